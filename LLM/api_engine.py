@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+API Engine - LLM Premier League
+Lógica de los endpoints independiente del framework: validación, respuestas locales, prompts y parseo
+"""
+
+import logging
+import os
+import platform
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from batch_predict import (
+    Fixture, _extract_json, create_batch_prediction_prompt, parse_claude_predictions, parse_fixtures,
+    predict_batch, predict_local_batch
+)
+from claude_client import CLAUDE_MODEL, CLAUDE_TIMEOUT
+from live_stats import parse_match_result
+from time_index import parse_window
+
+logger = logging.getLogger(__name__)
+
+DATA_RANGE = '2014-2024'
+AI_MODE_LABELS = {True: 'Claude AI Activo', False: 'Datos Locales'}
+AI_MODES = ('local', 'claude', 'speculative')
+AI_MODE_HEADER = 'X-AI-Mode'
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+ANALYSIS_LIST_FIELDS = ('strengths', 'weaknesses', 'key_players')
+MAX_QUESTION_CHARS = 2000
+BATCH_TIMEOUT = 4 * CLAUDE_TIMEOUT
+
+
+class ApiError(ValueError):
+    """Error de la petición con su código HTTP"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def resolve_ai_mode(body_mode, header_mode, use_claude_ai: bool) -> str:
+    """
+    Motor de una petición: campo 'mode' del cuerpo, si no el header X-AI-Mode
+    y, si no viene ninguno, el modo global de /api/toggle-ai.
+
+    Returns:
+        str: 'local', 'claude' o 'speculative'
+
+    Raises:
+        ApiError: Si el modo pedido no es uno de AI_MODES
+    """
+    mode = body_mode if body_mode not in (None, '') else header_mode
+    if mode in (None, ''):
+        return 'claude' if use_claude_ai else 'local'
+    mode = str(mode).strip().lower()
+    if mode not in AI_MODES:
+        raise ApiError(f"Modo no válido: {mode} (esperado {', '.join(AI_MODES)})")
+    return mode
+
+
+def admin_authorized(token: Optional[str], remote_addr: Optional[str]) -> bool:
+    """
+    Autorización de endpoints de administración.
+
+    Con ADMIN_API_TOKEN definido se exige el header X-Admin-Token; sin él solo
+    se aceptan peticiones desde localhost.
+
+    Args:
+        token: Valor del header X-Admin-Token
+        remote_addr: Dirección IP del cliente
+    """
+    expected = os.getenv('ADMIN_API_TOKEN')
+    if expected:
+        return token == expected
+    return remote_addr in LOCAL_ADDRESSES
+
+
+def claude_health(claude, use_claude_ai: bool) -> Dict:
+    """Estado de la integración con Claude (/api/health y /api/health/claude)"""
+    breaker = getattr(claude, 'breaker', None)
+    return {
+        'use_claude_ai': use_claude_ai,
+        'ai_modes': list(AI_MODES),
+        'claude_available': bool(claude is not None and claude.available),
+        'claude_circuit': breaker.snapshot() if breaker is not None else None
+    }
+
+
+def service_stats(response_cache=None, claude=None, speculative: Optional[Dict] = None,
+                  goals_model=None, market_model=None) -> Dict:
+    """Contadores de los servicios adicionales (/api/stats/cache)"""
+    return {
+        'response_cache': response_cache.stats() if response_cache is not None else None,
+        'claude_calls': claude.stats() if claude is not None else None,
+        'speculative': speculative,
+        'goals_model': goals_model.summary() if goals_model is not None else None,
+        'market_model': market_model.summary() if market_model is not None else None
+    }
+
+
+class PremierLeagueEngine:
+    """
+    Lógica de /api/* compartida por el servidor Flask y el ASGI.
+
+    El engine valida las peticiones, calcula las respuestas locales, construye
+    los prompts y parsea las respuestas de Claude; los handlers de cada
+    framework solo leen el cuerpo, llaman a Claude (bloqueante o con await) y
+    serializan. Así ambos caminos devuelven exactamente el mismo JSON.
+
+    use_claude_ai es solo el modo por defecto: cada petición puede elegir su
+    motor (request_mode) sin tocar el estado compartido, así tráfico local y
+    de Claude conviven en el mismo servidor.
+    """
+
+    def __init__(self, live_stats, h2h=None, use_claude_ai: bool = False, model: str = CLAUDE_MODEL,
+                 goals_model=None, market_model=None):
+        self.live_stats = live_stats
+        self.h2h = h2h
+        self.goals_model = goals_model
+        self.market_model = market_model
+        self.use_claude_ai = use_claude_ai
+        self.model = model
+        self.started_at = datetime.now(timezone.utc)
+        self.requests: Dict[str, int] = {}
+        self.mode_requests: Dict[str, int] = {}
+
+    @property
+    def teams(self) -> List[str]:
+        return sorted(self.live_stats.team_names)
+
+    def count(self, endpoint: str):
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def request_mode(self, payload: Optional[Dict], header: Optional[str] = None) -> str:
+        """
+        Modo de la petición (cuerpo 'mode', header X-AI-Mode o el global), contado en /api/stats.
+
+        Raises:
+            ApiError: Si el modo pedido no es válido
+        """
+        mode = resolve_ai_mode((payload or {}).get('mode'), header, self.use_claude_ai)
+        self.mode_requests[mode] = self.mode_requests.get(mode, 0) + 1
+        return mode
+
+    def _require_team(self, team_name: str):
+        if team_name not in self.live_stats.team_names:
+            raise ApiError(f"Equipo no encontrado en datos históricos: {team_name}", 404)
+
+    # --- /api/health, /api/teams, /api/stats, /api/system, /api/toggle-ai ---
+
+    def health(self, claude=None) -> Dict:
+        """Mismos campos que /api/health del servidor Flask (claude_health incluido)"""
+        health = claude_health(claude, self.use_claude_ai)
+        return {
+            'status': 'healthy',
+            'llm_ready': True,
+            'teams_loaded': len(self.live_stats.team_names),
+            'ai_mode': AI_MODE_LABELS[self.use_claude_ai],
+            'use_claude_ai': self.use_claude_ai,
+            'ai_modes': health['ai_modes'],
+            'model_version': self.model,
+            'data_range': DATA_RANGE,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'claude_available': health['claude_available'],
+            'claude_circuit': health['claude_circuit']
+        }
+
+    def teams_payload(self) -> Dict:
+        teams = self.teams
+        return {'success': True, 'teams': teams, 'total_teams': len(teams)}
+
+    def stats(self, extra: Optional[Dict] = None) -> Dict:
+        return {
+            'success': True,
+            'use_claude_ai': self.use_claude_ai,
+            'teams_loaded': len(self.live_stats.team_names),
+            'data_version': self.live_stats.data_version,
+            'uptime_seconds': self.uptime_seconds(),
+            'requests': dict(self.requests),
+            'requests_by_mode': dict(self.mode_requests),
+            'goals_model': self.goals_model.summary() if self.goals_model is not None else None,
+            'market_model': self.market_model.summary() if self.market_model is not None else None,
+            **(extra or {})
+        }
+
+    def uptime_seconds(self) -> float:
+        return round((datetime.now(timezone.utc) - self.started_at).total_seconds(), 1)
+
+    def system(self) -> Dict:
+        """Proceso y entorno que sirve la API (/api/system)"""
+        return {
+            'success': True,
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pid': os.getpid(),
+            'threads': threading.active_count(),
+            'uptime_seconds': self.uptime_seconds(),
+            'use_claude_ai': self.use_claude_ai,
+            'ai_modes': list(AI_MODES),
+            'model_version': self.model,
+            'data_range': DATA_RANGE,
+            'data_version': self.live_stats.data_version,
+            'teams_loaded': len(self.live_stats.team_names)
+        }
+
+    def toggle(self, payload: Optional[Dict]) -> Dict:
+        """
+        Raises:
+            ApiError: Si falta use_claude_ai o no es booleano
+        """
+        enabled = (payload or {}).get('use_claude_ai')
+        if not isinstance(enabled, bool):
+            raise ApiError("Campo 'use_claude_ai' (true/false) requerido")
+        self.use_claude_ai = enabled
+        logger.info(f"🔀 Modo cambiado a: {AI_MODE_LABELS[enabled]}")
+        return {'success': True, 'use_claude_ai': enabled, 'ai_mode': AI_MODE_LABELS[enabled]}
+
+    # --- /api/stats/results --------------------------------------------------
+
+    def ingest_result(self, payload: Optional[Dict]) -> Dict:
+        """
+        Ingerir un resultado final y devolver las estadísticas actualizadas de ambos equipos.
+
+        Raises:
+            ApiError: Si el resultado no es válido
+        """
+        try:
+            result = parse_match_result(payload)
+        except ValueError as e:
+            raise ApiError(str(e))
+
+        applied = self.live_stats.ingest_result(result)
+        home_stats, away_stats = self.live_stats.pair_stats(result.home_team, result.away_team)
+        if applied:
+            logger.info(f"⚽ Resultado ingerido: {result.home_team} {result.home_goals}-"
+                        f"{result.away_goals} {result.away_team}")
+        return {
+            'success': True,
+            'applied': applied,
+            'data_version': self.live_stats.data_version,
+            'match': {
+                'date': result.date,
+                'home_team': result.home_team,
+                'away_team': result.away_team,
+                'home_goals': result.home_goals,
+                'away_goals': result.away_goals,
+                'result': result.result
+            },
+            'team_stats': {
+                result.home_team: home_stats,
+                result.away_team: away_stats
+            }
+        }
+
+    # --- /api/predict --------------------------------------------------------
+
+    def parse_match(self, payload: Optional[Dict]) -> Fixture:
+        """
+        Raises:
+            ApiError: 400 si faltan equipos o son iguales, 404 si no existen
+        """
+        payload = payload or {}
+        home_team, away_team = payload.get('home_team'), payload.get('away_team')
+        if not home_team or not away_team:
+            raise ApiError("Se requieren 'home_team' y 'away_team'")
+        if home_team == away_team:
+            raise ApiError("Los equipos deben ser diferentes")
+        self._require_team(home_team)
+        self._require_team(away_team)
+        return Fixture(0, home_team, away_team)
+
+    def local_prediction(self, fixture: Fixture) -> Dict:
+        return predict_local_batch(self.live_stats.snapshot(), [fixture], self.goals_model, self.market_model)[0]
+
+    def prediction_prompt(self, fixture: Fixture) -> str:
+        return create_batch_prediction_prompt([fixture], self.live_stats.snapshot(), self.h2h)
+
+    def parse_prediction(self, text: str, fixture: Fixture) -> Dict:
+        """
+        Raises:
+            ValueError: Si la respuesta no contiene una predicción válida
+        """
+        prediction = parse_claude_predictions(text, [fixture]).get(fixture.index)
+        if prediction is None:
+            raise ValueError("Respuesta de Claude sin predicción válida")
+        return prediction
+
+    # --- /api/predict/batch --------------------------------------------------
+
+    def parse_batch(self, payload: Optional[Dict]) -> Tuple[object, List[Fixture], List[Dict]]:
+        """
+        Returns:
+            Tuple: (snapshot de la tabla, partidos válidos, errores por partido)
+
+        Raises:
+            ApiError: Si el cuerpo no trae una lista de partidos utilizable
+        """
+        table = self.live_stats.snapshot()
+        try:
+            fixtures, errors = parse_fixtures(payload, table)
+        except ValueError as e:
+            raise ApiError(str(e))
+        return table, fixtures, errors
+
+    def batch_prediction(self, table, fixtures: List[Fixture], errors: List[Dict],
+                         complete: Optional[Callable[..., str]] = None, mode: str = 'claude',
+                         budget: Optional[float] = None) -> Dict:
+        """
+        Respuesta de /api/predict/batch; bloquea hasta tener todos los partidos.
+
+        Args:
+            complete: complete(prompt, max_tokens=...) de Claude; sin él, predicción local
+            mode: Modo pedido ('claude' o 'speculative'), devuelto en 'mode' si se usa Claude
+            budget: Presupuesto de latencia por lote en modo speculative
+        """
+        if complete is None:
+            mode = 'local'
+        budget = budget if mode == 'speculative' else None
+        results = predict_batch(fixtures, table, complete=complete, h2h_index=self.h2h,
+                                goals_model=self.goals_model, market_model=self.market_model, budget=budget)
+        results = sorted(results + errors, key=lambda r: r['index'])
+
+        succeeded = sum(1 for r in results if r['success'])
+        logger.info(f"📋 Predicción batch: {succeeded}/{len(results)} partidos ({mode})")
+        response = {
+            'success': True,
+            'mode': mode,
+            'data_version': self.live_stats.data_version,
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results
+        }
+        if budget is not None:
+            response['budget_seconds'] = budget
+        return response
+
+    # --- /api/analyze --------------------------------------------------------
+
+    def parse_team(self, payload: Optional[Dict]) -> str:
+        """
+        Raises:
+            ApiError: 400 si falta el equipo, 404 si no existe
+        """
+        payload = payload or {}
+        team_name = payload.get('team_name') or payload.get('team')
+        if not team_name:
+            raise ApiError("Se requiere 'team_name'")
+        self._require_team(team_name)
+        return team_name
+
+    def window_stats(self, team_name: str, params: Dict) -> Optional[Dict]:
+        """
+        Raises:
+            ApiError: Si as_of o window no son válidos
+        """
+        as_of = params.get('as_of') or None
+        window = params.get('window')
+        if as_of is None and window in (None, ''):
+            return None
+        try:
+            return self.live_stats.window_stats(team_name, as_of=as_of, **parse_window(window))
+        except ValueError as e:
+            raise ApiError(str(e))
+
+    def market_stats(self, team_name: str) -> Optional[Dict]:
+        """Bloque market de /api/analyze: rating de mercado y probabilidades de sus últimos partidos"""
+        if self.market_model is None or team_name not in self.market_model:
+            return None
+        return self.market_model.team_summary(team_name)
+
+    def local_analysis(self, team_name: str) -> Dict:
+        """Fortalezas y debilidades frente a la media de la liga"""
+        stats = self.live_stats.team_stats(team_name)
+        table = self.live_stats.snapshot()
+        league_scored = float(table.goals_per_game.mean())
+        league_conceded = float(table.goals_conceded_per_game.mean())
+        league_win_rate = float(table.win_rate.mean())
+
+        strengths, weaknesses = [], []
+        checks = [
+            (stats['goals_per_game'] >= league_scored, stats['goals_per_game'],
+             "Ataque por encima de la media", "Ataque por debajo de la media", "goles a favor por partido"),
+            (stats['goals_conceded_per_game'] <= league_conceded, stats['goals_conceded_per_game'],
+             "Defensa sólida", "Defensa vulnerable", "goles en contra por partido"),
+        ]
+        for good, value, good_text, bad_text, unit in checks:
+            (strengths if good else weaknesses).append(f"{good_text if good else bad_text} ({value:.2f} {unit})")
+        if stats['home_win_rate'] >= league_win_rate:
+            strengths.append(f"Fuerte como local ({stats['home_win_rate']:.0%} de victorias en casa)")
+        else:
+            weaknesses.append(f"Irregular como local ({stats['home_win_rate']:.0%} de victorias en casa)")
+        if stats['away_win_rate'] >= league_win_rate * 0.8:
+            strengths.append(f"Competitivo fuera ({stats['away_win_rate']:.0%} de victorias fuera)")
+        else:
+            weaknesses.append(f"Le cuesta ganar fuera ({stats['away_win_rate']:.0%} de victorias fuera)")
+
+        return {
+            'team_name': team_name,
+            'strengths': strengths,
+            'weaknesses': weaknesses,
+            'key_players': [],
+            'recent_form': stats['recent_form'],
+            'statistics': stats,
+            'summary': (f"{team_name}: {stats['matches_played']} partidos, {stats['win_rate']:.0%} de victorias, "
+                        f"{stats['goals_per_game']:.2f} goles a favor y {stats['goals_conceded_per_game']:.2f} "
+                        f"en contra por partido. Forma reciente: {stats['recent_form'] or '-'}.")
+        }
+
+    def analysis_prompt(self, team_name: str) -> str:
+        stats = self.live_stats.team_stats(team_name)
+        return f"""Eres un analista experto de la Premier League (temporada 2024-25).
+Analiza al {team_name} con sus estadísticas históricas (2014-2024):
+- {stats['matches_played']} partidos, {stats['win_rate']:.0%} victorias (casa {stats['home_win_rate']:.0%}, fuera {stats['away_win_rate']:.0%})
+- {stats['goals_per_game']:.2f} goles a favor y {stats['goals_conceded_per_game']:.2f} en contra por partido
+- Forma reciente: {stats['recent_form'] or '-'}
+
+Responde ÚNICAMENTE con un objeto JSON:
+{{
+  "strengths": ["<fortaleza>", "<fortaleza>"],
+  "weaknesses": ["<debilidad>", "<debilidad>"],
+  "key_players": ["<jugador>", "<jugador>"],
+  "recent_form": "<valoración de la forma reciente>",
+  "summary": "<resumen del análisis>"
+}}"""
+
+    def parse_analysis(self, text: str, team_name: str) -> Dict:
+        """
+        Análisis de Claude completado con las estadísticas locales.
+
+        Raises:
+            ValueError: Si la respuesta no es un objeto JSON con las listas esperadas
+        """
+        parsed = _extract_json(text)
+        if not isinstance(parsed, dict):
+            raise ValueError("Respuesta de Claude sin objeto JSON")
+        analysis = self.local_analysis(team_name)
+        for field in ANALYSIS_LIST_FIELDS:
+            if not isinstance(parsed.get(field, []), list):
+                raise ValueError(f"Campo inválido en el análisis: {field}")
+            analysis[field] = [str(item) for item in parsed.get(field, [])] or analysis[field]
+        for field in ('recent_form', 'summary'):
+            if parsed.get(field):
+                analysis[field] = str(parsed[field])
+        return analysis
+
+    # --- /api/chat -----------------------------------------------------------
+
+    def parse_question(self, payload: Optional[Dict]) -> str:
+        """
+        Raises:
+            ApiError: Si falta la pregunta o es demasiado larga
+        """
+        payload = payload or {}
+        question = (payload.get('question') or payload.get('message') or '').strip()
+        if not question:
+            raise ApiError("Se requiere 'question'")
+        if len(question) > MAX_QUESTION_CHARS:
+            raise ApiError(f"La pregunta supera {MAX_QUESTION_CHARS} caracteres")
+        return question
+
+    def local_chat(self, question: str) -> str:
+        """Respuesta en modo local: estadísticas de los equipos mencionados"""
+        lowered = question.casefold()
+        mentioned = [team for team in self.teams if team.casefold() in lowered]
+        if not mentioned:
+            return ("Modo de datos locales: puedo responder con estadísticas históricas (2014-2024) "
+                    "de los equipos que menciones. Activa Claude AI para análisis conversacional.")
+        lines = [self.local_analysis(team)['summary'] for team in mentioned[:3]]
+        return "Según las estadísticas históricas (2014-2024):\n" + "\n".join(lines)
+
+    def chat_prompt(self, question: str) -> str:
+        return (f"Eres un analista experto de la Premier League (temporada 2024-25). "
+                f"Responde en español de forma clara y concisa.\n\nPregunta: {question}")
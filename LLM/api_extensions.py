@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+API Extensions - LLM Premier League
+Endpoints adicionales del servidor Flask, registrados como Blueprint sobre la app existente
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from api_engine import (
+    ADMIN_TOKEN_HEADER, AI_MODE_HEADER, BATCH_TIMEOUT, ApiError, PremierLeagueEngine, resolve_ai_mode, service_stats
+)
+from api_engine import admin_authorized as engine_admin_authorized, claude_health as engine_claude_health
+from claude_client import (
+    CLAUDE_MAX_TOKENS, CLAUDE_MODEL, CLAUDE_TIMEOUT, ClaudeAPIError, current_deadline, deadline_scope
+)
+from response_cache import cache_key
+from speculative import DEFAULT_LATENCY_BUDGET
+from sse import SSE_HEADERS, SSE_MIMETYPE, stream_events, stream_prediction_events, wants_event_stream
+from stream_parser import PredictionStreamParser
+from time_index import parse_window
+
+logger = logging.getLogger(__name__)
+
+api_extensions = Blueprint('api_extensions', __name__, url_prefix='/api')
+
+EXTENSION_KEY = 'premier_league'
+
+
+def init_api_extensions(app, **services):
+    """
+    Registrar los endpoints adicionales en la app Flask.
+
+    Uso en api_server_optimized.py:
+        dataset = load_dataset()
+        live_stats = LiveStatsStore.from_dataset(dataset)
+        claude = CircuitBreakerClient(BlockingClaudeClient(), CircuitBreaker.from_env())
+        goals_model = fit_goals_model(dataset)
+        market_model = fit_market_model(dataset)
+        init_api_extensions(app, llm=llm, live_stats=live_stats, claude=claude,
+                            h2h=h2h_index, response_cache=ResponseCache.from_env(),
+                            speculative=SpeculativePredictor.from_env(),
+                            goals_model=goals_model, market_model=market_model,
+                            simulator=SeasonSimulator(live_stats, goals_model, latest_season_teams(dataset),
+                                                      market_model=market_model))
+
+    Con goals_model, las predicciones locales (/api/predict en modo local y
+    /api/predict/batch) leen goles y probabilidades de sus tablas, y con
+    market_model las mezclan con las probabilidades implícitas en las cuotas:
+        predict_local_batch(live_stats.snapshot(), [fixture], get_service('goals_model'),
+                            get_service('market_model'))
+    """
+    app.extensions.setdefault(EXTENSION_KEY, {}).update(services)
+    if api_extensions.name not in app.blueprints:
+        app.register_blueprint(api_extensions)
+
+
+def get_service(name: str) -> Any:
+    """Servicio registrado con init_api_extensions (None si no está configurado)"""
+    return current_app.extensions.get(EXTENSION_KEY, {}).get(name)
+
+
+def get_engine() -> Optional[PremierLeagueEngine]:
+    """
+    PremierLeagueEngine sobre los servicios registrados, el mismo código que usa el servidor ASGI.
+
+    Se crea en la primera petición (None si no hay live_stats) y se reutiliza.
+    """
+    services = current_app.extensions.get(EXTENSION_KEY, {})
+    engine = services.get('engine')
+    if engine is None and services.get('live_stats') is not None:
+        engine = services['engine'] = PremierLeagueEngine(
+            services['live_stats'], h2h=services.get('h2h'),
+            model=getattr(services.get('claude'), 'model', CLAUDE_MODEL),
+            goals_model=services.get('goals_model'), market_model=services.get('market_model')
+        )
+    return engine
+
+
+def error_response(message: str, status_code: int):
+    return jsonify({'success': False, 'error': message}), status_code
+
+
+def admin_authorized() -> bool:
+    """Autorización de endpoints de administración (api_engine.admin_authorized sobre la petición Flask)"""
+    return engine_admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER), request.remote_addr)
+
+
+def request_timeout(default: float = CLAUDE_TIMEOUT) -> float:
+    """
+    Segundos que el cliente está dispuesto a esperar (header X-Request-Timeout).
+
+    Los handlers envuelven su trabajo en deadline_scope(request_timeout()) y las
+    llamadas a Claude usan como timeout el tiempo restante.
+    """
+    try:
+        timeout = float(request.headers.get('X-Request-Timeout', default))
+    except ValueError:
+        return default
+    return timeout if timeout > 0 else default
+
+
+def request_mode() -> str:
+    """
+    Motor de la petición: campo 'mode' del cuerpo JSON o header X-AI-Mode
+    ('local', 'claude' o 'speculative'); sin ninguno, el modo global de llm.
+
+    Uso en el handler de /api/predict en lugar de leer llm.use_claude_ai:
+        try:
+            mode = request_mode()
+        except ApiError as e:
+            return error_response(str(e), e.status_code)
+        if mode == 'speculative':
+            prediction, source = speculative_prediction(home_team, away_team, local=..., prompt=..., parse=...)
+        elif mode == 'claude':
+            prediction = cached_claude_response('predict', home_team, away_team, prompt, parse)
+        else:
+            prediction = llm.predict_match_local(home_team, away_team)
+
+    Así /api/toggle-ai solo cambia el modo por defecto y tráfico local y de
+    Claude pueden mezclarse en el mismo servidor sin pisarse.
+
+    Raises:
+        ApiError: Si el modo pedido no es válido
+    """
+    payload = request.get_json(silent=True)
+    body_mode = payload.get('mode') if isinstance(payload, dict) else None
+    return resolve_ai_mode(body_mode, request.headers.get(AI_MODE_HEADER),
+                           bool(getattr(get_service('llm'), 'use_claude_ai', False)))
+
+
+def stream_requested() -> bool:
+    """True si la petición pide SSE (Accept: text/event-stream o ?stream=1)"""
+    return wants_event_stream(request.headers.get('Accept'), request.args.get('stream'))
+
+
+def claude_sse_response(prompt: str, finalize: Callable[[str], Dict],
+                        fallback: Optional[Callable[[], Dict]] = None,
+                        max_tokens: int = CLAUDE_MAX_TOKENS) -> Response:
+    """
+    Respuesta SSE que reenvía los deltas de Claude según llegan.
+
+    Los handlers de /api/chat y /api/analyze la devuelven cuando stream_requested():
+        if stream_requested():
+            return claude_sse_response(
+                prompt,
+                finalize=lambda text: {'success': True, 'response': text},
+                fallback=lambda: {'success': True, 'response': local_answer(question)}
+            )
+
+    Eventos: start (inmediato), delta {"text"} por fragmento y done con el mismo
+    JSON que la respuesta sin stream (o error si Claude falla a mitad).
+    """
+    claude = get_service('claude')
+    deadline = time.monotonic() + request_timeout()
+
+    def deltas():
+        if claude is None or not claude.available:
+            raise ClaudeAPIError("Claude AI no disponible")
+        return claude.stream(prompt, max_tokens, deadline=deadline)
+
+    return Response(
+        stream_with_context(stream_events(deltas, finalize, fallback)),
+        mimetype=SSE_MIMETYPE,
+        headers=SSE_HEADERS
+    )
+
+
+def claude_prediction_sse_response(prompt: str, home_team: str, away_team: str,
+                                   finalize: Callable[[Dict], Dict],
+                                   fallback: Optional[Callable[[], Dict]] = None,
+                                   max_tokens: int = CLAUDE_MAX_TOKENS) -> Response:
+    """
+    Respuesta SSE para /api/predict que analiza el JSON de Claude según llega.
+
+    Uso en el handler de /api/predict:
+        if stream_requested():
+            return claude_prediction_sse_response(
+                create_match_analysis_prompt(home_team, away_team), home_team, away_team,
+                finalize=lambda prediction: {'success': True, 'prediction': prediction},
+                fallback=lambda: {'success': True, 'prediction': llm.predict_match(home_team, away_team)}
+            )
+
+    Eventos: start, partial con la MatchPrediction parcial cada vez que se
+    valida un campo y done con la predicción completa (o la local si la
+    respuesta de Claude es inválida).
+    """
+    claude = get_service('claude')
+    deadline = time.monotonic() + request_timeout()
+
+    def deltas():
+        if claude is None or not claude.available:
+            raise ClaudeAPIError("Claude AI no disponible")
+        return claude.stream(prompt, max_tokens, deadline=deadline)
+
+    parser = PredictionStreamParser(home_team, away_team)
+    return Response(
+        stream_with_context(stream_prediction_events(deltas, parser, finalize, fallback)),
+        mimetype=SSE_MIMETYPE,
+        headers=SSE_HEADERS
+    )
+
+
+def analyze_window_stats(team_name: str, params: Dict) -> Optional[Dict]:
+    """
+    Bloque window_stats de /api/analyze cuando la petición trae as_of y/o window.
+
+    El handler de /api/analyze lo añade a su respuesta:
+        window_stats = analyze_window_stats(team, {**request.args, **payload})
+
+    Raises:
+        ValueError: Si as_of o window no son válidos (responder 400)
+    """
+    as_of = params.get('as_of') or None
+    window = params.get('window')
+    if as_of is None and window in (None, ''):
+        return None
+
+    live_stats = get_service('live_stats')
+    if live_stats is None:
+        raise ValueError("Estadísticas por ventana no disponibles")
+    return live_stats.window_stats(team_name, as_of=as_of, **parse_window(window))
+
+
+def analyze_market(team_name: str) -> Optional[Dict]:
+    """
+    Bloque market de /api/analyze: rating de mercado del equipo y probabilidades
+    sin margen de sus últimos partidos (None sin market_model).
+
+    El handler de /api/analyze lo añade a su respuesta:
+        market = analyze_market(team)
+        if market is not None:
+            response['market'] = market
+    """
+    market_model = get_service('market_model')
+    if market_model is None or team_name not in market_model:
+        return None
+    return market_model.team_summary(team_name)
+
+
+def claude_call(prompt: str, parse: Callable[[str], Any]) -> Callable[[], Any]:
+    """
+    Llamada directa a Claude: parse(claude.complete(prompt)).
+
+    Falla con ClaudeAPIError (o la excepción de parse) en lugar de devolver un
+    resultado de respaldo, así lo que llega al cache de respuestas siempre
+    viene de Claude.
+    """
+    claude = get_service('claude')
+
+    def call():
+        if claude is None or not claude.available:
+            raise ClaudeAPIError("Claude AI no disponible")
+        return parse(claude.complete(prompt))
+    return call
+
+
+def cached_claude_response(endpoint: str, home_team: str, away_team: Optional[str],
+                           prompt: str, parse: Callable[[str], Any]) -> Any:
+    """
+    Respuesta de Claude cacheada por (endpoint, equipos, modelo, plantilla, versión de datos).
+
+    Solo se cachea la respuesta de Claude: no se envuelve llm.predict_match, que
+    ante un fallo devuelve la predicción local y la dejaría cacheada durante
+    todo el TTL como si fuera de Claude. Los fallos se propagan y el handler
+    responde con la local:
+        try:
+            prediction = cached_claude_response(
+                'predict', home, away, create_match_analysis_prompt(home, away),
+                parse=lambda text: predict_from_stream([text], home, away))
+        except (ClaudeAPIError, ValueError):
+            prediction = llm.predict_match_local(home, away)
+
+    Raises:
+        ClaudeAPIError: Si Claude no está disponible, falla o no responde antes del deadline
+        ValueError: Si parse rechaza la respuesta
+    """
+    cache = get_service('response_cache')
+    compute = claude_call(prompt, parse)
+    with deadline_scope(request_timeout()):
+        if cache is None:
+            return compute()
+        return _cache_get_or_compute(cache, _response_cache_key(endpoint, home_team, away_team), compute)
+
+
+def _cache_get_or_compute(cache, key, compute: Callable[[], Any]) -> Any:
+    """get_or_compute esperando a una petición idéntica como mucho lo que queda del deadline"""
+    try:
+        return cache.get_or_compute(key, compute, timeout=max(current_deadline() - time.monotonic(), 0.0))
+    except TimeoutError as e:
+        raise ClaudeAPIError(f"Timeout esperando a Claude: {e}")
+
+
+def _response_cache_key(endpoint: str, home_team: str, away_team: Optional[str]):
+    llm = get_service('llm')
+    live_stats = get_service('live_stats')
+    teams = (home_team, away_team) if away_team else (home_team,)
+    return cache_key(
+        endpoint, home_team, away_team,
+        model=getattr(llm, 'model', CLAUDE_MODEL),
+        data_version=live_stats.teams_version(*teams) if live_stats is not None else ''
+    )
+
+
+def latency_budget() -> Optional[float]:
+    """Presupuesto de latencia pedido por el cliente (header X-Latency-Budget, segundos)"""
+    try:
+        budget = float(request.headers['X-Latency-Budget'])
+    except (KeyError, ValueError):
+        return None
+    return budget if budget >= 0 else None
+
+
+def speculative_prediction(home_team: str, away_team: str, local: Callable[[], Any],
+                           prompt: str, parse: Callable[[str], Any]) -> Tuple[Any, str]:
+    """
+    Predicción en modo especulativo: local inmediata en carrera con Claude.
+
+    Uso en el handler de /api/predict con request_mode() == 'speculative':
+        prediction, source = speculative_prediction(
+            home_team, away_team,
+            local=lambda: llm.predict_match_local(home_team, away_team),
+            prompt=create_match_analysis_prompt(home_team, away_team),
+            parse=lambda text: predict_from_stream([text], home_team, away_team)
+        )
+        return jsonify({'success': True, 'prediction': prediction, 'source': source})
+
+    Claude se espera como mucho PREDICT_LATENCY_BUDGET segundos (o el header
+    X-Latency-Budget). Si no llega a tiempo se responde con la predicción local
+    (source 'local') y el resultado tardío de Claude se guarda en el cache de
+    respuestas para la siguiente petición del mismo partido. La llamada es la
+    directa a Claude (claude_call): un fallo sale como 'local_fallback' y no
+    se cachea.
+
+    Returns:
+        Tuple: (predicción, origen) con origen 'claude', 'local' o 'local_fallback'
+    """
+    speculative = get_service('speculative')
+    cache = get_service('response_cache')
+    key = _response_cache_key('predict', home_team, away_team)
+    remote = claude_call(prompt, parse)
+
+    def cached_remote():
+        return _cache_get_or_compute(cache, key, remote) if cache is not None else remote()
+
+    with deadline_scope(request_timeout()):
+        if speculative is None:
+            return cached_remote(), 'claude'
+        return speculative.predict(local, cached_remote, budget=latency_budget())
+
+
+def extension_stats() -> Dict:
+    """Contadores de los servicios adicionales, para incluir en /api/stats"""
+    speculative = get_service('speculative')
+    return service_stats(get_service('response_cache'), get_service('claude'),
+                         speculative.stats() if speculative is not None else None,
+                         get_service('goals_model'), get_service('market_model'))
+
+
+def claude_health() -> Dict:
+    """
+    Estado de la integración con Claude, para incluir en /api/health junto a use_claude_ai.
+
+    Uso en el handler de /api/health:
+        return jsonify({'status': 'healthy', ..., **claude_health()})
+
+    claude_circuit es None si el cliente no tiene circuit breaker. ai_modes
+    anuncia a los clientes que se puede elegir el modo por petición
+    (request_mode()).
+    """
+    return engine_claude_health(get_service('claude'), getattr(get_service('llm'), 'use_claude_ai', False))
+
+
+@api_extensions.route('/health/claude', methods=['GET'])
+def claude_health_check():
+    """Estado del circuit breaker de Claude"""
+    return jsonify({'success': True, **claude_health()})
+
+
+@api_extensions.route('/stats/cache', methods=['GET'])
+def cache_stats():
+    """Contadores del cache de respuestas y de la deduplicación de llamadas a Claude"""
+    return jsonify({'success': True, **extension_stats()})
+
+
+@api_extensions.route('/stats/results', methods=['POST'])
+def ingest_match_result():
+    """Ingerir un resultado final y actualizar las estadísticas sin recargar el dataset"""
+    if not admin_authorized():
+        return error_response('No autorizado', 403)
+
+    engine = get_engine()
+    if engine is None:
+        return error_response('Estadísticas en vivo no disponibles', 503)
+
+    try:
+        return jsonify(engine.ingest_result(request.get_json(silent=True)))
+    except ApiError as e:
+        return error_response(str(e), e.status_code)
+
+
+@api_extensions.route('/predict/batch', methods=['POST'])
+def predict_batch_endpoint():
+    """Predecir una jornada o lista de partidos en una sola petición"""
+    engine = get_engine()
+    if engine is None:
+        return error_response('Estadísticas no disponibles', 503)
+
+    payload = request.get_json(silent=True)
+    try:
+        table, fixtures, errors = engine.parse_batch(payload)
+        mode = request_mode()
+    except ApiError as e:
+        return error_response(str(e), e.status_code)
+    claude = get_service('claude')
+    use_claude = mode != 'local' and claude is not None and claude.available
+    speculative = get_service('speculative')
+    budget = latency_budget()
+    if budget is None:
+        budget = speculative.budget if speculative is not None else DEFAULT_LATENCY_BUDGET
+    with deadline_scope(request_timeout(BATCH_TIMEOUT)):
+        return jsonify(engine.batch_prediction(table, fixtures, errors,
+                                               complete=claude.complete if use_claude else None,
+                                               mode=mode, budget=budget))
+
+
+@api_extensions.route('/simulate', methods=['POST'])
+def simulate_season():
+    """Simular la temporada por Monte Carlo: probabilidades de título, top 4 y descenso"""
+    simulator = get_service('simulator')
+    if simulator is None:
+        return error_response('Simulador no disponible', 503)
+
+    try:
+        return jsonify(simulator.simulate(request.get_json(silent=True)))
+    except ValueError as e:
+        return error_response(str(e), 400)
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+ASGI Server - LLM Premier League
+Camino asyncio de la API: los mismos endpoints y contratos JSON que Flask, servidos sobre un event loop
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qsl
+
+from api_engine import (
+    ADMIN_TOKEN_HEADER, AI_MODE_HEADER, BATCH_TIMEOUT, ApiError, PremierLeagueEngine, admin_authorized, claude_health,
+    service_stats
+)
+from async_claude_client import AsyncClaudeClient
+from circuit_breaker import AsyncCircuitBreakerClient, CircuitBreaker
+from claude_client import CLAUDE_MAX_TOKENS, CLAUDE_TIMEOUT, ClaudeAPIError
+from response_cache import ResponseCache, cache_key
+from speculative import DEFAULT_LATENCY_BUDGET
+from sse import (
+    SSE_HEADERS, SSE_MIMETYPE, stream_events_async, stream_prediction_events_async, wants_event_stream
+)
+from stream_parser import PredictionStreamParser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 8081
+MAX_BODY_BYTES = 1024 * 1024
+JSON_HEADERS = [(b'content-type', b'application/json')]
+SSE_RESPONSE_HEADERS = [(b'content-type', SSE_MIMETYPE.encode())] + [
+    (name.lower().encode(), value.encode()) for name, value in SSE_HEADERS.items()]
+SPECULATIVE_COUNTERS = ('requests', 'claude_in_budget', 'local_served', 'late_completed', 'late_failed',
+                        'claude_errors')
+
+Handler = Callable[['Request'], Awaitable[Tuple[int, Union[Dict, 'EventStream']]]]
+
+
+class EventStream:
+    """Respuesta SSE de un handler: _http envía cada evento en cuanto el generador lo produce"""
+
+    def __init__(self, events: AsyncIterator[str]):
+        self.events = events
+
+
+class Request:
+    """Método, ruta, headers, query y cuerpo JSON de una petición ASGI"""
+
+    def __init__(self, scope: Dict, body: bytes):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        self.args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        self.remote_addr = (scope.get('client') or (None,))[0]
+        self.body = body
+
+    def json(self) -> Dict:
+        """
+        Raises:
+            ApiError: Si el cuerpo no es un objeto JSON
+        """
+        if not self.body:
+            return {}
+        try:
+            payload = json.loads(self.body)
+        except ValueError:
+            raise ApiError("Cuerpo JSON inválido")
+        if not isinstance(payload, dict):
+            raise ApiError("Se esperaba un objeto JSON")
+        return payload
+
+    def timeout(self, default: float = CLAUDE_TIMEOUT) -> float:
+        """Header X-Request-Timeout, igual que request_timeout() en Flask"""
+        try:
+            timeout = float(self.headers.get('x-request-timeout', default))
+        except ValueError:
+            return default
+        return timeout if timeout > 0 else default
+
+    def latency_budget(self, default: float) -> float:
+        """Header X-Latency-Budget, igual que latency_budget() en Flask"""
+        try:
+            budget = float(self.headers.get('x-latency-budget', default))
+        except ValueError:
+            return default
+        return budget if budget >= 0 else default
+
+    def stream_requested(self) -> bool:
+        """Accept: text/event-stream o ?stream=1, igual que stream_requested() en Flask"""
+        return wants_event_stream(self.headers.get('accept'), self.args.get('stream'))
+
+
+class PremierLeagueASGI:
+    """
+    App ASGI con los endpoints de /api/* del servidor Flask.
+
+    Cada petición es una corrutina: mientras espera a Claude no ocupa ningún
+    hilo, así un solo proceso mantiene miles de llamadas en vuelo (el límite lo
+    pone CLAUDE_MAX_CONCURRENCY en AsyncClaudeClient, no el número de hilos).
+    La lógica de cada endpoint está en PremierLeagueEngine, compartido con
+    Flask, y el trabajo local (tablas numpy de ~34 equipos) tarda
+    microsegundos, por lo que corre directamente en el event loop. Las
+    excepciones son /api/simulate (segundos de CPU) y /api/predict/batch (su
+    pool de hilos reparte los prompts), que van al executor del loop.
+
+    El cache de respuestas se usa solo con get/put: get_or_compute bloquearía el
+    loop esperando a otra petición. Las llamadas simultáneas con el mismo prompt
+    ya se agrupan en el single-flight del cliente asíncrono.
+
+    Cada petición elige su motor (campo 'mode' o header X-AI-Mode: local,
+    claude o speculative) y el modo global solo se usa por defecto. En modo
+    speculative Claude se espera como mucho latency_budget segundos (o el
+    header X-Latency-Budget); si no llega se responde con el resultado local
+    y la llamada sigue en segundo plano para dejar su resultado en el cache.
+
+    Con Accept: text/event-stream o ?stream=1, /api/chat y /api/analyze
+    responden con SSE: los deltas de AsyncClaudeClient.stream salen como
+    trozos del cuerpo (more_body=True) según llegan, sin esperar al final.
+    /api/predict pasa los deltas por PredictionStreamParser y envía cada
+    campo validado como evento partial.
+    """
+
+    def __init__(self, engine: PremierLeagueEngine, claude=None,
+                 response_cache: Optional[ResponseCache] = None, simulator=None,
+                 latency_budget: float = DEFAULT_LATENCY_BUDGET):
+        self.engine = engine
+        self.claude = claude
+        self.response_cache = response_cache
+        self.simulator = simulator
+        self.latency_budget = latency_budget
+        self.speculative = dict.fromkeys(SPECULATIVE_COUNTERS, 0)
+        self._late_tasks = set()
+        self.routes: Dict[Tuple[str, str], Handler] = {
+            ('GET', '/api/health'): self.health,
+            ('GET', '/api/health/claude'): self.claude_health,
+            ('GET', '/api/teams'): self.teams,
+            ('POST', '/api/predict'): self.predict,
+            ('POST', '/api/predict/batch'): self.predict_batch,
+            ('POST', '/api/analyze'): self.analyze,
+            ('POST', '/api/chat'): self.chat,
+            ('GET', '/api/stats'): self.stats,
+            ('GET', '/api/stats/cache'): self.cache_stats,
+            ('POST', '/api/stats/results'): self.ingest_result,
+            ('GET', '/api/system'): self.system,
+            ('POST', '/api/toggle-ai'): self.toggle_ai,
+            ('POST', '/api/simulate'): self.simulate,
+        }
+        self._paths = {path for _, path in self.routes}
+
+    async def __call__(self, scope: Dict, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                logger.info(f"🚀 API ASGI lista: {len(self.engine.teams)} equipos")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.claude is not None:
+                    await self.claude.aclose()
+                if self.simulator is not None:
+                    self.simulator.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive) -> Optional[bytes]:
+        """Cuerpo completo de la petición; None si supera MAX_BODY_BYTES"""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return b''
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    async def _http(self, scope: Dict, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            status, payload = 413, {'success': False, 'error': 'Cuerpo de la petición demasiado grande'}
+        else:
+            status, payload = await self.dispatch(Request(scope, body))
+        if isinstance(payload, EventStream):
+            await self._send_events(status, payload.events, receive, send)
+            return
+        data = json.dumps(payload).encode()
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': JSON_HEADERS + [(b'content-length', str(len(data)).encode())]})
+        await send({'type': 'http.response.body', 'body': data})
+
+    async def _send_events(self, status: int, events: AsyncIterator[str], receive, send):
+        """
+        Enviar una respuesta SSE evento a evento, cada uno en su http.response.body con more_body=True.
+
+        Si el cliente se desconecta se deja de enviar y el generador se cierra,
+        lo que cierra también el stream de Claude.
+        """
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await send({'type': 'http.response.start', 'status': status, 'headers': SSE_RESPONSE_HEADERS})
+            async for event in events:
+                if disconnected.is_set():
+                    return
+                await send({'type': 'http.response.body', 'body': event.encode(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        except Exception as e:
+            logger.exception(f"❌ Stream SSE interrumpido: {e}")
+        finally:
+            watcher.cancel()
+            await events.aclose()
+
+    async def dispatch(self, request: Request) -> Tuple[int, Union[Dict, EventStream]]:
+        """(código HTTP, JSON) de la petición, con los mismos errores que Flask"""
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            if request.path in self._paths:
+                return 405, {'success': False, 'error': 'Método no permitido'}
+            return 404, {'success': False, 'error': 'Endpoint no encontrado'}
+        self.engine.count(request.path)
+        try:
+            return await handler(request)
+        except ApiError as e:
+            return e.status_code, {'success': False, 'error': str(e)}
+        except Exception as e:
+            logger.exception(f"❌ Error en {request.path}: {e}")
+            return 500, {'success': False, 'error': 'Error interno del servidor'}
+
+    def _request_mode(self, request: Request, payload: Optional[Dict]) -> str:
+        return self.engine.request_mode(payload, request.headers.get(AI_MODE_HEADER.lower()))
+
+    def _claude_enabled(self, mode: str) -> bool:
+        return mode != 'local' and self.claude is not None and self.claude.available
+
+    async def _claude_result(self, prompt: str, parse: Callable[[str], Dict], deadline: float, key) -> Dict:
+        result = parse(await self.claude.complete(prompt, deadline=deadline))
+        if key is not None and self.response_cache is not None:
+            self.response_cache.put(key, result)
+        return result
+
+    def _late_done(self, task: asyncio.Task):
+        self._late_tasks.discard(task)
+        error = 'cancelada' if task.cancelled() else task.exception()
+        if error is not None:
+            self.speculative['late_failed'] += 1
+            logger.warning(f"⚠️ Llamada tardía a Claude sin resultado: {error}")
+        else:
+            self.speculative['late_completed'] += 1
+
+    async def _ask_claude(self, prompt: str, parse: Callable[[str], Dict], request: Request,
+                          fallback: Callable[[], Dict], key=None, mode: str = 'claude') -> Tuple[Dict, str]:
+        """
+        Resultado de Claude (cacheado por key si se da) o el local si Claude falla.
+
+        Como en Flask, un error de Claude o una respuesta que no se puede
+        interpretar no llegan al cliente: se responde con los datos locales.
+        En modo speculative tampoco se espera a Claude más allá del presupuesto.
+
+        Returns:
+            Tuple: (resultado, origen) con origen 'claude', 'local' o 'local_fallback'
+        """
+        if key is not None and self.response_cache is not None:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached, 'claude'
+        call = self._claude_result(prompt, parse, time.monotonic() + request.timeout(), key)
+        if mode != 'speculative':
+            try:
+                return await call, 'claude'
+            except (ClaudeAPIError, ValueError) as e:
+                logger.warning(f"⚠️ Claude no disponible, usando datos locales: {e}")
+                return fallback(), 'local_fallback'
+
+        self.speculative['requests'] += 1
+        start = time.monotonic()
+        task = asyncio.ensure_future(call)
+        local_result = fallback()
+        budget = request.latency_budget(self.latency_budget) - (time.monotonic() - start)
+        try:
+            # shield: al agotar el presupuesto la llamada sigue viva para el cache
+            result = await asyncio.wait_for(asyncio.shield(task), max(budget, 0.0))
+        except asyncio.TimeoutError:
+            self.speculative['local_served'] += 1
+            if key is None:
+                task.cancel()  # Sin cache nadie aprovecharía el resultado tardío
+            else:
+                self._late_tasks.add(task)
+                task.add_done_callback(self._late_done)
+            return local_result, 'local'
+        except (ClaudeAPIError, ValueError) as e:
+            logger.warning(f"⚠️ Claude falló en modo especulativo, usando datos locales: {e}")
+            self.speculative['claude_errors'] += 1
+            return local_result, 'local_fallback'
+        self.speculative['claude_in_budget'] += 1
+        return result, 'claude'
+
+    def _claude_deltas(self, prompt: str, request: Request, mode: str) -> Callable[[], AsyncIterator[str]]:
+        """Apertura del stream de Claude para los generadores SSE; ClaudeAPIError si Claude no se usa"""
+        deadline = time.monotonic() + request.timeout()
+
+        def deltas() -> AsyncIterator[str]:
+            if not self._claude_enabled(mode):
+                raise ClaudeAPIError("Claude AI no disponible")
+            return self.claude.stream(prompt, deadline=deadline)
+
+        return deltas
+
+    def _event_stream(self, prompt: str, finalize: Callable[[str], Dict], fallback: Callable[[], Dict],
+                      request: Request, mode: str) -> EventStream:
+        """Respuesta SSE con los deltas de Claude, o solo start y done con fallback() si Claude no se usa"""
+        return EventStream(stream_events_async(self._claude_deltas(prompt, request, mode), finalize, fallback))
+
+    def _threadsafe_complete(self, loop: asyncio.AbstractEventLoop, deadline: float) -> Callable[..., str]:
+        """complete(prompt, max_tokens=...) bloqueante para los hilos de predict_batch; la llamada corre en el loop"""
+        def complete(prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS) -> str:
+            call = self.claude.complete(prompt, max_tokens, deadline=deadline)
+            return asyncio.run_coroutine_threadsafe(call, loop).result()
+
+        return complete
+
+    def _cache_key(self, endpoint: str, home_team: str, away_team: Optional[str]):
+        teams = (home_team, away_team) if away_team else (home_team,)
+        return cache_key(endpoint, home_team, away_team, model=self.engine.model,
+                         data_version=self.engine.live_stats.teams_version(*teams))
+
+    async def health(self, request: Request) -> Tuple[int, Dict]:
+        return 200, self.engine.health(self.claude)
+
+    async def claude_health(self, request: Request) -> Tuple[int, Dict]:
+        return 200, {'success': True, **claude_health(self.claude, self.engine.use_claude_ai)}
+
+    async def teams(self, request: Request) -> Tuple[int, Dict]:
+        return 200, self.engine.teams_payload()
+
+    async def stats(self, request: Request) -> Tuple[int, Dict]:
+        return 200, self.engine.stats({
+            'response_cache': self.response_cache.stats() if self.response_cache is not None else None,
+            'claude_calls': self.claude.stats() if self.claude is not None else None,
+            'speculative': self._speculative_stats()
+        })
+
+    def _speculative_stats(self) -> Dict:
+        return {'budget_seconds': self.latency_budget, **self.speculative}
+
+    async def cache_stats(self, request: Request) -> Tuple[int, Dict]:
+        return 200, {'success': True, **service_stats(self.response_cache, self.claude, self._speculative_stats(),
+                                                      self.engine.goals_model, self.engine.market_model)}
+
+    async def ingest_result(self, request: Request) -> Tuple[int, Dict]:
+        if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER.lower()), request.remote_addr):
+            return 403, {'success': False, 'error': 'No autorizado'}
+        return 200, self.engine.ingest_result(request.json())
+
+    async def system(self, request: Request) -> Tuple[int, Dict]:
+        return 200, self.engine.system()
+
+    async def toggle_ai(self, request: Request) -> Tuple[int, Dict]:
+        return 200, self.engine.toggle(request.json())
+
+    async def predict(self, request: Request) -> Tuple[int, Dict]:
+        payload = request.json()
+        fixture = self.engine.parse_match(payload)
+        mode = self._request_mode(request, payload)
+        if request.stream_requested():
+            key = self._cache_key('predict', fixture.home_team, fixture.away_team)
+
+            def finalize(prediction: Dict) -> Dict:
+                if self.response_cache is not None:
+                    self.response_cache.put(key, prediction)
+                return {'success': True, 'prediction': prediction}
+
+            return 200, EventStream(stream_prediction_events_async(
+                self._claude_deltas(self.engine.prediction_prompt(fixture), request, mode),
+                PredictionStreamParser(fixture.home_team, fixture.away_team),
+                finalize,
+                fallback=lambda: {'success': True, 'prediction': self.engine.local_prediction(fixture)}
+            ))
+        if not self._claude_enabled(mode):
+            prediction, source = self.engine.local_prediction(fixture), 'local'
+        else:
+            prediction, source = await self._ask_claude(
+                self.engine.prediction_prompt(fixture),
+                lambda text: self.engine.parse_prediction(text, fixture),
+                request,
+                fallback=lambda: self.engine.local_prediction(fixture),
+                key=self._cache_key('predict', fixture.home_team, fixture.away_team),
+                mode=mode
+            )
+        response = {'success': True, 'prediction': prediction}
+        if mode == 'speculative':
+            response['source'] = source
+        return 200, response
+
+    async def predict_batch(self, request: Request) -> Tuple[int, Dict]:
+        payload = request.json()
+        table, fixtures, errors = self.engine.parse_batch(payload)
+        mode = self._request_mode(request, payload)
+        loop = asyncio.get_running_loop()
+        complete = None
+        if self._claude_enabled(mode):
+            complete = self._threadsafe_complete(loop, time.monotonic() + request.timeout(BATCH_TIMEOUT))
+        return 200, await loop.run_in_executor(None, self.engine.batch_prediction, table, fixtures, errors,
+                                               complete, mode, request.latency_budget(self.latency_budget))
+
+    async def analyze(self, request: Request) -> Tuple[int, Dict]:
+        payload = request.json()
+        team_name = self.engine.parse_team(payload)
+        window_stats = self.engine.window_stats(team_name, {**request.args, **payload})
+        mode = self._request_mode(request, payload)
+        market = self.engine.market_stats(team_name)
+
+        def respond(analysis: Dict) -> Dict:
+            response = {'success': True, 'analysis': analysis}
+            if window_stats is not None:
+                response['window_stats'] = window_stats
+            if market is not None:
+                response['market'] = market
+            return response
+
+        if request.stream_requested():
+            key = self._cache_key('analyze', team_name, None)
+
+            def finalize(text: str) -> Dict:
+                try:
+                    analysis = self.engine.parse_analysis(text, team_name)
+                except ValueError as e:
+                    logger.warning(f"⚠️ Análisis de Claude inválido, usando datos locales: {e}")
+                    return respond(self.engine.local_analysis(team_name))
+                if self.response_cache is not None:
+                    self.response_cache.put(key, analysis)
+                return respond(analysis)
+
+            return 200, self._event_stream(self.engine.analysis_prompt(team_name), finalize,
+                                           lambda: respond(self.engine.local_analysis(team_name)), request, mode)
+
+        if not self._claude_enabled(mode):
+            analysis, source = self.engine.local_analysis(team_name), 'local'
+        else:
+            analysis, source = await self._ask_claude(
+                self.engine.analysis_prompt(team_name),
+                lambda text: self.engine.parse_analysis(text, team_name),
+                request,
+                fallback=lambda: self.engine.local_analysis(team_name),
+                key=self._cache_key('analyze', team_name, None),
+                mode=mode
+            )
+        response = respond(analysis)
+        if mode == 'speculative':
+            response['source'] = source
+        return 200, response
+
+    async def chat(self, request: Request) -> Tuple[int, Dict]:
+        payload = request.json()
+        question = self.engine.parse_question(payload)
+        mode = self._request_mode(request, payload)
+        if request.stream_requested():
+            return 200, self._event_stream(
+                self.engine.chat_prompt(question),
+                finalize=lambda text: {'success': True, 'response': text},
+                fallback=lambda: {'success': True, 'response': self.engine.local_chat(question)},
+                request=request,
+                mode=mode
+            )
+        if not self._claude_enabled(mode):
+            answer, source = {'text': self.engine.local_chat(question)}, 'local'
+        else:
+            answer, source = await self._ask_claude(
+                self.engine.chat_prompt(question),
+                lambda text: {'text': text},
+                request,
+                fallback=lambda: {'text': self.engine.local_chat(question)},
+                mode=mode
+            )
+        response = {'success': True, 'response': answer['text']}
+        if mode == 'speculative':
+            response['source'] = source
+        return 200, response
+
+    async def simulate(self, request: Request) -> Tuple[int, Dict]:
+        if self.simulator is None:
+            return 503, {'success': False, 'error': 'Simulador no disponible'}
+        payload = request.json()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, self.simulator.simulate, payload)
+        except ValueError as e:
+            raise ApiError(str(e))
+        return 200, result
+
+
+def create_asgi_app(use_claude_ai: Optional[bool] = None, claude=None) -> PremierLeagueASGI:
+    """
+    Construir la app ASGI con el dataset, las estadísticas en vivo y el cliente de Claude.
+
+    Args:
+        use_claude_ai: Modo por defecto de las peticiones sin 'mode' ni X-AI-Mode; por defecto USE_CLAUDE_AI
+        claude: Cliente asíncrono; por defecto AsyncClaudeClient con circuit breaker
+    """
+    from columnar_cache import load_dataset
+    from goals_model import fit_goals_model
+    from head_to_head import HeadToHeadIndex
+    from live_stats import LiveStatsStore
+    from market_odds import fit_market_model
+    from season_simulator import SeasonSimulator, latest_season_teams
+
+    dataset = load_dataset()
+    live_stats = LiveStatsStore.from_dataset(dataset)
+    h2h = HeadToHeadIndex.from_dataset(dataset)
+    live_stats.register_index(h2h)
+    if use_claude_ai is None:
+        use_claude_ai = os.getenv('USE_CLAUDE_AI', 'true').lower() == 'true'
+    if claude is None:
+        claude = AsyncCircuitBreakerClient(AsyncClaudeClient(), CircuitBreaker.from_env())
+    goals_model = fit_goals_model(dataset)
+    market_model = fit_market_model(dataset)
+    engine = PremierLeagueEngine(live_stats, h2h=h2h, use_claude_ai=use_claude_ai, model=claude.model,
+                                 goals_model=goals_model, market_model=market_model)
+    simulator = SeasonSimulator(live_stats, goals_model, latest_season_teams(dataset), market_model=market_model)
+    return PremierLeagueASGI(engine, claude=claude, response_cache=ResponseCache.from_env(), simulator=simulator,
+                             latency_budget=float(os.getenv('PREDICT_LATENCY_BUDGET', DEFAULT_LATENCY_BUDGET)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API de la Premier League sobre asyncio (ASGI)')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=int(os.getenv('ASGI_PORT', DEFAULT_PORT)))
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("❌ uvicorn no está instalado: pip install uvicorn")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    uvicorn.run(create_asgi_app(), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Async Claude Client - LLM Premier League
+Cliente asyncio de Claude con conexiones persistentes, límite de concurrencia y deadlines
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+
+from claude_client import (
+    CLAUDE_API_URL, CLAUDE_MAX_TOKENS, CLAUDE_MODEL, CLAUDE_TIMEOUT,
+    ClaudeAPIError, build_headers, build_payload, current_deadline, parse_stream_line, response_text
+)
+from single_flight import AsyncSingleFlight, canonical_prompt_key
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx solo negocia HTTP/2 si está instalado)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+CLAUDE_MAX_CONCURRENCY = int(os.getenv('CLAUDE_MAX_CONCURRENCY', '8'))
+CLAUDE_KEEPALIVE_CONNECTIONS = 20
+CLAUDE_CONNECT_TIMEOUT = 5.0
+
+
+class AsyncClaudeClient:
+    """
+    Cliente asíncrono de la API de mensajes de Claude.
+
+    Un único httpx.AsyncClient mantiene las conexiones abiertas (keep-alive y
+    HTTP/2 si h2 está instalado). Un semáforo global limita las llamadas
+    simultáneas a Claude; el resto espera turno sin ocupar un hilo. El timeout
+    de cada llamada es el tiempo que le queda al deadline de la petición
+    (deadline_scope), así una petición nunca espera a Claude más de lo que el
+    cliente está dispuesto a esperar.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model: str = CLAUDE_MODEL,
+                 base_url: str = CLAUDE_API_URL, timeout: float = CLAUDE_TIMEOUT,
+                 max_concurrency: int = CLAUDE_MAX_CONCURRENCY, http2: bool = True,
+                 dedupe: bool = True):
+        self.api_key = api_key or os.getenv('CLAUDE_API_KEY')
+        self.model = model
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.single_flight = AsyncSingleFlight() if dedupe else None
+        self.breaker = None  # Lo instala AsyncCircuitBreakerClient: protege la llamada real, no cada petición
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.requests = 0
+        self.active = 0
+        self.waiting = 0
+        self.peak_active = 0
+        self.deadline_exceeded = 0
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        # Se crean dentro del event loop que los usa
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=CLAUDE_KEEPALIVE_CONNECTIONS),
+                headers=build_headers(self.api_key)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def complete(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS,
+                       deadline: Optional[float] = None) -> str:
+        """
+        Enviar un prompt y devolver el texto de la respuesta.
+
+        Args:
+            prompt: Prompt de usuario
+            max_tokens: Tokens máximos de la respuesta
+            deadline: Deadline absoluto (time.monotonic); por defecto el de deadline_scope
+
+        Raises:
+            ClaudeAPIError: Si no hay API key, se agota el deadline o la llamada falla
+        """
+        if not self.api_key:
+            raise ClaudeAPIError("CLAUDE_API_KEY no configurada")
+        deadline = deadline if deadline is not None else current_deadline(self.timeout)
+        if self.single_flight is None:
+            return await self._upstream(prompt, max_tokens, deadline)
+
+        key = canonical_prompt_key(self.model, max_tokens, prompt)
+        remaining = deadline - time.monotonic()
+        try:
+            # La llamada compartida usa el deadline de quien la lanzó; cada petición
+            # deja de esperar cuando se agota el suyo
+            return await asyncio.wait_for(
+                self.single_flight.do(key, lambda: self._upstream(prompt, max_tokens, deadline)),
+                timeout=max(remaining, 0.0)
+            )
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            raise ClaudeAPIError("Deadline de la petición excedido esperando a Claude")
+
+    async def _upstream(self, prompt: str, max_tokens: int, deadline: float) -> str:
+        """Llamada real a la API, bajo el circuit breaker si hay uno instalado"""
+        if self.breaker is None:
+            return await self._request(prompt, max_tokens, deadline)
+        return await self.breaker.call_async(lambda: self._request(prompt, max_tokens, deadline), deadline=deadline)
+
+    async def _acquire(self, deadline: float):
+        """Esperar turno en el semáforo global sin pasarse del deadline"""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max(deadline - time.monotonic(), 0.0))
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            raise ClaudeAPIError("Deadline de la petición excedido esperando turno para Claude")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    async def _request(self, prompt: str, max_tokens: int, deadline: float) -> str:
+        client = self._ensure_client()
+        self.requests += 1
+        await self._acquire(deadline)
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.deadline_exceeded += 1
+                raise ClaudeAPIError("Deadline de la petición excedido antes de llamar a Claude")
+            response = await client.post(
+                self.base_url,
+                json=build_payload(self.model, prompt, max_tokens),
+                timeout=httpx.Timeout(remaining, connect=min(CLAUDE_CONNECT_TIMEOUT, remaining))
+            )
+        except httpx.TimeoutException:
+            self.deadline_exceeded += 1
+            raise ClaudeAPIError("Timeout de Claude: deadline de la petición agotado")
+        except httpx.HTTPError as e:
+            raise ClaudeAPIError(f"Error de conexión con Claude: {e}")
+        finally:
+            self._release()
+
+        data = response.json() if response.status_code == 200 else None
+        return response_text(response.status_code, data, response.text)
+
+    async def stream(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS,
+                     deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Enviar un prompt con stream=true y producir los deltas de texto según llegan.
+
+        El permiso del semáforo se mantiene mientras dura el stream. Sin
+        deduplicación: cada cliente recibe su propio stream.
+
+        Raises:
+            ClaudeAPIError: Si no hay API key, la llamada falla o se agota el deadline
+        """
+        if not self.api_key:
+            raise ClaudeAPIError("CLAUDE_API_KEY no configurada")
+        deadline = deadline if deadline is not None else current_deadline(self.timeout)
+        client = self._ensure_client()
+        self.requests += 1
+        await self._acquire(deadline)
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.deadline_exceeded += 1
+                raise ClaudeAPIError("Deadline de la petición excedido antes de llamar a Claude")
+            request = client.build_request(
+                'POST', self.base_url,
+                json={**build_payload(self.model, prompt, max_tokens), 'stream': True},
+                timeout=httpx.Timeout(remaining, connect=min(CLAUDE_CONNECT_TIMEOUT, remaining))
+            )
+            response = await client.send(request, stream=True)
+            try:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    raise ClaudeAPIError(f"Claude respondió {response.status_code}: {body[:200]!r}")
+                async for line in response.aiter_lines():
+                    if time.monotonic() > deadline:
+                        self.deadline_exceeded += 1
+                        raise ClaudeAPIError("Deadline de la petición excedido durante el stream")
+                    text = parse_stream_line(line)
+                    if text:
+                        yield text
+            finally:
+                await response.aclose()
+        except httpx.TimeoutException:
+            self.deadline_exceeded += 1
+            raise ClaudeAPIError("Timeout de Claude: deadline de la petición agotado")
+        except httpx.HTTPError as e:
+            raise ClaudeAPIError(f"Error de conexión con Claude: {e}")
+        finally:
+            self._release()
+
+    def reset_after_fork(self):
+        """Olvidar el pool y el semáforo heredados: pertenecen al event loop del proceso padre"""
+        self._client = None
+        self._semaphore = None
+        self.active = 0
+        self.waiting = 0
+        if self.single_flight is not None:
+            self.single_flight = AsyncSingleFlight()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict:
+        """Métricas de concurrencia y deduplicación"""
+        return {
+            'max_concurrency': self.max_concurrency,
+            'http2': self.http2,
+            'requests': self.requests,
+            'active': self.active,
+            'waiting': self.waiting,
+            'peak_active': self.peak_active,
+            'deadline_exceeded': self.deadline_exceeded,
+            'single_flight': self.single_flight.stats() if self.single_flight else None
+        }
+
+
+class BlockingClaudeClient:
+    """
+    Adaptador síncrono del cliente asíncrono para los handlers de Flask.
+
+    Todas las llamadas corren en un único event loop en segundo plano, así los
+    hilos de Flask comparten el pool de conexiones y el semáforo en lugar de
+    abrir una conexión bloqueante por petición. El deadline de la petición
+    (deadline_scope en el hilo de Flask) se pasa explícitamente al loop.
+    Expone la misma interfaz que ClaudeClient (complete, available, stats).
+    """
+
+    def __init__(self, client: Optional[AsyncClaudeClient] = None):
+        self.client = client or AsyncClaudeClient()
+        self._start_loop()
+        if hasattr(os, 'register_at_fork'):
+            # Los hilos no sobreviven a fork(): cada worker prefork arranca su propio loop
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._after_fork())
+
+    def _start_loop(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='claude-loop', daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        self.client.reset_after_fork()
+        self._start_loop()
+
+    @property
+    def available(self) -> bool:
+        return self.client.available
+
+    @property
+    def model(self) -> str:
+        return self.client.model
+
+    def complete(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS) -> str:
+        """
+        Versión bloqueante de AsyncClaudeClient.complete.
+
+        Raises:
+            ClaudeAPIError: Si la llamada falla o se agota el deadline
+        """
+        deadline = current_deadline(self.client.timeout)
+        future = asyncio.run_coroutine_threadsafe(
+            self.client.complete(prompt, max_tokens, deadline=deadline), self._loop
+        )
+        try:
+            # Margen de 1 s: el propio cliente corta al llegar al deadline
+            return future.result(timeout=max(deadline - time.monotonic(), 0.0) + 1.0)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise ClaudeAPIError("Deadline de la petición excedido esperando a Claude")
+
+    def stream(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS,
+               deadline: Optional[float] = None) -> Iterator[str]:
+        """
+        Versión bloqueante de AsyncClaudeClient.stream: generador de deltas de texto.
+
+        Si el consumidor cierra el generador (cliente SSE desconectado), el
+        stream con Claude se cancela en el event loop.
+
+        Raises:
+            ClaudeAPIError: Si la llamada falla o se agota el deadline
+        """
+        deadline = deadline if deadline is not None else current_deadline(self.client.timeout)
+        deltas: queue.Queue = queue.Queue()
+
+        async def pump():
+            try:
+                async for text in self.client.stream(prompt, max_tokens, deadline=deadline):
+                    deltas.put(('delta', text))
+                deltas.put(('end', None))
+            except Exception as e:
+                deltas.put(('error', e))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        try:
+            while True:
+                try:
+                    kind, value = deltas.get(timeout=max(deadline - time.monotonic(), 0.0) + 1.0)
+                except queue.Empty:
+                    raise ClaudeAPIError("Deadline de la petición excedido esperando a Claude")
+                if kind == 'end':
+                    return
+                if kind == 'error':
+                    raise value
+                yield value
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def stats(self) -> Dict:
+        return self.client.stats()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Backtest - LLM Premier League
+Validación walk-forward de las predicciones: cada jornada se predice solo con los partidos anteriores
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from batch_predict import PROBABILITY_FIELDS, Fixture, predict_batch, predict_local_batch
+from claude_client import CLAUDE_API_URL, CLAUDE_MAX_TOKENS, CLAUDE_MODEL, ClaudeAPIError, ClaudeClient
+from columnar_cache import BASE_DIR, ColumnarDataset, days_to_iso, iso_to_days, load_dataset
+from goals_model import fit_goals_model
+from market_odds import fit_market_model
+from single_flight import canonical_prompt_key
+from stats_engine import compute_team_stats
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ('averages', 'goals', 'goals_market', 'claude')
+DEFAULT_ENGINE = 'goals_market'
+DEFAULT_REPLAY_PATH = os.path.join(BASE_DIR, 'datasets', 'processed', 'claude_replay.jsonl')
+OUTCOMES = 'HDA'
+MIN_PROBABILITY = 1e-6
+
+# Dataset de los workers: se fija antes del fork y los procesos hijos lo heredan mapeado
+_dataset: Optional[ColumnarDataset] = None
+
+
+def rows_before(dataset: ColumnarDataset, as_of: str) -> ColumnarDataset:
+    """Copia del dataset solo con los partidos anteriores a as_of"""
+    mask = np.asarray(dataset['Date']) < iso_to_days(as_of)
+    columns = {name: np.asarray(values)[mask] for name, values in dataset.columns.items()}
+    return ColumnarDataset(columns, dataset.kinds, dataset.dictionaries, int(mask.sum()), dataset.source_sha256)
+
+
+def score_probabilities(probabilities: np.ndarray, outcomes: np.ndarray) -> Dict:
+    """
+    Log-loss, Brier, ranked probability score y acierto frente al resultado real.
+
+    Args:
+        probabilities: (partidos, 3) local, empate, visitante
+        outcomes: Índice del resultado real (0 local, 1 empate, 2 visitante)
+    """
+    p = np.asarray(probabilities, dtype=np.float64)
+    p = np.clip(p / p.sum(axis=1, keepdims=True), MIN_PROBABILITY, 1)
+    onehot = np.eye(3)[outcomes]
+    # RPS: los resultados están ordenados (local < empate < visitante), se comparan las acumuladas
+    cumulative_gap = np.cumsum(p, axis=1)[:, :2] - np.cumsum(onehot, axis=1)[:, :2]
+    return {
+        'matches': int(len(outcomes)),
+        'log_loss': float(-np.log(p[np.arange(len(outcomes)), outcomes]).mean()),
+        'brier': float(((p - onehot) ** 2).sum(axis=1).mean()),
+        'rps': float((cumulative_gap ** 2).sum(axis=1).mean() / 2),
+        'accuracy': float((p.argmax(axis=1) == outcomes).mean())
+    }
+
+
+def prediction_probabilities(predictions: Sequence[Dict]) -> np.ndarray:
+    """Matriz (partidos, 3) con las probabilidades de las predicciones"""
+    return np.array([[float(p[name]) for name in PROBABILITY_FIELDS] for p in predictions])
+
+
+def matchdays(dates: np.ndarray) -> List[np.ndarray]:
+    """Índices de los partidos de cada jornada (semana de lunes a domingo), en orden cronológico"""
+    weeks = (np.asarray(dates, dtype=np.int64) + 3) // 7  # 1970-01-01 fue jueves
+    order = np.argsort(dates, kind='stable')
+    boundaries = np.flatnonzero(np.diff(weeks[order])) + 1
+    return np.split(order, boundaries)
+
+
+class ReplayCache:
+    """
+    Respuestas de Claude grabadas por prompt para repetir backtests sin coste.
+
+    complete() tiene la firma del cliente de Claude: si el prompt canónico ya
+    está grabado devuelve la respuesta guardada; si no, llama al cliente (si
+    hay) y graba la respuesta. Las nuevas se añaden al archivo JSONL con save().
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_REPLAY_PATH, client=None, model: str = CLAUDE_MODEL):
+        self.path = path
+        self.client = client
+        self.model = getattr(client, 'model', model)
+        self.responses: Dict[str, str] = {}
+        self.recorded: Dict[str, str] = {}
+        self.hits = 0
+        self.upstream_calls = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.responses[entry['key']] = entry['text']
+
+    def complete(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS) -> str:
+        """
+        Raises:
+            ClaudeAPIError: Si no hay respuesta grabada ni cliente disponible, o la llamada falla
+        """
+        key = canonical_prompt_key(self.model, max_tokens, prompt)
+        if key in self.responses:
+            self.hits += 1
+            return self.responses[key]
+        self.misses += 1
+        if self.client is None or not self.client.available:
+            raise ClaudeAPIError("Prompt sin respuesta grabada y sin cliente de Claude")
+        self.upstream_calls += 1
+        text = self.client.complete(prompt, max_tokens=max_tokens)
+        self.responses[key] = text
+        self.recorded[key] = text
+        return text
+
+    def merge(self, recorded: Dict[str, str]):
+        """Añadir respuestas grabadas en otro proceso"""
+        self.responses.update(recorded)
+        self.recorded.update(recorded)
+
+    def save(self) -> int:
+        """Añadir al archivo las respuestas nuevas; devuelve cuántas se escribieron"""
+        if not self.path or not self.recorded:
+            return 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for key, text in self.recorded.items():
+                f.write(json.dumps({'key': key, 'text': text}, ensure_ascii=False) + '\n')
+        written, self.recorded = len(self.recorded), {}
+        return written
+
+    def stats(self) -> Dict:
+        return {'recorded_responses': len(self.responses), 'hits': self.hits, 'misses': self.misses,
+                'upstream_calls': self.upstream_calls}
+
+
+def backtest_season(season: str, engine: str = DEFAULT_ENGINE, claude_config: Optional[Dict] = None) -> Dict:
+    """
+    Walk-forward de una temporada: por cada jornada se ajusta el motor con los
+    partidos anteriores a su primer día y se predicen todos sus partidos.
+
+    Args:
+        season: Etiqueta de la columna Season (p. ej. '2023-24')
+        engine: 'averages', 'goals', 'goals_market' o 'claude'
+        claude_config: Para engine='claude': replay_path, api_key, base_url y model
+
+    Returns:
+        Dict: Métricas de la temporada, tiempos y respuestas de Claude grabadas en este proceso
+    """
+    dataset = _dataset if _dataset is not None else load_dataset()
+    season_code = dataset.dictionaries['Season'].index(season)
+    ftr = np.asarray(dataset['FTR'])
+    result_codes = [dataset.dictionaries['FTR'].index(o) if o in dataset.dictionaries['FTR'] else -1
+                    for o in OUTCOMES]
+    outcome_of = {code: k for k, code in enumerate(result_codes)}
+    rows = np.flatnonzero((np.asarray(dataset['Season']) == season_code) & np.isin(ftr, result_codes))
+    dates = np.asarray(dataset['Date'])
+    home, away = np.asarray(dataset['HomeTeam']), np.asarray(dataset['AwayTeam'])
+    names = dataset.team_names
+
+    replay = None
+    if engine == 'claude':
+        config = claude_config or {}
+        client = ClaudeClient(api_key=config.get('api_key'), base_url=config.get('base_url', CLAUDE_API_URL),
+                              model=config.get('model', CLAUDE_MODEL), dedupe=False)
+        replay = ReplayCache(config.get('replay_path', DEFAULT_REPLAY_PATH), client)
+
+    start = time.perf_counter()
+    fit_seconds = predict_seconds = 0.0
+    probabilities, outcomes, sources = [], [], {}
+    days = matchdays(dates[rows])
+    for matchday in days:
+        matchday_rows = rows[matchday]
+        as_of = days_to_iso(int(dates[matchday_rows].min()))
+        fit_start = time.perf_counter()
+        table = compute_team_stats(rows_before(dataset, as_of))
+        goals_model = market_model = None
+        try:
+            if engine != 'averages':
+                goals_model = fit_goals_model(dataset, as_of=as_of)
+            if engine in ('goals_market', 'claude'):
+                market_model = fit_market_model(dataset, as_of=as_of)
+        except ValueError:
+            pass  # Sin partidos anteriores (primera jornada del dataset): medias simples
+        fit_seconds += time.perf_counter() - fit_start
+
+        fixtures = [Fixture(k, names[int(home[row])], names[int(away[row])]) for k, row in enumerate(matchday_rows)]
+        predict_start = time.perf_counter()
+        if engine == 'claude':
+            results = predict_batch(fixtures, table, complete=replay.complete, goals_model=goals_model,
+                                    market_model=market_model)
+            predictions = [r['prediction'] for r in results]
+            for r in results:
+                sources[r['source']] = sources.get(r['source'], 0) + 1
+        else:
+            predictions = predict_local_batch(table, fixtures, goals_model, market_model)
+        predict_seconds += time.perf_counter() - predict_start
+        probabilities.append(prediction_probabilities(predictions))
+        outcomes.extend(outcome_of[int(ftr[row])] for row in matchday_rows)
+
+    result = {
+        'season': season,
+        'engine': engine,
+        'matchdays': len(days),
+        **score_probabilities(np.concatenate(probabilities) if probabilities else np.zeros((0, 3)),
+                              np.array(outcomes, dtype=np.int64)),
+        'fit_seconds': fit_seconds,
+        'predict_seconds': predict_seconds,
+        'seconds': time.perf_counter() - start
+    }
+    if replay is not None:
+        result['sources'] = sources
+        result['claude'] = replay.stats()
+        result['recorded'] = replay.recorded
+    return result
+
+
+def _backtest_season_args(args):
+    return backtest_season(*args)
+
+
+def run_backtest(engine: str = DEFAULT_ENGINE, seasons: Optional[Sequence[str]] = None, workers: int = 1,
+                 dataset: Optional[ColumnarDataset] = None, claude_config: Optional[Dict] = None) -> Dict:
+    """
+    Backtest de varias temporadas, repartidas entre procesos.
+
+    Args:
+        engine: Motor a evaluar (ENGINES)
+        seasons: Temporadas (por defecto todas menos la primera, que no tiene historial previo)
+        workers: Procesos (una temporada por tarea)
+        dataset: Dataset a usar (por defecto load_dataset())
+        claude_config: Configuración del modo Claude (ver backtest_season)
+
+    Returns:
+        Dict: Métricas por temporada y totales ponderados por partidos
+
+    Raises:
+        ValueError: Si el motor o alguna temporada no existen
+    """
+    global _dataset
+    if engine not in ENGINES:
+        raise ValueError(f"Motor desconocido: {engine} (opciones: {', '.join(ENGINES)})")
+    _dataset = dataset if dataset is not None else load_dataset()
+    available = _dataset.dictionaries['Season']
+    seasons = list(seasons) if seasons else available[1:]
+    unknown = [season for season in seasons if season not in available]
+    if unknown:
+        raise ValueError(f"Temporada no encontrada: {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    tasks = [(season, engine, claude_config) for season in seasons]
+    workers = max(1, min(workers, len(tasks)))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            results = list(pool.map(_backtest_season_args, tasks))
+    else:
+        results = [backtest_season(*task) for task in tasks]
+    elapsed = time.perf_counter() - start
+
+    summary = {'engine': engine, 'workers': workers, 'seconds': elapsed, 'seasons': results}
+    matches = sum(r['matches'] for r in results)
+    summary['overall'] = {
+        'matches': matches,
+        **{metric: sum(r[metric] * r['matches'] for r in results) / max(matches, 1)
+           for metric in ('log_loss', 'brier', 'rps', 'accuracy')},
+        'fit_seconds': sum(r['fit_seconds'] for r in results),
+        'predict_seconds': sum(r['predict_seconds'] for r in results)
+    }
+    if engine == 'claude':
+        config = claude_config or {}
+        replay = ReplayCache(config.get('replay_path', DEFAULT_REPLAY_PATH))
+        for r in results:
+            replay.merge(r.pop('recorded'))
+        summary['replay'] = {
+            'path': replay.path,
+            'new_responses': replay.save(),
+            'upstream_calls': sum(r['claude']['upstream_calls'] for r in results),
+            'hits': sum(r['claude']['hits'] for r in results)
+        }
+    logger.info(f"🧪 Backtest {engine}: {len(results)} temporadas, {matches} partidos en {elapsed:.1f}s")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest walk-forward de las predicciones por temporada')
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument('--seasons', nargs='*', help="Temporadas (por defecto todas menos la primera)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--replay', default=DEFAULT_REPLAY_PATH, help="Archivo JSONL de respuestas de Claude")
+    parser.add_argument('--base-url', default=CLAUDE_API_URL)
+    parser.add_argument('--output', help="Guardar el resultado en este JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    claude_config = {'replay_path': args.replay, 'base_url': args.base_url, 'api_key': os.getenv('CLAUDE_API_KEY')}
+    summary = run_backtest(args.engine, args.seasons, args.workers, claude_config=claude_config)
+
+    print(f"🧪 Backtest walk-forward: {args.engine} ({summary['workers']} procesos, {summary['seconds']:.1f}s)")
+    print(f"   {'Temporada':<11} {'partidos':>8} {'log-loss':>9} {'Brier':>7} {'RPS':>7} {'acierto':>8} {'tiempo':>7}")
+    for r in summary['seasons'] + [{'season': 'Total', **summary['overall'],
+                                    'seconds': summary['seconds']}]:
+        print(f"   {r['season']:<11} {r['matches']:>8} {r['log_loss']:>9.4f} {r['brier']:>7.4f} {r['rps']:>7.4f} "
+              f"{r['accuracy']:>8.1%} {r['seconds']:>6.1f}s")
+    if 'replay' in summary:
+        print(f"   🎞️ Replay: {summary['replay']['hits']} respuestas grabadas, "
+              f"{summary['replay']['upstream_calls']} llamadas a Claude")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"💾 Resultados guardados en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Batch Predictions - LLM Premier League
+Predicción de jornadas completas: pasada vectorizada en modo local y prompts multi-partido con Claude
+"""
+
+import contextvars
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from stats_engine import TeamStatsTable, _safe_ratio
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_FIXTURES = 380        # Una temporada completa
+CLAUDE_FIXTURES_PER_PROMPT = 10  # Una jornada por llamada a Claude
+CLAUDE_TOKENS_PER_FIXTURE = 350
+CLAUDE_PARALLEL_PROMPTS = 4      # Lotes enviados a Claude a la vez
+
+PROBABILITY_FIELDS = ('win_probability_home', 'win_probability_draw', 'win_probability_away')
+
+
+@dataclass
+class Fixture:
+    """Partido a predecir; index es su posición en la petición"""
+    index: int
+    home_team: str
+    away_team: str
+
+
+def parse_fixtures(payload: Dict, known_teams) -> Tuple[List[Fixture], List[Dict]]:
+    """
+    Validar la lista de partidos de una petición batch.
+
+    Args:
+        payload: Cuerpo JSON con la clave 'fixtures'
+        known_teams: Contenedor con los equipos válidos
+
+    Returns:
+        Tuple: (partidos válidos, errores por partido con su index)
+
+    Raises:
+        ValueError: Si el cuerpo no trae una lista de partidos utilizable
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('fixtures'), list):
+        raise ValueError("Se requiere 'fixtures': lista de {home_team, away_team}")
+
+    raw_fixtures = payload['fixtures']
+    if not raw_fixtures:
+        raise ValueError("La lista de partidos está vacía")
+    if len(raw_fixtures) > MAX_BATCH_FIXTURES:
+        raise ValueError(f"Máximo {MAX_BATCH_FIXTURES} partidos por petición")
+
+    fixtures, errors = [], []
+    for i, item in enumerate(raw_fixtures):
+        if not isinstance(item, dict) or not item.get('home_team') or not item.get('away_team'):
+            errors.append({'index': i, 'success': False, 'error': 'Se requieren home_team y away_team'})
+            continue
+        home_team, away_team = str(item['home_team']).strip(), str(item['away_team']).strip()
+        unknown = [team for team in (home_team, away_team) if team not in known_teams]
+        if unknown:
+            errors.append({'index': i, 'success': False,
+                           'error': f"Equipo no encontrado en datos históricos: {', '.join(unknown)}"})
+        elif home_team == away_team:
+            errors.append({'index': i, 'success': False, 'error': 'home_team y away_team deben ser distintos'})
+        else:
+            fixtures.append(Fixture(i, home_team, away_team))
+    return fixtures, errors
+
+
+def _local_estimates(table: TeamStatsTable, fixtures: Sequence[Fixture], goals_model=None,
+                     market_model=None) -> Dict[str, np.ndarray]:
+    """
+    Goles esperados, probabilidades 1X2 y marcador más probable de cada partido.
+
+    Con goals_model (GoalsModel de goals_model.py) se leen de sus tablas
+    precalculadas de Poisson/Dixon-Coles. Sin él, o para equipos que no
+    estaban en su ajuste: goles esperados como media entre el ataque de un
+    equipo y la defensa del rival, y probabilidades de victoria local
+    (rendimiento en casa + derrotas del visitante), visitante (rendimiento
+    fuera + derrotas del local) y empate (tasa de empates de ambos),
+    normalizadas a 1.
+
+    Con market_model (MarketModel de market_odds.py) las probabilidades se
+    mezclan con las de mercado con su blend_weight; los goles no cambian.
+    """
+    home = np.array([table.team_id(f.home_team) for f in fixtures], dtype=np.int64)
+    away = np.array([table.team_id(f.away_team) for f in fixtures], dtype=np.int64)
+    played = table.matches_played
+    scored, conceded = table.goals_per_game, table.goals_conceded_per_game
+    draw_rate = _safe_ratio(table.draws, played)
+    loss_rate = _safe_ratio(table.losses, played)
+
+    home_goals = (scored[home] + conceded[away]) / 2
+    away_goals = (scored[away] + conceded[home]) / 2
+
+    raw = np.stack([
+        (table.home_win_rate[home] + loss_rate[away]) / 2,
+        (draw_rate[home] + draw_rate[away]) / 2,
+        (table.away_win_rate[away] + loss_rate[home]) / 2
+    ], axis=1).reshape(len(fixtures), 3)
+    totals = raw.sum(axis=1, keepdims=True)
+    probabilities = np.divide(raw, totals, out=np.full_like(raw, 1 / 3), where=totals > 0)
+
+    modelled = np.zeros(len(fixtures), dtype=bool)
+    scores = np.zeros((len(fixtures), 2), dtype=np.int64)
+    score_probability = np.zeros(len(fixtures))
+    if goals_model is not None and fixtures:
+        modelled = np.array([f.home_team in goals_model and f.away_team in goals_model for f in fixtures])
+        if modelled.any():
+            rows = [f for f, ok in zip(fixtures, modelled) if ok]
+            model_home = np.array([goals_model.team_id(f.home_team) for f in rows])
+            model_away = np.array([goals_model.team_id(f.away_team) for f in rows])
+            probabilities[modelled] = goals_model.probabilities[model_home, model_away]
+            home_goals[modelled] = goals_model.expected_goals[model_home, model_away, 0]
+            away_goals[modelled] = goals_model.expected_goals[model_home, model_away, 1]
+            scores[modelled] = goals_model.most_likely[model_home, model_away]
+            score_probability[modelled] = goals_model.score_matrix[model_home, model_away,
+                                                                   scores[modelled, 0], scores[modelled, 1]]
+
+    market = np.full((len(fixtures), 3), np.nan)
+    if market_model is not None and fixtures:
+        priced = np.array([f.home_team in market_model and f.away_team in market_model for f in fixtures])
+        if priced.any():
+            rows = [f for f, ok in zip(fixtures, priced) if ok]
+            market[priced] = market_model.probabilities[
+                [market_model.team_id(f.home_team) for f in rows], [market_model.team_id(f.away_team) for f in rows]]
+            weight = market_model.blend_weight
+            probabilities[priced] = (1 - weight) * probabilities[priced] + weight * market[priced]
+    return {
+        'home': home, 'away': away, 'home_goals': home_goals, 'away_goals': away_goals,
+        'probabilities': probabilities, 'modelled': modelled, 'scores': scores,
+        'score_probability': score_probability, 'market': market
+    }
+
+
+def local_probabilities(table: TeamStatsTable, fixtures: Sequence[Fixture], goals_model=None,
+                        market_model=None) -> np.ndarray:
+    """Probabilidades (local, empate, visitante) sin redondear, shape (partidos, 3)"""
+    return _local_estimates(table, fixtures, goals_model, market_model)['probabilities']
+
+
+def predict_local_batch(table: TeamStatsTable, fixtures: Sequence[Fixture], goals_model=None,
+                        market_model=None) -> List[Dict]:
+    """
+    Predicción estadística de todos los partidos en una pasada sobre la tabla de equipos.
+
+    Goles y probabilidades salen de _local_estimates: el modelo de goles si se
+    da, si no las medias simples de la tabla, mezcladas con el mercado si se da
+    market_model.
+
+    Returns:
+        List[Dict]: Una predicción por partido con los campos de MatchPrediction
+    """
+    if not fixtures:
+        return []
+
+    estimates = _local_estimates(table, fixtures, goals_model, market_model)
+    home, away = estimates['home'], estimates['away']
+    market = estimates['market']
+    home_goals, away_goals = estimates['home_goals'], estimates['away_goals']
+    probabilities, modelled = estimates['probabilities'], estimates['modelled']
+    scores, score_probability = estimates['scores'], estimates['score_probability']
+    played = table.matches_played
+    scored, conceded = table.goals_per_game, table.goals_conceded_per_game
+    outcome = probabilities.argmax(axis=1)
+
+    predictions = []
+    for k, fixture in enumerate(fixtures):
+        h, a = home[k], away[k]
+        p_home, p_draw, p_away = (round(float(p), 3) for p in probabilities[k])
+        expected = (f"Victoria {fixture.home_team}", "Empate", f"Victoria {fixture.away_team}")[outcome[k]]
+        reasoning = (
+            f"Predicción estadística con {int(played[h])} partidos históricos de {fixture.home_team} "
+            f"({scored[h]:.2f} goles a favor y {conceded[h]:.2f} en contra por partido) y "
+            f"{int(played[a])} de {fixture.away_team} ({scored[a]:.2f} a favor, {conceded[a]:.2f} en contra)."
+        )
+        insights = [
+            f"{fixture.home_team} gana el {table.home_win_rate[h]:.0%} de sus partidos en casa",
+            f"{fixture.away_team} gana el {table.away_win_rate[a]:.0%} de sus partidos fuera",
+            f"Forma reciente: {fixture.home_team} {table.form_string(h) or '-'}, "
+            f"{fixture.away_team} {table.form_string(a) or '-'}"
+        ]
+        if modelled[k]:
+            insights.append(f"Marcador más probable: {scores[k, 0]}-{scores[k, 1]} ({score_probability[k]:.0%})")
+            reasoning += (" Goles esperados y probabilidades del modelo de Poisson (Dixon-Coles) "
+                          "con fuerzas de ataque y defensa y ventaja local.")
+        if not np.isnan(market[k, 0]):
+            insights.append(f"Mercado (cuotas sin margen): {market[k, 0]:.0%} / {market[k, 1]:.0%} / "
+                            f"{market[k, 2]:.0%}")
+            reasoning += (f" Probabilidades mezcladas al {market_model.blend_weight:.0%} con las implícitas "
+                          "en las cuotas de las casas de apuestas.")
+        predictions.append({
+            'home_team': fixture.home_team,
+            'away_team': fixture.away_team,
+            'predicted_home_goals': round(float(home_goals[k]), 2),
+            'predicted_away_goals': round(float(away_goals[k]), 2),
+            'win_probability_home': p_home,
+            'win_probability_draw': p_draw,
+            'win_probability_away': p_away,
+            'confidence_score': round(float(probabilities[k].max()), 3),
+            'key_insights': insights,
+            'reasoning': reasoning,
+            'expected_result': expected
+        })
+    return predictions
+
+
+def create_batch_prediction_prompt(fixtures: Sequence[Fixture], table: TeamStatsTable,
+                                   h2h_index=None) -> str:
+    """Prompt con varios partidos y respuesta pedida como array JSON (un objeto por partido)"""
+    team_lines = {}
+    for fixture in fixtures:
+        for team in (fixture.home_team, fixture.away_team):
+            if team not in team_lines:
+                s = table.get(team)
+                team_lines[team] = (
+                    f"- {team}: {s['matches_played']} PJ, {s['win_rate']:.0%} victorias "
+                    f"(casa {s['home_win_rate']:.0%}, fuera {s['away_win_rate']:.0%}), "
+                    f"{s['goals_per_game']:.2f} GF/p, {s['goals_conceded_per_game']:.2f} GC/p, "
+                    f"forma {s['recent_form'] or '-'}"
+                )
+
+    fixture_lines = []
+    for fixture in fixtures:
+        line = f"{fixture.index}. {fixture.home_team} (local) vs {fixture.away_team} (visitante)"
+        if h2h_index is not None:
+            h2h = h2h_index.lookup(fixture.home_team, fixture.away_team)
+            line += (f" | H2H: {h2h['home_team_wins']}V {h2h['draws']}E "
+                     f"{h2h['away_team_wins']}D en {h2h['matches']} partidos")
+        fixture_lines.append(line)
+
+    return f"""Eres un analista experto de la Premier League (temporada 2024-25).
+Predice TODOS los partidos siguientes usando las estadísticas históricas (2014-2024).
+
+PARTIDOS:
+{chr(10).join(fixture_lines)}
+
+ESTADÍSTICAS DE LOS EQUIPOS:
+{chr(10).join(team_lines.values())}
+
+Responde ÚNICAMENTE con un array JSON con un objeto por partido, en el mismo orden:
+[
+  {{
+    "fixture": <número del partido>,
+    "home_team": "<local>",
+    "away_team": "<visitante>",
+    "predicted_home_goals": <float>,
+    "predicted_away_goals": <float>,
+    "win_probability_home": <0-1>,
+    "win_probability_draw": <0-1>,
+    "win_probability_away": <0-1>,
+    "confidence_score": <0-1>,
+    "key_insights": ["<insight>", "<insight>"],
+    "reasoning": "<razonamiento breve>",
+    "expected_result": "<resultado esperado>"
+  }}
+]
+Las tres probabilidades de cada partido deben sumar 1."""
+
+
+def _extract_json(text: str):
+    """Primer array u objeto JSON del texto (admite bloques ```json y texto alrededor)"""
+    text = re.sub(r'```(?:json)?', '', text)
+    starts = [i for i in (text.find('['), text.find('{')) if i >= 0]
+    if not starts:
+        raise ValueError("La respuesta no contiene JSON")
+    decoder = json.JSONDecoder()
+    value, _ = decoder.raw_decode(text[min(starts):])
+    return value
+
+
+def _normalize_prediction(item: Dict, fixture: Fixture) -> Dict:
+    """Validar una predicción de Claude y normalizar probabilidades (mismo criterio que en modo unitario)"""
+    probabilities = [max(float(item[field]), 0.0) for field in PROBABILITY_FIELDS]
+    total = sum(probabilities)
+    if total <= 0:
+        raise ValueError("Probabilidades inválidas")
+
+    insights = item.get('key_insights') or []
+    return {
+        'home_team': fixture.home_team,
+        'away_team': fixture.away_team,
+        'predicted_home_goals': float(item['predicted_home_goals']),
+        'predicted_away_goals': float(item['predicted_away_goals']),
+        **{field: round(p / total, 3) for field, p in zip(PROBABILITY_FIELDS, probabilities)},
+        'confidence_score': min(max(float(item.get('confidence_score', max(probabilities) / total)), 0.0), 1.0),
+        'key_insights': [str(insight) for insight in insights] if isinstance(insights, list) else [str(insights)],
+        'reasoning': str(item.get('reasoning', '')),
+        'expected_result': str(item.get('expected_result', ''))
+    }
+
+
+def parse_claude_predictions(response_text: str, fixtures: Sequence[Fixture]) -> Dict[int, Dict]:
+    """
+    Extensión de _parse_claude_prediction para respuestas con varios partidos.
+
+    Acepta un array JSON (o un único objeto, el formato de /api/predict) y asocia
+    cada elemento a su partido por 'fixture', por nombres de equipo o por posición.
+
+    Returns:
+        Dict[int, Dict]: Predicciones válidas por index de partido (las que falten
+        o no se puedan validar se omiten)
+    """
+    try:
+        parsed = _extract_json(response_text)
+    except ValueError as e:
+        logger.warning(f"⚠️ No se pudo extraer JSON de la respuesta batch: {e}")
+        return {}
+    items = parsed if isinstance(parsed, list) else [parsed]
+
+    by_index = {f.index: f for f in fixtures}
+    by_teams = {(f.home_team, f.away_team): f for f in fixtures}
+    predictions = {}
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        # Claude puede devolver cualquier JSON: solo se buscan claves hashables del tipo esperado
+        index, teams = item.get('fixture'), (item.get('home_team'), item.get('away_team'))
+        fixture = by_index.get(index) if isinstance(index, int) and not isinstance(index, bool) else None
+        if fixture is None and all(isinstance(team, str) for team in teams):
+            fixture = by_teams.get(teams)
+        if fixture is None and position < len(fixtures):
+            fixture = fixtures[position]
+        if fixture is None or fixture.index in predictions:
+            continue
+        try:
+            predictions[fixture.index] = _normalize_prediction(item, fixture)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Predicción inválida para {fixture.home_team} vs {fixture.away_team}: {e}")
+    return predictions
+
+
+def predict_batch(fixtures: Sequence[Fixture], table: TeamStatsTable,
+                  complete: Optional[Callable[..., str]] = None, h2h_index=None,
+                  goals_model=None, market_model=None, budget: Optional[float] = None) -> List[Dict]:
+    """
+    Predecir una lista de partidos.
+
+    Sin complete (modo local) es una sola pasada vectorizada. Con complete (modo
+    Claude) se agrupan CLAUDE_FIXTURES_PER_PROMPT partidos por llamada, con hasta
+    CLAUDE_PARALLEL_PROMPTS llamadas a la vez; los que Claude no devuelva o no se
+    puedan parsear usan la predicción local.
+
+    Con budget (modo speculative) cada lote de Claude se espera como mucho
+    budget segundos: sus partidos se quedan con la predicción local
+    (source 'local') y la llamada sigue en segundo plano hasta el deadline.
+
+    Args:
+        fixtures: Partidos ya validados con parse_fixtures
+        table: Estadísticas de equipos (una única versión de los datos)
+        complete: Función prompt -> texto de Claude, o None para modo local
+        h2h_index: HeadToHeadIndex opcional para el contexto del prompt
+        goals_model: GoalsModel opcional para las predicciones locales
+        market_model: MarketModel opcional para mezclar las probabilidades locales con el mercado
+        budget: Segundos máximos de espera a Claude; None espera a todos los lotes
+
+    Returns:
+        List[Dict]: Resultado por partido con index, success, source y prediction
+    """
+    local = predict_local_batch(table, fixtures, goals_model, market_model)
+    results = [{'index': f.index, 'success': True, 'source': 'local', 'prediction': p}
+               for f, p in zip(fixtures, local)]
+    if complete is None or not fixtures:
+        return results  # Sin partidos válidos no hay lotes que enviar a Claude
+
+    def call(chunk):
+        try:
+            prompt = create_batch_prediction_prompt(chunk, table, h2h_index)
+            return complete(prompt, max_tokens=CLAUDE_TOKENS_PER_FIXTURE * len(chunk) + 200)
+        except Exception as e:
+            return e
+
+    # Cada lote corre con una copia del contexto: conserva el deadline de la petición
+    starts = range(0, len(fixtures), CLAUDE_FIXTURES_PER_PROMPT)
+    chunks = [fixtures[start:start + CLAUDE_FIXTURES_PER_PROMPT] for start in starts]
+    pool = ThreadPoolExecutor(max_workers=min(CLAUDE_PARALLEL_PROMPTS, len(chunks)))
+    futures = [pool.submit(contextvars.copy_context().run, call, chunk) for chunk in chunks]
+    done, late = wait(futures, timeout=budget)
+    # Sin esperar a los lotes tardíos: los que no empezaron se cancelan
+    pool.shutdown(wait=False, cancel_futures=True)
+    if late:
+        logger.info(f"⏱️ {len(late)}/{len(chunks)} lotes de Claude fuera del presupuesto de {budget}s: "
+                    f"predicción local")
+
+    for start, chunk, future in zip(starts, chunks, futures):
+        if future not in done:
+            continue
+        response_text = future.result()
+        if isinstance(response_text, Exception):
+            logger.warning(f"⚠️ Claude falló en el lote de {len(chunk)} partidos, usando modo local: "
+                           f"{response_text}")
+            for k in range(start, start + len(chunk)):
+                results[k]['source'] = 'local_fallback'
+            continue
+
+        parsed = parse_claude_predictions(response_text, chunk)
+        for k, fixture in enumerate(chunk, start):
+            if fixture.index in parsed:
+                results[k].update(source='claude', prediction=parsed[fixture.index])
+            else:
+                results[k]['source'] = 'local_fallback'
+    return results
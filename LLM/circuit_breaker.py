@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Circuit Breaker - LLM Premier League
+Corte automático de las llamadas a Claude cuando la API falla o se degrada
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+from claude_client import CLAUDE_MAX_TOKENS, ClaudeAPIError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_WINDOW_SIZE = 20
+DEFAULT_WINDOW_SECONDS = 60.0
+DEFAULT_MIN_CALLS = 10
+DEFAULT_ERROR_RATE = 0.5
+DEFAULT_SLOW_CALL_SECONDS = 10.0
+DEFAULT_SLOW_RATE = 0.5
+DEFAULT_OPEN_SECONDS = 15.0
+DEFAULT_HALF_OPEN_PROBES = 1
+DEADLINE_SLACK_SECONDS = 0.05
+
+
+class CircuitOpenError(ClaudeAPIError):
+    """Circuito abierto: la llamada a Claude no se intenta"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker con ventanas móviles de errores y latencia.
+
+    closed: las llamadas pasan y se registran en una ventana móvil de las
+    últimas window_size llamadas (sin contar las de hace más de window_seconds).
+    La ventana es por número de llamadas y no por tiempo: durante una caída
+    llegan pocas respuestas y, en una ventana temporal, los aciertos previos
+    diluirían los errores. Con al menos min_calls llamadas, si la tasa de
+    errores o la de llamadas lentas (más de slow_call_seconds) supera su
+    umbral, el circuito se abre.
+
+    open: las llamadas se rechazan al instante con CircuitOpenError, así las
+    peticiones pasan a las estadísticas locales sin pagar el timeout.
+
+    half_open: pasados open_seconds se dejan pasar half_open_probes llamadas de
+    prueba. Si la prueba va bien (sin error y sin ser lenta) el circuito se
+    cierra; si no, vuelve a abrirse.
+    """
+
+    def __init__(self, window_size: int = DEFAULT_WINDOW_SIZE, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 min_calls: int = DEFAULT_MIN_CALLS, error_rate: float = DEFAULT_ERROR_RATE,
+                 slow_call_seconds: float = DEFAULT_SLOW_CALL_SECONDS, slow_rate: float = DEFAULT_SLOW_RATE,
+                 open_seconds: float = DEFAULT_OPEN_SECONDS, half_open_probes: int = DEFAULT_HALF_OPEN_PROBES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window_size = window_size
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window_size)  # (instante, ok, latencia)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> 'CircuitBreaker':
+        """Umbrales desde CLAUDE_BREAKER_* (con los valores por defecto si no están definidas)"""
+        return cls(
+            window_size=int(os.getenv('CLAUDE_BREAKER_WINDOW', DEFAULT_WINDOW_SIZE)),
+            window_seconds=float(os.getenv('CLAUDE_BREAKER_WINDOW_SECONDS', DEFAULT_WINDOW_SECONDS)),
+            min_calls=int(os.getenv('CLAUDE_BREAKER_MIN_CALLS', DEFAULT_MIN_CALLS)),
+            error_rate=float(os.getenv('CLAUDE_BREAKER_ERROR_RATE', DEFAULT_ERROR_RATE)),
+            slow_call_seconds=float(os.getenv('CLAUDE_BREAKER_SLOW_CALL', DEFAULT_SLOW_CALL_SECONDS)),
+            slow_rate=float(os.getenv('CLAUDE_BREAKER_SLOW_RATE', DEFAULT_SLOW_RATE)),
+            open_seconds=float(os.getenv('CLAUDE_BREAKER_OPEN_SECONDS', DEFAULT_OPEN_SECONDS)),
+            half_open_probes=int(os.getenv('CLAUDE_BREAKER_HALF_OPEN_PROBES', DEFAULT_HALF_OPEN_PROBES))
+        )
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info("🟡 Circuito de Claude semiabierto: probando la API")
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float, reason: str):
+        self._state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self.times_opened += 1
+        logger.warning(f"🔴 Circuito de Claude abierto ({reason}): usando estadísticas locales")
+
+    def check(self):
+        """
+        Rechazar al instante una petición que el circuito no admitiría, sin reservar prueba.
+
+        Para las peticiones que pueden sumarse a una llamada ya en curso: con el
+        circuito abierto, o con la prueba de half_open ya lanzada, no esperan a
+        esa llamada y pasan a local.
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto o ya hay una prueba en curso
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED or (state == HALF_OPEN and self._probes < self.half_open_probes):
+                return
+            self.rejected += 1
+        raise CircuitOpenError("Circuito de Claude abierto: usando estadísticas locales")
+
+    def acquire(self) -> str:
+        """
+        Pedir permiso para llamar a Claude.
+
+        Returns:
+            str: Estado con el que se admitió la llamada (closed o half_open), para record()
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto o ya hay una prueba en curso
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return CLOSED
+            if state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return HALF_OPEN
+            self.rejected += 1
+        raise CircuitOpenError("Circuito de Claude abierto: usando estadísticas locales")
+
+    def record(self, admitted: str, ok: Optional[bool], latency: float = 0.0, error: Optional[str] = None):
+        """
+        Registrar el resultado de una llamada admitida con acquire().
+
+        Args:
+            admitted: Valor devuelto por acquire()
+            ok: True si fue bien, False si falló, None si se abandonó sin resultado
+            latency: Segundos que tardó la llamada
+            error: Descripción del error, para /api/health
+        """
+        now = self._clock()
+        slow = latency > self.slow_call_seconds
+        with self._lock:
+            if error is not None:
+                self.last_error = error
+            state = self._current_state()
+            if admitted == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+                if state != HALF_OPEN or ok is None:
+                    return
+                if ok and not slow:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    logger.info("🟢 Circuito de Claude cerrado: la API responde de nuevo")
+                else:
+                    self._open(now, 'la prueba falló')
+                return
+
+            # Llamadas lanzadas antes de abrirse el circuito no cuentan después
+            if ok is None or state != CLOSED:
+                return
+            self._calls.append((now, ok, latency))
+            self._prune(now)
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+            slow_calls = sum(1 for _, _, call_latency in self._calls if call_latency > self.slow_call_seconds)
+            if failures / total >= self.error_rate:
+                self._open(now, f"{failures}/{total} errores")
+            elif slow_calls / total >= self.slow_rate:
+                self._open(now, f"{slow_calls}/{total} llamadas lentas")
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        Ejecutar fn() bajo el circuito.
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto
+            ClaudeAPIError: El error de fn(), que además cuenta como fallo
+        """
+        admitted = self.acquire()
+        start = time.monotonic()
+        try:
+            result = fn()
+        except (ClaudeAPIError, TimeoutError) as e:
+            self.record(admitted, False, time.monotonic() - start, str(e))
+            raise
+        except BaseException:
+            self.record(admitted, None)
+            raise
+        self.record(admitted, True, time.monotonic() - start)
+        return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        """
+        Versión asyncio de call(): await fn() bajo el circuito.
+
+        Args:
+            fn: Llamada a Claude
+            deadline: Deadline absoluto (time.monotonic) de la llamada. Si se
+                cancela al agotarlo (las peticiones que la esperaban se fueron
+                por timeout) cuenta como fallo; antes, como abandonada.
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto
+            ClaudeAPIError: El error de fn(), que además cuenta como fallo
+        """
+        admitted = self.acquire()
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except (ClaudeAPIError, TimeoutError) as e:
+            self.record(admitted, False, time.monotonic() - start, str(e))
+            raise
+        except BaseException:
+            now = time.monotonic()
+            # Margen: los timers del event loop pueden disparar un poco antes del deadline
+            if deadline is not None and now >= deadline - DEADLINE_SLACK_SECONDS:
+                self.record(admitted, False, now - start, "Timeout de Claude: deadline de la petición agotado")
+            else:
+                self.record(admitted, None)  # Cancelada: todas las peticiones se fueron
+            raise
+        self.record(admitted, True, time.monotonic() - start)
+        return result
+
+    def snapshot(self) -> Dict:
+        """Estado y ventana actual, para /api/health"""
+        with self._lock:
+            now = self._clock()
+            state = self._current_state()
+            self._prune(now)
+            total = len(self._calls)
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            slow_calls = sum(1 for _, _, latency in self._calls if latency > self.slow_call_seconds)
+            latencies = [latency for _, _, latency in self._calls]
+            return {
+                'state': state,
+                'window_calls': total,
+                'error_rate': round(failures / total, 3) if total else 0.0,
+                'slow_rate': round(slow_calls / total, 3) if total else 0.0,
+                'avg_latency': round(sum(latencies) / total, 3) if total else 0.0,
+                'retry_in_seconds': round(max(self.open_seconds - (now - self._opened_at), 0.0), 1)
+                if state == OPEN else 0.0,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+                'last_error': self.last_error
+            }
+
+
+def attach_breaker(client, breaker: CircuitBreaker) -> bool:
+    """
+    Instalar el breaker en la llamada real a la API, dentro del single-flight.
+
+    ClaudeClient y AsyncClaudeClient (también detrás de BlockingClaudeClient)
+    exponen el atributo breaker: así N peticiones agrupadas en una misma
+    llamada cuentan como una sola en la ventana, y una prueba en half_open no
+    la gastan las peticiones que solo esperan su resultado.
+
+    Returns:
+        bool: False si el cliente no lo admite (el breaker envuelve entonces cada petición)
+    """
+    for target in (client, getattr(client, 'client', None)):
+        if target is not None and hasattr(target, 'breaker') and not isinstance(
+                target, (CircuitBreakerClient, AsyncCircuitBreakerClient)):
+            target.breaker = breaker
+            return True
+    return False
+
+
+class CircuitBreakerClient:
+    """
+    Cliente de Claude protegido por un CircuitBreaker.
+
+    Envuelve ClaudeClient o BlockingClaudeClient con la misma interfaz. Con el
+    circuito abierto available es False, así los handlers van directos al motor
+    local, y cualquier llamada falla al instante con CircuitOpenError (un
+    ClaudeAPIError, que los fallbacks existentes ya capturan).
+
+    Las llamadas de complete() se registran en el líder del single-flight
+    (attach_breaker), no una vez por petición agrupada; cada petición solo
+    comprueba antes (check) que el circuito no la rechazaría.
+    """
+
+    def __init__(self, client, breaker: Optional[CircuitBreaker] = None):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker.from_env()
+        self._attached = attach_breaker(client, self.breaker)
+
+    @property
+    def available(self) -> bool:
+        return self.client.available and self.breaker.state != OPEN
+
+    @property
+    def model(self) -> str:
+        return self.client.model
+
+    def complete(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS) -> str:
+        """
+        Raises:
+            ClaudeAPIError: Si el circuito está abierto o la llamada falla
+        """
+        if self._attached:
+            self.breaker.check()
+            return self.client.complete(prompt, max_tokens)
+        return self.breaker.call(lambda: self.client.complete(prompt, max_tokens))
+
+    def stream(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS,
+               deadline: Optional[float] = None) -> Iterator[str]:
+        """
+        Stream de deltas bajo el circuito; la latencia registrada es la del primer delta.
+
+        Raises:
+            ClaudeAPIError: Si el circuito está abierto o la llamada falla
+        """
+        admitted = self.breaker.acquire()
+        start = time.monotonic()
+        first_delta = None
+        outcome = None
+        error = None
+        try:
+            for text in self.client.stream(prompt, max_tokens, deadline=deadline):
+                if first_delta is None:
+                    first_delta = time.monotonic() - start
+                yield text
+            outcome = True
+        except ClaudeAPIError as e:
+            outcome, error = False, str(e)
+            raise
+        finally:
+            if outcome is None and first_delta is not None:
+                outcome = True  # El consumidor cerró el stream tras recibir datos
+            latency = first_delta if first_delta is not None else time.monotonic() - start
+            self.breaker.record(admitted, outcome, latency, error)
+
+    def stats(self) -> Dict:
+        stats = self.client.stats()
+        return {**stats, 'circuit': self.breaker.snapshot()}
+
+    def close(self):
+        close = getattr(self.client, 'close', None)
+        if close is not None:
+            close()
+
+
+class AsyncCircuitBreakerClient:
+    """
+    Versión asyncio de CircuitBreakerClient para AsyncClaudeClient (servidor ASGI).
+
+    acquire() y record() solo toman un lock durante microsegundos, así que se
+    llaman directamente desde el event loop.
+    """
+
+    def __init__(self, client, breaker: Optional[CircuitBreaker] = None):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker.from_env()
+        self._attached = attach_breaker(client, self.breaker)
+
+    @property
+    def available(self) -> bool:
+        return self.client.available and self.breaker.state != OPEN
+
+    @property
+    def model(self) -> str:
+        return self.client.model
+
+    async def complete(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS,
+                       deadline: Optional[float] = None) -> str:
+        """
+        Raises:
+            ClaudeAPIError: Si el circuito está abierto o la llamada falla
+        """
+        if self._attached:
+            self.breaker.check()
+            return await self.client.complete(prompt, max_tokens, deadline=deadline)
+        return await self.breaker.call_async(lambda: self.client.complete(prompt, max_tokens, deadline=deadline))
+
+    async def stream(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS,
+                     deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Versión asyncio de CircuitBreakerClient.stream: la latencia registrada es la del primer delta.
+
+        Raises:
+            ClaudeAPIError: Si el circuito está abierto o la llamada falla
+        """
+        admitted = self.breaker.acquire()
+        start = time.monotonic()
+        first_delta = None
+        outcome = None
+        error = None
+        try:
+            async for text in self.client.stream(prompt, max_tokens, deadline=deadline):
+                if first_delta is None:
+                    first_delta = time.monotonic() - start
+                yield text
+            outcome = True
+        except ClaudeAPIError as e:
+            outcome, error = False, str(e)
+            raise
+        finally:
+            if outcome is None and first_delta is not None:
+                outcome = True  # El consumidor cerró el stream tras recibir datos
+            latency = first_delta if first_delta is not None else time.monotonic() - start
+            self.breaker.record(admitted, outcome, latency, error)
+
+    def stats(self) -> Dict:
+        stats = self.client.stats()
+        return {**stats, 'circuit': self.breaker.snapshot()}
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Claude Client - LLM Premier League
+Cliente mínimo de la API de mensajes de Anthropic para los endpoints adicionales
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, Optional
+
+import requests
+
+from single_flight import SingleFlight, canonical_prompt_key
+
+logger = logging.getLogger(__name__)
+
+CLAUDE_MODEL = "claude-opus-4-20250514"
+CLAUDE_API_URL = os.getenv('CLAUDE_API_URL', "https://api.anthropic.com/v1/messages")
+CLAUDE_API_VERSION = "2023-06-01"
+CLAUDE_TIMEOUT = 30
+CLAUDE_MAX_TOKENS = 1500
+
+
+# Deadline absoluto (time.monotonic) de la petición en curso
+_request_deadline: ContextVar[Optional[float]] = ContextVar('claude_request_deadline', default=None)
+
+
+class ClaudeAPIError(Exception):
+    """Error al llamar a la API de Claude (red, HTTP o respuesta vacía)"""
+
+
+@contextmanager
+def deadline_scope(timeout: float):
+    """
+    Fijar el deadline de la petición actual; las llamadas a Claude dentro del
+    bloque usan como timeout el tiempo restante (nunca amplían un deadline previo).
+    """
+    deadline = time.monotonic() + timeout
+    current = _request_deadline.get()
+    token = _request_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def current_deadline(default_timeout: float = CLAUDE_TIMEOUT) -> float:
+    """Deadline absoluto de la petición actual (o ahora + default_timeout)"""
+    deadline = _request_deadline.get()
+    return deadline if deadline is not None else time.monotonic() + default_timeout
+
+
+def build_headers(api_key: str) -> Dict[str, str]:
+    return {
+        'x-api-key': api_key,
+        'anthropic-version': CLAUDE_API_VERSION,
+        'content-type': 'application/json'
+    }
+
+
+def build_payload(model: str, prompt: str, max_tokens: int) -> Dict:
+    return {
+        'model': model,
+        'max_tokens': max_tokens,
+        'messages': [{'role': 'user', 'content': prompt}]
+    }
+
+
+def parse_stream_line(line: str) -> Optional[str]:
+    """
+    Texto de una línea del stream SSE de la API de mensajes (None si no es un delta de texto).
+
+    Raises:
+        ClaudeAPIError: Si el stream trae un evento de error
+    """
+    if not line.startswith('data:'):
+        return None
+    try:
+        event = json.loads(line[5:].strip())
+    except ValueError:
+        return None
+    if event.get('type') == 'error':
+        raise ClaudeAPIError(f"Error en el stream de Claude: {event.get('error', {}).get('message', event)}")
+    if event.get('type') == 'content_block_delta' and event.get('delta', {}).get('type') == 'text_delta':
+        return event['delta'].get('text', '')
+    return None
+
+
+def stream_deltas(lines: Iterable[str]) -> Iterator[str]:
+    """Deltas de texto de un stream SSE de Claude, en orden de llegada"""
+    for line in lines:
+        text = parse_stream_line(line)
+        if text:
+            yield text
+
+
+def response_text(status_code: int, data: Optional[Dict], raw_text: str = '') -> str:
+    """
+    Texto de una respuesta de la API de mensajes.
+
+    Raises:
+        ClaudeAPIError: Si el status no es 200 o la respuesta no trae texto
+    """
+    if status_code != 200:
+        raise ClaudeAPIError(f"Claude respondió {status_code}: {raw_text[:200]}")
+    content = (data or {}).get('content') or []
+    text = ''.join(block.get('text', '') for block in content if block.get('type') == 'text')
+    if not text:
+        raise ClaudeAPIError("Respuesta de Claude sin texto")
+    return text
+
+
+class ClaudeClient:
+    """
+    Llamadas síncronas a Claude con la misma configuración que premier_league_llm.py.
+
+    Las llamadas concurrentes con el mismo prompt canónico comparten una única
+    petición a la API (single-flight), salvo con dedupe=False.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model: str = CLAUDE_MODEL,
+                 base_url: str = CLAUDE_API_URL, timeout: float = CLAUDE_TIMEOUT,
+                 dedupe: bool = True):
+        self.api_key = api_key or os.getenv('CLAUDE_API_KEY')
+        self.model = model
+        self.base_url = base_url
+        self.timeout = timeout
+        self.single_flight = SingleFlight() if dedupe else None
+        self.breaker = None  # Lo instala CircuitBreakerClient: protege la llamada real, no cada petición
+        self._session = requests.Session()
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def complete(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS) -> str:
+        """
+        Enviar un prompt y devolver el texto de la respuesta.
+
+        Raises:
+            ClaudeAPIError: Si no hay API key, la petición falla o la respuesta no trae texto
+        """
+        if not self.api_key:
+            raise ClaudeAPIError("CLAUDE_API_KEY no configurada")
+        # El deadline se resuelve aquí: los hilos del single-flight no heredan el contexto
+        deadline = current_deadline(self.timeout)
+
+        def upstream():
+            if self.breaker is None:
+                return self._request(prompt, max_tokens, deadline)
+            return self.breaker.call(lambda: self._request(prompt, max_tokens, deadline))
+
+        if self.single_flight is None:
+            return upstream()
+
+        key = canonical_prompt_key(self.model, max_tokens, prompt)
+        try:
+            return self.single_flight.do(key, upstream, timeout=max(deadline - time.monotonic(), 0.0))
+        except TimeoutError as e:
+            raise ClaudeAPIError(f"Timeout esperando a Claude: {e}")
+
+    def _request(self, prompt: str, max_tokens: int, deadline: float) -> str:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ClaudeAPIError("Deadline de la petición excedido antes de llamar a Claude")
+        try:
+            response = self._session.post(
+                self.base_url,
+                headers=build_headers(self.api_key),
+                json=build_payload(self.model, prompt, max_tokens),
+                timeout=min(self.timeout, remaining)
+            )
+        except requests.RequestException as e:
+            raise ClaudeAPIError(f"Error de conexión con Claude: {e}")
+        data = response.json() if response.status_code == 200 else None
+        return response_text(response.status_code, data, response.text)
+
+    def stream(self, prompt: str, max_tokens: int = CLAUDE_MAX_TOKENS,
+               deadline: Optional[float] = None) -> Iterator[str]:
+        """
+        Enviar un prompt con stream=true y devolver los deltas de texto según llegan.
+
+        Raises:
+            ClaudeAPIError: Si no hay API key, la petición falla o se agota el deadline
+        """
+        if not self.api_key:
+            raise ClaudeAPIError("CLAUDE_API_KEY no configurada")
+        deadline = deadline if deadline is not None else current_deadline(self.timeout)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ClaudeAPIError("Deadline de la petición excedido antes de llamar a Claude")
+        try:
+            with self._session.post(
+                self.base_url,
+                headers=build_headers(self.api_key),
+                json={**build_payload(self.model, prompt, max_tokens), 'stream': True},
+                timeout=min(self.timeout, remaining),
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    raise ClaudeAPIError(f"Claude respondió {response.status_code}: {response.text[:200]}")
+                response.encoding = response.encoding or 'utf-8'
+                yield from stream_deltas(response.iter_lines(decode_unicode=True))
+        except requests.RequestException as e:
+            raise ClaudeAPIError(f"Error de conexión con Claude: {e}")
+
+    def stats(self) -> Dict:
+        """Métricas de deduplicación de llamadas en curso"""
+        return {'single_flight': self.single_flight.stats() if self.single_flight else None}
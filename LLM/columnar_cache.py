@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Columnar Cache - LLM Premier League
+Convierte el CSV procesado en un archivo binario columnar que se mapea en memoria al arrancar
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV_PATH = os.path.join(BASE_DIR, 'datasets', 'processed', 'dataset_2014-2024_clean.csv')
+
+CACHE_MAGIC = b'PLCOL01\n'
+CACHE_FORMAT_VERSION = 2     # 2: columnas de mercado precalculadas (market_odds.py)
+CACHE_ALIGNMENT = 64
+
+DATE_COLUMNS = ('Date',)
+TEAM_COLUMNS = ('HomeTeam', 'AwayTeam')
+EPOCH = date(1970, 1, 1)
+
+
+class ColumnarDataset:
+    """Dataset de partidos en formato columnar (un array de tipo fijo por columna)"""
+
+    def __init__(self, columns: Dict[str, np.ndarray], kinds: Dict[str, str],
+                 dictionaries: Dict[str, List[str]], n_rows: int,
+                 source_sha256: str, path: Optional[str] = None):
+        self.columns = columns
+        self.kinds = kinds
+        self.dictionaries = dictionaries
+        self.n_rows = n_rows
+        self.source_sha256 = source_sha256
+        self.path = path
+        self._team_index = {name: i for i, name in enumerate(dictionaries.get('teams', []))}
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.column(name)
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.columns.keys())
+
+    @property
+    def team_names(self) -> List[str]:
+        return self.dictionaries.get('teams', [])
+
+    def column(self, name: str) -> np.ndarray:
+        """Array (de solo lectura si viene del cache) de una columna"""
+        if name not in self.columns:
+            raise KeyError(f"Columna no encontrada: {name}")
+        return self.columns[name]
+
+    def team_id(self, team_name: str) -> int:
+        """
+        Código entero de un equipo en el diccionario compartido HomeTeam/AwayTeam.
+
+        Raises:
+            ValueError: Si el equipo no existe en los datos
+        """
+        if team_name not in self._team_index:
+            raise ValueError(f"Equipo no encontrado en datos históricos: {team_name}")
+        return self._team_index[team_name]
+
+    def decode(self, name: str) -> List[str]:
+        """Decodificar una columna de categorías, equipos o fechas a texto"""
+        kind = self.kinds[name]
+        values = self.column(name)
+        if kind == 'date':
+            return [days_to_iso(int(v)) for v in values]
+        if kind == 'team':
+            lookup = self.dictionaries['teams']
+        elif kind == 'category':
+            lookup = self.dictionaries[name]
+        else:
+            return [str(v) for v in values]
+        return [lookup[int(code)] for code in values]
+
+
+def iso_to_days(value: str) -> int:
+    """Fecha ISO (YYYY-MM-DD) a días desde 1970-01-01"""
+    return (date.fromisoformat(value) - EPOCH).days
+
+
+def days_to_iso(days: int) -> str:
+    """Días desde 1970-01-01 a fecha ISO"""
+    return date.fromordinal(EPOCH.toordinal() + days).isoformat()
+
+
+def file_sha256(path: str) -> str:
+    """Hash SHA-256 del contenido de un archivo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_cache_path(csv_path: str) -> str:
+    """Ruta del cache junto al CSV (mismo nombre, extensión .colcache)"""
+    return os.path.splitext(csv_path)[0] + '.colcache'
+
+
+def _smallest_code_dtype(size: int) -> np.dtype:
+    return np.dtype(np.uint8) if size <= 0xFF else np.dtype(np.uint16)
+
+
+def _encode_categories(values: List[str], lookup: List[str]) -> np.ndarray:
+    index = {name: i for i, name in enumerate(lookup)}
+    return np.array([index[v] for v in values], dtype=_smallest_code_dtype(len(lookup)))
+
+
+def _numeric_column(values: List[str]) -> Optional[np.ndarray]:
+    """Array numérico de una columna, o None si contiene texto"""
+    try:
+        parsed = np.array([float(v) if v != '' else np.nan for v in values], dtype=np.float64)
+    except ValueError:
+        return None
+
+    if not np.isnan(parsed).any() and np.all(parsed == np.round(parsed)):
+        for int_dtype in (np.int16, np.int32):
+            info = np.iinfo(int_dtype)
+            if parsed.size == 0 or (parsed.min() >= info.min and parsed.max() <= info.max):
+                return parsed.astype(int_dtype)
+    return parsed
+
+
+def parse_csv_columns(csv_path: str) -> ColumnarDataset:
+    """Parsear el CSV procesado y tipar cada columna (parse completo, sin cache)"""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        raw_columns = [list(col) for col in zip(*reader)] if header else []
+
+    if not raw_columns:
+        raw_columns = [[] for _ in header]
+
+    n_rows = len(raw_columns[0]) if raw_columns else 0
+    columns: Dict[str, np.ndarray] = {}
+    kinds: Dict[str, str] = {}
+    dictionaries: Dict[str, List[str]] = {}
+
+    team_values = [raw_columns[header.index(c)] for c in TEAM_COLUMNS if c in header]
+    if team_values:
+        dictionaries['teams'] = sorted({team for values in team_values for team in values})
+
+    for name, values in zip(header, raw_columns):
+        values = [v.strip() for v in values]
+        if name in DATE_COLUMNS:
+            columns[name] = np.array([iso_to_days(v) for v in values], dtype=np.int32)
+            kinds[name] = 'date'
+        elif name in TEAM_COLUMNS:
+            columns[name] = _encode_categories(values, dictionaries['teams'])
+            kinds[name] = 'team'
+        else:
+            numeric = _numeric_column(values)
+            if numeric is not None:
+                columns[name] = numeric
+                kinds[name] = 'numeric'
+            else:
+                dictionaries[name] = sorted(set(values))
+                columns[name] = _encode_categories(values, dictionaries[name])
+                kinds[name] = 'category'
+
+    return ColumnarDataset(columns, kinds, dictionaries, n_rows, file_sha256(csv_path))
+
+
+def _aligned(offset: int) -> int:
+    return (offset + CACHE_ALIGNMENT - 1) // CACHE_ALIGNMENT * CACHE_ALIGNMENT
+
+
+def write_columnar_cache(dataset: ColumnarDataset, cache_path: str, source_name: str = '') -> None:
+    """
+    Escribir el dataset como archivo columnar de forma atómica.
+
+    El archivo se escribe en un temporal del mismo directorio y se publica con
+    os.replace, así los workers que ya lo tienen mapeado nunca ven uno a medias.
+    """
+    layout = []
+    offset = 0
+    for name, values in dataset.columns.items():
+        values = np.ascontiguousarray(values)
+        layout.append((name, values, offset))
+        offset = _aligned(offset + values.nbytes)
+
+    header = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'source_name': source_name,
+        'source_sha256': dataset.source_sha256,
+        'n_rows': dataset.n_rows,
+        'dictionaries': dataset.dictionaries,
+        'columns': [
+            {
+                'name': name,
+                'kind': dataset.kinds[name],
+                'dtype': values.dtype.str,
+                'offset': column_offset,
+                'nbytes': values.nbytes
+            }
+            for name, values, column_offset in layout
+        ]
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _aligned(len(CACHE_MAGIC) + 8 + len(header_bytes))
+
+    cache_dir = os.path.dirname(os.path.abspath(cache_path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.colcache-', dir=cache_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(CACHE_MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for name, values, column_offset in layout:
+                f.seek(data_start + column_offset)
+                f.write(values.tobytes())
+            f.truncate(data_start + offset)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_cache_header(cache_path: str) -> Dict:
+    """Leer solo la cabecera JSON del cache (sin mapear columnas)"""
+    with open(cache_path, 'rb') as f:
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            raise ValueError(f"Archivo de cache inválido: {cache_path}")
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    header['_data_start'] = _aligned(len(CACHE_MAGIC) + 8 + header_len)
+    return header
+
+
+def load_columnar_cache(cache_path: str) -> ColumnarDataset:
+    """
+    Mapear en memoria un cache columnar.
+
+    Las columnas son vistas de solo lectura sobre el mismo mmap, por lo que
+    varios procesos que cargan el mismo archivo comparten las páginas físicas.
+    """
+    header = read_cache_header(cache_path)
+    if header.get('format_version') != CACHE_FORMAT_VERSION:
+        raise ValueError(f"Versión de cache no soportada: {header.get('format_version')}")
+
+    data_start = header['_data_start']
+    mapped = np.memmap(cache_path, dtype=np.uint8, mode='r')
+    columns: Dict[str, np.ndarray] = {}
+    kinds: Dict[str, str] = {}
+
+    for spec in header['columns']:
+        start = data_start + spec['offset']
+        columns[spec['name']] = mapped[start:start + spec['nbytes']].view(np.dtype(spec['dtype']))
+        kinds[spec['name']] = spec['kind']
+
+    return ColumnarDataset(columns, kinds, header['dictionaries'], header['n_rows'],
+                           header['source_sha256'], path=cache_path)
+
+
+def build_columnar_cache(csv_path: str = DEFAULT_CSV_PATH, cache_path: Optional[str] = None) -> ColumnarDataset:
+    """Paso de build: parsear el CSV, precalcular las probabilidades de mercado y escribir su cache columnar"""
+    from market_odds import add_market_columns
+
+    cache_path = cache_path or default_cache_path(csv_path)
+    dataset = add_market_columns(parse_csv_columns(csv_path))
+    write_columnar_cache(dataset, cache_path, source_name=os.path.basename(csv_path))
+    logger.info(f"📦 Cache columnar generado: {cache_path} ({dataset.n_rows} partidos)")
+    return load_columnar_cache(cache_path)
+
+
+def load_dataset(csv_path: str = DEFAULT_CSV_PATH, cache_path: Optional[str] = None) -> ColumnarDataset:
+    """
+    Cargar el dataset procesado usando el cache columnar si está vigente.
+
+    El CSV sigue siendo la fuente de verdad: si el hash de su contenido no
+    coincide con el registrado en el cache (o el cache no existe o es de otra
+    versión), se regenera antes de mapearlo.
+
+    Args:
+        csv_path: Ruta del CSV procesado
+        cache_path: Ruta del cache (por defecto junto al CSV)
+
+    Returns:
+        ColumnarDataset: Dataset con columnas mapeadas en memoria
+    """
+    cache_path = cache_path or default_cache_path(csv_path)
+    source_sha256 = file_sha256(csv_path)
+
+    if os.path.exists(cache_path):
+        try:
+            header = read_cache_header(cache_path)
+            if (header.get('format_version') == CACHE_FORMAT_VERSION
+                    and header.get('source_sha256') == source_sha256):
+                return load_columnar_cache(cache_path)
+            logger.info("🔄 CSV modificado, regenerando cache columnar")
+        except (ValueError, OSError) as e:
+            logger.warning(f"⚠️ Cache columnar ilegible, regenerando: {e}")
+
+    return build_columnar_cache(csv_path, cache_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar el cache columnar del dataset procesado")
+    parser.add_argument('--csv', default=DEFAULT_CSV_PATH, help="CSV procesado de origen")
+    parser.add_argument('--output', default=None, help="Ruta del cache (por defecto junto al CSV)")
+    parser.add_argument('--force', action='store_true', help="Regenerar aunque el hash coincida")
+    args = parser.parse_args()
+
+    if args.force:
+        dataset = build_columnar_cache(args.csv, args.output)
+    else:
+        dataset = load_dataset(args.csv, args.output)
+
+    print(f"✅ Cache listo: {dataset.path}")
+    print(f"   📊 {dataset.n_rows} partidos, {len(dataset.columns)} columnas, "
+          f"{len(dataset.team_names)} equipos")
+    print(f"   🔑 SHA-256 CSV: {dataset.source_sha256[:16]}...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Goals Model - LLM Premier League
+Modelo de Poisson / Dixon-Coles: fuerzas de ataque y defensa, ventaja local y matrices de marcadores precalculadas
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from columnar_cache import ColumnarDataset, iso_to_days
+from stats_engine import match_arrays
+
+logger = logging.getLogger(__name__)
+
+MAX_GOALS = 10                 # Matriz de marcadores 0-10 x 0-10
+DEFAULT_TIME_DECAY = 0.0018    # Por día: un partido de hace un año pesa ~la mitad (Dixon-Coles 1997)
+PRIOR_MATCHES = 1.0            # Pseudo-partidos de media de liga por equipo (equipos con pocos datos)
+MAX_ITERATIONS = 200
+TOLERANCE = 1e-7
+RHO_SEARCH_ITERATIONS = 40
+
+
+def poisson_pmf(rates: np.ndarray, max_goals: int = MAX_GOALS) -> np.ndarray:
+    """P(k goles) para k = 0..max_goals de cada tasa; shape rates.shape + (max_goals + 1,)"""
+    rates = np.asarray(rates, dtype=np.float64)[..., None]
+    k = np.arange(max_goals + 1)
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, max_goals + 1)))])
+    return np.exp(k * np.log(np.maximum(rates, 1e-300)) - rates - log_factorial)
+
+
+def dixon_coles_tau(home_goals: np.ndarray, away_goals: np.ndarray, home_rate: np.ndarray,
+                    away_rate: np.ndarray, rho: float) -> np.ndarray:
+    """Factor de corrección de Dixon-Coles para 0-0, 1-0, 0-1 y 1-1 (1 en el resto)"""
+    tau = np.ones(np.broadcast(home_goals, away_goals, home_rate, away_rate).shape)
+    low_00 = (home_goals == 0) & (away_goals == 0)
+    low_01 = (home_goals == 0) & (away_goals == 1)
+    low_10 = (home_goals == 1) & (away_goals == 0)
+    low_11 = (home_goals == 1) & (away_goals == 1)
+    product = np.broadcast_to(home_rate * away_rate, tau.shape)
+    tau = np.where(low_00, 1 - product * rho, tau)
+    tau = np.where(low_01, 1 + np.broadcast_to(home_rate, tau.shape) * rho, tau)
+    tau = np.where(low_10, 1 + np.broadcast_to(away_rate, tau.shape) * rho, tau)
+    tau = np.where(low_11, 1 - rho, tau)
+    return tau
+
+
+@dataclass
+class GoalsModel:
+    """
+    Modelo ajustado: log λ_local = ataque[local] + defensa[visitante] + ventaja_local,
+    log λ_visitante = ataque[visitante] + defensa[local].
+
+    Tras el ajuste se precalculan para cada par (local, visitante) la matriz de
+    marcadores, las probabilidades 1X2, los goles esperados y el marcador más
+    probable, así que predecir es leer una celda.
+    """
+    team_names: List[str]
+    attack: np.ndarray
+    defence: np.ndarray
+    home_advantage: float
+    rho: float
+    time_decay: float
+    matches: int
+    fit_seconds: float
+    score_matrix: np.ndarray = field(repr=False)   # (n, n, MAX_GOALS + 1, MAX_GOALS + 1)
+    probabilities: np.ndarray = field(repr=False)  # (n, n, 3): local, empate, visitante
+    expected_goals: np.ndarray = field(repr=False)  # (n, n, 2)
+    most_likely: np.ndarray = field(repr=False)    # (n, n, 2)
+
+    def __post_init__(self):
+        self._team_index = {name: i for i, name in enumerate(self.team_names)}
+
+    def __contains__(self, team_name: str) -> bool:
+        return team_name in self._team_index
+
+    def team_id(self, team_name: str) -> int:
+        """
+        Raises:
+            ValueError: Si el equipo no estaba en los datos del ajuste
+        """
+        if team_name not in self._team_index:
+            raise ValueError(f"Equipo no incluido en el modelo de goles: {team_name}")
+        return self._team_index[team_name]
+
+    def lookup(self, home_team: str, away_team: str) -> Dict:
+        """Probabilidades y goles esperados de un partido (lectura de las tablas precalculadas)"""
+        h, a = self.team_id(home_team), self.team_id(away_team)
+        p_home, p_draw, p_away = (float(p) for p in self.probabilities[h, a])
+        return {
+            'home_team': home_team,
+            'away_team': away_team,
+            'expected_home_goals': float(self.expected_goals[h, a, 0]),
+            'expected_away_goals': float(self.expected_goals[h, a, 1]),
+            'win_probability_home': p_home,
+            'win_probability_draw': p_draw,
+            'win_probability_away': p_away,
+            'most_likely_score': [int(g) for g in self.most_likely[h, a]],
+            'most_likely_probability': float(self.score_matrix[h, a][tuple(self.most_likely[h, a])])
+        }
+
+    def summary(self) -> Dict:
+        """Parámetros del ajuste, para /api/stats"""
+        ranking = np.argsort(-(self.attack - self.defence))
+        return {
+            'matches': self.matches,
+            'home_advantage': round(float(np.exp(self.home_advantage)), 3),
+            'rho': round(self.rho, 4),
+            'time_decay': self.time_decay,
+            'fit_seconds': round(self.fit_seconds, 4),
+            'strongest_teams': [self.team_names[i] for i in ranking[:5]]
+        }
+
+
+def _fit_strengths(home: np.ndarray, away: np.ndarray, home_goals: np.ndarray, away_goals: np.ndarray,
+                   weights: np.ndarray, n_teams: int) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Máxima verosimilitud de Poisson por actualizaciones de bloque en forma cerrada.
+
+    Fijados los demás parámetros, el óptimo de cada ataque, defensa y de la
+    ventaja local es log(goles ponderados / goles esperados ponderados); cada
+    vuelta son unos pocos np.bincount sobre los partidos.
+    """
+    def weighted(ids, values):
+        return np.bincount(ids, weights=values, minlength=n_teams)[:n_teams]
+
+    league_rate = max(float((weights * (home_goals + away_goals)).sum() / (2 * weights.sum())), 1e-6)
+    scored = weighted(home, weights * home_goals) + weighted(away, weights * away_goals)
+    conceded = weighted(home, weights * away_goals) + weighted(away, weights * home_goals)
+    home_total = float((weights * home_goals).sum())
+
+    attack = np.zeros(n_teams)
+    defence = np.full(n_teams, np.log(league_rate))
+    home_adv = 0.0
+    for iteration in range(MAX_ITERATIONS):
+        previous = np.concatenate([attack, defence, [home_adv]])
+        # Cada equipo tiene PRIOR_MATCHES partidos ficticios a ritmo de media de liga
+        exposure = (weighted(home, weights * np.exp(defence[away] + home_adv))
+                    + weighted(away, weights * np.exp(defence[home])))
+        attack = np.log((scored + PRIOR_MATCHES * league_rate) / (exposure + PRIOR_MATCHES * league_rate))
+        exposure = (weighted(away, weights * np.exp(attack[home] + home_adv))
+                    + weighted(home, weights * np.exp(attack[away])))
+        defence = np.log((conceded + PRIOR_MATCHES * league_rate) / (exposure + PRIOR_MATCHES))
+        home_adv = float(np.log(home_total / max(float((weights * np.exp(attack[home] + defence[away])).sum()),
+                                                 1e-12)))
+        # Identificabilidad: ataque de media 0 (el desplazamiento pasa a la defensa)
+        shift = attack.mean()
+        attack -= shift
+        defence += shift
+        if np.abs(np.concatenate([attack, defence, [home_adv]]) - previous).max() < TOLERANCE:
+            break
+    logger.debug(f"Modelo de goles convergido en {iteration + 1} iteraciones")
+    return attack, defence, home_adv
+
+
+def _fit_rho(home_goals: np.ndarray, away_goals: np.ndarray, home_rate: np.ndarray,
+             away_rate: np.ndarray, weights: np.ndarray) -> float:
+    """ρ de Dixon-Coles con las fuerzas fijas: búsqueda de sección áurea en el intervalo válido"""
+    low = (home_goals <= 1) & (away_goals <= 1)
+    if not low.any():
+        return 0.0
+    x, y, lam, mu, w = home_goals[low], away_goals[low], home_rate[low], away_rate[low], weights[low]
+    # τ > 0 en todos los partidos: ρ en (max(-1/λ, -1/μ), min(1/(λμ), 1))
+    lower = max(float(np.max(-1 / lam)), float(np.max(-1 / mu)), -1.0) + 1e-6
+    upper = min(float(np.min(1 / (lam * mu))), 1.0) - 1e-6
+
+    def log_likelihood(rho):
+        return float((w * np.log(dixon_coles_tau(x, y, lam, mu, rho))).sum())
+
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = lower, upper
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    fc, fd = log_likelihood(c), log_likelihood(d)
+    for _ in range(RHO_SEARCH_ITERATIONS):
+        if fc > fd:
+            b, d, fd = d, c, fc
+            c = b - ratio * (b - a)
+            fc = log_likelihood(c)
+        else:
+            a, c, fc = c, d, fd
+            d = a + ratio * (b - a)
+            fd = log_likelihood(d)
+    return float((a + b) / 2)
+
+
+def score_matrices(home_rate: np.ndarray, away_rate: np.ndarray, rho: float = 0.0,
+                   max_goals: int = MAX_GOALS) -> np.ndarray:
+    """
+    Matrices de marcadores para tasas con cualquier shape: shape + (max_goals + 1, max_goals + 1).
+
+    Se renormalizan a 1 para repartir la masa de los marcadores de más de max_goals.
+    """
+    matrix = poisson_pmf(home_rate, max_goals)[..., :, None] * poisson_pmf(away_rate, max_goals)[..., None, :]
+    if rho:
+        goals = np.arange(2)
+        matrix[..., :2, :2] *= dixon_coles_tau(goals[:, None], goals[None, :],
+                                               np.asarray(home_rate)[..., None, None],
+                                               np.asarray(away_rate)[..., None, None], rho)
+    return matrix / matrix.sum(axis=(-2, -1), keepdims=True)
+
+
+def fit_goals_model(dataset: ColumnarDataset, time_decay: float = DEFAULT_TIME_DECAY,
+                    dixon_coles: bool = True, as_of: Optional[str] = None) -> GoalsModel:
+    """
+    Ajustar el modelo sobre el dataset procesado y precalcular las tablas de todos los pares.
+
+    Args:
+        dataset: Dataset columnar de partidos
+        time_decay: ξ por día; cada partido pesa exp(-ξ · días hasta as_of). 0 = sin decaimiento
+        dixon_coles: Aplicar la corrección de marcadores bajos (ρ)
+        as_of: Fecha ISO de referencia; solo se usan partidos anteriores (por defecto, todos)
+
+    Returns:
+        GoalsModel: Parámetros y tablas (n_equipos x n_equipos) precalculadas
+
+    Raises:
+        ValueError: Si no hay partidos con los que ajustar
+    """
+    start = time.perf_counter()
+    n_teams = len(dataset.team_names)
+    m = match_arrays(dataset)
+    dates = np.asarray(m['date'], dtype=np.int64)
+    valid = m['home_result'] >= 0
+    if as_of is not None:
+        valid &= dates < iso_to_days(as_of)
+    if not valid.any():
+        raise ValueError("No hay partidos para ajustar el modelo de goles")
+
+    home, away = m['home'][valid].astype(np.int64), m['away'][valid].astype(np.int64)
+    home_goals = m['home_goals'][valid].astype(np.float64)
+    away_goals = m['away_goals'][valid].astype(np.float64)
+    reference = iso_to_days(as_of) if as_of is not None else int(dates[valid].max())
+    weights = np.exp(-time_decay * (reference - dates[valid]))
+
+    attack, defence, home_adv = _fit_strengths(home, away, home_goals, away_goals, weights, n_teams)
+    rho = 0.0
+    if dixon_coles:
+        rho = _fit_rho(home_goals, away_goals, np.exp(attack[home] + defence[away] + home_adv),
+                       np.exp(attack[away] + defence[home]), weights)
+
+    # Tablas de todos los pares (local en filas, visitante en columnas)
+    home_rate = np.exp(attack[:, None] + defence[None, :] + home_adv)
+    away_rate = np.exp(attack[None, :] + defence[:, None])
+    matrix = score_matrices(home_rate, away_rate, rho)
+    goals = np.arange(MAX_GOALS + 1)
+    diff = goals[:, None] - goals[None, :]
+    probabilities = np.stack([matrix[..., diff > 0].sum(-1), matrix[..., diff == 0].sum(-1),
+                              matrix[..., diff < 0].sum(-1)], axis=-1)
+    expected = np.stack([(matrix.sum(-1) * goals).sum(-1), (matrix.sum(-2) * goals).sum(-1)], axis=-1)
+    flat = matrix.reshape(n_teams, n_teams, -1).argmax(-1)
+    most_likely = np.stack(np.unravel_index(flat, (MAX_GOALS + 1, MAX_GOALS + 1)), axis=-1)
+
+    model = GoalsModel(
+        team_names=list(dataset.team_names), attack=attack, defence=defence, home_advantage=home_adv,
+        rho=rho, time_decay=time_decay, matches=int(valid.sum()), fit_seconds=time.perf_counter() - start,
+        score_matrix=matrix, probabilities=probabilities, expected_goals=expected, most_likely=most_likely
+    )
+    logger.info(f"⚽ Modelo de goles ajustado: {model.matches} partidos, ventaja local "
+                f"x{np.exp(home_adv):.2f}, ρ={rho:.3f} en {model.fit_seconds * 1000:.0f} ms")
+    return model
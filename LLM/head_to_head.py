@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Head-to-Head Index - LLM Premier League
+Índice precalculado de enfrentamientos directos para todos los pares de equipos
+"""
+
+import threading
+from collections import deque
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from columnar_cache import ColumnarDataset, days_to_iso
+from stats_engine import RESULT_DRAW, RESULT_LOSS, RESULT_WIN, match_arrays
+
+H2H_LAST_N = 5
+
+
+class HeadToHeadIndex:
+    """
+    Enfrentamientos directos indexados por (local, visitante).
+
+    Los agregados son matrices n_equipos x n_equipos, así que leer un par es
+    O(1) en lugar de recorrer los 3,460 partidos en cada petición. Los últimos
+    partidos de cada cruce se guardan en un deque acotado por par, ordenado por
+    fecha aunque los resultados lleguen fuera de orden.
+    """
+
+    _COUNTERS = ('matches', 'home_wins', 'draws', 'away_wins', 'home_goals', 'away_goals')
+
+    def __init__(self, team_names: List[str], last_n: int = H2H_LAST_N):
+        self._lock = threading.RLock()
+        self.last_n = last_n
+        self._team_names = list(team_names)
+        self._team_index = {name: i for i, name in enumerate(self._team_names)}
+        n = max(len(self._team_names), 1)
+        self._counters = {name: np.zeros((n, n), dtype=np.int32) for name in self._COUNTERS}
+        self._last: Dict[Tuple[int, int], deque] = {}
+
+    @classmethod
+    def from_dataset(cls, dataset: ColumnarDataset, last_n: int = H2H_LAST_N) -> 'HeadToHeadIndex':
+        """Construir el índice completo en una pasada vectorizada"""
+        index = cls(dataset.team_names, last_n)
+        n = len(index._team_names)
+        m = match_arrays(dataset)
+        pair = m['home'].astype(np.int64) * n + m['away']
+        result = m['home_result']
+
+        def grid(weights=None):
+            return np.bincount(pair, weights=weights, minlength=n * n).reshape(n, n).astype(np.int32)
+
+        index._counters = {
+            'matches': grid(),
+            'home_wins': grid(result == RESULT_WIN),
+            'draws': grid(result == RESULT_DRAW),
+            'away_wins': grid(result == RESULT_LOSS),
+            'home_goals': grid(m['home_goals']),
+            'away_goals': grid(m['away_goals'])
+        }
+
+        # Últimos N partidos por cruce: sort estable por par sobre el orden cronológico
+        sort_keys = pair.astype(np.uint16) if n * n <= np.iinfo(np.uint16).max else pair
+        by_pair = np.argsort(sort_keys, kind='stable')
+        sorted_pair = pair[by_pair]
+        ends = np.flatnonzero(np.diff(sorted_pair, append=-1)) + 1
+        starts = np.concatenate([[0], ends[:-1]])
+        for start, end in zip(starts, ends):
+            rows = by_pair[max(start, end - last_n):end]
+            key = divmod(int(sorted_pair[start]), n)
+            index._last[key] = deque(
+                ((int(m['date'][r]), int(m['home_goals'][r]), int(m['away_goals'][r])) for r in rows),
+                maxlen=last_n
+            )
+        return index
+
+    def _ensure_capacity(self, team_id: int):
+        size = self._counters['matches'].shape[0]
+        if team_id < size:
+            return
+        new_size = max(size * 2, team_id + 1)
+        for name, values in self._counters.items():
+            grown = np.zeros((new_size, new_size), dtype=values.dtype)
+            grown[:size, :size] = values
+            self._counters[name] = grown
+
+    def apply_result(self, result, home_id: int, away_id: int):
+        """Actualizar el cruce con un resultado nuevo (llamado desde LiveStatsStore)"""
+        with self._lock:
+            for team_id, name in ((home_id, result.home_team), (away_id, result.away_team)):
+                self._ensure_capacity(team_id)
+                if name not in self._team_index:
+                    self._team_index[name] = team_id
+                    self._team_names.append(name)
+
+            c = self._counters
+            c['matches'][home_id, away_id] += 1
+            c['home_goals'][home_id, away_id] += result.home_goals
+            c['away_goals'][home_id, away_id] += result.away_goals
+            outcome = {'H': 'home_wins', 'D': 'draws', 'A': 'away_wins'}[result.result]
+            c[outcome][home_id, away_id] += 1
+            self._push_last((home_id, away_id), (result.date_days, result.home_goals, result.away_goals))
+
+    def _push_last(self, key: Tuple[int, int], entry: Tuple[int, int, int]):
+        """
+        Añadir un partido a los últimos del cruce por fecha, no por orden de llegada.
+
+        Un resultado que llega tarde se inserta en su sitio y sale el más antiguo;
+        si es anterior a todos los guardados con el deque lleno, no entra.
+        """
+        last = self._last.get(key)
+        if last is None:
+            self._last[key] = deque([entry], maxlen=self.last_n)
+        elif not last or entry[0] >= last[-1][0]:
+            last.append(entry)
+        elif len(last) == last.maxlen and entry[0] < last[0][0]:
+            return
+        else:
+            self._last[key] = deque(sorted([*last, entry], key=lambda e: e[0]), maxlen=self.last_n)
+
+    def team_id(self, team_name: str) -> int:
+        """
+        Índice de un equipo en el índice de enfrentamientos.
+
+        Raises:
+            ValueError: Si el equipo no existe en los datos
+        """
+        if team_name not in self._team_index:
+            raise ValueError(f"Equipo no encontrado en datos históricos: {team_name}")
+        return self._team_index[team_name]
+
+    def _venue(self, home_id: int, away_id: int) -> Dict:
+        c = self._counters
+        return {
+            'matches': int(c['matches'][home_id, away_id]),
+            'home_wins': int(c['home_wins'][home_id, away_id]),
+            'draws': int(c['draws'][home_id, away_id]),
+            'away_wins': int(c['away_wins'][home_id, away_id]),
+            'home_goals': int(c['home_goals'][home_id, away_id]),
+            'away_goals': int(c['away_goals'][home_id, away_id])
+        }
+
+    def lookup(self, home_team: str, away_team: str) -> Dict:
+        """
+        Historial directo entre dos equipos desde el punto de vista del local pedido.
+
+        Returns:
+            Dict con totales (ambas sedes), desglose por sede y últimos partidos
+        """
+        with self._lock:
+            home_id, away_id = self.team_id(home_team), self.team_id(away_team)
+            at_home = self._venue(home_id, away_id)
+            at_away = self._venue(away_id, home_id)
+
+            fixtures = [
+                (d, home_team, away_team, hg, ag) for d, hg, ag in self._last.get((home_id, away_id), ())
+            ] + [
+                (d, away_team, home_team, hg, ag) for d, hg, ag in self._last.get((away_id, home_id), ())
+            ]
+
+        fixtures.sort(key=lambda f: f[0], reverse=True)
+        return {
+            'home_team': home_team,
+            'away_team': away_team,
+            'matches': at_home['matches'] + at_away['matches'],
+            'home_team_wins': at_home['home_wins'] + at_away['away_wins'],
+            'draws': at_home['draws'] + at_away['draws'],
+            'away_team_wins': at_home['away_wins'] + at_away['home_wins'],
+            'home_team_goals': at_home['home_goals'] + at_away['away_goals'],
+            'away_team_goals': at_home['away_goals'] + at_away['home_goals'],
+            'venues': {
+                f"{home_team} local": at_home,
+                f"{away_team} local": at_away
+            },
+            'last_matches': [
+                {
+                    'date': days_to_iso(d),
+                    'home_team': home,
+                    'away_team': away,
+                    'score': f"{hg}-{ag}"
+                }
+                for d, home, away, hg, ag in fixtures[:self.last_n]
+            ]
+        }
+
+    def prompt_context(self, home_team: str, away_team: str) -> str:
+        """Bloque de 'enfrentamientos directos' para _create_prediction_prompt"""
+        h2h = self.lookup(home_team, away_team)
+        if h2h['matches'] == 0:
+            return f"Sin enfrentamientos directos registrados entre {home_team} y {away_team}."
+
+        at_home = h2h['venues'][f"{home_team} local"]
+        lines = [
+            f"Enfrentamientos directos ({h2h['matches']} partidos): "
+            f"{home_team} {h2h['home_team_wins']} victorias, {h2h['draws']} empates, "
+            f"{away_team} {h2h['away_team_wins']} victorias",
+            f"Goles: {home_team} {h2h['home_team_goals']} - {h2h['away_team_goals']} {away_team}",
+            f"Con {home_team} de local: {at_home['home_wins']}V {at_home['draws']}E "
+            f"{at_home['away_wins']}D en {at_home['matches']} partidos",
+            "Últimos partidos: " + "; ".join(
+                f"{m['date']} {m['home_team']} {m['score']} {m['away_team']}" for m in h2h['last_matches']
+            )
+        ]
+        return "\n".join(lines)
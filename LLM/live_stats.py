@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Live Statistics - LLM Premier League
+Actualización incremental de las estadísticas por equipo al llegar un resultado nuevo
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from columnar_cache import ColumnarDataset, iso_to_days
+from stats_engine import (
+    FORM_LETTERS, FORM_WINDOW, RESULT_DRAW, RESULT_LOSS, RESULT_WIN,
+    TeamStatsTable, compute_team_stats, match_arrays
+)
+from time_index import TeamTimeIndex
+
+logger = logging.getLogger(__name__)
+
+# Estadísticas opcionales del partido que se propagan a los índices registrados
+RESULT_EXTRA_COLUMNS = ('HS', 'AS', 'HST', 'AST', 'HC', 'AC', 'HY', 'AY', 'HR', 'AR')
+# Fecha de las posiciones de la forma sin partido o sin fecha conocida: más antiguas que cualquiera
+UNKNOWN_FORM_DAY = np.iinfo(np.int32).min
+
+
+@dataclass
+class MatchResult:
+    """Resultado final de un partido, con los mismos nombres de columna que el CSV"""
+    date: str
+    home_team: str
+    away_team: str
+    home_goals: int
+    away_goals: int
+    extras: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def result(self) -> str:
+        if self.home_goals > self.away_goals:
+            return 'H'
+        if self.home_goals < self.away_goals:
+            return 'A'
+        return 'D'
+
+    @property
+    def date_days(self) -> int:
+        return iso_to_days(self.date)
+
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return self.date, self.home_team, self.away_team
+
+
+def parse_match_result(payload: Dict) -> MatchResult:
+    """
+    Validar una fila de resultado (Date, HomeTeam, AwayTeam, FTHG, FTAG y opcionalmente FTR).
+
+    Raises:
+        ValueError: Si faltan campos o los valores no son coherentes
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("El resultado debe ser un objeto JSON")
+
+    missing = [key for key in ('HomeTeam', 'AwayTeam', 'FTHG', 'FTAG') if payload.get(key) in (None, '')]
+    if missing:
+        raise ValueError(f"Campos requeridos faltantes: {', '.join(missing)}")
+
+    home_team = str(payload['HomeTeam']).strip()
+    away_team = str(payload['AwayTeam']).strip()
+    if home_team == away_team:
+        raise ValueError("HomeTeam y AwayTeam deben ser distintos")
+
+    try:
+        home_goals = int(payload['FTHG'])
+        away_goals = int(payload['FTAG'])
+        match_date = date.fromisoformat(str(payload.get('Date') or date.today().isoformat())).isoformat()
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Valores inválidos en el resultado: {e}")
+    if home_goals < 0 or away_goals < 0:
+        raise ValueError("Los goles no pueden ser negativos")
+
+    extras = {}
+    for column in RESULT_EXTRA_COLUMNS:
+        if payload.get(column) not in (None, ''):
+            try:
+                extras[column] = float(payload[column])
+            except (TypeError, ValueError):
+                raise ValueError(f"Valor inválido en {column}: {payload[column]!r}")
+
+    result = MatchResult(match_date, home_team, away_team, home_goals, away_goals, extras)
+    if payload.get('FTR') and payload['FTR'] != result.result:
+        raise ValueError(f"FTR={payload['FTR']} no coincide con el marcador {home_goals}-{away_goals}")
+    return result
+
+
+def recent_form_days(dataset: ColumnarDataset, form_window: int = FORM_WINDOW) -> np.ndarray:
+    """Fechas (días) de los partidos de recent_form, en las mismas posiciones que compute_team_stats"""
+    n_teams = len(dataset.team_names)
+    m = match_arrays(dataset)
+    teams = np.empty(2 * len(m['home']), dtype=m['home'].dtype)
+    teams[0::2], teams[1::2] = m['home'], m['away']
+    sorted_days = np.repeat(m['date'], 2)[np.argsort(teams, kind='stable')]
+    played = np.bincount(teams, minlength=n_teams)[:n_teams]
+    ends = np.cumsum(played)
+
+    days = np.full((n_teams, form_window), UNKNOWN_FORM_DAY, dtype=np.int32)
+    for k in range(form_window):
+        has_match = played > k
+        days[has_match, form_window - 1 - k] = sorted_days[ends[has_match] - 1 - k]
+    return days
+
+
+class LiveStatsStore:
+    """
+    Estadísticas por equipo con actualización O(1) por resultado.
+
+    Mantiene los agregados acumulados de TeamStatsTable y la forma reciente como
+    ring buffer por equipo, con la fecha de cada partido para colocar en orden
+    los resultados que llegan tarde. Escrituras y lecturas comparten un lock de sección
+    crítica corta, así ningún lector ve un par de equipos a medio actualizar.
+    Otros índices (enfrentamientos directos, series temporales) se registran
+    con register_index y se actualizan dentro de la misma sección crítica.
+    """
+
+    _COUNTERS = ('matches_played', 'home_played', 'away_played', 'wins', 'draws', 'losses',
+                 'home_wins', 'away_wins', 'goals_for', 'goals_against')
+
+    def __init__(self, table: TeamStatsTable, source_version: str = '',
+                 known_matches: Optional[set] = None, form_days: Optional[np.ndarray] = None):
+        self._lock = threading.RLock()
+        self._team_names: List[str] = list(table.team_names)
+        self._team_index = {name: i for i, name in enumerate(self._team_names)}
+        self._capacity = max(len(self._team_names), 1)
+        self._counters = {name: np.array(getattr(table, name), dtype=np.int64) for name in self._COUNTERS}
+
+        # Ring buffer: recent_form ya viene del más antiguo al más reciente,
+        # así que la próxima escritura va a la posición 0
+        self._form_window = table.recent_form.shape[1] if table.recent_form.ndim == 2 else FORM_WINDOW
+        self._form = np.array(table.recent_form, dtype=np.int8).reshape(-1, self._form_window)
+        self._form_head = np.zeros(len(self._team_names), dtype=np.int16)
+        # Sin fechas (tabla sin dataset) la forma inicial cuenta como anterior a todo lo que llegue
+        self._form_days = (np.array(form_days, dtype=np.int32).reshape(self._form.shape) if form_days is not None
+                           else np.full(self._form.shape, UNKNOWN_FORM_DAY, dtype=np.int32))
+
+        self._known_matches = known_matches if known_matches is not None else set()
+        self._indexes = []
+        self.time_index: Optional[TeamTimeIndex] = None
+        self.source_version = source_version
+        self.version = 0
+        self._team_versions: Dict[str, int] = {}
+
+    @classmethod
+    def from_dataset(cls, dataset: ColumnarDataset) -> 'LiveStatsStore':
+        """Construir el store a partir del dataset histórico"""
+        known = set(zip(dataset.decode('Date'), dataset.decode('HomeTeam'), dataset.decode('AwayTeam')))
+        store = cls(compute_team_stats(dataset), source_version=dataset.source_sha256[:12], known_matches=known,
+                    form_days=recent_form_days(dataset))
+        store.time_index = TeamTimeIndex.from_dataset(dataset)
+        store.register_index(store.time_index)
+        return store
+
+    @property
+    def data_version(self) -> str:
+        """Versión de los datos: hash del CSV + número de resultados ingeridos"""
+        return f"{self.source_version}:{self.version}"
+
+    def teams_version(self, *team_names: str) -> str:
+        """
+        Versión de los datos de unos equipos: hash del CSV + resultados ingeridos de cada uno.
+
+        Para las claves del cache de respuestas: un resultado solo invalida las
+        respuestas de sus dos equipos, no el cache entero como data_version.
+        """
+        with self._lock:
+            counts = '.'.join(str(self._team_versions.get(name, 0)) for name in team_names)
+        return f"{self.source_version}:{counts}"
+
+    @property
+    def team_names(self) -> List[str]:
+        with self._lock:
+            return list(self._team_names)
+
+    def register_index(self, index):
+        """Registrar un índice con método apply_result(match, home_id, away_id)"""
+        with self._lock:
+            self._indexes.append(index)
+
+    def _ensure_team(self, team_name: str) -> int:
+        if team_name in self._team_index:
+            return self._team_index[team_name]
+
+        team_id = len(self._team_names)
+        if team_id >= self._capacity:
+            self._capacity *= 2
+            for name, values in self._counters.items():
+                self._counters[name] = np.concatenate([values, np.zeros(self._capacity - len(values), np.int64)])
+            self._form = np.concatenate([
+                self._form, np.full((self._capacity - len(self._form), self._form_window), -1, np.int8)
+            ])
+            self._form_days = np.concatenate([
+                self._form_days,
+                np.full((self._capacity - len(self._form_days), self._form_window), UNKNOWN_FORM_DAY, np.int32)
+            ])
+            self._form_head = np.concatenate([
+                self._form_head, np.zeros(self._capacity - len(self._form_head), np.int16)
+            ])
+        self._team_names.append(team_name)
+        self._team_index[team_name] = team_id
+        logger.info(f"🆕 Equipo nuevo en estadísticas en vivo: {team_name}")
+        return team_id
+
+    def _push_form(self, team_id: int, code: int, day: int):
+        head = self._form_head[team_id]
+        # head - 1 es la posición del partido más reciente (-1: la última columna)
+        if day >= self._form_days[team_id, head - 1]:
+            self._form[team_id, head] = code
+            self._form_days[team_id, head] = day
+            self._form_head[team_id] = (head + 1) % self._form_window
+            return
+
+        # Resultado atrasado: insertarlo por fecha y descartar el más antiguo de la ventana
+        codes = self._form_codes(team_id)
+        days = np.roll(self._form_days[team_id], -int(head))
+        pos = int(np.searchsorted(days, day, side='right'))
+        if pos == 0:
+            return  # Anterior a toda la ventana: no forma parte de los últimos partidos
+        self._form[team_id] = np.insert(codes, pos, code)[1:]
+        self._form_days[team_id] = np.insert(days, pos, day)[1:]
+        self._form_head[team_id] = 0
+
+    def ingest_result(self, result: MatchResult) -> bool:
+        """
+        Aplicar un resultado a los agregados de ambos equipos.
+
+        Returns:
+            bool: False si el partido ya estaba registrado (ingesta idempotente)
+        """
+        with self._lock:
+            if result.key in self._known_matches:
+                return False
+
+            home = self._ensure_team(result.home_team)
+            away = self._ensure_team(result.away_team)
+            c = self._counters
+            hg, ag = result.home_goals, result.away_goals
+            home_code = {'H': RESULT_WIN, 'D': RESULT_DRAW, 'A': RESULT_LOSS}[result.result]
+
+            c['matches_played'][[home, away]] += 1
+            c['home_played'][home] += 1
+            c['away_played'][away] += 1
+            c['goals_for'][home] += hg
+            c['goals_against'][home] += ag
+            c['goals_for'][away] += ag
+            c['goals_against'][away] += hg
+            if home_code == RESULT_WIN:
+                c['wins'][home] += 1
+                c['home_wins'][home] += 1
+                c['losses'][away] += 1
+            elif home_code == RESULT_LOSS:
+                c['wins'][away] += 1
+                c['away_wins'][away] += 1
+                c['losses'][home] += 1
+            else:
+                c['draws'][[home, away]] += 1
+
+            self._push_form(home, home_code, result.date_days)
+            self._push_form(away, RESULT_WIN - home_code, result.date_days)
+
+            for index in self._indexes:
+                index.apply_result(result, home, away)
+
+            self._known_matches.add(result.key)
+            self.version += 1
+            for name in (result.home_team, result.away_team):
+                self._team_versions[name] = self._team_versions.get(name, 0) + 1
+            return True
+
+    def _form_codes(self, team_id: int) -> np.ndarray:
+        return np.roll(self._form[team_id], -int(self._form_head[team_id]))
+
+    def snapshot(self) -> TeamStatsTable:
+        """Copia consistente de todas las estadísticas como TeamStatsTable"""
+        with self._lock:
+            n = len(self._team_names)
+            form = np.stack([self._form_codes(i) for i in range(n)]) if n else self._form[:0]
+            return TeamStatsTable(
+                team_names=list(self._team_names),
+                recent_form=form,
+                **{name: values[:n].copy() for name, values in self._counters.items()}
+            )
+
+    def team_stats(self, team_name: str) -> Dict:
+        """
+        Estadísticas de un equipo en el formato de team_stats.
+
+        Raises:
+            ValueError: Si el equipo no existe en los datos
+        """
+        with self._lock:
+            return self._team_dict(team_name)
+
+    def pair_stats(self, home_team: str, away_team: str) -> Tuple[Dict, Dict]:
+        """Estadísticas de ambos equipos leídas en la misma sección crítica"""
+        with self._lock:
+            return self._team_dict(home_team), self._team_dict(away_team)
+
+    def window_stats(self, team_name: str, as_of: Optional[str] = None,
+                     last_n: Optional[int] = None, days: Optional[int] = None) -> Dict:
+        """
+        Estadísticas de un equipo antes de as_of, en los últimos N partidos o K días.
+
+        Raises:
+            ValueError: Si el equipo no existe o no hay índice temporal
+        """
+        if self.time_index is None:
+            raise ValueError("Índice temporal no disponible")
+        return self.time_index.window(team_name, as_of=as_of, last_n=last_n, days=days)
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """team_stats completo, consistente con una única versión de los datos"""
+        return self.snapshot().to_dict()
+
+    def _team_dict(self, team_name: str) -> Dict:
+        if team_name not in self._team_index:
+            raise ValueError(f"Equipo no encontrado en datos históricos: {team_name}")
+        i = self._team_index[team_name]
+        c = self._counters
+        played = int(c['matches_played'][i])
+        home_played = int(c['home_played'][i])
+        away_played = int(c['away_played'][i])
+        return {
+            'matches_played': played,
+            'wins': int(c['wins'][i]),
+            'draws': int(c['draws'][i]),
+            'losses': int(c['losses'][i]),
+            'goals_scored': int(c['goals_for'][i]),
+            'goals_conceded': int(c['goals_against'][i]),
+            'goals_per_game': float(c['goals_for'][i] / played) if played else 0.0,
+            'goals_conceded_per_game': float(c['goals_against'][i] / played) if played else 0.0,
+            'win_rate': float(c['wins'][i] / played) if played else 0.0,
+            'home_win_rate': float(c['home_wins'][i] / home_played) if home_played else 0.0,
+            'away_win_rate': float(c['away_wins'][i] / away_played) if away_played else 0.0,
+            'recent_form': ''.join(FORM_LETTERS[code] for code in self._form_codes(i) if code >= 0)
+        }
+
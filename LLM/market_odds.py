@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Market Odds - LLM Premier League
+Probabilidades implícitas de las cuotas de las casas de apuestas (sin margen) y ratings de mercado por equipo
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from columnar_cache import ColumnarDataset, days_to_iso, iso_to_days
+
+logger = logging.getLogger(__name__)
+
+BOOKMAKERS = ('B365', 'BW', 'IW', 'LB', 'PS', 'SJ', 'VC', 'WH')   # Cuotas 1X2: <casa>H, <casa>D, <casa>A
+OVER_UNDER_ODDS = (('B365>2.5', 'B365<2.5'), ('BbAv>2.5', 'BbAv<2.5'))
+METHODS = ('proportional', 'shin', 'power')
+DEFAULT_METHOD = 'shin'
+METHOD_PREFIXES = {'proportional': 'MktProp', 'shin': 'MktShin', 'power': 'MktPow'}
+OVER_25_COLUMN = 'MktOver25'
+MARGIN_COLUMN = 'MktMargin'
+SEARCH_TOLERANCE = 1e-12           # Bisección vectorizada: anchura final del intervalo
+SEARCH_ITERATIONS = 60
+DEFAULT_TIME_DECAY = 0.003         # Por día: el mercado refleja el nivel actual, más reciente que los goles
+DEFAULT_BLEND_WEIGHT = 0.5         # Peso del mercado frente al modelo local (validado en la temporada 2023-24)
+RATING_RIDGE = 1.0                 # Pseudo-partidos que acercan a 0 el rating de equipos con pocos datos
+MIN_DRAW, MAX_DRAW = 0.05, 0.40
+RECENT_MATCHES = 5
+ACTIVE_DAYS = 365                  # Equipos con partidos en el último año: entran en el ranking
+
+
+def market_column_names(method: str) -> List[str]:
+    """Columnas precalculadas (local, empate, visitante) de un método"""
+    if method not in METHOD_PREFIXES:
+        raise ValueError(f"Método desconocido: {method} (opciones: {', '.join(METHODS)})")
+    return [f"{METHOD_PREFIXES[method]}{outcome}" for outcome in 'HDA']
+
+
+def _proportional(inverse: np.ndarray) -> np.ndarray:
+    return inverse / inverse.sum(axis=1, keepdims=True)
+
+
+def _bisect(function, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+    """Raíz de una función decreciente en [low, high] para todas las filas a la vez"""
+    for _ in range(SEARCH_ITERATIONS):
+        middle = (low + high) / 2
+        positive = function(middle) > 0
+        low = np.where(positive, middle, low)
+        high = np.where(positive, high, middle)
+        if float((high - low).max()) < SEARCH_TOLERANCE:
+            break
+    return (low + high) / 2
+
+
+def _shin(inverse: np.ndarray) -> np.ndarray:
+    """
+    Método de Shin (1993): el margen compensa a los apostantes informados, con
+    proporción z; se busca z tal que las probabilidades sumen 1.
+    """
+    booksum = inverse.sum(axis=1, keepdims=True)
+
+    def probabilities(z):
+        return (np.sqrt(z ** 2 + 4 * (1 - z) * inverse ** 2 / booksum) - z) / (2 * (1 - z))
+
+    z = _bisect(lambda z: probabilities(z).sum(axis=1, keepdims=True) - 1,
+                np.zeros_like(booksum), np.full_like(booksum, 0.5))
+    return _proportional(probabilities(z))
+
+
+def _power(inverse: np.ndarray) -> np.ndarray:
+    """Método potencial: p_i = (1/cuota_i)^k con k tal que las probabilidades sumen 1"""
+    log_inverse = np.log(inverse)
+    k = _bisect(lambda k: np.exp(k * log_inverse).sum(axis=1, keepdims=True) - 1,
+                np.ones((len(inverse), 1)), np.full((len(inverse), 1), 10.0))
+    return _proportional(np.exp(k * log_inverse))
+
+
+def implied_probabilities(odds: np.ndarray, method: str = DEFAULT_METHOD) -> np.ndarray:
+    """
+    Quitar el margen de la casa a cuotas decimales, para todas las filas en una pasada.
+
+    Args:
+        odds: (partidos, resultados) cuotas decimales; filas con NaN o cuotas <= 1 quedan en NaN
+        method: 'proportional' (reparto proporcional del margen), 'shin' o 'power'
+
+    Returns:
+        np.ndarray: Probabilidades de cada resultado, cada fila suma 1
+
+    Raises:
+        ValueError: Si el método no existe
+    """
+    if method not in METHODS:
+        raise ValueError(f"Método desconocido: {method} (opciones: {', '.join(METHODS)})")
+    odds = np.asarray(odds, dtype=np.float64)
+    result = np.full(odds.shape, np.nan)
+    valid = np.all(np.isfinite(odds) & (odds > 1), axis=1)
+    if not valid.any():
+        return result
+
+    inverse = 1 / odds[valid]
+    # Sin margen (casas de intercambio o cuotas de arbitraje) solo tiene sentido el reparto proporcional
+    overround = inverse.sum(axis=1) > 1
+    probabilities = _proportional(inverse)
+    if method != 'proportional' and overround.any():
+        probabilities[overround] = (_shin if method == 'shin' else _power)(inverse[overround])
+    result[valid] = probabilities
+    return result
+
+
+def _odds_matrix(dataset: ColumnarDataset, columns: Sequence[str]) -> np.ndarray:
+    return np.column_stack([np.asarray(dataset[name], dtype=np.float64) for name in columns])
+
+
+def consensus_probabilities(dataset: ColumnarDataset, method: str = DEFAULT_METHOD) -> np.ndarray:
+    """
+    Probabilidades 1X2 de consenso: media de las casas disponibles en cada partido, cada una sin margen.
+
+    Returns:
+        np.ndarray: (partidos, 3); NaN en los partidos sin ninguna cuota válida
+    """
+    books = [book for book in BOOKMAKERS if all(f"{book}{o}" in dataset for o in 'HDA')]
+    n_rows = len(dataset)
+    if not books:
+        return np.full((n_rows, 3), np.nan)
+    # Todas las casas en una sola llamada: (partidos · casas, 3)
+    stacked = np.concatenate([_odds_matrix(dataset, [f"{book}{o}" for o in 'HDA']) for book in books])
+    per_book = implied_probabilities(stacked, method).reshape(len(books), n_rows, 3)
+    counts = np.isfinite(per_book[..., 0]).sum(axis=0)
+    consensus = np.full((n_rows, 3), np.nan)
+    available = counts > 0
+    consensus[available] = np.nansum(per_book[:, available], axis=0) / counts[available, None]
+    return consensus
+
+
+def market_columns(dataset: ColumnarDataset) -> Dict[str, np.ndarray]:
+    """
+    Columnas precalculadas del mercado para el cache columnar.
+
+    MktPropH/D/A, MktShinH/D/A, MktPowH/D/A: consenso 1X2 sin margen por método;
+    MktOver25: probabilidad de más de 2.5 goles (Shin); MktMargin: margen medio de las casas 1X2.
+    """
+    columns: Dict[str, np.ndarray] = {}
+    for method in METHODS:
+        consensus = consensus_probabilities(dataset, method)
+        for name, values in zip(market_column_names(method), consensus.T):
+            columns[name] = np.ascontiguousarray(values)
+
+    over = np.full(len(dataset), np.nan)
+    for pair in OVER_UNDER_ODDS:
+        if all(name in dataset for name in pair):
+            probabilities = implied_probabilities(_odds_matrix(dataset, pair), 'shin')[:, 0]
+            over = np.where(np.isnan(over), probabilities, over)
+    columns[OVER_25_COLUMN] = over
+
+    overround = np.full((len(BOOKMAKERS), len(dataset)), np.nan)
+    for k, book in enumerate(BOOKMAKERS):
+        if all(f"{book}{o}" in dataset for o in 'HDA'):
+            odds = _odds_matrix(dataset, [f"{book}{o}" for o in 'HDA'])
+            valid = np.all(np.isfinite(odds) & (odds > 1), axis=1)
+            overround[k, valid] = (1 / odds[valid]).sum(axis=1) - 1
+    counts = np.isfinite(overround).sum(axis=0)
+    columns[MARGIN_COLUMN] = np.where(counts > 0, np.nansum(overround, axis=0) / np.maximum(counts, 1), np.nan)
+    return columns
+
+
+def add_market_columns(dataset: ColumnarDataset) -> ColumnarDataset:
+    """Dataset con las columnas de market_columns añadidas (se guardan en el cache como numéricas)"""
+    columns = dict(dataset.columns)
+    kinds = dict(dataset.kinds)
+    for name, values in market_columns(dataset).items():
+        columns[name] = values
+        kinds[name] = 'numeric'
+    return ColumnarDataset(columns, kinds, dataset.dictionaries, dataset.n_rows, dataset.source_sha256)
+
+
+def market_matrix(dataset: ColumnarDataset, method: str = DEFAULT_METHOD) -> np.ndarray:
+    """Probabilidades 1X2 de mercado: columnas precalculadas si existen, si no se calculan al vuelo"""
+    names = market_column_names(method)
+    if all(name in dataset for name in names):
+        return _odds_matrix(dataset, names)
+    return consensus_probabilities(dataset, method)
+
+
+@dataclass
+class MarketModel:
+    """
+    Ratings de mercado: log(p_local / p_visitante) ≈ ventaja_local + rating[local] - rating[visitante]
+    ajustado por mínimos cuadrados ponderados sobre las probabilidades sin margen.
+
+    El empate se modela como función de la diferencia esperada d,
+    p_empate = c0 + c1·d², y así un partido sin cuotas (los que se predicen)
+    recibe unas probabilidades 1X2 coherentes con lo que pagaba el mercado.
+    Las tablas de todos los pares se precalculan tras el ajuste.
+    """
+    team_names: List[str]
+    rating: np.ndarray
+    home_advantage: float
+    draw_coefficients: np.ndarray
+    method: str
+    time_decay: float
+    blend_weight: float
+    matches: int
+    fit_seconds: float
+    team_matches: np.ndarray = field(repr=False)   # Partidos con cuotas de cada equipo
+    active: np.ndarray = field(repr=False)         # Equipos con partidos en los ACTIVE_DAYS finales
+    probabilities: np.ndarray = field(repr=False)  # (n, n, 3): local, empate, visitante
+    recent: Dict[str, List[Dict]] = field(repr=False, default_factory=dict)
+
+    def __post_init__(self):
+        self._team_index = {name: i for i, name in enumerate(self.team_names)}
+
+    def __contains__(self, team_name: str) -> bool:
+        return team_name in self._team_index and self.team_matches[self._team_index[team_name]] > 0
+
+    def team_id(self, team_name: str) -> int:
+        """
+        Raises:
+            ValueError: Si el equipo no tenía cuotas en los datos del ajuste
+        """
+        if team_name not in self:
+            raise ValueError(f"Equipo sin cuotas de mercado: {team_name}")
+        return self._team_index[team_name]
+
+    def lookup(self, home_team: str, away_team: str) -> Dict:
+        """Probabilidades de mercado de un partido (lectura de la tabla precalculada)"""
+        p_home, p_draw, p_away = (float(p) for p in self.probabilities[self.team_id(home_team),
+                                                                          self.team_id(away_team)])
+        return {'home_team': home_team, 'away_team': away_team, 'win_probability_home': p_home,
+                'win_probability_draw': p_draw, 'win_probability_away': p_away}
+
+    def team_summary(self, team_name: str) -> Dict:
+        """Bloque market de /api/analyze: rating, posición y probabilidades de sus últimos partidos"""
+        i = self.team_id(team_name)
+        return {
+            'method': self.method,
+            'rating': round(float(self.rating[i]), 3),
+            'rank': int((self.rating[self.active] > self.rating[i]).sum()) + 1 if self.active[i] else None,
+            'active_teams': int(self.active.sum()),
+            'recent_matches': self.recent.get(team_name, [])
+        }
+
+    def summary(self) -> Dict:
+        """Parámetros del ajuste, para /api/stats"""
+        ranking = [i for i in np.argsort(-self.rating) if self.active[i]]
+        return {
+            'method': self.method,
+            'matches': self.matches,
+            'home_advantage': round(self.home_advantage, 3),
+            'blend_weight': self.blend_weight,
+            'time_decay': self.time_decay,
+            'fit_seconds': round(self.fit_seconds, 4),
+            'strongest_teams': [self.team_names[i] for i in ranking[:5]]
+        }
+
+
+def _draw_probability(difference: np.ndarray, coefficients: np.ndarray) -> np.ndarray:
+    return np.clip(coefficients[0] + coefficients[1] * difference ** 2, MIN_DRAW, MAX_DRAW)
+
+
+def outcome_probabilities(difference: np.ndarray, coefficients: np.ndarray) -> np.ndarray:
+    """(local, empate, visitante) para una diferencia log(p_local / p_visitante) de cualquier shape"""
+    draw = _draw_probability(difference, coefficients)
+    home = (1 - draw) / (1 + np.exp(-difference))
+    return np.stack([home, draw, 1 - draw - home], axis=-1)
+
+
+def _recent_matches(dataset: ColumnarDataset, rows: np.ndarray, probabilities: np.ndarray) -> Dict[str, List[Dict]]:
+    """Últimos RECENT_MATCHES partidos con cuotas de cada equipo, del más reciente al más antiguo"""
+    names = dataset.team_names
+    home, away = np.asarray(dataset['HomeTeam']), np.asarray(dataset['AwayTeam'])
+    dates = np.asarray(dataset['Date'])
+    goals = (np.asarray(dataset['FTHG']), np.asarray(dataset['FTAG'])) if 'FTHG' in dataset else None
+    recent: Dict[str, List[Dict]] = {}
+    for row in rows[np.argsort(-dates[rows], kind='stable')]:
+        for team, opponent, venue in ((home[row], away[row], 'home'), (away[row], home[row], 'away')):
+            matches = recent.setdefault(names[int(team)], [])
+            if len(matches) >= RECENT_MATCHES:
+                continue
+            p_home, p_draw, p_away = (round(float(p), 3) for p in probabilities[row])
+            match = {'date': days_to_iso(int(dates[row])), 'opponent': names[int(opponent)], 'venue': venue,
+                     'win_probability': p_home if venue == 'home' else p_away, 'draw_probability': p_draw,
+                     'loss_probability': p_away if venue == 'home' else p_home}
+            if goals is not None:
+                scored, conceded = int(goals[0][row]), int(goals[1][row])
+                match['score'] = f"{scored}-{conceded}" if venue == 'home' else f"{conceded}-{scored}"
+            matches.append(match)
+    return recent
+
+
+def fit_market_model(dataset: ColumnarDataset, method: str = DEFAULT_METHOD,
+                     time_decay: float = DEFAULT_TIME_DECAY, blend_weight: float = DEFAULT_BLEND_WEIGHT,
+                     as_of: Optional[str] = None) -> MarketModel:
+    """
+    Ajustar los ratings de mercado y precalcular las probabilidades de todos los pares.
+
+    Args:
+        dataset: Dataset columnar con cuotas (o con las columnas Mkt* precalculadas)
+        method: Método para quitar el margen ('proportional', 'shin' o 'power')
+        time_decay: ξ por día; cada partido pesa exp(-ξ · días hasta as_of)
+        blend_weight: Peso del mercado al mezclarlo con las predicciones locales (0-1)
+        as_of: Fecha ISO de referencia; solo se usan partidos anteriores (por defecto, todos)
+
+    Raises:
+        ValueError: Si el método no existe o no hay partidos con cuotas
+    """
+    start = time.perf_counter()
+    probabilities = market_matrix(dataset, method)
+    dates = np.asarray(dataset['Date'], dtype=np.int64)
+    valid = np.all(np.isfinite(probabilities), axis=1)
+    if as_of is not None:
+        valid &= dates < iso_to_days(as_of)
+    if not valid.any():
+        raise ValueError("No hay partidos con cuotas para ajustar el modelo de mercado")
+
+    rows = np.flatnonzero(valid)
+    n_teams = len(dataset.team_names)
+    home = np.asarray(dataset['HomeTeam'])[rows].astype(np.int64)
+    away = np.asarray(dataset['AwayTeam'])[rows].astype(np.int64)
+    p = probabilities[rows]
+    target = np.log(p[:, 0] / p[:, 2])
+    reference = iso_to_days(as_of) if as_of is not None else int(dates[rows].max())
+    weights = np.exp(-time_decay * (reference - dates[rows]))
+
+    # Mínimos cuadrados ponderados en forma normal: [ventaja_local, ratings...] con ridge en los ratings
+    design = np.zeros((len(rows), n_teams + 1))
+    design[:, 0] = 1
+    design[np.arange(len(rows)), home + 1] += 1
+    design[np.arange(len(rows)), away + 1] -= 1
+    normal = design.T @ (design * weights[:, None])
+    normal[1:, 1:] += RATING_RIDGE * np.eye(n_teams) * weights.max()
+    solution = np.linalg.solve(normal, design.T @ (weights * target))
+    home_advantage, rating = float(solution[0]), solution[1:]
+    rating = rating - rating.mean()
+
+    difference = home_advantage + rating[home] - rating[away]
+    basis = np.column_stack([np.ones(len(rows)), difference ** 2])
+    coefficients = np.linalg.lstsq(basis * np.sqrt(weights)[:, None], p[:, 1] * np.sqrt(weights), rcond=None)[0]
+
+    team_matches = np.bincount(np.concatenate([home, away]), minlength=n_teams)
+    last_match = np.full(n_teams, np.iinfo(np.int64).min)
+    np.maximum.at(last_match, home, dates[rows])
+    np.maximum.at(last_match, away, dates[rows])
+    table = outcome_probabilities(home_advantage + rating[:, None] - rating[None, :], coefficients)
+    model = MarketModel(
+        team_names=list(dataset.team_names), rating=rating, home_advantage=home_advantage,
+        draw_coefficients=coefficients, method=method, time_decay=time_decay, blend_weight=blend_weight,
+        matches=len(rows), fit_seconds=time.perf_counter() - start, team_matches=team_matches,
+        active=last_match > reference - ACTIVE_DAYS, probabilities=table,
+        recent=_recent_matches(dataset, rows, probabilities)
+    )
+    logger.info(f"💹 Modelo de mercado ajustado ({method}): {model.matches} partidos en "
+                f"{model.fit_seconds * 1000:.0f} ms")
+    return model
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Prefork Server - LLM Premier League
+Modo producción multiproceso: N workers que comparten el dataset cargado y se recargan sin cortar peticiones
+"""
+
+import argparse
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = int(os.getenv('PREFORK_WORKERS', os.cpu_count() or 1))
+LISTEN_BACKLOG = 2048
+RELOAD_POLL_SECONDS = 2.0
+KEEPALIVE_TIMEOUT = 5.0
+WORKER_SHUTDOWN_TIMEOUT = 30.0
+
+
+class _WorkerRequestHandler(WSGIRequestHandler):
+    """Keep-alive con límite de inactividad; al recargar se cierra cada conexión tras su respuesta"""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+
+    def end_headers(self):
+        if getattr(self.server, 'draining', False):
+            self.send_header('Connection', 'close')  # El cliente abrirá la siguiente contra un worker nuevo
+        super().end_headers()
+
+
+def load_app_target(target: str) -> Callable[[], Callable]:
+    """
+    Convertir 'modulo:atributo' en una función que (re)construye la app WSGI.
+
+    Si el atributo es una factoría (create_app) se llama en cada carga; si es
+    la app ya creada (app = Flask(__name__)) el módulo se recarga con importlib.
+
+    Raises:
+        ValueError: Si el target no tiene el formato 'modulo:atributo'
+    """
+    module_name, sep, attr = target.partition(':')
+    if not sep or not module_name or not attr:
+        raise ValueError(f"Target inválido (se esperaba 'modulo:atributo'): {target}")
+
+    def loader():
+        module = sys.modules.get(module_name)
+        module = importlib.reload(module) if module is not None else importlib.import_module(module_name)
+        app = getattr(module, attr)
+        return app if hasattr(app, 'wsgi_app') else app()
+
+    return loader
+
+
+def files_signature(paths: Sequence[str]) -> Tuple:
+    """(mtime, tamaño) de cada archivo vigilado; None si no existe"""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class PreforkServer:
+    """
+    Servidor prefork: el maestro carga la app y crea N workers con fork().
+
+    El maestro construye la app (dataset columnar mapeado en memoria, tablas de
+    estadísticas, índices) una sola vez y abre el socket de escucha. Cada
+    worker hereda ambos por fork: el dataset se comparte vía page cache del
+    mmap y las tablas numpy por copy-on-write (gc.freeze evita que el GC toque
+    las páginas heredadas), así que ningún worker vuelve a parsear datos.
+
+    Recarga (SIGHUP o cambio en los archivos vigilados): el maestro construye
+    la app nueva, arranca una generación nueva de workers sobre el mismo
+    socket y solo entonces pide a los antiguos que terminen. Los antiguos dejan
+    de aceptar conexiones, acaban las peticiones en curso y salen; las
+    conexiones que llegan mientras tanto esperan en el backlog del socket, así
+    que no se pierde ninguna petición. Si la app nueva falla al cargar, siguen
+    sirviendo los workers actuales.
+    """
+
+    def __init__(self, app_loader: Callable[[], Callable], host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 workers: int = DEFAULT_WORKERS, watch_paths: Sequence[str] = (),
+                 reload_interval: float = RELOAD_POLL_SECONDS):
+        if not hasattr(os, 'fork'):
+            raise RuntimeError("El modo prefork necesita os.fork (Linux/macOS)")
+        self.app_loader = app_loader
+        self.host = host
+        self.port = port
+        self.workers = max(int(workers), 1)
+        self.watch_paths = list(watch_paths)
+        self.reload_interval = reload_interval
+        self.generation = 0
+        self.reloads = 0
+        self._app = None
+        self._socket: Optional[socket.socket] = None
+        self._children: Dict[int, int] = {}  # pid -> generación
+        self._reload_requested = False
+        self._stopping = False
+
+    def bind(self) -> int:
+        """Abrir el socket de escucha compartido; devuelve el puerto (útil con port=0)"""
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(LISTEN_BACKLOG)
+        sock.set_inheritable(True)
+        self._socket = sock
+        self.port = sock.getsockname()[1]
+        return self.port
+
+    def _load_app(self):
+        gc.unfreeze()
+        app = self.app_loader()
+        self._app = app
+        gc.collect()
+        # Los objetos cargados pasan a la generación permanente: el GC de los
+        # workers no los recorre y sus páginas siguen compartidas
+        gc.freeze()
+
+    def _run_worker(self, generation: int):
+        """Cuerpo del proceso hijo: servir hasta SIGTERM y terminar las peticiones en curso"""
+        server = make_server(self.host, self.port, self._app, threaded=True,
+                             request_handler=_WorkerRequestHandler, fd=self._socket.fileno())
+        server.daemon_threads = False  # server_close espera a las peticiones en curso
+        server.draining = False
+
+        def drain(signum, frame):
+            server.draining = True
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, drain)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        logger.info(f"👷 Worker {os.getpid()} (generación {generation}) sirviendo en el puerto {self.port}")
+        server.serve_forever(poll_interval=0.2)
+        server.server_close()
+
+    def _spawn(self, generation: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(generation)
+            except BaseException:
+                logger.exception("❌ Worker terminado por error")
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self._children[pid] = generation
+        return pid
+
+    def _spawn_generation(self):
+        for _ in range(self.workers):
+            self._spawn(self.generation)
+
+    def _signal_children(self, pids: List[int], signum: int):
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self):
+        """Recoger workers terminados y reponer los de la generación actual"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self._children.pop(pid, None)
+            if generation == self.generation and not self._stopping:
+                logger.warning(f"⚠️ Worker {pid} terminó inesperadamente (estado {status}), reponiéndolo")
+                self._spawn(self.generation)
+
+    def reload(self) -> bool:
+        """
+        Recargar la app y sustituir los workers sin cortar peticiones.
+
+        Returns:
+            bool: False si la app nueva no se pudo cargar (siguen los workers actuales)
+        """
+        try:
+            self._load_app()
+        except Exception as e:
+            logger.error(f"❌ Recarga cancelada, la app nueva no carga: {e}")
+            return False
+
+        old = [pid for pid, generation in self._children.items() if generation == self.generation]
+        self.generation += 1
+        self.reloads += 1
+        self._spawn_generation()
+        self._signal_children(old, signal.SIGTERM)
+        logger.info(f"🔄 Recarga completada: generación {self.generation} con {self.workers} workers")
+        return True
+
+    def _request_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def stop(self, timeout: float = WORKER_SHUTDOWN_TIMEOUT):
+        """Parar todos los workers esperando a las peticiones en curso"""
+        self._stopping = True
+        self._signal_children(list(self._children), signal.SIGTERM)
+        deadline = time.monotonic() + timeout
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        self._signal_children(list(self._children), signal.SIGKILL)
+        self._reap()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def serve_forever(self):
+        """Cargar la app, arrancar los workers y supervisarlos hasta SIGTERM/SIGINT"""
+        if self._socket is None:
+            self.bind()
+        self._load_app()
+        signal.signal(signal.SIGHUP, self._request_reload)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        self._spawn_generation()
+        logger.info(f"🚀 Prefork: {self.workers} workers en http://{self.host}:{self.port} (maestro {os.getpid()})")
+
+        signature = files_signature(self.watch_paths)
+        pending_signature = None
+        next_poll = time.monotonic() + self.reload_interval
+        try:
+            while not self._stopping:
+                time.sleep(0.1)
+                self._reap()
+                if self.watch_paths and time.monotonic() >= next_poll:
+                    next_poll = time.monotonic() + self.reload_interval
+                    current = files_signature(self.watch_paths)
+                    # Recargar cuando el cambio se mantiene dos sondeos (escritura terminada)
+                    if current != signature and current == pending_signature:
+                        signature = current
+                        self._reload_requested = True
+                    pending_signature = current if current != signature else None
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self.reload()
+        finally:
+            self.stop()
+            logger.info("👋 Prefork detenido")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor prefork multiproceso de la API')
+    parser.add_argument('target', nargs='?', default='api_server_optimized:app',
+                        help="App WSGI como 'modulo:atributo' (app o factoría create_app)")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', DEFAULT_PORT)))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='Procesos worker (por defecto uno por núcleo o PREFORK_WORKERS)')
+    parser.add_argument('--watch', action='append', default=None,
+                        help='Archivo cuyo cambio recarga los workers (por defecto el CSV procesado)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(process)d %(levelname)s %(message)s')
+    if args.watch is None:
+        from columnar_cache import DEFAULT_CSV_PATH
+        args.watch = [DEFAULT_CSV_PATH]
+
+    server = PreforkServer(load_app_target(args.target), host=args.host, port=args.port,
+                           workers=args.workers, watch_paths=args.watch)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
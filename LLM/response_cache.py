@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Response Cache - LLM Premier League
+Cache LRU + TTL de respuestas de Claude por partido, endpoint, modelo y versión de datos
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 6 * 3600
+
+# Subir al cambiar los prompts: invalida todas las respuestas cacheadas
+PROMPT_TEMPLATE_VERSION = 'v1'
+
+
+def normalize_team(team_name: str) -> str:
+    """Nombre de equipo normalizado para la clave ('  man  city' == 'Man City')"""
+    return ' '.join(str(team_name).split()).casefold()
+
+
+def cache_key(endpoint: str, home_team: str, away_team: Optional[str], model: str,
+              data_version: str, prompt_version: str = PROMPT_TEMPLATE_VERSION) -> Tuple:
+    """Clave de cache: (endpoint, local, visitante, modelo, plantilla de prompt, versión de datos)"""
+    return (
+        endpoint,
+        normalize_team(home_team),
+        normalize_team(away_team) if away_team else '',
+        model,
+        prompt_version,
+        data_version
+    )
+
+
+class _Pending:
+    """Cálculo en curso compartido por todas las peticiones con la misma clave"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    Cache LRU con expiración por TTL delante de las llamadas a Claude.
+
+    Los misses concurrentes de una misma clave se agrupan (single-flight): solo
+    el primero llama a Claude y el resto espera su resultado. Los errores no se
+    cachean, pero se propagan a todas las peticiones que esperaban.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_entries <= 0 or ttl <= 0:
+            raise ValueError("max_entries y ttl deben ser mayores que 0")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._pending: Dict[Hashable, _Pending] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCache':
+        """Configuración desde CLAUDE_CACHE_SIZE y CLAUDE_CACHE_TTL (segundos)"""
+        return cls(
+            max_entries=int(os.getenv('CLAUDE_CACHE_SIZE', DEFAULT_MAX_ENTRIES)),
+            ttl=float(os.getenv('CLAUDE_CACHE_TTL', DEFAULT_TTL_SECONDS))
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _lookup(self, key: Hashable):
+        """Entrada vigente o None; llamar con el lock tomado"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Valor cacheado o resultado de compute(), calculado una sola vez por clave.
+
+        compute debe ser la llamada a Claude y fallar con una excepción si no hay
+        respuesta: lo que devuelve se cachea durante todo el TTL, así que nunca
+        debe devolver un resultado de respaldo (p. ej. la predicción local).
+
+        Args:
+            key: Clave de cache (cache_key)
+            compute: Llamada a Claude para el caso de miss
+            timeout: Segundos máximos que una petición agrupada espera al cálculo
+                en curso (normalmente lo que queda del deadline de la petición)
+
+        Raises:
+            TimeoutError: Si la petición agrupada deja de esperar antes de tener resultado
+            Exception: La excepción de compute(), también para las peticiones agrupadas
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[1]
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                pending = self._pending[key] = _Pending()
+                leader = True
+
+        if not leader:
+            if not pending.done.wait(timeout):
+                raise TimeoutError(f"Sin respuesta del cálculo compartido en {timeout:.2f}s")
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = compute()
+            self.put(key, pending.value)
+            return pending.value
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Contadores para /api/stats"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0
+            }
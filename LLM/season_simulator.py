@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Season Simulator - LLM Premier League
+Simulación Monte Carlo de temporadas completas con muestreo vectorizado por lotes
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from batch_predict import MAX_BATCH_FIXTURES, Fixture, local_probabilities, parse_fixtures
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEASONS = 100_000
+MAX_SEASONS = 1_000_000
+CHUNK_SEASONS = 10_000        # Temporadas por lote: ~15 MB de números aleatorios para 380 partidos
+MAX_SIMULATION_FIXTURES = 760  # Dos temporadas de 20 equipos
+MAX_SIMULATION_WORKERS = int(os.getenv('SIMULATION_MAX_WORKERS', os.cpu_count() or 1))
+TOP_POSITIONS = 4
+RELEGATION_POSITIONS = 3
+SEASON_DAYS = 300             # Una temporada dura ~280 días de agosto a mayo
+POINTS_PERCENTILES = (5, 25, 50, 75, 95)
+# Los workers no se crean con fork: /api/simulate corre en servidores con hilos y
+# un fork desde ahí puede heredar locks tomados por otros hilos
+SIMULATION_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+@dataclass
+class SimulationResult:
+    """Conteos agregados de todas las temporadas simuladas"""
+    team_names: List[str]
+    seasons: int
+    seed: int
+    position_counts: np.ndarray  # (equipos, posiciones)
+    points: np.ndarray           # (temporadas, equipos) puntos finales
+
+    def summary(self, relegation_positions: int = RELEGATION_POSITIONS) -> List[Dict]:
+        """Probabilidades de título, top 4 y descenso y distribución de puntos, ordenado por puntos esperados"""
+        n = len(self.team_names)
+        positions = self.position_counts / self.seasons
+        percentiles = np.percentile(self.points, POINTS_PERCENTILES, axis=0)
+        expected = self.points.mean(axis=0)
+        std = self.points.std(axis=0)
+        rows = []
+        for i in np.argsort(-expected, kind='stable'):
+            rows.append({
+                'team': self.team_names[i],
+                'title': round(float(positions[i, 0]), 4),
+                'top4': round(float(positions[i, :min(TOP_POSITIONS, n)].sum()), 4),
+                'relegation': round(float(positions[i, n - min(relegation_positions, n):].sum()), 4)
+                if n > relegation_positions else 0.0,
+                'expected_points': round(float(expected[i]), 2),
+                'points_std': round(float(std[i]), 2),
+                'points_percentiles': {f"p{p}": int(round(v)) for p, v in zip(POINTS_PERCENTILES, percentiles[:, i])},
+                'position_probabilities': [round(float(p), 4) for p in positions[i]]
+            })
+        return rows
+
+
+def round_robin(team_names: Sequence[str]) -> List[Fixture]:
+    """Calendario a doble vuelta: cada equipo recibe a todos los demás una vez"""
+    return [Fixture(k, home, away) for k, (home, away) in enumerate(
+        (home, away) for home in team_names for away in team_names if home != away)]
+
+
+def _simulate_chunk(home: np.ndarray, away: np.ndarray, cumulative: np.ndarray, base_points: np.ndarray,
+                    seasons: int, seed_sequence: np.random.SeedSequence):
+    """
+    Simular un lote de temporadas sin bucles por partido.
+
+    Un uniforme por (temporada, partido) frente a las probabilidades acumuladas
+    da el resultado; los puntos de cada equipo son dos productos matriciales
+    con las matrices de incidencia local/visitante, y el orden de la tabla un
+    argsort por temporada (desempate aleatorio: no se simulan goles).
+    """
+    rng = np.random.default_rng(seed_sequence)
+    n_teams, n_matches = len(base_points), len(home)
+    home_incidence = np.zeros((n_matches, n_teams), dtype=np.float32)
+    away_incidence = np.zeros((n_matches, n_teams), dtype=np.float32)
+    home_incidence[np.arange(n_matches), home] = 1
+    away_incidence[np.arange(n_matches), away] = 1
+
+    u = rng.random((seasons, n_matches), dtype=np.float32)
+    home_win = u < cumulative[:, 0]
+    draw = (u < cumulative[:, 1]) & ~home_win
+    away_win = ~(home_win | draw)
+    draw_points = draw.astype(np.float32)
+    points = ((3 * home_win + draw_points) @ home_incidence
+              + (3 * away_win + draw_points) @ away_incidence + base_points)
+
+    order = np.argsort(-(points + rng.random(points.shape, dtype=np.float32)), axis=1)
+    position_counts = np.bincount((order * n_teams + np.arange(n_teams)).ravel(),
+                                  minlength=n_teams * n_teams).reshape(n_teams, n_teams)
+    return position_counts, np.rint(points).astype(np.int16)
+
+
+def _simulate_chunk_args(args):
+    return _simulate_chunk(*args)
+
+
+def simulate_seasons(team_names: Sequence[str], home: np.ndarray, away: np.ndarray, probabilities: np.ndarray,
+                     seasons: int = DEFAULT_SEASONS, seed: Optional[int] = None, workers: int = 1,
+                     current_points: Optional[np.ndarray] = None, pool: Optional[Executor] = None) -> SimulationResult:
+    """
+    Simular temporadas completas a partir de las probabilidades 1X2 de cada partido.
+
+    Las temporadas se reparten en lotes de CHUNK_SEASONS con semillas derivadas
+    de seed (SeedSequence.spawn), así el resultado con la misma semilla es
+    idéntico con 1 o con N workers.
+
+    Args:
+        team_names: Equipos de la tabla
+        home, away: Índice (en team_names) del local y del visitante de cada partido
+        probabilities: (partidos, 3) probabilidades local/empate/visitante
+        seasons: Número de temporadas a simular
+        seed: Semilla del generador; None = aleatoria (se devuelve en el resultado)
+        workers: Procesos para repartir los lotes (1 = en el proceso actual)
+        current_points: Puntos ya conseguidos por cada equipo (simular lo que queda de temporada)
+        pool: Pool de procesos ya creado para los lotes con workers > 1; sin él se crea
+            uno para esta llamada (con SIMULATION_START_METHOD)
+
+    Raises:
+        ValueError: Si los parámetros no son válidos
+    """
+    if not 1 <= seasons <= MAX_SEASONS:
+        raise ValueError(f"seasons debe estar entre 1 y {MAX_SEASONS}")
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    if probabilities.shape != (len(home), 3) or np.any(probabilities < 0):
+        raise ValueError("Se requiere una fila de probabilidades (local, empate, visitante) por partido")
+    probabilities = probabilities / probabilities.sum(axis=1, keepdims=True)
+    cumulative = np.cumsum(probabilities, axis=1)[:, :2].astype(np.float32)
+
+    n_teams = len(team_names)
+    base_points = np.zeros(n_teams, dtype=np.float32) if current_points is None \
+        else np.asarray(current_points, dtype=np.float32)
+    seed = int(np.random.SeedSequence().entropy % (2 ** 63)) if seed is None else int(seed)
+    sizes = [min(CHUNK_SEASONS, seasons - start) for start in range(0, seasons, CHUNK_SEASONS)]
+    chunks = [(home, away, cumulative, base_points, size, child)
+              for size, child in zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes)))]
+
+    workers = max(1, min(int(workers), MAX_SIMULATION_WORKERS, len(chunks)))
+    if workers > 1 and pool is not None:
+        outputs = list(pool.map(_simulate_chunk_args, chunks))
+    elif workers > 1:
+        context = multiprocessing.get_context(SIMULATION_START_METHOD)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as call_pool:
+            outputs = list(call_pool.map(_simulate_chunk_args, chunks))
+    else:
+        outputs = [_simulate_chunk(*chunk) for chunk in chunks]
+
+    return SimulationResult(
+        team_names=list(team_names),
+        seasons=seasons,
+        seed=seed,
+        position_counts=sum(counts for counts, _ in outputs),
+        points=np.concatenate([points for _, points in outputs])
+    )
+
+
+def latest_season_teams(dataset) -> List[str]:
+    """Equipos de la última temporada del dataset (partidos en los SEASON_DAYS días finales)"""
+    dates = np.asarray(dataset['Date'])
+    if len(dates) == 0:
+        return []
+    recent = dates > dates.max() - SEASON_DAYS
+    ids = np.union1d(np.asarray(dataset['HomeTeam'])[recent], np.asarray(dataset['AwayTeam'])[recent])
+    return sorted(dataset.team_names[int(i)] for i in ids)
+
+
+class SeasonSimulator:
+    """
+    Servicio de POST /api/simulate: valida la petición, calcula las
+    probabilidades de cada partido con el modelo local y simula las temporadas.
+
+    Las peticiones con workers > 1 comparten un pool de max_workers procesos
+    (SIMULATION_START_METHOD), creado una vez por proceso del servidor: cada
+    worker prefork tiene el suyo y ninguna petición hace fork.
+    """
+
+    def __init__(self, live_stats, goals_model=None, default_teams: Optional[Sequence[str]] = None,
+                 max_workers: int = MAX_SIMULATION_WORKERS, market_model=None):
+        self.live_stats = live_stats
+        self.goals_model = goals_model
+        self.market_model = market_model
+        self.default_teams = list(default_teams or [])
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            # Un pool heredado del proceso padre (prefork) comparte sus colas: no sirve
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context(SIMULATION_START_METHOD))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _fixtures(self, payload: Dict, known_teams) -> List[Fixture]:
+        if payload.get('fixtures') is not None:
+            if not isinstance(payload['fixtures'], list) or len(payload['fixtures']) > MAX_SIMULATION_FIXTURES:
+                raise ValueError(f"'fixtures' debe ser una lista de hasta {MAX_SIMULATION_FIXTURES} partidos")
+            # parse_fixtures limita a una temporada; la simulación admite más partidos
+            fixtures, errors = [], []
+            raw = payload['fixtures']
+            for start in range(0, len(raw), MAX_BATCH_FIXTURES):
+                parsed, failed = parse_fixtures({'fixtures': raw[start:start + MAX_BATCH_FIXTURES]}, known_teams)
+                fixtures += [Fixture(f.index + start, f.home_team, f.away_team) for f in parsed]
+                errors += [{**e, 'index': e['index'] + start} for e in failed]
+            if errors:
+                raise ValueError(f"Partido {errors[0]['index']}: {errors[0]['error']}")
+            if not fixtures:
+                raise ValueError("La lista de partidos está vacía")
+            return fixtures
+
+        teams = payload.get('teams') or self.default_teams
+        if not isinstance(teams, list) or not all(isinstance(team, str) for team in teams) or len(set(teams)) < 2:
+            raise ValueError("Se requieren 'teams' (al menos 2 nombres de equipo) o 'fixtures'")
+        unknown = [team for team in teams if team not in known_teams]
+        if unknown:
+            raise ValueError(f"Equipo no encontrado en datos históricos: {', '.join(map(str, unknown))}")
+        return round_robin(list(dict.fromkeys(teams)))
+
+    def simulate(self, payload: Optional[Dict]) -> Dict:
+        """
+        Respuesta JSON de /api/simulate.
+
+        Raises:
+            ValueError: Si la petición no es válida (responder 400)
+        """
+        payload = payload or {}
+        table = self.live_stats.snapshot()
+        fixtures = self._fixtures(payload, table)
+
+        try:
+            seasons = int(payload.get('seasons', DEFAULT_SEASONS))
+            workers = int(payload.get('workers', 1))
+            seed = None if payload.get('seed') is None else int(payload['seed'])
+        except (TypeError, ValueError):
+            raise ValueError("'seasons', 'workers' y 'seed' deben ser enteros")
+        if seed is not None and seed < 0:
+            raise ValueError("'seed' debe ser un entero no negativo")
+        current = payload.get('current_points') or {}
+        if not isinstance(current, dict):
+            raise ValueError("'current_points' debe ser un objeto {equipo: puntos}")
+
+        team_names = list(dict.fromkeys([name for f in fixtures for name in (f.home_team, f.away_team)]))
+        for team in current:
+            if team not in team_names:
+                raise ValueError(f"Equipo de current_points sin partidos en la simulación: {team}")
+        index = {name: i for i, name in enumerate(team_names)}
+        home = np.array([index[f.home_team] for f in fixtures], dtype=np.int64)
+        away = np.array([index[f.away_team] for f in fixtures], dtype=np.int64)
+        try:
+            current_points = np.array([float(current.get(name, 0)) for name in team_names])
+        except (TypeError, ValueError):
+            raise ValueError("Los puntos de 'current_points' deben ser números")
+
+        start = time.perf_counter()
+        probabilities = local_probabilities(table, fixtures, self.goals_model, self.market_model)
+        workers = min(workers, self.max_workers)
+        result = simulate_seasons(team_names, home, away, probabilities, seasons=seasons, seed=seed,
+                                  workers=workers, current_points=current_points,
+                                  pool=self._executor() if workers > 1 else None)
+        elapsed = time.perf_counter() - start
+        logger.info(f"🎲 {seasons} temporadas simuladas ({len(fixtures)} partidos, {len(team_names)} equipos) "
+                    f"en {elapsed:.2f}s")
+        return {
+            'success': True,
+            'seasons': result.seasons,
+            'seed': result.seed,
+            'fixtures': len(fixtures),
+            'model': 'poisson_dixon_coles' if self.goals_model is not None else 'averages',
+            'market_blend': self.market_model.blend_weight if self.market_model is not None else None,
+            'data_version': self.live_stats.data_version,
+            'elapsed_seconds': round(elapsed, 3),
+            'teams': result.summary()
+        }
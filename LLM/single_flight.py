@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Single Flight - LLM Premier League
+Agrupación de llamadas idénticas concurrentes a Claude en una única petición compartida
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 16
+
+
+def canonical_prompt_key(model: str, max_tokens: int, prompt: str) -> str:
+    """
+    Clave canónica de una llamada: modelo, max_tokens y prompt sin diferencias
+    de espacios al final de línea, saltos CRLF ni espacios en los extremos.
+    """
+    canonical = '\n'.join(line.rstrip() for line in prompt.strip().splitlines())
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f"{model}:{max_tokens}:{digest}"
+
+
+class _Flight:
+    """Llamada en curso: future compartido y número de peticiones esperando"""
+
+    def __init__(self):
+        self.future: Optional[Future] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplicación de llamadas en curso (sin cachear resultados).
+
+    La primera petición de una clave lanza la llamada en un pool de hilos; las
+    que llegan mientras sigue en curso esperan el mismo future. El resultado o
+    la excepción llegan a todas. Si todas las peticiones abandonan la espera
+    (timeout o desconexión del cliente), la llamada se cancela: si aún no había
+    empezado no se ejecuta, y si ya estaba en curso su resultado se descarta y
+    la siguiente petición lanza una llamada nueva.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='claude-flight')
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.requests = 0
+        self.upstream_calls = 0
+        self.shared = 0
+        self.cancelled = 0
+        self.errors = 0
+
+    def _run(self, key: Hashable, flight: _Flight, fn: Callable[[], Any]) -> Any:
+        try:
+            return fn()
+        except BaseException:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def _leave(self, key: Hashable, flight: _Flight):
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters > 0 or flight.future.done():
+                return
+            # Nadie espera ya esta llamada: cancelarla y no reutilizarla
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.future.cancel()
+            self.cancelled += 1
+        logger.info(f"🛑 Llamada a Claude cancelada: todas las peticiones abandonaron la espera ({key})")
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Ejecutar fn() una sola vez para todas las peticiones concurrentes con la misma clave.
+
+        Args:
+            key: Clave canónica de la llamada
+            fn: Llamada real a Claude
+            timeout: Segundos máximos de espera de esta petición
+
+        Raises:
+            TimeoutError: Si esta petición deja de esperar antes de tener resultado
+            Exception: La excepción de fn(), propagada a todas las peticiones agrupadas
+        """
+        with self._lock:
+            self.requests += 1
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                flight.future = self._executor.submit(self._run, key, flight, fn)
+                self.upstream_calls += 1
+            else:
+                self.shared += 1
+            flight.waiters += 1
+
+        try:
+            return flight.future.result(timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"Sin respuesta de la llamada compartida en {timeout}s")
+        except CancelledError:
+            raise TimeoutError("La llamada compartida fue cancelada")
+        finally:
+            self._leave(key, flight)
+
+    def stats(self) -> Dict:
+        """Contadores para /api/stats: saved_calls son las llamadas a Claude evitadas"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'upstream_calls': self.upstream_calls,
+                'saved_calls': self.shared,
+                'cancelled': self.cancelled,
+                'errors': self.errors,
+                'in_flight': len(self._flights)
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncSingleFlight:
+    """
+    Versión asyncio de SingleFlight para el cliente asíncrono.
+
+    La llamada compartida es una Task protegida con asyncio.shield: cancelar una
+    petición (cliente desconectado, deadline propio) no afecta al resto, y
+    cuando se cancela la última la Task se cancela de verdad, cerrando la
+    petición HTTP en curso.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.requests = 0
+        self.upstream_calls = 0
+        self.shared = 0
+        self.cancelled = 0
+        self.errors = 0
+
+    def _finished(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecutar await fn() una sola vez para todas las peticiones concurrentes con la misma clave.
+
+        Raises:
+            Exception: La excepción de fn(), propagada a todas las peticiones agrupadas
+        """
+        self.requests += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.future = asyncio.ensure_future(fn())
+            flight.future.add_done_callback(lambda task: self._finished(key, flight, task))
+            self.upstream_calls += 1
+        else:
+            self.shared += 1
+        flight.waiters += 1
+
+        try:
+            return await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.future.done():
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.future.cancel()
+                self.cancelled += 1
+                logger.info(f"🛑 Llamada a Claude cancelada: todas las peticiones abandonaron la espera ({key})")
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'upstream_calls': self.upstream_calls,
+            'saved_calls': self.shared,
+            'cancelled': self.cancelled,
+            'errors': self.errors,
+            'in_flight': len(self._flights)
+        }
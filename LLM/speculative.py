@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Speculative Prediction - LLM Premier League
+Modo especulativo: predicción local inmediata en carrera con Claude bajo un presupuesto de latencia
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUDGET = 1.0
+DEFAULT_MAX_WORKERS = 16
+
+
+class SpeculativePredictor:
+    """
+    Carrera entre el motor local (~100-300 ms) y Claude (2-5 s).
+
+    La llamada a Claude sale primero a un pool de hilos y la predicción local se
+    calcula mientras tanto en el hilo de la petición. Si Claude termina dentro
+    del presupuesto se usa su resultado; si no, se responde con el local y la
+    llamada a Claude sigue en segundo plano hasta su deadline. Como esa llamada
+    pasa por el cache de respuestas, el resultado tardío queda cacheado y la
+    siguiente petición del mismo partido lo recibe al instante.
+    """
+
+    def __init__(self, budget: float = DEFAULT_LATENCY_BUDGET, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.budget = budget
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='claude-speculative')
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.claude_in_budget = 0
+        self.local_served = 0
+        self.late_completed = 0
+        self.late_failed = 0
+        self.claude_errors = 0
+
+    @classmethod
+    def from_env(cls) -> 'SpeculativePredictor':
+        """Presupuesto desde PREDICT_LATENCY_BUDGET (segundos)"""
+        return cls(budget=float(os.getenv('PREDICT_LATENCY_BUDGET', DEFAULT_LATENCY_BUDGET)))
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _late_done(self, future: Future):
+        error = 'cancelada' if future.cancelled() else future.exception()
+        if error is not None:
+            self._count('late_failed')
+            logger.warning(f"⚠️ Llamada tardía a Claude sin resultado: {error}")
+        else:
+            self._count('late_completed')
+
+    def predict(self, local: Callable[[], Any], remote: Callable[[], Any],
+                budget: Optional[float] = None) -> Tuple[Any, str]:
+        """
+        Resultado de Claude si llega dentro del presupuesto; si no, el local.
+
+        Args:
+            local: Predicción local (se ejecuta en el hilo de la petición)
+            remote: Predicción con Claude, normalmente a través del cache de respuestas
+            budget: Segundos máximos de espera; por defecto el del predictor
+
+        Returns:
+            Tuple: (predicción, origen) con origen 'claude', 'local' o 'local_fallback'
+
+        Raises:
+            Exception: La excepción de local(), que no tiene alternativa
+        """
+        budget = self.budget if budget is None else budget
+        start = time.monotonic()
+        self._count('requests')
+        # copy_context: la llamada en segundo plano conserva el deadline de la petición
+        future = self._executor.submit(contextvars.copy_context().run, remote)
+
+        local_result = local()
+        try:
+            result = future.result(timeout=max(budget - (time.monotonic() - start), 0.0))
+        except FutureTimeoutError:
+            future.add_done_callback(self._late_done)
+            self._count('local_served')
+            return local_result, 'local'
+        except Exception as e:
+            logger.warning(f"⚠️ Claude falló en modo especulativo, usando predicción local: {e}")
+            self._count('claude_errors')
+            return local_result, 'local_fallback'
+
+        self._count('claude_in_budget')
+        return result, 'claude'
+
+    def stats(self) -> Dict:
+        """Contadores para /api/stats"""
+        with self._lock:
+            return {
+                'budget_seconds': self.budget,
+                'requests': self.requests,
+                'claude_in_budget': self.claude_in_budget,
+                'local_served': self.local_served,
+                'late_completed': self.late_completed,
+                'late_failed': self.late_failed,
+                'claude_errors': self.claude_errors
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
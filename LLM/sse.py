@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events - LLM Premier League
+Reenvío de los deltas de Claude al cliente como eventos SSE, con un evento final estructurado
+"""
+
+import json
+import logging
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+from claude_client import ClaudeAPIError
+from stream_parser import MalformedPredictionError, PredictionStreamParser
+
+logger = logging.getLogger(__name__)
+
+SSE_MIMETYPE = 'text/event-stream'
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'  # nginx: no acumular el stream
+}
+
+
+def format_sse(data: Dict, event: Optional[str] = None) -> str:
+    """Un evento SSE con datos JSON en una sola línea"""
+    prefix = f"event: {event}\n" if event else ''
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def wants_event_stream(accept_header: Optional[str], stream_param: Optional[str]) -> bool:
+    """True si el cliente pide streaming (Accept: text/event-stream o ?stream=1)"""
+    if stream_param is not None and stream_param.lower() in ('1', 'true', 'yes'):
+        return True
+    return SSE_MIMETYPE in (accept_header or '')
+
+
+def stream_events(deltas: Callable[[], Iterator[str]], finalize: Callable[[str], Dict],
+                  fallback: Optional[Callable[[], Dict]] = None) -> Iterator[str]:
+    """
+    Generador de eventos SSE: start, un delta por fragmento de Claude y done.
+
+    El evento start sale antes de llamar a Claude, así el cliente recibe el
+    primer byte inmediatamente. done lleva el resultado estructurado que
+    devuelve finalize(texto completo), el mismo JSON que la respuesta sin stream.
+
+    Args:
+        deltas: Función que abre el stream de Claude y devuelve sus deltas de texto
+        finalize: Convierte el texto completo en la respuesta estructurada final
+        fallback: Respuesta local si Claude falla antes del primer delta
+
+    Yields:
+        str: Eventos SSE ya formateados
+    """
+    yield format_sse({'status': 'started'}, event='start')
+
+    chunks = []
+    try:
+        for text in deltas():
+            chunks.append(text)
+            yield format_sse({'text': text}, event='delta')
+    except ClaudeAPIError as e:
+        if not chunks and fallback is not None:
+            logger.warning(f"⚠️ Stream de Claude falló, usando respuesta local: {e}")
+            yield format_sse(fallback(), event='done')
+        else:
+            logger.error(f"❌ Stream de Claude interrumpido: {e}")
+            yield format_sse({'success': False, 'error': str(e)}, event='error')
+        return
+
+    yield format_sse(finalize(''.join(chunks)), event='done')
+
+
+async def stream_events_async(deltas: Callable[[], AsyncIterator[str]], finalize: Callable[[str], Dict],
+                              fallback: Optional[Callable[[], Dict]] = None) -> AsyncIterator[str]:
+    """
+    Versión asyncio de stream_events para el servidor ASGI (AsyncClaudeClient.stream).
+
+    Mismos eventos: start, un delta por fragmento de Claude y done (o error).
+    El stream de Claude se cierra también si el cliente se desconecta a mitad.
+    """
+    yield format_sse({'status': 'started'}, event='start')
+
+    chunks = []
+    stream = None
+    try:
+        stream = deltas()
+        async for text in stream:
+            chunks.append(text)
+            yield format_sse({'text': text}, event='delta')
+    except ClaudeAPIError as e:
+        if not chunks and fallback is not None:
+            logger.warning(f"⚠️ Stream de Claude falló, usando respuesta local: {e}")
+            yield format_sse(fallback(), event='done')
+        else:
+            logger.error(f"❌ Stream de Claude interrumpido: {e}")
+            yield format_sse({'success': False, 'error': str(e)}, event='error')
+        return
+    finally:
+        if stream is not None:
+            await stream.aclose()
+
+    yield format_sse(finalize(''.join(chunks)), event='done')
+
+
+def stream_prediction_events(deltas: Callable[[], Iterator[str]], parser: PredictionStreamParser,
+                             finalize: Callable[[Dict], Dict],
+                             fallback: Optional[Callable[[], Dict]] = None) -> Iterator[str]:
+    """
+    Generador de eventos SSE para predicciones: start, partial y done.
+
+    El JSON de Claude se analiza según llega: cada vez que se cierra un campo
+    válido sale un evento partial con la MatchPrediction parcial. Con todos los
+    campos el stream de Claude se cierra sin esperar al resto del texto. Si la
+    respuesta deja de ser JSON válido o Claude falla, done lleva fallback()
+    en cuanto se detecta, sin esperar al final de la respuesta.
+
+    Args:
+        deltas: Función que abre el stream de Claude y devuelve sus deltas de texto
+        parser: Parser incremental de la predicción
+        finalize: Convierte la predicción completa en la respuesta estructurada final
+        fallback: Respuesta local si Claude falla o devuelve una predicción inválida
+
+    Yields:
+        str: Eventos SSE ya formateados
+    """
+    yield format_sse({'status': 'started'}, event='start')
+
+    stream = None
+    try:
+        stream = deltas()
+        for text in stream:
+            if parser.feed(text):
+                yield format_sse(parser.partial(), event='partial')
+            if parser.complete:
+                break
+        prediction = parser.prediction()
+    except (ClaudeAPIError, MalformedPredictionError) as e:
+        if fallback is not None:
+            logger.warning(f"⚠️ Predicción de Claude descartada, usando predicción local: {e}")
+            yield format_sse(fallback(), event='done')
+        else:
+            logger.error(f"❌ Predicción de Claude inválida: {e}")
+            yield format_sse({'success': False, 'error': str(e)}, event='error')
+        return
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()  # Cancela la llamada a Claude si aún sigue generando
+
+    yield format_sse(finalize(prediction), event='done')
+
+
+async def stream_prediction_events_async(deltas: Callable[[], AsyncIterator[str]], parser: PredictionStreamParser,
+                                         finalize: Callable[[Dict], Dict],
+                                         fallback: Optional[Callable[[], Dict]] = None) -> AsyncIterator[str]:
+    """
+    Versión asyncio de stream_prediction_events para el servidor ASGI.
+
+    Mismos eventos: start, partial por campo validado y done; el stream de
+    Claude se cierra en cuanto la predicción está completa o es inválida.
+    """
+    yield format_sse({'status': 'started'}, event='start')
+
+    stream = None
+    try:
+        stream = deltas()
+        async for text in stream:
+            if parser.feed(text):
+                yield format_sse(parser.partial(), event='partial')
+            if parser.complete:
+                break
+        prediction = parser.prediction()
+    except (ClaudeAPIError, MalformedPredictionError) as e:
+        if fallback is not None:
+            logger.warning(f"⚠️ Predicción de Claude descartada, usando predicción local: {e}")
+            yield format_sse(fallback(), event='done')
+        else:
+            logger.error(f"❌ Predicción de Claude inválida: {e}")
+            yield format_sse({'success': False, 'error': str(e)}, event='error')
+        return
+    finally:
+        if stream is not None:
+            await stream.aclose()  # Cancela la llamada a Claude si aún sigue generando
+
+    yield format_sse(finalize(prediction), event='done')
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Statistics Engine - LLM Premier League
+Estadísticas por equipo calculadas en una pasada vectorizada sobre los arrays de partidos
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+from columnar_cache import ColumnarDataset
+
+logger = logging.getLogger(__name__)
+
+FORM_WINDOW = 5
+
+# Códigos de resultado desde el punto de vista del equipo (-1 = sin partido)
+RESULT_LOSS, RESULT_DRAW, RESULT_WIN = 0, 1, 2
+FORM_LETTERS = 'LDW'
+
+
+@dataclass
+class TeamStatsTable:
+    """
+    Estadísticas de todos los equipos como struct-of-arrays.
+
+    Cada array está indexado por el código de equipo del dataset columnar
+    (el mismo diccionario que HomeTeam/AwayTeam).
+    """
+    team_names: List[str]
+    matches_played: np.ndarray
+    home_played: np.ndarray
+    away_played: np.ndarray
+    wins: np.ndarray
+    draws: np.ndarray
+    losses: np.ndarray
+    home_wins: np.ndarray
+    away_wins: np.ndarray
+    goals_for: np.ndarray
+    goals_against: np.ndarray
+    recent_form: np.ndarray  # (n_teams, FORM_WINDOW), del más antiguo al más reciente
+
+    def __post_init__(self):
+        self._team_index = {name: i for i, name in enumerate(self.team_names)}
+
+    def __len__(self) -> int:
+        return len(self.team_names)
+
+    def __contains__(self, team_name: str) -> bool:
+        return team_name in self._team_index
+
+    def team_id(self, team_name: str) -> int:
+        """
+        Índice de un equipo en la tabla.
+
+        Raises:
+            ValueError: Si el equipo no existe en los datos
+        """
+        if team_name not in self._team_index:
+            raise ValueError(f"Equipo no encontrado en datos históricos: {team_name}")
+        return self._team_index[team_name]
+
+    @property
+    def goals_per_game(self) -> np.ndarray:
+        return _safe_ratio(self.goals_for, self.matches_played)
+
+    @property
+    def goals_conceded_per_game(self) -> np.ndarray:
+        return _safe_ratio(self.goals_against, self.matches_played)
+
+    @property
+    def win_rate(self) -> np.ndarray:
+        return _safe_ratio(self.wins, self.matches_played)
+
+    @property
+    def home_win_rate(self) -> np.ndarray:
+        return _safe_ratio(self.home_wins, self.home_played)
+
+    @property
+    def away_win_rate(self) -> np.ndarray:
+        return _safe_ratio(self.away_wins, self.away_played)
+
+    def form_string(self, team_id: int) -> str:
+        """Forma reciente como texto (p. ej. 'WWDLW')"""
+        return ''.join(FORM_LETTERS[code] for code in self.recent_form[team_id] if code >= 0)
+
+    def get(self, team_name: str) -> Dict:
+        """Estadísticas de un equipo en el formato de team_stats del LLM"""
+        return self._team_dict(self.team_id(team_name))
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """Todas las estadísticas en el formato {equipo: {...}} que usa el LLM"""
+        return {name: self._team_dict(i) for i, name in enumerate(self.team_names)
+                if self.matches_played[i] > 0}
+
+    def _team_dict(self, i: int) -> Dict:
+        return {
+            'matches_played': int(self.matches_played[i]),
+            'wins': int(self.wins[i]),
+            'draws': int(self.draws[i]),
+            'losses': int(self.losses[i]),
+            'goals_scored': int(self.goals_for[i]),
+            'goals_conceded': int(self.goals_against[i]),
+            'goals_per_game': float(self.goals_per_game[i]),
+            'goals_conceded_per_game': float(self.goals_conceded_per_game[i]),
+            'win_rate': float(self.win_rate[i]),
+            'home_win_rate': float(self.home_win_rate[i]),
+            'away_win_rate': float(self.away_win_rate[i]),
+            'recent_form': self.form_string(i)
+        }
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    out = np.zeros(len(numerator), dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def chronological_order(dates: np.ndarray) -> np.ndarray:
+    """Permutación estable que ordena los partidos por fecha en tiempo lineal"""
+    dates = np.asarray(dates)
+    if len(dates) == 0:
+        return np.arange(0)
+    relative = dates - dates.min()
+    if relative.max() <= np.iinfo(np.uint16).max:
+        relative = relative.astype(np.uint16)
+    return np.argsort(relative, kind='stable')
+
+
+def match_arrays(dataset: ColumnarDataset) -> Dict[str, np.ndarray]:
+    """
+    Arrays de partidos en orden cronológico listos para agregación.
+
+    Las fechas se ordenan como días relativos a la primera fecha en uint16,
+    con lo que el sort estable de NumPy es un radix sort lineal.
+    """
+    order = chronological_order(dataset['Date'])
+    ftr_lookup = dataset.dictionaries['FTR']
+    home_result = np.array(
+        [{'H': RESULT_WIN, 'D': RESULT_DRAW, 'A': RESULT_LOSS}.get(code, -1) for code in ftr_lookup],
+        dtype=np.int8
+    )[dataset['FTR'][order]]
+
+    return {
+        'date': np.asarray(dataset['Date'])[order],
+        'home': np.asarray(dataset['HomeTeam'])[order],
+        'away': np.asarray(dataset['AwayTeam'])[order],
+        'home_goals': np.asarray(dataset['FTHG'], dtype=np.int64)[order],
+        'away_goals': np.asarray(dataset['FTAG'], dtype=np.int64)[order],
+        'home_result': home_result
+    }
+
+
+def compute_team_stats(dataset: ColumnarDataset, form_window: int = FORM_WINDOW) -> TeamStatsTable:
+    """
+    Calcular las estadísticas de todos los equipos en una pasada vectorizada.
+
+    Sustituye el filtrado del DataFrame equipo por equipo: cada agregado es un
+    np.bincount sobre los códigos de equipo local/visitante, y la forma reciente
+    sale de un sort estable por equipo (radix para códigos uint8/uint16).
+
+    Args:
+        dataset: Dataset columnar de partidos
+        form_window: Número de partidos de la forma reciente
+
+    Returns:
+        TeamStatsTable: Estadísticas struct-of-arrays de todos los equipos
+    """
+    n_teams = len(dataset.team_names)
+    m = match_arrays(dataset)
+    home, away = m['home'], m['away']
+    home_result = m['home_result']
+
+    def count(ids, weights=None):
+        return np.bincount(ids, weights=weights, minlength=n_teams)[:n_teams].astype(np.int64)
+
+    home_played = count(home)
+    away_played = count(away)
+    home_wins = count(home, home_result == RESULT_WIN)
+    away_wins = count(away, home_result == RESULT_LOSS)
+    draws = count(home, home_result == RESULT_DRAW) + count(away, home_result == RESULT_DRAW)
+    matches_played = home_played + away_played
+    wins = home_wins + away_wins
+
+    # Forma reciente: apariciones intercaladas (local, visitante) en orden
+    # cronológico, agrupadas por equipo con un sort estable
+    teams = np.empty(2 * len(home), dtype=home.dtype)
+    teams[0::2], teams[1::2] = home, away
+    results = np.empty(2 * len(home), dtype=np.int8)
+    results[0::2] = home_result
+    results[1::2] = np.where(home_result >= 0, RESULT_WIN - home_result, -1)
+
+    by_team = np.argsort(teams, kind='stable')
+    sorted_results = results[by_team]
+    ends = np.cumsum(matches_played)
+
+    recent_form = np.full((n_teams, form_window), -1, dtype=np.int8)
+    for k in range(form_window):
+        has_match = matches_played > k
+        recent_form[has_match, form_window - 1 - k] = sorted_results[ends[has_match] - 1 - k]
+
+    return TeamStatsTable(
+        team_names=list(dataset.team_names),
+        matches_played=matches_played,
+        home_played=home_played,
+        away_played=away_played,
+        wins=wins,
+        draws=draws,
+        losses=matches_played - wins - draws,
+        home_wins=home_wins,
+        away_wins=away_wins,
+        goals_for=count(home, m['home_goals']) + count(away, m['away_goals']),
+        goals_against=count(home, m['away_goals']) + count(away, m['home_goals']),
+        recent_form=recent_form
+    )
+
+
+def calculate_advanced_statistics(dataset: ColumnarDataset) -> Dict[str, Dict]:
+    """
+    Reemplazo directo de ClaudePremierLeagueLLM._calculate_advanced_statistics.
+
+    Returns:
+        Dict[str, Dict]: team_stats en el formato que consume el prompt
+    """
+    table = compute_team_stats(dataset)
+    logger.info(f"📊 Estadísticas calculadas para {len(table.to_dict())} equipos")
+    return table.to_dict()
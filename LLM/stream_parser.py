@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Stream Parser - LLM Premier League
+Parser JSON incremental para predicciones de Claude recibidas en streaming
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Texto permitido antes del '{' (p. ej. "```json" o una frase introductoria)
+MAX_PREAMBLE_CHARS = 500
+MAX_PREDICTED_GOALS = 15
+
+PROBABILITY_FIELDS = ('win_probability_home', 'win_probability_draw', 'win_probability_away')
+REQUIRED_FIELDS = (
+    'predicted_home_goals', 'predicted_away_goals', *PROBABILITY_FIELDS,
+    'confidence_score', 'key_insights', 'expected_result', 'reasoning'
+)
+
+
+class MalformedPredictionError(ValueError):
+    """La respuesta de Claude no es una predicción JSON válida"""
+
+
+class IncrementalJSONObject:
+    """
+    Lector incremental del primer objeto JSON de un texto.
+
+    Recibe fragmentos con feed() y devuelve los pares (clave, valor) de primer
+    nivel en cuanto cada valor se cierra, sin esperar al resto del objeto.
+    Un error de estructura se detecta en el primer carácter inválido.
+    """
+
+    def __init__(self, max_preamble: int = MAX_PREAMBLE_CHARS):
+        self.max_preamble = max_preamble
+        self.done = False
+        self._buffer = ''
+        self._pos = 0
+        self._started = False
+        self._preamble = 0
+        self._depth = 0
+        self._state = 'key'
+        self._in_string = False
+        self._escape = False
+        self._primitive = False
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None
+        self._fields = 0
+
+    def _fail(self, message: str):
+        raise MalformedPredictionError(f"JSON inválido en la posición {self._pos}: {message}")
+
+    def _decode(self, start: int, end: int) -> Any:
+        try:
+            return json.loads(self._buffer[start:end])
+        except ValueError as e:
+            raise MalformedPredictionError(f"Valor JSON inválido para '{self._key}': {e}")
+
+    def _emit(self, end: int, out: List[Tuple[str, Any]]):
+        out.append((self._key, self._decode(self._token_start, end)))
+        self._fields += 1
+        self._token_start = None
+        self._primitive = False
+        self._state = 'after_value'
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consumir un fragmento y devolver los campos de primer nivel completados.
+
+        Raises:
+            MalformedPredictionError: Si el texto deja de ser un objeto JSON válido
+        """
+        if self.done:
+            return []
+        if not self._started:
+            start = chunk.find('{')
+            if start < 0:
+                self._preamble += len(chunk)
+                if self._preamble > self.max_preamble:
+                    raise MalformedPredictionError("La respuesta no contiene un objeto JSON")
+                return []
+            self._preamble += start
+            if self._preamble > self.max_preamble:
+                raise MalformedPredictionError("Demasiado texto antes del objeto JSON")
+            self._started = True
+            self._depth = 1
+            chunk = chunk[start + 1:]
+
+        self._buffer += chunk
+        out: List[Tuple[str, Any]] = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            self._pos = i
+            c = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == 'key':
+                        self._key = self._decode(self._token_start, i + 1)
+                        self._token_start = None
+                        self._state = 'colon'
+                    elif self._depth == 1 and self._state == 'value':
+                        self._emit(i + 1, out)
+                continue
+
+            if self._depth > 1:
+                if c == '"':
+                    self._in_string = True
+                elif c in '{[':
+                    self._depth += 1
+                elif c in '}]':
+                    self._depth -= 1
+                    if self._depth == 1:
+                        self._emit(i + 1, out)
+                continue
+
+            if self._primitive:
+                if c.isspace() or c in ',}':
+                    self._emit(i, out)
+                else:
+                    continue
+            if c.isspace():
+                continue
+
+            if self._state == 'key':
+                if c == '"':
+                    self._in_string = True
+                    self._token_start = i
+                elif c == '}' and self._fields == 0:
+                    self.done = True
+                    break
+                else:
+                    self._fail(f"se esperaba una clave y llegó {c!r}")
+            elif self._state == 'colon':
+                if c != ':':
+                    self._fail(f"se esperaba ':' y llegó {c!r}")
+                self._state = 'value'
+            elif self._state == 'value':
+                self._token_start = i
+                if c == '"':
+                    self._in_string = True
+                elif c in '{[':
+                    self._depth += 1
+                elif c in '-0123456789tfn':
+                    self._primitive = True
+                else:
+                    self._fail(f"valor inesperado {c!r}")
+            elif self._state == 'after_value':
+                if c == ',':
+                    self._state = 'key'
+                elif c == '}':
+                    self.done = True
+                    break
+                else:
+                    self._fail(f"se esperaba ',' o '}}' y llegó {c!r}")
+        else:
+            self._pos = len(buffer)
+        return out
+
+
+def _number(name: str, value: Any, low: float, high: float) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise MalformedPredictionError(f"{name} debe ser numérico: {value!r}")
+    if not low <= value <= high:
+        raise MalformedPredictionError(f"{name} fuera de rango [{low}, {high}]: {value}")
+    return float(value)
+
+
+def _probability(name: str, value: Any) -> float:
+    value = _number(name, value, 0.0, 100.0)
+    return value / 100 if value > 1 else value  # Claude a veces responde en porcentaje
+
+
+def validate_field(name: str, value: Any) -> Any:
+    """
+    Validar y normalizar un campo de predicción en cuanto se cierra.
+
+    Raises:
+        MalformedPredictionError: Si el valor no es válido para ese campo
+    """
+    if name in ('predicted_home_goals', 'predicted_away_goals'):
+        return _number(name, value, 0.0, MAX_PREDICTED_GOALS)
+    if name in PROBABILITY_FIELDS or name == 'confidence_score':
+        return _probability(name, value)
+    if name == 'key_insights':
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise MalformedPredictionError("key_insights debe ser una lista de textos")
+        return value
+    if name in ('expected_result', 'reasoning'):
+        if not isinstance(value, str) or (name == 'expected_result' and not value.strip()):
+            raise MalformedPredictionError(f"{name} debe ser un texto no vacío")
+        return value
+    return value
+
+
+class PredictionStreamParser:
+    """
+    Predicción de Claude construida campo a campo desde el stream.
+
+    Cada campo se valida al cerrarse; partial() devuelve lo validado hasta el
+    momento (probabilidades primero si Claude las escribe antes) y complete
+    indica que ya están todos los campos requeridos, así el stream se puede
+    cortar sin esperar al resto del texto.
+    """
+
+    def __init__(self, home_team: str, away_team: str):
+        self.home_team = home_team
+        self.away_team = away_team
+        self.fields: Dict[str, Any] = {}
+        self._json = IncrementalJSONObject()
+
+    @property
+    def complete(self) -> bool:
+        return all(name in self.fields for name in REQUIRED_FIELDS)
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """
+        Consumir un fragmento y devolver los campos validados nuevos.
+
+        Raises:
+            MalformedPredictionError: Si el JSON o algún campo no es válido
+        """
+        new_fields = {}
+        for name, value in self._json.feed(chunk):
+            if name in REQUIRED_FIELDS:
+                new_fields[name] = self.fields[name] = validate_field(name, value)
+        if self._json.done and not self.complete:
+            missing = [name for name in REQUIRED_FIELDS if name not in self.fields]
+            raise MalformedPredictionError(f"Faltan campos en la predicción: {', '.join(missing)}")
+        return new_fields
+
+    def partial(self) -> Dict[str, Any]:
+        """MatchPrediction parcial con los campos validados hasta ahora"""
+        return {'home_team': self.home_team, 'away_team': self.away_team, **self.fields}
+
+    def prediction(self) -> Dict[str, Any]:
+        """
+        MatchPrediction completa con probabilidades normalizadas a 1.
+
+        Raises:
+            MalformedPredictionError: Si aún faltan campos o las probabilidades suman 0
+        """
+        if not self.complete:
+            missing = [name for name in REQUIRED_FIELDS if name not in self.fields]
+            raise MalformedPredictionError(f"Faltan campos en la predicción: {', '.join(missing)}")
+        total = sum(self.fields[name] for name in PROBABILITY_FIELDS)
+        if total <= 0:
+            raise MalformedPredictionError("Las probabilidades suman 0")
+        prediction = self.partial()
+        for name in PROBABILITY_FIELDS:
+            prediction[name] = round(self.fields[name] / total, 3)
+        return prediction
+
+
+def predict_from_stream(deltas: Iterable[str], home_team: str, away_team: str) -> Dict[str, Any]:
+    """
+    Consumir el stream de Claude hasta tener la predicción completa.
+
+    Corta el stream (cerrándolo, lo que cancela la llamada) en cuanto están
+    todos los campos, y falla en cuanto el texto deja de ser válido.
+
+    Raises:
+        MalformedPredictionError: Si la respuesta es inválida o termina incompleta
+    """
+    parser = PredictionStreamParser(home_team, away_team)
+    iterator = iter(deltas)
+    try:
+        for chunk in iterator:
+            parser.feed(chunk)
+            if parser.complete:
+                return parser.prediction()
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+    return parser.prediction()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Time Index - LLM Premier League
+Serie temporal por equipo con sumas acumuladas para consultas as-of y por ventana
+"""
+
+import re
+import threading
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from columnar_cache import ColumnarDataset, days_to_iso, iso_to_days
+from stats_engine import RESULT_DRAW, RESULT_LOSS, RESULT_WIN, chronological_order
+
+# Métricas acumuladas por partido, desde el punto de vista del equipo
+SERIES_METRICS = ('goals_for', 'goals_against', 'points', 'shots', 'shots_on_target',
+                  'wins', 'draws', 'losses')
+POINTS = {RESULT_WIN: 3, RESULT_DRAW: 1, RESULT_LOSS: 0}
+
+
+class _TeamSeries:
+    """Fechas ordenadas y sumas acumuladas de un equipo (con capacidad creciente)"""
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray):
+        self.size = len(dates)
+        capacity = max(self.size, 8)
+        self.dates = np.zeros(capacity, dtype=np.int32)
+        self.dates[:self.size] = dates
+        self.cum = np.zeros((capacity + 1, len(SERIES_METRICS)), dtype=np.float64)
+        self.cum[1:self.size + 1] = np.cumsum(values, axis=0)
+
+    def append(self, day: int, values: np.ndarray):
+        if self.size == len(self.dates):
+            self.dates = np.concatenate([self.dates, np.zeros(len(self.dates), dtype=np.int32)])
+            self.cum = np.concatenate([self.cum, np.zeros((len(self.cum) - 1, self.cum.shape[1]))])
+
+        if self.size and day < self.dates[self.size - 1]:
+            # Resultado atrasado: insertar en orden y rehacer la cola acumulada
+            pos = int(np.searchsorted(self.dates[:self.size], day, side='right'))
+            tail = np.diff(self.cum[pos:self.size + 1], axis=0)
+            self.dates[pos + 1:self.size + 1] = self.dates[pos:self.size].copy()
+            self.dates[pos] = day
+            self.cum[pos + 1] = self.cum[pos] + values
+            self.cum[pos + 2:self.size + 2] = self.cum[pos + 1] + np.cumsum(tail, axis=0)
+        else:
+            self.dates[self.size] = day
+            self.cum[self.size + 1] = self.cum[self.size] + values
+        self.size += 1
+
+
+def parse_window(window) -> Dict[str, Optional[int]]:
+    """
+    Interpretar el parámetro window: N partidos (10) o K días ('30d').
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    if window is None or window == '':
+        return {'last_n': None, 'days': None}
+    if isinstance(window, int) and not isinstance(window, bool):
+        value, unit = window, ''
+    else:
+        match = re.fullmatch(r'\s*(\d+)\s*([dD]?)\s*', str(window))
+        if not match:
+            raise ValueError(f"window inválido: {window!r} (usa N partidos o 'Kd' días)")
+        value, unit = int(match.group(1)), match.group(2).lower()
+    if value <= 0:
+        raise ValueError("window debe ser mayor que 0")
+    return {'last_n': None, 'days': value} if unit == 'd' else {'last_n': value, 'days': None}
+
+
+class TeamTimeIndex:
+    """
+    Índice temporal por equipo para estadísticas as-of.
+
+    Cada equipo guarda sus fechas ordenadas y las sumas acumuladas de
+    SERIES_METRICS, así cualquier agregado "antes de la fecha D en los últimos
+    N partidos o K días" se resuelve con dos búsquedas binarias y una resta.
+    """
+
+    def __init__(self, team_names: List[str], series: List[_TeamSeries]):
+        self._lock = threading.RLock()
+        self._team_names = list(team_names)
+        self._team_index = {name: i for i, name in enumerate(self._team_names)}
+        self._series = series
+
+    @classmethod
+    def from_dataset(cls, dataset: ColumnarDataset) -> 'TeamTimeIndex':
+        """Construir las series de todos los equipos en una pasada vectorizada"""
+        n_teams = len(dataset.team_names)
+        order = chronological_order(dataset['Date'])
+        n = len(order)
+
+        def column(name):
+            if name not in dataset:
+                return np.zeros(n)
+            return np.nan_to_num(np.asarray(dataset[name], dtype=np.float64)[order])
+
+        ftr = np.array([{'H': RESULT_WIN, 'D': RESULT_DRAW, 'A': RESULT_LOSS}.get(c, RESULT_DRAW)
+                        for c in dataset.dictionaries['FTR']], dtype=np.int8)[dataset['FTR'][order]]
+        dates = np.asarray(dataset['Date'])[order]
+        hg, ag = column('FTHG'), column('FTAG')
+
+        # Apariciones intercaladas (local, visitante) en orden cronológico
+        teams = np.empty(2 * n, dtype=np.asarray(dataset['HomeTeam']).dtype)
+        teams[0::2] = np.asarray(dataset['HomeTeam'])[order]
+        teams[1::2] = np.asarray(dataset['AwayTeam'])[order]
+        result = np.empty(2 * n, dtype=np.int8)
+        result[0::2], result[1::2] = ftr, RESULT_WIN - ftr
+
+        values = np.empty((2 * n, len(SERIES_METRICS)), dtype=np.float64)
+        metrics = {
+            'goals_for': (hg, ag),
+            'goals_against': (ag, hg),
+            'shots': (column('HS'), column('AS')),
+            'shots_on_target': (column('HST'), column('AST'))
+        }
+        for j, name in enumerate(SERIES_METRICS):
+            if name in metrics:
+                home_values, away_values = metrics[name]
+                values[0::2, j], values[1::2, j] = home_values, away_values
+        values[:, SERIES_METRICS.index('points')] = np.select(
+            [result == RESULT_WIN, result == RESULT_DRAW], [3, 1], 0)
+        values[:, SERIES_METRICS.index('wins')] = result == RESULT_WIN
+        values[:, SERIES_METRICS.index('draws')] = result == RESULT_DRAW
+        values[:, SERIES_METRICS.index('losses')] = result == RESULT_LOSS
+
+        by_team = np.argsort(teams, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(teams, minlength=n_teams)[:n_teams])])
+        appearance_dates = np.repeat(dates, 2)[by_team]
+        sorted_values = values[by_team]
+
+        series = [
+            _TeamSeries(appearance_dates[bounds[t]:bounds[t + 1]], sorted_values[bounds[t]:bounds[t + 1]])
+            for t in range(n_teams)
+        ]
+        return cls(dataset.team_names, series)
+
+    def apply_result(self, result, home_id: int, away_id: int):
+        """Añadir un resultado a las series de ambos equipos (llamado desde LiveStatsStore)"""
+        home_code = {'H': RESULT_WIN, 'D': RESULT_DRAW, 'A': RESULT_LOSS}[result.result]
+        extras = result.extras
+        home_values = np.zeros(len(SERIES_METRICS))
+        away_values = np.zeros(len(SERIES_METRICS))
+        for values, code, gf, ga, shots, on_target in (
+            (home_values, home_code, result.home_goals, result.away_goals, 'HS', 'HST'),
+            (away_values, RESULT_WIN - home_code, result.away_goals, result.home_goals, 'AS', 'AST')
+        ):
+            values[:] = [gf, ga, POINTS[code], extras.get(shots, 0.0), extras.get(on_target, 0.0),
+                         code == RESULT_WIN, code == RESULT_DRAW, code == RESULT_LOSS]
+
+        with self._lock:
+            for team_id, name, values in ((home_id, result.home_team, home_values),
+                                          (away_id, result.away_team, away_values)):
+                while team_id >= len(self._series):
+                    self._series.append(_TeamSeries(np.zeros(0, np.int32), np.zeros((0, len(SERIES_METRICS)))))
+                if name not in self._team_index:
+                    self._team_index[name] = team_id
+                    self._team_names.append(name)
+                self._series[team_id].append(result.date_days, values)
+
+    def window(self, team_name: str, as_of: Optional[str] = None,
+               last_n: Optional[int] = None, days: Optional[int] = None) -> Dict:
+        """
+        Agregados de un equipo antes de una fecha y dentro de una ventana.
+
+        Args:
+            team_name: Nombre del equipo
+            as_of: Fecha ISO; solo cuentan partidos anteriores (por defecto, todos)
+            last_n: Limitar a los últimos N partidos
+            days: Limitar a los últimos K días antes de as_of
+
+        Returns:
+            Dict con partidos, puntos, goles, tiros y promedios de la ventana
+
+        Raises:
+            ValueError: Si el equipo no existe o la fecha no es válida
+        """
+        if team_name not in self._team_index:
+            raise ValueError(f"Equipo no encontrado en datos históricos: {team_name}")
+
+        with self._lock:
+            s = self._series[self._team_index[team_name]]
+            dates = s.dates[:s.size]
+            as_of_days = iso_to_days(as_of) if as_of else None
+            if days is not None and as_of_days is None:
+                as_of_days = iso_to_days(date.today().isoformat())
+
+            end = s.size if as_of_days is None else int(np.searchsorted(dates, as_of_days, side='left'))
+            start = 0
+            if last_n is not None:
+                start = max(start, end - last_n)
+            if days is not None:
+                start = max(start, int(np.searchsorted(dates, as_of_days - days, side='left')))
+            totals = s.cum[end] - s.cum[start]
+            first_date = int(dates[start]) if end > start else None
+            last_date = int(dates[end - 1]) if end > start else None
+
+        matches = end - start
+        stats = {name: int(totals[j]) for j, name in enumerate(SERIES_METRICS)}
+        per_game = (lambda v: v / matches) if matches else (lambda v: 0.0)
+        return {
+            'team': team_name,
+            'as_of': as_of,
+            'last_n': last_n,
+            'days': days,
+            'matches': matches,
+            **stats,
+            'points_per_game': per_game(stats['points']),
+            'goals_per_game': per_game(stats['goals_for']),
+            'goals_conceded_per_game': per_game(stats['goals_against']),
+            'win_rate': per_game(stats['wins']),
+            'from_date': days_to_iso(first_date) if first_date is not None else None,
+            'to_date': days_to_iso(last_date) if last_date is not None else None
+        }
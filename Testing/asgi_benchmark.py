@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+ASGI Benchmark - LLM Premier League
+Compara el servidor Flask (hilo por petición) con el camino ASGI bajo los escenarios de LoadTester y una ráfaga de llamadas a Claude
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+import httpx
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+import load_stress_test  # noqa: E402
+from latency_histogram import LatencyHistogram  # noqa: E402
+from load_stress_test import LoadTester  # noqa: E402
+
+MOCK_LATENCY = 0.5
+BURST_REQUESTS = 1000
+BURST_TIMEOUT = 60.0
+SCENARIOS = ('light_load', 'medium_load', 'heavy_load', 'stress_test')
+VOLATILE_FIELDS = ('timestamp', 'claude_circuit', 'pid', 'threads', 'uptime_seconds')
+MIXED_REQUESTS = 40
+CONTRACT_REQUESTS = [
+    ('GET', '/api/health', None),
+    ('GET', '/api/teams', None),
+    ('GET', '/api/system', None),
+    ('POST', '/api/predict', {'home_team': 'Arsenal', 'away_team': 'Chelsea'}),
+    ('POST', '/api/predict', {'home_team': 'Arsenal'}),
+    ('POST', '/api/predict', {'home_team': 'Arsenal', 'away_team': 'Atlantis'}),
+    ('POST', '/api/analyze', {'team': 'Liverpool'}),
+    ('POST', '/api/analyze', {'team_name': 'Arsenal', 'as_of': '2023-01-01', 'window': '10'}),
+    ('POST', '/api/analyze', {'team_name': 'Arsenal', 'window': 'diez'}),
+    ('POST', '/api/chat', {'message': '¿Cómo llega el Arsenal?'}),
+    ('POST', '/api/chat', {}),
+    ('POST', '/api/toggle-ai', {'use_claude_ai': 'si'}),
+    ('POST', '/api/predict', {'home_team': 'Arsenal', 'away_team': 'Chelsea', 'mode': 'local'}),
+    ('POST', '/api/analyze', {'team': 'Liverpool', 'mode': 'turbo'}),
+    ('POST', '/api/predict/batch', {'fixtures': [{'home_team': 'Arsenal', 'away_team': 'Chelsea'},
+                                                 {'home_team': 'Liverpool', 'away_team': 'Atlantis'}]}),
+    ('POST', '/api/predict/batch', {'fixtures': []}),
+    ('GET', '/api/health/claude', None),
+    ('POST', '/api/stats/results', {'Date': '2025-05-25', 'HomeTeam': 'Arsenal', 'AwayTeam': 'Chelsea',
+                                    'FTHG': 2, 'FTAG': 1}),
+    ('POST', '/api/stats/results', {'HomeTeam': 'Arsenal', 'AwayTeam': 'Arsenal', 'FTHG': 2, 'FTAG': 1}),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def claude_client(mock_url: str, asynchronous: bool):
+    """Mismo cliente en ambos caminos: sin límite efectivo de concurrencia y con circuit breaker"""
+    from async_claude_client import AsyncClaudeClient, BlockingClaudeClient
+    from circuit_breaker import AsyncCircuitBreakerClient, CircuitBreaker, CircuitBreakerClient
+
+    client = AsyncClaudeClient(api_key='mock', base_url=mock_url, max_concurrency=BURST_REQUESTS)
+    if asynchronous:
+        return AsyncCircuitBreakerClient(client, CircuitBreaker())
+    return CircuitBreakerClient(BlockingClaudeClient(client), CircuitBreaker())
+
+
+def create_flask_app(engine, claude):
+    """Handlers Flask equivalentes sobre el mismo PremierLeagueEngine que el camino ASGI"""
+    from flask import Flask, jsonify, request
+    from api_engine import ADMIN_TOKEN_HEADER, AI_MODE_HEADER, ApiError, admin_authorized, claude_health
+    from claude_client import ClaudeAPIError
+    from response_cache import ResponseCache, cache_key
+    from speculative import SpeculativePredictor
+
+    app = Flask(__name__)
+    cache = ResponseCache()
+    speculative = SpeculativePredictor.from_env()
+
+    def ask_claude(prompt, parse, fallback, key=None, mode='claude'):
+        def compute():
+            return parse(claude.complete(prompt))
+
+        def remote():
+            return cache.get_or_compute(key, compute) if key is not None else compute()
+
+        if mode == 'speculative':
+            budget = float(request.headers.get('X-Latency-Budget', speculative.budget))
+            return speculative.predict(fallback, remote, budget=budget)
+        try:
+            return remote(), 'claude'
+        except (ClaudeAPIError, ValueError):
+            return fallback(), 'local_fallback'
+
+    def request_mode(payload):
+        return engine.request_mode(payload, request.headers.get(AI_MODE_HEADER))
+
+    def enabled(mode):
+        return mode != 'local' and claude.available
+
+    def with_source(response, mode, source):
+        if mode == 'speculative':
+            response['source'] = source
+        return jsonify(response)
+
+    def key(endpoint, home_team, away_team):
+        teams = (home_team, away_team) if away_team else (home_team,)
+        return cache_key(endpoint, home_team, away_team, model=engine.model,
+                         data_version=engine.live_stats.teams_version(*teams))
+
+    @app.errorhandler(ApiError)
+    def api_error(e):
+        return jsonify({'success': False, 'error': str(e)}), e.status_code
+
+    @app.before_request
+    def count():
+        engine.count(request.path)
+
+    @app.route('/api/health')
+    def health():
+        return jsonify(engine.health(claude))
+
+    @app.route('/api/health/claude')
+    def health_claude():
+        return jsonify({'success': True, **claude_health(claude, engine.use_claude_ai)})
+
+    @app.route('/api/stats/results', methods=['POST'])
+    def ingest_result():
+        if not admin_authorized(request.headers.get(ADMIN_TOKEN_HEADER), request.remote_addr):
+            return jsonify({'success': False, 'error': 'No autorizado'}), 403
+        return jsonify(engine.ingest_result(request.get_json(silent=True)))
+
+    @app.route('/api/teams')
+    def teams():
+        return jsonify(engine.teams_payload())
+
+    @app.route('/api/stats')
+    def stats():
+        return jsonify(engine.stats({'response_cache': cache.stats(), 'claude_calls': claude.stats()}))
+
+    @app.route('/api/system')
+    def system():
+        return jsonify(engine.system())
+
+    @app.route('/api/toggle-ai', methods=['POST'])
+    def toggle_ai():
+        return jsonify(engine.toggle(request.get_json(silent=True)))
+
+    @app.route('/api/predict', methods=['POST'])
+    def predict():
+        payload = request.get_json(silent=True)
+        fixture = engine.parse_match(payload)
+        mode = request_mode(payload)
+        if not enabled(mode):
+            prediction, source = engine.local_prediction(fixture), 'local'
+        else:
+            prediction, source = ask_claude(engine.prediction_prompt(fixture),
+                                            lambda text: engine.parse_prediction(text, fixture),
+                                            lambda: engine.local_prediction(fixture),
+                                            key('predict', fixture.home_team, fixture.away_team), mode)
+        return with_source({'success': True, 'prediction': prediction}, mode, source)
+
+    @app.route('/api/analyze', methods=['POST'])
+    def analyze():
+        payload = request.get_json(silent=True) or {}
+        team_name = engine.parse_team(payload)
+        window_stats = engine.window_stats(team_name, {**request.args, **payload})
+        mode = request_mode(payload)
+        if not enabled(mode):
+            analysis, source = engine.local_analysis(team_name), 'local'
+        else:
+            analysis, source = ask_claude(engine.analysis_prompt(team_name),
+                                          lambda text: engine.parse_analysis(text, team_name),
+                                          lambda: engine.local_analysis(team_name),
+                                          key('analyze', team_name, None), mode)
+        response = {'success': True, 'analysis': analysis}
+        if window_stats is not None:
+            response['window_stats'] = window_stats
+        market = engine.market_stats(team_name)
+        if market is not None:
+            response['market'] = market
+        return with_source(response, mode, source)
+
+    @app.route('/api/chat', methods=['POST'])
+    def chat():
+        payload = request.get_json(silent=True)
+        question = engine.parse_question(payload)
+        mode = request_mode(payload)
+        if not enabled(mode):
+            answer, source = engine.local_chat(question), 'local'
+        else:
+            answer, source = ask_claude(engine.chat_prompt(question), lambda text: text,
+                                        lambda: engine.local_chat(question), mode=mode)
+        return with_source({'success': True, 'response': answer}, mode, source)
+
+    @app.route('/api/predict/batch', methods=['POST'])
+    def predict_batch():
+        payload = request.get_json(silent=True)
+        table, fixtures, errors = engine.parse_batch(payload)
+        mode = request_mode(payload)
+        complete = claude.complete if enabled(mode) else None
+        budget = float(request.headers.get('X-Latency-Budget', speculative.budget))
+        return jsonify(engine.batch_prediction(table, fixtures, errors, complete=complete, mode=mode, budget=budget))
+
+    return app
+
+
+def serve_mock(port: int):
+    from mock_claude_server import start_mock_server
+    start_mock_server(port, latency=MOCK_LATENCY)
+    threading.Event().wait()
+
+
+def serve_flask(port: int, mock_url: str):
+    from werkzeug.serving import make_server
+    from api_engine import PremierLeagueEngine
+    from columnar_cache import load_dataset
+    from goals_model import fit_goals_model
+    from live_stats import LiveStatsStore
+    from market_odds import fit_market_model
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    claude = claude_client(mock_url, asynchronous=False)
+    dataset = load_dataset()
+    engine = PremierLeagueEngine(LiveStatsStore.from_dataset(dataset), model=claude.model,
+                                 goals_model=fit_goals_model(dataset), market_model=fit_market_model(dataset))
+    server = make_server('127.0.0.1', port, create_flask_app(engine, claude), threaded=True)
+    server.socket.listen(BURST_REQUESTS)  # Mismo backlog que uvicorn para la ráfaga
+    server.serve_forever()
+
+
+def serve_asgi(port: int, mock_url: str):
+    import uvicorn
+    from asgi_server import create_asgi_app
+
+    app = create_asgi_app(use_claude_ai=False, claude=claude_client(mock_url, asynchronous=True))
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning', backlog=2048)
+
+
+def start_process(target, *args) -> multiprocessing.Process:
+    process = multiprocessing.get_context('fork').Process(target=target, args=args, daemon=True)
+    process.start()
+    return process
+
+
+def wait_ready(base_url: str):
+    for _ in range(200):
+        try:
+            requests.get(f"{base_url}/api/health", timeout=2)
+            return
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError(f"El servidor no arrancó: {base_url}")
+
+
+def process_usage(pid: int) -> dict:
+    """Hilos y memoria residente (MB) de un proceso, leídos de /proc"""
+    usage = {'threads': 0, 'rss_mb': 0.0}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    usage['threads'] = int(line.split()[1])
+                elif line.startswith('VmRSS:'):
+                    usage['rss_mb'] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return usage
+
+
+def contract_responses(base_url: str) -> list:
+    """Respuestas en modo local sin los campos que cambian en cada llamada"""
+    responses = []
+    for method, path, payload in CONTRACT_REQUESTS:
+        response = requests.request(method, f"{base_url}{path}", json=payload, timeout=10)
+        body = response.json()
+        for field in VOLATILE_FIELDS:
+            body.pop(field, None)
+        responses.append({'request': f"{method} {path}", 'status': response.status_code, 'body': body})
+    return responses
+
+
+async def mixed_modes(base_url: str) -> dict:
+    """
+    Peticiones local y claude a la vez contra el mismo servidor (header X-AI-Mode), sin toggles,
+    y una predicción especulativa con presupuesto por debajo de la latencia del mock
+    """
+    from mock_claude_server import MOCK_TEXT
+
+    async with httpx.AsyncClient(timeout=BURST_TIMEOUT) as client:
+        async def ask(i: int, mode: str):
+            response = await client.post(f"{base_url}/api/chat", headers={'X-AI-Mode': mode},
+                                         json={'question': f"¿Cómo llega el Arsenal a la jornada {i}?"})
+            return mode, response.json().get('response') == MOCK_TEXT
+
+        answers = await asyncio.gather(*(ask(i, ('local', 'claude')[i % 2]) for i in range(MIXED_REQUESTS)))
+        match = {'home_team': 'Everton', 'away_team': 'Fulham', 'mode': 'speculative'}
+        budget = {'X-Latency-Budget': str(MOCK_LATENCY / 5)}
+        first = (await client.post(f"{base_url}/api/predict", json=match, headers=budget)).json()
+        await asyncio.sleep(MOCK_LATENCY * 2)  # La llamada tardía termina y queda en el cache
+        second = (await client.post(f"{base_url}/api/predict", json=match, headers=budget)).json()
+        stats = (await client.get(f"{base_url}/api/stats")).json()
+    return {
+        'routed': all(from_claude == (mode == 'claude') for mode, from_claude in answers),
+        'speculative_sources': [first.get('source'), second.get('source')],
+        'default_unchanged': stats['use_claude_ai'] is False,
+        'requests_by_mode': stats.get('requests_by_mode')
+    }
+
+
+async def burst(base_url: str) -> dict:
+    """BURST_REQUESTS preguntas distintas a /api/chat a la vez: todas acaban en Claude"""
+    limits = httpx.Limits(max_connections=BURST_REQUESTS, max_keepalive_connections=0)
+    async with httpx.AsyncClient(limits=limits, timeout=BURST_TIMEOUT) as client:
+        async def ask(i: int):
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{base_url}/api/chat", headers={'X-AI-Mode': 'claude'},
+                                             json={'question': f"¿Quién gana la jornada {i}?"})
+                ok = response.status_code == 200 and response.json().get('success')
+            except httpx.HTTPError:
+                ok = False
+            return ok, time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(ask(i) for i in range(BURST_REQUESTS)))
+        elapsed = time.perf_counter() - start
+    histogram = LatencyHistogram(latency for _, latency in results)
+    return {
+        'requests': BURST_REQUESTS,
+        'failed': sum(1 for ok, _ in results if not ok),
+        'seconds': elapsed,
+        'latency': histogram.summary(),
+        'p50': histogram.value_at_percentile(50),
+        'p99': histogram.value_at_percentile(99)
+    }
+
+
+def run_burst(base_url: str, pid: int) -> dict:
+    peak = {'threads': 0, 'rss_mb': 0.0}
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            usage = process_usage(pid)
+            peak['threads'] = max(peak['threads'], usage['threads'])
+            peak['rss_mb'] = max(peak['rss_mb'], usage['rss_mb'])
+            time.sleep(0.05)
+
+    idle = process_usage(pid)
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        stats = asyncio.run(burst(base_url))
+    finally:
+        done.set()
+        sampler.join()
+    claude_calls = requests.get(f"{base_url}/api/stats", timeout=10).json().get('claude_calls') or {}
+    return {**stats, 'idle': idle, 'peak_threads': peak['threads'], 'peak_rss_mb': round(peak['rss_mb'], 1),
+            'claude_peak_active': claude_calls.get('peak_active')}
+
+
+def run_server(name: str, target, mock_url: str) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = start_process(target, port, mock_url)
+    results = {}
+    try:
+        wait_ready(base_url)
+        print(f"\n🖥️ {name} en {base_url} (pid {process.pid})")
+        results['contract'] = contract_responses(base_url)
+        results['modes'] = asyncio.run(mixed_modes(base_url))
+        m = results['modes']
+        print(f"   🔀 Modos por petición: {'OK' if m['routed'] else 'MAL ENRUTADOS'}, "
+              f"especulativo {' → '.join(str(s) for s in m['speculative_sources'])}")
+
+        load_stress_test.API_BASE_URL = f"{base_url}/api"
+        tester = LoadTester()
+        tester.toggle_ai_mode(True)
+        chat = next(e for e in tester.test_endpoints if e['name'] == 'chat_simple')
+        results['scenarios'] = {}
+        for scenario in SCENARIOS:
+            stats = tester.run_load_test(scenario, chat, 'claude')
+            stats['errors'] = len(stats['errors'])
+            results['scenarios'][scenario] = stats
+
+        results['burst'] = run_burst(base_url, process.pid)
+        b = results['burst']
+        print(f"   💥 Ráfaga de {b['requests']}: {b['seconds']:.2f}s, {b['failed']} fallidas, "
+              f"p99 {b['p99']:.2f}s, {b['peak_threads']} hilos, {b['peak_rss_mb']:.0f} MB, "
+              f"{b['claude_peak_active']} llamadas a Claude en vuelo")
+    finally:
+        os.kill(process.pid, signal.SIGTERM)
+        process.join(timeout=10)
+    return results
+
+
+def main():
+    print("⚡ LLM PREMIER LEAGUE - ASGI vs FLASK BENCHMARK")
+    print("=" * 70)
+    mock_port = free_port()
+    mock = start_process(serve_mock, mock_port)
+    mock_url = f"http://127.0.0.1:{mock_port}/v1/messages"
+    results = {'timestamp': datetime.now().isoformat(), 'mock_latency': MOCK_LATENCY}
+    try:
+        results['flask'] = run_server('Flask (hilo por petición)', serve_flask, mock_url)
+        results['asgi'] = run_server('ASGI (asyncio)', serve_asgi, mock_url)
+    finally:
+        mock.terminate()
+        mock.join(timeout=5)
+
+    flask, asgi = results['flask'], results['asgi']
+    print("\n📊 RPS por escenario (Flask → ASGI)")
+    for scenario in SCENARIOS:
+        f, a = flask['scenarios'][scenario], asgi['scenarios'][scenario]
+        print(f"   {scenario:<12} {f['requests_per_second']:>6.1f} → {a['requests_per_second']:>6.1f} RPS   "
+              f"p95 {f['percentile_95']:.2f}s → {a['percentile_95']:.2f}s")
+
+    checks = {
+        'identical_contracts': flask['contract'] == asgi['contract'],
+        'modes_routed_per_request': all(r['modes']['routed'] and r['modes']['default_unchanged']
+                                        for r in (flask, asgi)),
+        'speculative_late_result_cached': all(r['modes']['speculative_sources'] == ['local', 'claude']
+                                              for r in (flask, asgi)),
+        'asgi_scenarios_succeeded': all(s['success_rate'] == 1.0 for s in asgi['scenarios'].values()),
+        'asgi_burst_succeeded': asgi['burst']['failed'] == 0,
+        'asgi_burst_all_in_flight': (asgi['burst']['claude_peak_active'] or 0) >= BURST_REQUESTS * 0.9,
+        'asgi_fewer_threads': asgi['burst']['peak_threads'] < flask['burst']['peak_threads']
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"asgi_benchmark_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
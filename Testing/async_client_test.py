@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Async Claude Client Test - LLM Premier League
+Compara el cliente bloqueante (hilo por petición) con el cliente asíncrono contra un mock local de Claude
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from async_claude_client import AsyncClaudeClient, BlockingClaudeClient  # noqa: E402
+from batch_predict import parse_fixtures, predict_batch  # noqa: E402
+from claude_client import ClaudeAPIError, ClaudeClient, deadline_scope  # noqa: E402
+from mock_claude_server import start_mock_server  # noqa: E402
+
+CONCURRENT_USERS = 50
+MOCK_LATENCY = 0.5
+MAX_CONCURRENCY = 8
+SHORT_DEADLINE = 0.2
+
+
+def prompts(count: int, distinct: bool = True):
+    return [f"¿Quién gana Arsenal vs Chelsea? (usuario {i if distinct else 0})" for i in range(count)]
+
+
+def run_blocking(url: str) -> dict:
+    """Modelo actual: una llamada bloqueante por hilo de petición"""
+    client = ClaudeClient(api_key='mock', base_url=url, dedupe=False)
+    errors = []
+
+    def call(prompt):
+        try:
+            client.complete(prompt, max_tokens=50)
+        except ClaudeAPIError as e:
+            errors.append(str(e))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=call, args=(p,)) for p in prompts(CONCURRENT_USERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {'seconds': time.perf_counter() - start, 'errors': len(errors)}
+
+
+async def run_async(url: str, distinct: bool = True) -> dict:
+    """Cliente asíncrono: semáforo global y pool de conexiones persistente"""
+    client = AsyncClaudeClient(api_key='mock', base_url=url, max_concurrency=MAX_CONCURRENCY)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(client.complete(p, max_tokens=50) for p in prompts(CONCURRENT_USERS, distinct)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    stats = client.stats()
+    await client.aclose()
+    return {
+        'seconds': elapsed,
+        'errors': sum(1 for r in results if isinstance(r, Exception)),
+        'client_stats': stats
+    }
+
+
+async def run_deadline(url: str) -> dict:
+    """Un deadline más corto que la latencia debe cortar la llamada a tiempo"""
+    client = AsyncClaudeClient(api_key='mock', base_url=url)
+    start = time.perf_counter()
+    try:
+        with deadline_scope(SHORT_DEADLINE):
+            await client.complete("Deadline corto")
+        failed = False
+    except ClaudeAPIError:
+        failed = True
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    return {'seconds': elapsed, 'timed_out': failed}
+
+
+def run_bridge(url: str) -> dict:
+    """Hilos tipo Flask usando BlockingClaudeClient (un solo event loop compartido)"""
+    bridge = BlockingClaudeClient(AsyncClaudeClient(api_key='mock', base_url=url, max_concurrency=MAX_CONCURRENCY))
+    errors = []
+
+    def call(prompt):
+        try:
+            bridge.complete(prompt, max_tokens=50)
+        except ClaudeAPIError as e:
+            errors.append(str(e))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=call, args=(p,)) for p in prompts(CONCURRENT_USERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stats = bridge.stats()
+    bridge.close()
+    return {'seconds': elapsed, 'errors': len(errors), 'client_stats': stats}
+
+
+def run_batch_all_invalid(url: str) -> dict:
+    """/api/predict/batch en modo Claude con todos los partidos inválidos: solo errores, sin llamar a Claude"""
+    from columnar_cache import load_dataset
+    from live_stats import LiveStatsStore
+
+    table = LiveStatsStore.from_dataset(load_dataset()).snapshot()
+    fixtures, errors = parse_fixtures({'fixtures': [{'home_team': 'Atlantis', 'away_team': 'Chelsea'},
+                                                    {'home_team': 'Arsenal', 'away_team': 'Arsenal'}]},
+                                      table.team_names)
+    bridge = BlockingClaudeClient(AsyncClaudeClient(api_key='mock', base_url=url))
+    try:
+        results = predict_batch(fixtures, table, complete=bridge.complete)
+        error = None
+    except Exception as e:
+        results, error = None, f"{type(e).__name__}: {e}"
+    finally:
+        bridge.close()
+    return {'seconds': 0.0, 'errors': int(error is not None), 'error': error, 'results': results,
+            'invalid': len(errors)}
+
+
+def scenario(name: str, latency: float, fn, *args) -> dict:
+    server, state, url = start_mock_server(latency=latency)
+    try:
+        result = fn(url, *args)
+        if asyncio.iscoroutine(result):
+            result = asyncio.run(result)
+        result['mock'] = state.stats()
+        return result
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    print("⚡ LLM PREMIER LEAGUE - ASYNC CLAUDE CLIENT TEST")
+    print("=" * 70)
+    print(f"👥 {CONCURRENT_USERS} usuarios concurrentes, mock con {MOCK_LATENCY}s de latencia, "
+          f"límite de {MAX_CONCURRENCY} llamadas simultáneas\n")
+
+    results = {'timestamp': datetime.now().isoformat(), 'scenarios': {}}
+    s = results['scenarios']
+    s['blocking_threads'] = scenario('blocking', MOCK_LATENCY, run_blocking)
+    s['async_client'] = scenario('async', MOCK_LATENCY, run_async)
+    s['async_identical_prompts'] = scenario('dedupe', MOCK_LATENCY, run_async, False)
+    s['blocking_bridge'] = scenario('bridge', MOCK_LATENCY, run_bridge)
+    s['deadline'] = scenario('deadline', MOCK_LATENCY, run_deadline)
+    s['batch_all_invalid'] = scenario('batch', MOCK_LATENCY, run_batch_all_invalid)
+
+    print(f"{'Escenario':<26} {'Tiempo':>9} {'Errores':>8} {'Pico mock':>10} {'Conexiones':>11} {'Llamadas':>9}")
+    print("-" * 78)
+    for name, r in s.items():
+        if name in ('deadline', 'batch_all_invalid'):
+            continue
+        print(f"{name:<26} {r['seconds']:>8.2f}s {r['errors']:>8} {r['mock']['peak_active']:>10} "
+              f"{r['mock']['connections']:>11} {r['mock']['requests']:>9}")
+
+    deadline = s['deadline']
+    print(f"\n⏱️  Deadline de {SHORT_DEADLINE}s: {'cortado' if deadline['timed_out'] else 'NO cortado'} "
+          f"en {deadline['seconds']:.2f}s (latencia del mock {MOCK_LATENCY}s)")
+
+    checks = {
+        'concurrency_limited': s['async_client']['mock']['peak_active'] <= MAX_CONCURRENCY,
+        'connections_reused': s['async_client']['mock']['connections'] <= MAX_CONCURRENCY,
+        'bridge_limited': s['blocking_bridge']['mock']['peak_active'] <= MAX_CONCURRENCY,
+        'identical_prompts_deduplicated': s['async_identical_prompts']['mock']['requests'] == 1,
+        'deadline_enforced': deadline['timed_out'] and deadline['seconds'] < MOCK_LATENCY,
+        'batch_all_invalid_no_claude_call': (s['batch_all_invalid']['results'] == []
+                                             and s['batch_all_invalid']['invalid'] == 2
+                                             and s['batch_all_invalid']['mock']['requests'] == 0),
+        'no_errors': all(s[n]['errors'] == 0 for n in ('async_client', 'async_identical_prompts', 'blocking_bridge'))
+    }
+    results['checks'] = checks
+
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"async_client_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Backtest Benchmark - LLM Premier League
+Compara los motores locales en un backtest walk-forward y verifica el replay de Claude (sin coste de API)
+"""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from backtest import run_backtest  # noqa: E402
+from columnar_cache import load_dataset  # noqa: E402
+from mock_claude_server import start_mock_server  # noqa: E402
+
+LOCAL_ENGINES = ('averages', 'goals', 'goals_market')
+CLAUDE_SEASON = '2023-24'
+MOCK_LATENCY = 0.01
+MAX_SECONDS = 60.0
+METRICS = ('log_loss', 'brier', 'rps', 'accuracy')
+
+
+def main():
+    print("🧪 LLM PREMIER LEAGUE - BACKTEST BENCHMARK")
+    print("=" * 70)
+    dataset = load_dataset()
+    results = {'timestamp': datetime.now().isoformat(), 'engines': {}}
+
+    print("📅 Walk-forward por jornada, todas las temporadas con historial previo")
+    print(f"   {'Motor':<14} {'partidos':>8} {'log-loss':>9} {'Brier':>7} {'RPS':>7} {'acierto':>8} {'ajuste':>7} "
+          f"{'total':>7}")
+    for engine in LOCAL_ENGINES:
+        summary = run_backtest(engine, dataset=dataset)
+        overall = summary['overall']
+        results['engines'][engine] = {**overall, 'seconds': summary['seconds'],
+                                      'seasons': {r['season']: {m: r[m] for m in METRICS}
+                                                  for r in summary['seasons']}}
+        print(f"   {engine:<14} {overall['matches']:>8} {overall['log_loss']:>9.4f} {overall['brier']:>7.4f} "
+              f"{overall['rps']:>7.4f} {overall['accuracy']:>8.1%} {overall['fit_seconds']:>6.1f}s "
+              f"{summary['seconds']:>6.1f}s")
+
+    parallel = run_backtest('goals_market', dataset=dataset, workers=2)
+    results['parallel'] = {'workers': parallel['workers'], 'seconds': parallel['seconds']}
+    print(f"\n⚙️ goals_market con {parallel['workers']} procesos: {parallel['seconds']:.1f}s "
+          f"({os.cpu_count()} CPU)")
+
+    print(f"\n🎞️ Modo Claude con replay ({CLAUDE_SEASON}, mock de Claude)")
+    server, state, url = start_mock_server(latency=MOCK_LATENCY)
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {'replay_path': os.path.join(tmp, 'replay.jsonl'), 'base_url': url, 'api_key': 'mock'}
+        runs = []
+        for label in ('grabación', 'replay'):
+            before = state.stats()['requests']
+            summary = run_backtest('claude', [CLAUDE_SEASON], dataset=dataset, claude_config=config)
+            runs.append({**summary['replay'], 'mock_requests': state.stats()['requests'] - before,
+                         **{m: summary['overall'][m] for m in METRICS}, 'seconds': summary['seconds']})
+            print(f"   {label:<10} {runs[-1]['mock_requests']:>4} llamadas a la API, {runs[-1]['hits']:>4} del replay, "
+                  f"{runs[-1]['seconds']:.1f}s")
+    server.shutdown()
+    results['claude_replay'] = runs
+
+    engines = results['engines']
+    checks = {
+        'local_suite_under_60s': all(e['seconds'] < MAX_SECONDS for e in engines.values()),
+        'goals_beats_averages': engines['goals']['log_loss'] < engines['averages']['log_loss'],
+        'market_beats_goals': engines['goals_market']['log_loss'] < engines['goals']['log_loss'],
+        'parallel_matches_serial': all(abs(parallel['overall'][m] - engines['goals_market'][m]) < 1e-12
+                                       for m in METRICS),
+        'replay_records_calls': runs[0]['mock_requests'] > 0 and runs[0]['new_responses'] == runs[0]['mock_requests'],
+        'replay_zero_api_calls': runs[1]['mock_requests'] == 0 and runs[1]['upstream_calls'] == 0,
+        'replay_same_scores': all(runs[0][m] == runs[1][m] for m in METRICS)
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"backtest_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
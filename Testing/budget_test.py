@@ -4,10 +4,13 @@ Budget-Friendly Test Suite - LLM Premier League
 Tests económicos que no consumen todos tus tokens 💸
 """
 
-import subprocess
-import sys
+import os
+import threading
 import time
 from datetime import datetime
+from functools import partial
+
+from suite_runner import TESTING_DIR, Job, ProgressPrinter, run_jobs, run_script, start_api_server
 
 class BudgetTester:
     def __init__(self):
@@ -27,51 +30,65 @@ class BudgetTester:
         }
         
         self.results = {}
+        self.results_dir = os.path.join(TESTING_DIR, 'results')
+        self.run_dir = os.path.join(self.results_dir, f"budget_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        self.progress = ProgressPrinter()
+        self._servers = []
+        self._servers_lock = threading.Lock()
+    
+    def start_server(self, test_name, inputs):
+        """Servidor propio para el test: sus medidas no compiten con la carga del otro"""
+        server = start_api_server(f"servidor {test_name}",
+                                  log_path=os.path.join(self.run_dir, f"server_{test_name}.log"))
+        with self._servers_lock:
+            self._servers.append(server)
+        return server
     
-    def run_budget_test(self, test_name):
+    def run_budget_test(self, test_name, inputs):
         """Ejecutar un test económico"""
         test_info = self.tests[test_name]
+        server = inputs[f"server:{test_name}"]
         
-        print(f"\n🚀 EJECUTANDO: {test_info['description']}")
-        print(f"⏱️  Duración: {test_info['duration']}")
-        print(f"💰 Costo: {test_info['cost']}")
-        print("-" * 50)
+        self.progress(test_name, f"🚀 EJECUTANDO: {test_info['description']} contra {server.url}")
+        self.progress(test_name, f"⏱️  Duración: {test_info['duration']} | 💰 Costo: {test_info['cost']}")
         
-        try:
-            result = subprocess.run([
-                sys.executable, test_info['script']
-            ], capture_output=True, text=True, timeout=600)  # 10 min max
-            
-            if result.returncode == 0:
-                print(f"✅ {test_name.upper()} completado!")
-                return True
-            else:
-                print(f"❌ Error: {result.stderr}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Excepción: {e}")
-            return False
+        result = run_script(test_name, test_info['script'],
+                            ['--base-url', server.url, '--output', os.path.join(self.run_dir, f"{test_name}.json")],
+                            progress=self.progress, log_path=os.path.join(self.run_dir, f"{test_name}.log"),
+                            timeout=600)  # 10 min max
+        
+        if result['success']:
+            self.progress(test_name, f"✅ {test_name.upper()} completado!")
+        else:
+            self.progress(test_name, f"❌ Error (código {result['returncode']})")
+        return result['success']
     
     def run_budget_suite(self):
         """Suite económica completa"""
         print("💸 LLM PREMIER LEAGUE - DETAILED BUDGET TESTING SUITE")
         print("=" * 70)
         print("🎯 Objetivo: Análisis detallado con consumo moderado")
-        print("⏱️  Duración total: ~12 minutos")
+        print("⏱️  Duración total: ~8 minutos (los dos tests en paralelo)")
         print("💰 Costo total: ~16 requests (vs 200+ de la suite completa)")
         print("🔍 Comparaciones precisas: Toggle ON vs OFF con métricas detalladas")
         
-        success_count = 0
+        os.makedirs(self.run_dir, exist_ok=True)
         start_time = time.time()
         
-        for test_name in self.tests.keys():
-            if self.run_budget_test(test_name):
-                success_count += 1
-            
-            # Pausa corta entre tests
-            if test_name != list(self.tests.keys())[-1]:
-                time.sleep(5)
+        # Los dos tests a la vez, cada uno contra su servidor
+        jobs = []
+        for test_name in self.tests:
+            jobs.append(Job(f"server:{test_name}", partial(self.start_server, test_name)))
+            jobs.append(Job(test_name, partial(self.run_budget_test, test_name), [f"server:{test_name}"]))
+        try:
+            outcomes = run_jobs(jobs)
+        finally:
+            for server in self._servers:
+                server.stop()
+        for name, outcome in outcomes.items():
+            if not outcome['success'] and not outcome['skipped']:
+                print(f"❌ {name}: {outcome['error']}")
+        success_count = sum(1 for name in self.tests if outcomes[name]['success'] and outcomes[name]['value'])
         
         total_time = time.time() - start_time
         
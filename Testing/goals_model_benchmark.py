@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Goals Model Benchmark - LLM Premier League
+Mide el ajuste del modelo de Poisson / Dixon-Coles y compara su precisión con las medias simples en la última temporada
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from backtest import prediction_probabilities, rows_before, score_probabilities  # noqa: E402
+from batch_predict import Fixture, predict_local_batch  # noqa: E402
+from columnar_cache import ColumnarDataset, iso_to_days, load_dataset  # noqa: E402
+from goals_model import fit_goals_model  # noqa: E402
+from stats_engine import compute_team_stats  # noqa: E402
+from stats_engine_benchmark import replicate_as_leagues, time_call  # noqa: E402
+
+HOLDOUT_FROM = '2023-08-01'  # Temporada 2023-24
+MAX_FIT_SECONDS = 1.0
+VARIANTS = {
+    'poisson': {'time_decay': 0.0, 'dixon_coles': False},
+    'poisson_decay': {'dixon_coles': False},
+    'dixon_coles_decay': {}
+}
+
+
+def holdout_fixtures(dataset: ColumnarDataset, as_of: str):
+    """Partidos desde as_of con su resultado (0 local, 1 empate, 2 visitante)"""
+    dates = np.asarray(dataset['Date'])
+    home, away = dataset.decode('HomeTeam'), dataset.decode('AwayTeam')
+    ftr = dataset.decode('FTR')
+    fixtures, outcomes = [], []
+    for i in np.flatnonzero(dates >= iso_to_days(as_of)):
+        if ftr[i] in ('H', 'D', 'A'):
+            fixtures.append(Fixture(len(fixtures), home[i], away[i]))
+            outcomes.append('HDA'.index(ftr[i]))
+    return fixtures, np.array(outcomes)
+
+
+def score(predictions, outcomes) -> dict:
+    """Log-loss, Brier, RPS y acierto del resultado más probable"""
+    return score_probabilities(prediction_probabilities(predictions), outcomes)
+
+
+def main():
+    print("⚽ LLM PREMIER LEAGUE - GOALS MODEL BENCHMARK")
+    print("=" * 70)
+    dataset = load_dataset()
+    results = {'timestamp': datetime.now().isoformat(), 'fit': {}, 'holdout': {}}
+
+    print("⏱️ Ajuste completo (mejor de varias ejecuciones)")
+    for factor in (1, 10):
+        scaled = replicate_as_leagues(dataset, factor)
+        seconds = time_call(fit_goals_model, scaled)
+        results['fit'][factor] = {'rows': len(scaled), 'teams': len(scaled.team_names), 'seconds': seconds}
+        print(f"   {factor:>3}x  {len(scaled):>6} partidos, {len(scaled.team_names):>4} equipos: "
+              f"{seconds * 1000:8.1f} ms")
+
+    model = fit_goals_model(dataset)
+    table = compute_team_stats(dataset)
+    season = [Fixture(i, h, a) for i, (h, a) in enumerate(
+        (h, a) for h in table.team_names[:20] for a in table.team_names[:20] if h != a)]
+    averages_seconds = time_call(predict_local_batch, table, season)
+    model_seconds = time_call(predict_local_batch, table, season, model)
+    lookups = 10000
+    start = time.perf_counter()
+    for _ in range(lookups):
+        model.lookup('Arsenal', 'Chelsea')
+    lookup_us = (time.perf_counter() - start) / lookups * 1e6
+    results['predict'] = {'fixtures': len(season), 'averages_seconds': averages_seconds,
+                          'model_seconds': model_seconds, 'lookup_microseconds': lookup_us}
+    print(f"\n📋 {len(season)} partidos en local: medias {averages_seconds * 1000:.1f} ms, "
+          f"modelo {model_seconds * 1000:.1f} ms; lookup de un partido {lookup_us:.1f} µs")
+
+    print(f"\n🎯 Temporada de validación desde {HOLDOUT_FROM} (ajuste solo con partidos anteriores)")
+    train = rows_before(dataset, HOLDOUT_FROM)
+    fixtures, outcomes = holdout_fixtures(dataset, HOLDOUT_FROM)
+    train_table = compute_team_stats(train)
+    # Equipos recién ascendidos sin partidos previos no se pueden evaluar con ningún método
+    known = [f for f in fixtures if train_table.matches_played[train_table.team_id(f.home_team)] > 0
+             and train_table.matches_played[train_table.team_id(f.away_team)] > 0]
+    known_outcomes = outcomes[[f.index for f in known]]
+    results['holdout']['matches'] = len(known)
+    results['holdout']['averages'] = score(predict_local_batch(train_table, known), known_outcomes)
+    for name, kwargs in VARIANTS.items():
+        variant = fit_goals_model(train, **kwargs)
+        results['holdout'][name] = {**score(predict_local_batch(train_table, known, variant), known_outcomes),
+                                    'rho': variant.rho}
+    print(f"   {'Método':<20} {'log-loss':>9} {'Brier':>7} {'acierto':>8}")
+    for name in ('averages', *VARIANTS):
+        r = results['holdout'][name]
+        print(f"   {name:<20} {r['log_loss']:>9.4f} {r['brier']:>7.4f} {r['accuracy']:>8.1%}")
+
+    sums = model.probabilities.sum(axis=-1)
+    checks = {
+        'fit_under_1s': results['fit'][1]['seconds'] < MAX_FIT_SECONDS,
+        'fit_10x_under_1s': results['fit'][10]['seconds'] < MAX_FIT_SECONDS,
+        'probabilities_normalized': bool(np.allclose(sums, 1.0)),
+        'model_beats_averages': results['holdout']['dixon_coles_decay']['log_loss']
+        < results['holdout']['averages']['log_loss']
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"goals_model_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
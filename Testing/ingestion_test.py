@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Ingestion Test - LLM Premier League
+Verifica que la ingesta reproduce byte a byte el CSV procesado versionado y no pisa datos ajenos
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+import ingestion  # noqa: E402
+from ingestion import DEFAULT_RAW_DIR, UNIFIED_COLUMNS, IngestionPipeline  # noqa: E402
+from columnar_cache import DEFAULT_CSV_PATH  # noqa: E402
+
+TAIL_ROWS = 50
+LAST_RAW_FILE = '2023-2024.csv'
+CORRECTED_RAW_FILE = '2016-2017.csv'
+RAW_CORRECTION = (b'E0,13/08/16,Burnley,Swansea,0,1,A,0,0,D,J Moss,',
+                  b'E0,13/08/16,Burnley,Swansea,0,1,A,0,0,D,M Oliver,')
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def write_bytes(path: str, data: bytes):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def without_tail(data: bytes, rows: int) -> bytes:
+    """El mismo CSV sin sus últimas filas"""
+    return b''.join(data.splitlines(keepends=True)[:-rows])
+
+
+def interrupted_run(pipeline: IngestionPipeline) -> bool:
+    """Ejecutar la ingesta fallando justo al sustituir el CSV (como si el proceso muriera al escribir)"""
+    original = ingestion.os.replace
+
+    def failing_replace(src, dst):
+        if dst == pipeline.output_path:
+            raise OSError("escritura interrumpida (simulada)")
+        return original(src, dst)
+
+    ingestion.os.replace = failing_replace
+    try:
+        pipeline.run()
+    except OSError:
+        return True
+    finally:
+        ingestion.os.replace = original
+    return False
+
+
+def main():
+    print("📥 LLM PREMIER LEAGUE - INGESTION TEST")
+    print("=" * 70)
+    committed = read_bytes(DEFAULT_CSV_PATH)
+    results = {'timestamp': datetime.now().isoformat(), 'scenarios': {}}
+    workdir = tempfile.mkdtemp(prefix='ingestion-test-')
+
+    try:
+        # 1. Primera ejecución sobre el CSV versionado (sin manifest): no debe cambiar nada
+        output = os.path.join(workdir, 'adopt', 'dataset.csv')
+        os.makedirs(os.path.dirname(output))
+        write_bytes(output, committed)
+        pipeline = IngestionPipeline(DEFAULT_RAW_DIR, output)
+        first = pipeline.run()
+        adopted = read_bytes(output)
+        second = pipeline.run()
+        results['scenarios']['adopt'] = {'mode': first.mode, 'rows': first.total_rows,
+                                         'rerun_mode': second.mode}
+        print(f"🔁 CSV versionado: modo {first.mode}, {first.total_rows} filas, "
+              f"{'idéntico' if adopted == committed else 'DISTINTO'}; segunda ejecución: {second.mode}")
+
+        # 2. Partidos que faltan en el CSV: las filas nuevas salen con el formato del procesado
+        output = os.path.join(workdir, 'tail', 'dataset.csv')
+        os.makedirs(os.path.dirname(output))
+        write_bytes(output, without_tail(committed, TAIL_ROWS))
+        report = IngestionPipeline(DEFAULT_RAW_DIR, output).run()
+        regenerated = read_bytes(output)
+        results['scenarios']['missing_tail'] = {'mode': report.mode, 'rows': report.total_rows}
+        print(f"➕ Sin las últimas {TAIL_ROWS} filas: modo {report.mode}, "
+              f"{'idéntico' if regenerated == committed else 'DISTINTO'} al versionado")
+
+        # 3. Actualización semanal: la última temporada crece y se añade al final
+        raw_dir = os.path.join(workdir, 'append', 'raw')
+        shutil.copytree(DEFAULT_RAW_DIR, raw_dir)
+        full_raw = read_bytes(os.path.join(raw_dir, LAST_RAW_FILE))
+        write_bytes(os.path.join(raw_dir, LAST_RAW_FILE), without_tail(full_raw, TAIL_ROWS))
+        output = os.path.join(workdir, 'append', 'dataset.csv')
+        write_bytes(output, without_tail(committed, TAIL_ROWS))
+        pipeline = IngestionPipeline(raw_dir, output)
+        pipeline.run()
+        before_ok = read_bytes(output) == without_tail(committed, TAIL_ROWS)
+        write_bytes(os.path.join(raw_dir, LAST_RAW_FILE), full_raw)
+        interrupted = interrupted_run(pipeline)
+        untouched = (read_bytes(output) == without_tail(committed, TAIL_ROWS)
+                     and not any(name.startswith('.dataset-') for name in os.listdir(os.path.dirname(output))))
+        print(f"💥 Append interrumpido: CSV {'intacto' if untouched else 'MODIFICADO'}")
+        after = pipeline.run()
+        appended = read_bytes(output)
+        results['scenarios']['append'] = {'mode': after.mode, 'rows_parsed': after.rows_parsed}
+        print(f"📅 Temporada en curso +{TAIL_ROWS} partidos: modo {after.mode}, "
+              f"{after.rows_parsed} filas parseadas, {'idéntico' if appended == committed else 'DISTINTO'}")
+
+        # 4. CSV con partidos que no vienen de raw y sin manifest que lo avale: no se sobrescribe
+        foreign_path = os.path.join(workdir, 'foreign', 'dataset.csv')
+        os.makedirs(os.path.dirname(foreign_path))
+        extra = ['2024-08-16', 'Man United', 'Fulham', '1', '0', 'H'] + [''] * (len(UNIFIED_COLUMNS) - 7) + ['2024-25']
+        foreign = committed + (','.join(extra) + '\n').encode()
+        write_bytes(foreign_path, foreign)
+        refused = None
+        try:
+            IngestionPipeline(DEFAULT_RAW_DIR, foreign_path).run()
+        except ValueError as e:
+            refused = str(e)
+        results['scenarios']['foreign'] = {'refused': refused}
+        print(f"🛑 CSV con partidos ajenos: {'rechazado' if refused else 'SOBRESCRITO'}")
+        if refused:
+            print(f"   {refused}")
+
+        # 5. raw corrige un partido ya ingerido: se toma la fila de raw y el resto sigue intacto
+        raw_dir = os.path.join(workdir, 'correction', 'raw')
+        shutil.copytree(DEFAULT_RAW_DIR, raw_dir)
+        output = os.path.join(workdir, 'correction', 'dataset.csv')
+        write_bytes(output, committed)
+        pipeline = IngestionPipeline(raw_dir, output)
+        pipeline.run()
+        raw_path = os.path.join(raw_dir, CORRECTED_RAW_FILE)
+        write_bytes(raw_path, read_bytes(raw_path).replace(*RAW_CORRECTION))
+        corrected = pipeline.run()
+        corrected_csv = read_bytes(output)
+        changed_lines = [(a, b) for a, b in zip(committed.splitlines(), corrected_csv.splitlines()) if a != b]
+        results['scenarios']['raw_correction'] = {'mode': corrected.mode, 'rows_updated': corrected.rows_updated,
+                                                  'changed_lines': len(changed_lines)}
+        print(f"✏️  Partido corregido en raw: modo {corrected.mode}, {corrected.rows_updated} filas actualizadas, "
+              f"{len(changed_lines)} líneas distintas del versionado")
+
+        checks = {
+            'committed_csv_roundtrip': adopted == committed,
+            'rerun_is_noop': second.mode == 'noop' and read_bytes(os.path.join(workdir, 'adopt', 'dataset.csv')) == committed,
+            'corrections_kept': b',L Mason,' in adopted and b',l Mason,' not in adopted,
+            'new_rows_match_format': regenerated == committed,
+            'weekly_update_appends': before_ok and after.mode == 'append' and after.rows_parsed == TAIL_ROWS
+            and appended == committed,
+            'interrupted_append_leaves_csv_intact': interrupted and untouched,
+            'foreign_rows_not_overwritten': refused is not None and read_bytes(foreign_path) == foreign,
+            'raw_correction_applied': corrected.rows_updated == 1 and len(changed_lines) == 1
+            and b'Burnley,Swansea,0,1,A,0,0,D,M Oliver,' in changed_lines[0][1]
+            and b',L Mason,' in corrected_csv
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"ingestion_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
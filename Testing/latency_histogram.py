@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Latency Histogram - LLM Premier League
+Histograma de latencias estilo HDR: memoria acotada, error relativo < 1 % y combinable entre procesos y ejecuciones
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+# Buckets log-lineales en microsegundos: exactos por debajo de 128 µs y, por encima,
+# 128 sub-buckets por potencia de dos (error relativo máximo 1/128)
+SUB_BUCKET_BITS = 8
+HALF_SUB_BUCKETS = 1 << (SUB_BUCKET_BITS - 1)
+UNIT_SECONDS = 1e-6
+REPORT_PERCENTILES = (('p50', 50.0), ('p90', 90.0), ('p99', 99.0), ('p99_9', 99.9))
+
+
+def _bucket_index(value: int) -> int:
+    shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+    return shift * HALF_SUB_BUCKETS + (value >> shift)
+
+
+def _bucket_highest(index: int) -> int:
+    """Mayor valor que cae en el bucket (la convención de HDR para los percentiles)"""
+    shift = max(0, index // HALF_SUB_BUCKETS - 1)
+    lowest = (index - shift * HALF_SUB_BUCKETS) << shift
+    return lowest + (1 << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias en segundos.
+
+    Guarda solo los buckets con datos, el mínimo, el máximo y la suma exactos. Dos
+    histogramas se combinan sumando buckets, así los de varios workers o de varias
+    ejecuciones dan los mismos percentiles que si se hubieran grabado juntos.
+    """
+
+    def __init__(self, values: Optional[Iterable[float]] = None):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        if values is not None:
+            for value in values:
+                self.record(value)
+
+    def record(self, seconds: float, count: int = 1):
+        """Registrar una latencia (en segundos); los valores negativos cuentan como 0"""
+        seconds = max(0.0, seconds)
+        index = _bucket_index(int(seconds / UNIT_SECONDS))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += seconds * count
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """Sumar otro histograma a este (devuelve self)"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @classmethod
+    def merged(cls, histograms: Iterable['LatencyHistogram']) -> 'LatencyHistogram':
+        """Nuevo histograma con la suma de varios"""
+        result = cls()
+        for histogram in histograms:
+            result.merge(histogram)
+        return result
+
+    def value_at_percentile(self, percentile: float) -> Optional[float]:
+        """Latencia (segundos) del percentil 0-100; None si está vacío"""
+        if not self.count:
+            return None
+        if percentile <= 0:
+            return self.min
+        target = math.ceil(percentile / 100 * self.count)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(max(_bucket_highest(index) * UNIT_SECONDS, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def summary(self) -> Dict:
+        """count, min, mean, p50, p90, p99, p99.9 y max (None si no hay muestras)"""
+        result = {'count': self.count, 'min': self.min, 'mean': self.mean}
+        result.update({name: self.value_at_percentile(p) for name, p in REPORT_PERCENTILES})
+        result['max'] = self.max
+        return result
+
+    def to_dict(self) -> Dict:
+        """Forma compacta para los JSON de resultados: buckets como 'índice:cuenta' en una sola cadena"""
+        return {
+            'unit_seconds': UNIT_SECONDS,
+            'sub_bucket_bits': SUB_BUCKET_BITS,
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max,
+            'buckets': ','.join(f"{index}:{count}" for index, count in sorted(self.counts.items()))
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        """
+        Reconstruir un histograma guardado con to_dict.
+
+        Raises:
+            ValueError: Si se grabó con otra resolución
+        """
+        if data.get('unit_seconds') != UNIT_SECONDS or data.get('sub_bucket_bits') != SUB_BUCKET_BITS:
+            raise ValueError("Histograma grabado con otra resolución")
+        histogram = cls()
+        for pair in filter(None, data.get('buckets', '').split(',')):
+            index, count = pair.split(':')
+            histogram.counts[int(index)] = int(count)
+        histogram.count = data['count']
+        histogram.total = data['sum']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def format_latency(seconds: Optional[float]) -> str:
+    """Latencia legible: ms por debajo de 1 s, '—' si no hay dato"""
+    if seconds is None:
+        return '—'
+    return f"{seconds * 1000:.1f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+def format_summary(summary: Dict) -> str:
+    """Línea p50/p90/p99/p99.9/max para los informes de consola"""
+    return '  '.join(f"{label} {format_latency(summary.get(key))}" for label, key in
+                     (('p50', 'p50'), ('p90', 'p90'), ('p99', 'p99'), ('p99.9', 'p99_9'), ('max', 'max')))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Latency Histogram Test - LLM Premier League
+Verifica la precisión de los percentiles, la combinación de histogramas y su serialización
+"""
+
+import json
+import math
+import random
+import sys
+import time
+from datetime import datetime
+
+from latency_histogram import LatencyHistogram, format_summary
+
+SAMPLES = 200_000
+WORKERS = 4
+MAX_RELATIVE_ERROR = 1 / 128
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def exact_percentile(ordered, percentile: float) -> float:
+    """Percentil por rango más cercano sobre la lista ordenada (la misma definición que el histograma)"""
+    return ordered[max(math.ceil(percentile / 100 * len(ordered)) - 1, 0)]
+
+
+def main():
+    print("⏱️ LLM PREMIER LEAGUE - LATENCY HISTOGRAM TEST")
+    print("=" * 70)
+    rng = random.Random(42)
+    # Latencias con cola larga: la mayoría en ~10-50 ms, algunas de segundos
+    samples = [rng.lognormvariate(math.log(0.02), 0.8) + (rng.random() < 0.01) * rng.uniform(1, 30)
+               for _ in range(SAMPLES)]
+    results = {'timestamp': datetime.now().isoformat(), 'samples': SAMPLES}
+
+    start = time.perf_counter()
+    histogram = LatencyHistogram(samples)
+    record_seconds = time.perf_counter() - start
+    ordered = sorted(samples)
+    errors = {p: abs(histogram.value_at_percentile(p) - exact_percentile(ordered, p)) / exact_percentile(ordered, p)
+              for p in PERCENTILES}
+    results['record_per_second'] = SAMPLES / record_seconds
+    results['relative_error'] = {str(p): e for p, e in errors.items()}
+    print(f"📈 {SAMPLES:,} latencias en {record_seconds:.2f}s ({SAMPLES / record_seconds:,.0f}/s), "
+          f"{len(histogram.counts)} buckets")
+    print(f"   {format_summary(histogram.summary())}")
+    print("   error relativo: " + ", ".join(f"p{p} {e:.3%}" for p, e in errors.items()))
+
+    # Workers en paralelo y ejecuciones repetidas: combinar debe dar lo mismo que grabar todo junto
+    parts = [LatencyHistogram(samples[i::WORKERS]) for i in range(WORKERS)]
+    merged = LatencyHistogram.merged(parts)
+    serialized = json.dumps(merged.to_dict())
+    restored = LatencyHistogram.from_dict(json.loads(serialized))
+    results['serialized_bytes'] = len(serialized)
+    print(f"\n🔗 {WORKERS} histogramas combinados; JSON de {len(serialized):,} bytes "
+          f"(las muestras ocuparían {len(json.dumps(samples)):,})")
+
+    few = LatencyHistogram([0.12, 0.15, 0.11, 0.31, 0.14])
+    empty = LatencyHistogram()
+    print(f"\n🔍 5 muestras: {format_summary(few.summary())}")
+    print(f"   Sin muestras: {format_summary(empty.summary())}")
+
+    checks = {
+        'percentiles_within_1pct': all(e <= MAX_RELATIVE_ERROR for e in errors.values()),
+        'exact_min_max_mean': histogram.min == ordered[0] and histogram.max == ordered[-1]
+        and abs(histogram.mean - sum(samples) / SAMPLES) < 1e-9,
+        'merge_matches_single': merged.counts == histogram.counts and merged.summary()['p99_9'] == histogram.summary()['p99_9'],
+        'roundtrip_json': restored.counts == merged.counts and restored.summary() == merged.summary(),
+        'compact_json': len(serialized) < len(json.dumps(samples)) / 50,
+        'few_samples_have_percentiles': few.value_at_percentile(95) == 0.31 and few.summary()['p50'] > 0,
+        'empty_is_none': empty.summary()['p99'] is None and empty.mean is None
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"latency_histogram_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
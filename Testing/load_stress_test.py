@@ -9,11 +9,14 @@ import json
 import time
 import threading
 from datetime import datetime
-from typing import Dict, List
-import statistics
+from typing import Dict
 import concurrent.futures
 from queue import Queue
 
+from latency_histogram import LatencyHistogram, format_summary
+from open_loop import DEFAULT_MAX_CONNECTIONS, open_loop_load
+from suite_runner import MODE_KEYS, MODE_NAMES, MODES, select_mode, suite_parser, selected_modes
+
 API_BASE_URL = "http://localhost:8080/api"
 
 class LoadTester:
@@ -25,12 +28,17 @@ class LoadTester:
             'concurrent_test_results': {}
         }
         
+        # Lazo abierto: las peticiones salen a la tasa fijada aunque el servidor vaya lento
+        # (mismo número total de peticiones que los escenarios de usuarios anteriores)
         self.test_scenarios = {
-            'light_load': {'users': 5, 'requests_per_user': 10, 'delay': 0.5},
-            'medium_load': {'users': 10, 'requests_per_user': 20, 'delay': 0.2},
-            'heavy_load': {'users': 20, 'requests_per_user': 15, 'delay': 0.1},
-            'stress_test': {'users': 50, 'requests_per_user': 5, 'delay': 0.05}
+            'light_load': {'profile': 'constant', 'rate': 10, 'duration': 5},
+            'medium_load': {'profile': 'poisson', 'rate': 25, 'duration': 8, 'seed': 1},
+            'heavy_load': {'profile': 'poisson', 'rate': 50, 'duration': 6, 'seed': 2},
+            'stress_test': {'profile': 'ramp', 'rate': 5, 'end_rate': 45, 'duration': 10}
         }
+        self.stress_rates = [10, 25, 50, 100, 200, 400]
+        self.max_connections = DEFAULT_MAX_CONNECTIONS
+        self.headers = {}
         
         self.test_endpoints = [
             {'name': 'health', 'method': 'GET', 'path': '/health', 'payload': None},
@@ -43,13 +51,12 @@ class LoadTester:
         ]
     
     def toggle_ai_mode(self, enable: bool) -> bool:
-        """Cambiar modo AI"""
-        try:
-            response = requests.post(f"{API_BASE_URL}/toggle-ai",
-                                   json={"use_claude_ai": enable}, timeout=10)
-            return response.status_code == 200
-        except:
+        """Modo AI de las siguientes peticiones (header X-AI-Mode o toggle global)"""
+        headers = select_mode(API_BASE_URL, 'claude' if enable else 'local')
+        if headers is None:
             return False
+        self.headers = headers
+        return True
     
     def make_request(self, endpoint: Dict, timeout: int = 30) -> Dict:
         """Hacer una petición a un endpoint"""
@@ -57,10 +64,11 @@ class LoadTester:
         
         try:
             if endpoint['method'] == 'GET':
-                response = requests.get(f"{API_BASE_URL}{endpoint['path']}", timeout=timeout)
+                response = requests.get(f"{API_BASE_URL}{endpoint['path']}", headers=self.headers,
+                                        timeout=timeout)
             else:
                 response = requests.post(f"{API_BASE_URL}{endpoint['path']}", 
-                                       json=endpoint['payload'], timeout=timeout)
+                                       json=endpoint['payload'], headers=self.headers, timeout=timeout)
             
             end_time = time.time()
             response_time = end_time - start_time
@@ -90,77 +98,22 @@ class LoadTester:
                 'error': str(e)
             }
     
-    def user_simulation(self, user_id: int, scenario: Dict, endpoint: Dict, results_queue: Queue):
-        """Simular las peticiones de un usuario"""
-        user_results = []
-        
-        for request_num in range(scenario['requests_per_user']):
-            result = self.make_request(endpoint)
-            result['user_id'] = user_id
-            result['request_num'] = request_num
-            result['timestamp'] = time.time()
-            
-            user_results.append(result)
-            results_queue.put(result)
-            
-            # Delay entre peticiones
-            if scenario['delay'] > 0:
-                time.sleep(scenario['delay'])
-        
-        return user_results
-    
     def run_load_test(self, scenario_name: str, endpoint: Dict, mode: str) -> Dict:
-        """Ejecutar test de carga"""
+        """Ejecutar test de carga de lazo abierto (tasa de llegada fija, no usuarios que esperan)"""
         scenario = self.test_scenarios[scenario_name]
         print(f"🔄 Load test: {scenario_name} on {endpoint['name']} ({mode} mode)")
-        print(f"   👥 Users: {scenario['users']}, Requests/user: {scenario['requests_per_user']}")
-        
-        results_queue = Queue()
-        start_time = time.time()
-        
-        # Ejecutar usuarios concurrentemente
-        with concurrent.futures.ThreadPoolExecutor(max_workers=scenario['users']) as executor:
-            futures = []
-            
-            for user_id in range(scenario['users']):
-                future = executor.submit(
-                    self.user_simulation, user_id, scenario, endpoint, results_queue
-                )
-                futures.append(future)
-            
-            # Esperar a que terminen todos
-            concurrent.futures.wait(futures)
-        
-        end_time = time.time()
-        total_duration = end_time - start_time
-        
-        # Recopilar resultados
-        all_results = []
-        while not results_queue.empty():
-            all_results.append(results_queue.get())
-        
-        # Calcular estadísticas
-        success_count = sum(1 for r in all_results if r['success'])
-        response_times = [r['response_time'] for r in all_results]
-        
-        stats = {
-            'total_requests': len(all_results),
-            'successful_requests': success_count,
-            'failed_requests': len(all_results) - success_count,
-            'success_rate': success_count / len(all_results) if all_results else 0,
-            'total_duration': total_duration,
-            'requests_per_second': len(all_results) / total_duration,
-            'avg_response_time': statistics.mean(response_times) if response_times else 0,
-            'min_response_time': min(response_times) if response_times else 0,
-            'max_response_time': max(response_times) if response_times else 0,
-            'median_response_time': statistics.median(response_times) if response_times else 0,
-            'percentile_95': statistics.quantiles(response_times, n=20)[18] if len(response_times) > 20 else 0,
-            'errors': [r for r in all_results if not r['success']]
-        }
-        
-        print(f"   ✅ Completed: {stats['success_rate']*100:.1f}% success, {stats['requests_per_second']:.1f} RPS")
+        print(f"   📈 {scenario['profile']} {scenario['rate']}"
+              f"{'→' + str(scenario['end_rate']) if scenario.get('end_rate') else ''} RPS durante {scenario['duration']}s")
+
+        result = open_loop_load(API_BASE_URL, [{**endpoint, 'headers': self.headers}], scenario['rate'],
+                                scenario['duration'], profile=scenario['profile'], end_rate=scenario.get('end_rate'),
+                                seed=scenario.get('seed'), max_connections=self.max_connections)
+        stats = result.summary()
+
+        print(f"   ✅ Completed: {stats['success_rate']*100:.1f}% success, {stats['requests_per_second']:.1f} RPS, "
+              f"p99 {stats['percentile_99']:.2f}s")
         return stats
-    
+
     def run_concurrent_endpoint_test(self, mode: str) -> Dict:
         """Test de múltiples endpoints simultáneamente"""
         print(f"🚀 Concurrent endpoint test ({mode} mode)")
@@ -198,13 +151,15 @@ class LoadTester:
         summary = {}
         for endpoint_name, results in endpoint_results.items():
             success_count = sum(1 for r in results if r['success'])
-            response_times = [r['response_time'] for r in results if r['success']]
+            histogram = LatencyHistogram(r['response_time'] for r in results if r['success'])
             
             summary[endpoint_name] = {
                 'requests': len(results),
                 'success_rate': success_count / len(results) if results else 0,
-                'avg_response_time': statistics.mean(response_times) if response_times else 0,
-                'max_response_time': max(response_times) if response_times else 0
+                'avg_response_time': histogram.mean,
+                'max_response_time': histogram.max,
+                'latency': histogram.summary(),
+                'histogram': histogram.to_dict()
             }
         
         summary['total_duration'] = total_duration
@@ -214,68 +169,51 @@ class LoadTester:
         return summary
     
     def run_stress_escalation_test(self, endpoint: Dict, mode: str) -> Dict:
-        """Test de stress con escalamiento progresivo"""
+        """Test de stress con escalamiento progresivo de la tasa de llegada"""
         print(f"⚡ Stress escalation test on {endpoint['name']} ({mode} mode)")
         
         escalation_results = {}
-        user_counts = [5, 10, 20, 30, 40, 50]
         
-        for user_count in user_counts:
-            print(f"   📈 Testing with {user_count} concurrent users")
+        for rate in self.stress_rates:
+            print(f"   📈 Testing at {rate} RPS")
             
-            scenario = {'users': user_count, 'requests_per_user': 3, 'delay': 0.1}
+            result = open_loop_load(API_BASE_URL, [{**endpoint, 'headers': self.headers}], rate, duration=3,
+                                    profile='poisson', seed=rate, max_connections=self.max_connections)
+            stats = result.summary()
             
-            results_queue = Queue()
-            start_time = time.time()
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=user_count) as executor:
-                futures = [
-                    executor.submit(self.user_simulation, i, scenario, endpoint, results_queue)
-                    for i in range(user_count)
-                ]
-                concurrent.futures.wait(futures, timeout=120)
-            
-            # Recopilar resultados
-            all_results = []
-            while not results_queue.empty():
-                all_results.append(results_queue.get())
-            
-            success_count = sum(1 for r in all_results if r['success'])
-            response_times = [r['response_time'] for r in all_results if r['success']]
-            
-            escalation_results[user_count] = {
-                'success_rate': success_count / len(all_results) if all_results else 0,
-                'avg_response_time': statistics.mean(response_times) if response_times else 0,
-                'requests_per_second': len(all_results) / (time.time() - start_time),
-                'failed_requests': len(all_results) - success_count
+            escalation_results[rate] = {
+                'success_rate': stats['success_rate'],
+                'avg_response_time': stats['avg_response_time'],
+                'percentile_99': stats['percentile_99'],
+                'requests_per_second': stats['requests_per_second'],
+                'failed_requests': stats['failed_requests'],
+                'latency': stats['latency'],
+                'histogram': stats['histogram']
             }
             
-            print(f"      Success: {escalation_results[user_count]['success_rate']*100:.1f}%")
+            print(f"      Success: {stats['success_rate']*100:.1f}%, p99 {stats['percentile_99']:.2f}s")
             
             # Si la tasa de éxito cae mucho, detener la escalada
-            if escalation_results[user_count]['success_rate'] < 0.5:
-                print(f"   🔴 Breaking point reached at {user_count} users")
+            if escalation_results[rate]['success_rate'] < 0.5:
+                print(f"   🔴 Breaking point reached at {rate} RPS")
                 break
-                
-            time.sleep(2)  # Pausa entre escalaciones
         
         return escalation_results
     
-    def run_all_tests(self):
-        """Ejecutar toda la suite de tests"""
+    def run_all_tests(self, modes=tuple(MODES)):
+        """Ejecutar toda la suite de tests (solo los modos indicados: 'local', 'claude')"""
         print("⚡ LLM PREMIER LEAGUE - LOAD & STRESS TESTING SUITE")
         print("=" * 70)
         
-        for ai_mode in [False, True]:
-            mode_name = "LOCAL" if not ai_mode else "CLAUDE AI"
+        for mode in (m for m in MODES if m in modes):
+            ai_mode = MODES[mode]
+            mode_name = MODE_NAMES[mode]
             print(f"\n📊 TESTING {mode_name} MODE")
             print("-" * 50)
             
             if not self.toggle_ai_mode(ai_mode):
                 print(f"❌ Failed to switch to {mode_name} mode")
                 continue
-                
-            time.sleep(2)  # Pausa después del cambio
             
             mode_results = {}
             
@@ -283,18 +221,16 @@ class LoadTester:
             print("\n🔄 Load Tests:")
             mode_results['load_tests'] = {}
             
-            for scenario_name in ['light_load', 'medium_load', 'heavy_load']:
+            for scenario_name in ['light_load', 'medium_load', 'heavy_load', 'stress_test']:
                 # Test con endpoint de predicción (más pesado)
                 predict_endpoint = next(e for e in self.test_endpoints if e['name'] == 'predict_simple')
                 mode_results['load_tests'][scenario_name] = self.run_load_test(
                     scenario_name, predict_endpoint, mode_name
                 )
-                time.sleep(1)
             
             # 2. Test concurrente de múltiples endpoints
             print("\n🚀 Concurrent Endpoints Test:")
             mode_results['concurrent_endpoints'] = self.run_concurrent_endpoint_test(mode_name)
-            time.sleep(2)
             
             # 3. Stress test con escalamiento
             print("\n⚡ Stress Escalation Test:")
@@ -303,16 +239,26 @@ class LoadTester:
                 chat_endpoint, mode_name
             )
             
+            # Latencias del modo: histogramas de todos los escenarios combinados
+            histograms = {
+                'load_tests': LatencyHistogram.merged(LatencyHistogram.from_dict(r['histogram'])
+                                                      for r in mode_results['load_tests'].values()),
+                'stress_escalation': LatencyHistogram.merged(LatencyHistogram.from_dict(r['histogram'])
+                                                             for r in mode_results['stress_escalation'].values())
+            }
+            mode_histogram = LatencyHistogram.merged(histograms.values())
+            mode_results['latency'] = {name: h.summary() for name, h in histograms.items()}
+            mode_results['latency']['all'] = mode_histogram.summary()
+            mode_results['histogram'] = mode_histogram.to_dict()
+            
             # Guardar resultados del modo
-            if ai_mode:
-                self.results['claude_ai_on'] = mode_results
-            else:
-                self.results['claude_ai_off'] = mode_results
+            self.results[MODE_KEYS[mode]] = mode_results
     
-    def save_results(self) -> str:
+    def save_results(self, filepath: str = None) -> str:
         """Guardar resultados"""
-        filename = f"load_stress_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        filepath = f"/Users/rios/Desktop/LLM-PREMIER/testing/{filename}"
+        if not filepath:
+            filename = f"load_stress_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            filepath = f"/Users/rios/Desktop/LLM-PREMIER/testing/{filename}"
         
         with open(filepath, 'w') as f:
             json.dump(self.results, f, indent=2, ensure_ascii=False)
@@ -339,7 +285,10 @@ class LoadTester:
                 for scenario, results in data['load_tests'].items():
                     print(f"      {scenario}: {results['success_rate']*100:.1f}% success, "
                           f"{results['requests_per_second']:.1f} RPS, "
-                          f"{results['avg_response_time']:.2f}s avg")
+                          f"{results['avg_response_time']:.2f}s avg, p99 {results['percentile_99']:.2f}s")
+            
+            if 'latency' in data:
+                print(f"   ⏱️  Latencias: {format_summary(data['latency']['all'])}")
             
             # Test concurrente
             if 'concurrent_endpoints' in data:
@@ -348,15 +297,349 @@ class LoadTester:
             
             # Stress test
             if 'stress_escalation' in data:
-                max_users = max(data['stress_escalation'].keys())
-                max_stats = data['stress_escalation'][max_users]
-                print(f"   ⚡ Stress: Max {max_users} users, {max_stats['success_rate']*100:.1f}% success")
+                max_rate = max(data['stress_escalation'].keys())
+                max_stats = data['stress_escalation'][max_rate]
+                print(f"   ⚡ Stress: Max {max_rate} RPS, {max_stats['success_rate']*100:.1f}% success")
+
+# --- Caída simulada de Claude (circuit breaker) -------------------------------
+# Escenario autocontenido: app Flask mínima con /api/predict, cliente de Claude
+# apuntando a mock_claude_server.py y fases sana -> caída -> recuperación.
+
+OUTAGE_PHASES = [('healthy', 4.0), ('outage', 8.0), ('recovered', 6.0)]
+OUTAGE_USERS = 20
+OUTAGE_CLIENT_TIMEOUT = 2.0
+OUTAGE_MOCK_LATENCY = 0.2
+OUTAGE_FIXTURES = [('Arsenal', 'Chelsea'), ('Liverpool', 'Everton'), ('Man City', 'Man United'),
+                   ('Tottenham', 'Newcastle'), ('Aston Villa', 'Brighton'), ('West Ham', 'Fulham')]
+
+
+def create_outage_app(claude):
+    """App mínima con un /api/predict equivalente: Claude si está disponible, si no local"""
+    from flask import Flask, jsonify, request
+    from api_extensions import init_api_extensions, get_service
+    from claude_client import ClaudeAPIError
+
+    app = Flask(__name__)
+    init_api_extensions(app, claude=claude)
+
+    @app.route('/api/predict', methods=['POST'])
+    def predict():
+        data = request.get_json(silent=True) or {}
+        home_team, away_team = data.get('home_team'), data.get('away_team')
+        claude_client = get_service('claude')
+        if claude_client.available:
+            try:
+                analysis = claude_client.complete(f"Predice el partido {home_team} vs {away_team}")
+                return jsonify({'success': True, 'source': 'claude', 'prediction': analysis})
+            except ClaudeAPIError:
+                pass
+        return jsonify({'success': True, 'source': 'local',
+                        'prediction': {'home_team': home_team, 'away_team': away_team}})
+
+    return app
+
+
+def run_outage_scenario(use_breaker: bool) -> Dict:
+    """Carga constante durante una caída de Claude con y sin circuit breaker"""
+    import logging
+    import os
+    import sys
+    from werkzeug.serving import make_server
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+    from async_claude_client import AsyncClaudeClient, BlockingClaudeClient
+    from circuit_breaker import CircuitBreaker, CircuitBreakerClient
+    from mock_claude_server import start_mock_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    label = 'con circuit breaker' if use_breaker else 'sin circuit breaker'
+    print(f"🔌 Outage test {label}")
+
+    mock, mock_state, mock_url = start_mock_server(latency=OUTAGE_MOCK_LATENCY)
+    claude = BlockingClaudeClient(AsyncClaudeClient(api_key='mock', base_url=mock_url,
+                                                    timeout=OUTAGE_CLIENT_TIMEOUT, max_concurrency=OUTAGE_USERS))
+    breaker = None
+    if use_breaker:
+        # La ventana cuenta llamadas reales a Claude (una por partido en vuelo gracias
+        # al single-flight), no peticiones: una ronda de fallos basta para abrir
+        breaker = CircuitBreaker(window_size=len(OUTAGE_FIXTURES), min_calls=3,
+                                 slow_call_seconds=1.0, open_seconds=2.0)
+        claude = CircuitBreakerClient(claude, breaker)
+    server = make_server('127.0.0.1', 0, create_outage_app(claude), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/predict"
+
+    phase = {'name': OUTAGE_PHASES[0][0]}
+    stop = threading.Event()
+    samples = Queue()
+
+    def user(user_id: int):
+        session = requests.Session()
+        i = user_id
+        while not stop.is_set():
+            home_team, away_team = OUTAGE_FIXTURES[i % len(OUTAGE_FIXTURES)]
+            i += 1
+            name = phase['name']
+            # Las peticiones que ya esperaban a Claude cuando dejó de responder pagan
+            # el timeout con o sin breaker: se separan las que llegan con él ya abierto
+            opened = breaker is not None and breaker.times_opened > 0
+            start = time.perf_counter()
+            try:
+                response = session.post(url, json={'home_team': home_team, 'away_team': away_team}, timeout=30)
+                source = response.json().get('source') if response.status_code == 200 else 'error'
+            except requests.exceptions.RequestException:
+                source = 'error'
+            samples.put((name, start, time.perf_counter() - start, source, opened))
+
+    threads = [threading.Thread(target=user, args=(u,), daemon=True) for u in range(OUTAGE_USERS)]
+    circuit_states = {}
+    phase_starts = {}
+    try:
+        for t in threads:
+            t.start()
+        for name, duration in OUTAGE_PHASES:
+            phase['name'] = name
+            phase_starts[name] = time.perf_counter()
+            mock_state.set_outage('hang' if name == 'outage' else None)
+            time.sleep(duration)
+            if breaker is not None:
+                circuit_states[name] = breaker.snapshot()['state']
+        stop.set()
+        mock_state.set_outage(None)
+        for t in threads:
+            t.join(timeout=OUTAGE_CLIENT_TIMEOUT + 5)
+    finally:
+        server.shutdown()
+        claude.close()
+        mock.shutdown()
+
+    collected = []
+    while not samples.empty():
+        collected.append(samples.get())
+
+    results = {}
+    for name, _ in OUTAGE_PHASES:
+        histogram = LatencyHistogram(latency for phase_name, _, latency, _, _ in collected if phase_name == name)
+        sources = [source for phase_name, _, _, source, _ in collected if phase_name == name]
+        results[name] = {
+            **histogram.summary(),
+            'requests': histogram.count,
+            'sources': {source: sources.count(source) for source in set(sources)},
+            'histogram': histogram.to_dict()
+        }
+        print(f"   {name:<10} {histogram.count:>6} req  {format_summary(results[name])}  {results[name]['sources']}")
+    if breaker is not None:
+        opened = [(start, latency) for phase_name, start, latency, _, was_open in collected
+                  if phase_name == 'outage' and was_open]
+        histogram = LatencyHistogram(latency for _, latency in opened)
+        results['outage_circuit_open'] = {**histogram.summary(), 'requests': histogram.count}
+        print(f"   {'(abierto)':<10} {histogram.count:>6} req  {format_summary(results['outage_circuit_open'])}")
+        first_open = min((start for start, _ in opened), default=None)
+        results['circuit'] = {
+            **breaker.snapshot(),
+            'state_by_phase': circuit_states,
+            'seconds_to_open': first_open - phase_starts['outage'] if first_open is not None else None
+        }
+    return results
+
+
+def run_outage_tests() -> bool:
+    """Comparar p99 durante una caída simulada con y sin circuit breaker"""
+    print("🔌 LLM PREMIER LEAGUE - CLAUDE OUTAGE TEST")
+    print("=" * 70)
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'with_breaker': run_outage_scenario(use_breaker=True),
+        'without_breaker': run_outage_scenario(use_breaker=False)
+    }
+
+    with_breaker = results['with_breaker']
+    without_breaker = results['without_breaker']
+    healthy_p99 = with_breaker['healthy']['p99']
+    seconds_to_open = with_breaker['circuit']['seconds_to_open']
+    checks = {
+        'breaker_opened': with_breaker['circuit']['times_opened'] >= 1,
+        # Una sola ronda de timeouts antes de abrirse (más el margen de la última petición)
+        'breaker_opens_after_first_timeouts': seconds_to_open is not None
+        and seconds_to_open <= OUTAGE_CLIENT_TIMEOUT + OUTAGE_MOCK_LATENCY + 0.5,
+        'outage_p99_flat': with_breaker['outage_circuit_open']['requests'] > 0
+        and with_breaker['outage_circuit_open']['p99'] <= max(healthy_p99 * 1.5, healthy_p99 + 0.1),
+        'no_breaker_pays_timeout': without_breaker['outage']['p99'] >= OUTAGE_CLIENT_TIMEOUT * 0.9,
+        'breaker_recovers': with_breaker['circuit']['state_by_phase'].get('recovered') == 'closed'
+        and with_breaker['recovered']['sources'].get('claude', 0) > 0
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"outage_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en: {filename}")
+    return all(checks.values())
+
+
+# --- Lazo abierto frente a lazo cerrado (coordinated omission) ----------------
+# Servidor asyncio mínimo en otro proceso: responde al instante salvo durante una
+# pausa provocada con /api/stall, como un GC largo o un deploy.
+
+OPEN_LOOP_RATE = 2000
+OPEN_LOOP_SECONDS = 3.0
+STALL_RATE = 200
+STALL_USERS = 20
+STALL_SECONDS = 1.0
+STALL_AT = 2.0
+STALL_RUN_SECONDS = 6.0
+
+
+def serve_stalling_api(port_queue):
+    """Servidor HTTP/1.1 keep-alive que devuelve {"success": true} y se congela tras /api/stall"""
+    import asyncio
+
+    body = b'{"success": true}'
+    response = (b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: "
+                + str(len(body)).encode() + b"\r\n\r\n" + body)
+    stall = {'until': 0.0}
+
+    async def handle(reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = next((int(line.split(b':')[1]) for line in head.split(b"\r\n")
+                               if line.lower().startswith(b'content-length:')), 0)
+                if length:
+                    await reader.readexactly(length)
+                if head.startswith(b'GET /api/stall'):
+                    stall['until'] = loop.time() + STALL_SECONDS
+                elif stall['until'] > loop.time():
+                    await asyncio.sleep(stall['until'] - loop.time())
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0, backlog=1024)
+        port_queue.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def closed_loop_load(url: str, users: int, seconds: float, delay: float) -> LatencyHistogram:
+    """El modelo anterior: cada usuario espera su respuesta y duerme antes de la siguiente"""
+    histograms = [LatencyHistogram() for _ in range(users)]
+    deadline = time.perf_counter() + seconds
+
+    def user(histogram: LatencyHistogram):
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            session.get(url, timeout=30)
+            histogram.record(time.perf_counter() - start)
+            time.sleep(delay)
+
+    # Un histograma por usuario, combinados al final (sin locks en la medida)
+    threads = [threading.Thread(target=user, args=(h,)) for h in histograms]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return LatencyHistogram.merged(histograms)
+
+
+def run_open_loop_tests() -> bool:
+    """Capacidad del generador de lazo abierto y latencias con una pausa del servidor"""
+    import multiprocessing
+    from open_loop import arrival_schedule
+
+    print("📈 LLM PREMIER LEAGUE - OPEN-LOOP LOAD GENERATOR TEST")
+    print("=" * 70)
+    results = {'timestamp': datetime.now().isoformat(), 'schedules': {}}
+
+    for name, rate, profile, kwargs in [('constant', 100, 'constant', {}), ('poisson', 100, 'poisson', {'seed': 7}),
+                                        ('ramp', 100, 'ramp', {'end_rate': 300}),
+                                        ('ramp_from_zero', 0, 'ramp', {'end_rate': 100})]:
+        schedule = arrival_schedule(rate, 10, profile, **kwargs)
+        results['schedules'][name] = {'requests': len(schedule), 'first': schedule[0], 'last': schedule[-1]}
+    expected = {'constant': 1000, 'poisson': 1000, 'ramp': 2000, 'ramp_from_zero': 500}
+    print("📅 Llegadas en 10 s: " + ", ".join(f"{p} {results['schedules'][p]['requests']}" for p in expected))
+
+    context = multiprocessing.get_context('fork')
+    port_queue = context.Queue()
+    server = context.Process(target=serve_stalling_api, args=(port_queue,), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port_queue.get(timeout=10)}/api"
+    health = [{'name': 'health', 'method': 'GET', 'path': '/health', 'payload': None}]
+    try:
+        capacity = open_loop_load(base_url, health, OPEN_LOOP_RATE, OPEN_LOOP_SECONDS, 'poisson', seed=1,
+                                  max_connections=50).summary()
+        results['capacity'] = capacity
+        print(f"\n⚡ {OPEN_LOOP_RATE} RPS objetivo: {capacity['requests_per_second']:.0f} RPS logrados, "
+              f"p99 {capacity['percentile_99'] * 1000:.1f} ms, retraso de envío p99 "
+              f"{capacity['send_lag_p99'] * 1000:.1f} ms, {capacity['connections_opened']} conexiones")
+
+        def trigger_stall():
+            time.sleep(STALL_AT)
+            requests.get(f"{base_url}/stall", timeout=10)
+
+        print(f"\n🧊 Pausa de {STALL_SECONDS}s del servidor a los {STALL_AT}s (~{STALL_RATE} RPS en ambos casos)")
+        runs = {}
+        for name in ('closed_loop', 'open_loop'):
+            trigger = threading.Thread(target=trigger_stall)
+            trigger.start()
+            if name == 'closed_loop':
+                histogram = closed_loop_load(f"{base_url}/health", STALL_USERS, STALL_RUN_SECONDS,
+                                             STALL_USERS / STALL_RATE)
+            else:
+                histogram = open_loop_load(base_url, health, STALL_RATE, STALL_RUN_SECONDS).latency
+            trigger.join()
+            runs[name] = {**histogram.summary(), 'requests': histogram.count, 'histogram': histogram.to_dict()}
+            print(f"   {name:<12} {histogram.count:>5} req  {format_summary(runs[name])}")
+        results['stall'] = runs
+    finally:
+        server.terminate()
+
+    checks = {
+        'schedules_match_rate': all(abs(results['schedules'][p]['requests'] - n) <= n * 0.1
+                                    for p, n in expected.items()),
+        'sustains_target_rate': capacity['requests_per_second'] >= OPEN_LOOP_RATE * 0.9
+        and capacity['success_rate'] == 1.0,
+        'open_loop_counts_stall': runs['open_loop']['p90'] >= STALL_SECONDS / 4,
+        'closed_loop_hides_stall': runs['closed_loop']['p90'] < STALL_SECONDS / 10,
+        'closed_loop_sends_less': runs['closed_loop']['requests'] < runs['open_loop']['requests']
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"open_loop_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en: {filename}")
+    return all(checks.values())
+
 
 def main():
+    import sys
+    global API_BASE_URL
+    parser = suite_parser('Tests de carga y stress LOCAL vs CLAUDE AI')
+    parser.add_argument('--outage', action='store_true', help='Escenario de caída de Claude (autocontenido)')
+    parser.add_argument('--open-loop', action='store_true', help='Verificación del generador de lazo abierto')
+    args = parser.parse_args()
+    if args.outage:
+        sys.exit(0 if run_outage_tests() else 1)
+    if args.open_loop:
+        sys.exit(0 if run_open_loop_tests() else 1)
+
+    API_BASE_URL = args.base_url
     tester = LoadTester()
-    tester.run_all_tests()
+    tester.run_all_tests(selected_modes(args))
     tester.print_summary()
-    results_file = tester.save_results()
+    results_file = tester.save_results(args.output)
     return results_file
 
 if __name__ == "__main__":
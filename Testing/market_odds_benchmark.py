@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Market Odds Benchmark - LLM Premier League
+Mide la conversión de cuotas a probabilidades sin margen y el efecto de mezclar el mercado con el modelo local
+"""
+
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from backtest import rows_before  # noqa: E402
+from batch_predict import predict_local_batch  # noqa: E402
+from columnar_cache import load_dataset  # noqa: E402
+from goals_model import fit_goals_model  # noqa: E402
+from goals_model_benchmark import HOLDOUT_FROM, holdout_fixtures, score  # noqa: E402
+from market_odds import (  # noqa: E402
+    BOOKMAKERS, METHODS, fit_market_model, implied_probabilities, market_column_names, market_columns
+)
+from stats_engine import compute_team_stats  # noqa: E402
+from stats_engine_benchmark import time_call  # noqa: E402
+
+SCALE_FACTOR = 10
+REFERENCE_ROWS = 500
+MAX_COLUMNS_SECONDS = 1.0
+
+
+def reference_shin(odds) -> list:
+    """Shin partido a partido con bisección escalar, como referencia de la versión vectorizada"""
+    inverse = [1 / o for o in odds]
+    booksum = sum(inverse)
+    if booksum <= 1:
+        return [p / booksum for p in inverse]
+
+    def probabilities(z):
+        return [(math.sqrt(z * z + 4 * (1 - z) * p * p / booksum) - z) / (2 * (1 - z)) for p in inverse]
+
+    low, high = 0.0, 0.5
+    for _ in range(60):
+        middle = (low + high) / 2
+        if sum(probabilities(middle)) > 1:
+            low = middle
+        else:
+            high = middle
+    result = probabilities((low + high) / 2)
+    return [p / sum(result) for p in result]
+
+
+def main():
+    print("💹 LLM PREMIER LEAGUE - MARKET ODDS BENCHMARK")
+    print("=" * 70)
+    dataset = load_dataset()
+    results = {'timestamp': datetime.now().isoformat(), 'timing': {}, 'closing_odds': {}, 'holdout': {}}
+
+    odds = np.concatenate([np.column_stack([dataset[f"{book}{o}"] for o in 'HDA']) for book in BOOKMAKERS])
+    odds = odds[np.all(np.isfinite(odds), axis=1)]
+    scaled = np.tile(odds, (SCALE_FACTOR, 1))
+    print(f"⏱️ Cuotas 1X2 sin margen ({len(odds)} filas de {len(BOOKMAKERS)} casas, mejor de varias ejecuciones)")
+    for method in METHODS:
+        seconds = time_call(implied_probabilities, odds, method)
+        scaled_seconds = time_call(implied_probabilities, scaled, method)
+        results['timing'][method] = {'rows': len(odds), 'seconds': seconds,
+                                     'rows_10x': len(scaled), 'seconds_10x': scaled_seconds}
+        print(f"   {method:<13} {seconds * 1000:7.1f} ms   10x: {scaled_seconds * 1000:7.1f} ms "
+              f"({len(scaled) / scaled_seconds:,.0f} filas/s)")
+    columns_seconds = time_call(market_columns, dataset)
+    results['timing']['market_columns'] = columns_seconds
+    print(f"   Columnas Mkt* completas (3 métodos + over 2.5 + margen): {columns_seconds * 1000:.1f} ms")
+
+    sample = odds[:REFERENCE_ROWS]
+    start = time.perf_counter()
+    reference = np.array([reference_shin(row) for row in sample.tolist()])
+    reference_seconds = time.perf_counter() - start
+    shin_gap = float(np.abs(reference - implied_probabilities(sample, 'shin')).max())
+    results['reference'] = {'rows': len(sample), 'seconds': reference_seconds, 'max_gap': shin_gap}
+    print(f"\n🔍 Shin fila a fila ({len(sample)} filas): {reference_seconds * 1000:.1f} ms, "
+          f"diferencia máxima {shin_gap:.2e}")
+
+    print("\n🎯 Precisión de las probabilidades de cierre (consenso de casas, todo el dataset)")
+    outcomes = np.array(['HDA'.index(r) for r in dataset.decode('FTR')])
+    onehot = np.eye(3)[outcomes]
+    for method in METHODS:
+        p = np.column_stack([dataset[name] for name in market_column_names(method)])
+        results['closing_odds'][method] = {
+            'log_loss': float(-np.log(p[np.arange(len(outcomes)), outcomes]).mean()),
+            'brier': float(((p - onehot) ** 2).sum(axis=1).mean()),
+            'favourite_probability': float(p.max(axis=1).mean())
+        }
+        r = results['closing_odds'][method]
+        print(f"   {method:<13} log-loss {r['log_loss']:.4f}  Brier {r['brier']:.4f}  "
+              f"favorito {r['favourite_probability']:.3f}")
+
+    print(f"\n🧪 Temporada de validación desde {HOLDOUT_FROM} (ajuste solo con partidos anteriores)")
+    train = rows_before(dataset, HOLDOUT_FROM)
+    fixtures, outcomes = holdout_fixtures(dataset, HOLDOUT_FROM)
+    table = compute_team_stats(train)
+    known = [f for f in fixtures if table.matches_played[table.team_id(f.home_team)] > 0
+             and table.matches_played[table.team_id(f.away_team)] > 0]
+    known_outcomes = outcomes[[f.index for f in known]]
+    goals_model = fit_goals_model(train)
+    market_model = fit_market_model(train)
+    variants = {
+        'averages': predict_local_batch(table, known),
+        'averages_market': predict_local_batch(table, known, None, market_model),
+        'goals_model': predict_local_batch(table, known, goals_model),
+        'goals_model_market': predict_local_batch(table, known, goals_model, market_model)
+    }
+    results['holdout']['matches'] = len(known)
+    print(f"   {'Método':<20} {'log-loss':>9} {'Brier':>7} {'acierto':>8}")
+    for name, predictions in variants.items():
+        results['holdout'][name] = score(predictions, known_outcomes)
+        r = results['holdout'][name]
+        print(f"   {name:<20} {r['log_loss']:>9.4f} {r['brier']:>7.4f} {r['accuracy']:>8.1%}")
+
+    sums = [np.column_stack([dataset[name] for name in market_column_names(m)]).sum(axis=1) for m in METHODS]
+    precomputed = market_columns(dataset)
+    checks = {
+        'columns_under_1s': columns_seconds < MAX_COLUMNS_SECONDS,
+        'probabilities_normalized': all(np.allclose(s, 1.0) for s in sums),
+        'cache_columns_match': all(np.allclose(dataset[name], values, equal_nan=True)
+                                   for name, values in precomputed.items()),
+        'shin_matches_reference': shin_gap < 1e-9,
+        'market_improves_goals_model': results['holdout']['goals_model_market']['log_loss']
+        < results['holdout']['goals_model']['log_loss'],
+        'market_improves_averages': results['holdout']['averages_market']['log_loss']
+        < results['holdout']['averages']['log_loss']
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"market_odds_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
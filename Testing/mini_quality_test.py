@@ -9,6 +9,8 @@ import json
 import time
 from datetime import datetime
 
+from suite_runner import select_mode, suite_parser
+
 API_BASE_URL = "http://localhost:8080/api"
 
 class MiniQualityTester:
@@ -18,15 +20,15 @@ class MiniQualityTester:
             'local_quality': {},
             'claude_quality': {}
         }
+        self.headers = {}
     
     def toggle_ai_mode(self, enable: bool) -> bool:
-        """Cambiar modo AI"""
-        try:
-            response = requests.post(f"{API_BASE_URL}/toggle-ai", 
-                                   json={"use_claude_ai": enable}, timeout=5)
-            return response.status_code == 200
-        except:
+        """Modo AI de las siguientes peticiones (header X-AI-Mode o toggle global)"""
+        headers = select_mode(API_BASE_URL, 'claude' if enable else 'local')
+        if headers is None:
             return False
+        self.headers = headers
+        return True
     
     def simple_quality_check(self, response_text, test_type):
         """Check básico de calidad (sin gastar tokens)"""
@@ -65,7 +67,7 @@ class MiniQualityTester:
         try:
             response = requests.post(f"{API_BASE_URL}/predict", 
                                    json={'home_team': 'Arsenal', 'away_team': 'Chelsea'}, 
-                                   timeout=25)
+                                   headers=self.headers, timeout=25)
             pred_time = time.time() - pred_start
             
             if response.status_code == 200:
@@ -88,15 +90,13 @@ class MiniQualityTester:
             results['prediction'] = {'quality_score': 0, 'status': 'exception', 'response_time': pred_time, 'error': str(e)[:100]}
             print(f"      ❌ Exception: {str(e)[:50]} ({pred_time:.2f}s)")
         
-        time.sleep(1)
-        
         # Test 2: Chat detallado
         print(f"  💬 Chat comparison question...")
         chat_start = time.time()
         try:
             response = requests.post(f"{API_BASE_URL}/chat", 
                                    json={'message': '¿Quién es mejor actualmente, Arsenal o Chelsea? Explica tu respuesta.'}, 
-                                   timeout=25)
+                                   headers=self.headers, timeout=25)
             chat_time = time.time() - chat_start
             
             if response.status_code == 200:
@@ -142,15 +142,11 @@ class MiniQualityTester:
         # Test LOCAL
         print("\n🏠 LOCAL MODE QUALITY:")
         if self.toggle_ai_mode(False):
-            time.sleep(1)
             self.results['local_quality'] = self.test_mode_quality('LOCAL')
         
-        time.sleep(2)
-        
         # Test CLAUDE AI
         print("\n🤖 CLAUDE AI MODE QUALITY:")
         if self.toggle_ai_mode(True):
-            time.sleep(1)
             self.results['claude_quality'] = self.test_mode_quality('CLAUDE AI')
     
     def print_summary(self):
@@ -282,17 +278,20 @@ class MiniQualityTester:
             print("   🎯 CLAUDE AI: Más confiable")
             print(f"     → Menos probabilidad de errores")
     
-    def save_results(self):
+    def save_results(self, filepath=None):
         """Guardar resultados"""
         filename = f"mini_quality_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        filepath = f"/Users/rios/Desktop/LLM-PREMIER/testing/{filename}"
+        filepath = filepath or f"/Users/rios/Desktop/LLM-PREMIER/testing/{filename}"
         
         with open(filepath, 'w') as f:
             json.dump(self.results, f, indent=2)
         
-        print(f"\n💾 Guardado: {filename}")
+        print(f"\n💾 Guardado: {filepath}")
 
 def main():
+    global API_BASE_URL
+    args = suite_parser('Test de calidad mínimo LOCAL vs CLAUDE AI', modes=False).parse_args()
+    API_BASE_URL = args.base_url
     print("🎯 DETAILED QUALITY ANALYSIS - Análisis de calidad detallado")
     print("⏱️  Duración: ~4-5 minutos")
     print("💰 Costo: 4 requests (2 LOCAL + 2 CLAUDE AI)")
@@ -302,7 +301,7 @@ def main():
     tester = MiniQualityTester()
     tester.run_mini_quality_test()
     tester.print_summary()
-    tester.save_results()
+    tester.save_results(args.output)
     
     print(f"\n🎉 Análisis de calidad completado!")
     print(f"🔍 Insights detallados sobre calidad de respuestas")
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Mock Claude Server - LLM Premier League
+Servidor local que imita la API de mensajes de Anthropic para tests de concurrencia y carga sin coste
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from single_flight import canonical_prompt_key  # noqa: E402
+
+DEFAULT_PORT = 8765
+DEFAULT_LATENCY = 0.5
+DEFAULT_FIRST_TOKEN_LATENCY = 0.1
+STREAM_CHUNK_WORDS = 3
+CHARS_PER_TOKEN = 4
+OUTAGE_HANG_SECONDS = 60.0
+OUTAGE_MODES = ('error', 'hang')
+LISTEN_BACKLOG = 1024  # Ráfagas de cientos de conexiones simultáneas
+RETRY_AFTER_SECONDS = 1
+UPSTREAM_TIMEOUT = 120
+FIXTURE_LINE = re.compile(r'^(\d+)\. (.+?) \(local\) vs (.+?) \(visitante\)', re.MULTILINE)
+ANALYSIS_TEAM = re.compile(r'Analiza al (.+?) con')
+
+MOCK_TEXT = (
+    "El Arsenal llega en buena forma: ha ganado la mayoría de sus últimos partidos en casa "
+    "y su defensa concede menos de un gol por encuentro. El Chelsea marca con regularidad "
+    "fuera de casa, pero su rendimiento reciente es irregular. Considero que el factor local "
+    "y la solidez defensiva dan ventaja al Arsenal, aunque un empate no sería sorprendente."
+)
+
+
+def synthetic_response(prompt: str, rng: random.Random) -> str:
+    """
+    Respuesta verosímil según el prompt: array JSON de predicciones para los prompts
+    de partidos, objeto JSON para los de análisis y texto libre para el resto.
+    """
+    fixtures = FIXTURE_LINE.findall(prompt)
+    if fixtures:
+        predictions = []
+        for index, home_team, away_team in fixtures:
+            home, away = 0.30 + 0.30 * rng.random(), 0.15 + 0.25 * rng.random()
+            draw = max(1.0 - home - away, 0.12)
+            total = home + draw + away
+            probabilities = [round(home / total, 3), round(draw / total, 3), round(away / total, 3)]
+            result = ('Victoria local', 'Empate', 'Victoria visitante')[probabilities.index(max(probabilities))]
+            predictions.append({
+                'fixture': int(index),
+                'home_team': home_team,
+                'away_team': away_team,
+                'predicted_home_goals': round(0.8 + 1.6 * rng.random(), 1),
+                'predicted_away_goals': round(0.5 + 1.4 * rng.random(), 1),
+                'win_probability_home': probabilities[0],
+                'win_probability_draw': probabilities[1],
+                'win_probability_away': probabilities[2],
+                'confidence_score': max(probabilities),
+                'key_insights': [f"{home_team} se apoya en el factor local",
+                                 f"{away_team} concede más fuera de casa"],
+                'reasoning': f"El rendimiento en casa de {home_team} pesa más que la forma de {away_team}.",
+                'expected_result': result
+            })
+        return json.dumps(predictions, ensure_ascii=False, indent=2)
+
+    team = ANALYSIS_TEAM.search(prompt)
+    if team and '"strengths"' in prompt:
+        name = team.group(1)
+        return json.dumps({
+            'strengths': [f"Solidez de {name} en casa", "Presión alta tras pérdida"],
+            'weaknesses': ["Transiciones defensivas", "Irregularidad fuera de casa"],
+            'key_players': ["Capitán", "Delantero centro"],
+            'recent_form': "Irregular, con buenos resultados en casa",
+            'summary': f"{name} compite bien en casa pero le falta regularidad como visitante."
+        }, ensure_ascii=False, indent=2)
+    return MOCK_TEXT
+
+
+def prompt_text(request: Dict) -> str:
+    """Texto del último mensaje (content como cadena o como lista de bloques)"""
+    content = (request.get('messages') or [{}])[-1].get('content', '')
+    if isinstance(content, list):
+        return ''.join(block.get('text', '') for block in content if isinstance(block, dict))
+    return content
+
+
+@dataclass
+class ResponsePlan:
+    """Qué responde el mock a una petición y cuándo"""
+    status: int
+    text: str
+    source: str
+    first_token: float
+    total: float
+    output_tokens: int
+
+
+class MockClaudeState:
+    """
+    Configuración y contadores compartidos entre los hilos del servidor.
+
+    Sin tokens_per_second la latencia es fija (latency y first_token_latency).
+    Con tokens_per_second cada respuesta tarda TTFT + tokens / tokens_per_second,
+    con TTFT lognormal alrededor de first_token_latency si ttft_jitter > 0. Las
+    latencias, los errores y el texto sintético salen de un generador por petición
+    derivado de (seed, hash del prompt, repetición): la misma carga da siempre la
+    misma secuencia, aunque los hilos lleguen en otro orden.
+    """
+
+    def __init__(self, latency: float = DEFAULT_LATENCY,
+                 first_token_latency: float = DEFAULT_FIRST_TOKEN_LATENCY,
+                 tokens_per_second: Optional[float] = None, ttft_jitter: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0,
+                 replay_path: Optional[str] = None, upstream_url: Optional[str] = None):
+        if not 0 <= error_rate + rate_limit_rate <= 1:
+            raise ValueError("error_rate + rate_limit_rate debe estar entre 0 y 1")
+        self.latency = latency
+        self.first_token_latency = first_token_latency if tokens_per_second else min(first_token_latency, latency)
+        self.tokens_per_second = tokens_per_second
+        self.ttft_jitter = ttft_jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self.replay_path = replay_path
+        self.upstream_url = upstream_url
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self.connections = set()
+        self.seen: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self.sources: Counter = Counter()
+        # Caída simulada: 'error' responde 529 al instante, 'hang' no responde mientras dure
+        self.outage = None
+        self.replay: Dict[str, str] = {}
+        if replay_path and os.path.exists(replay_path):
+            with open(replay_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.replay[entry['key']] = entry['text']
+
+    def plan(self, request: Dict) -> ResponsePlan:
+        """Decidir estado, texto y tiempos de la respuesta a una petición"""
+        prompt = prompt_text(request)
+        key = canonical_prompt_key(request.get('model'), request.get('max_tokens'), prompt)
+        with self.lock:
+            repetition = self.seen[key]
+            self.seen[key] += 1
+        rng = random.Random(f"{self.seed}:{key}:{repetition}")
+
+        failure = rng.random()
+        if failure < self.rate_limit_rate:
+            return self._record(ResponsePlan(429, '', 'rate_limit', 0.0, 0.0, 0))
+        if failure < self.rate_limit_rate + self.error_rate:
+            return self._record(ResponsePlan(529, '', 'error', 0.0, 0.0, 0))
+
+        if key in self.replay:
+            text, source = self.replay[key], 'replay'
+        elif self.upstream_url:
+            text, source = self._fetch_upstream(key, request), 'upstream'
+            if text is None:
+                return self._record(ResponsePlan(529, '', 'upstream_error', 0.0, 0.0, 0))
+        else:
+            text, source = synthetic_response(prompt, random.Random(f"{self.seed}:{key}")), 'synthetic'
+
+        output_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+        if self.tokens_per_second:
+            first_token = self.first_token_latency
+            if self.ttft_jitter:
+                first_token *= math.exp(self.ttft_jitter * rng.gauss(0, 1))
+            total = first_token + output_tokens / self.tokens_per_second
+        else:
+            first_token, total = self.first_token_latency, self.latency
+        return self._record(ResponsePlan(200, text, source, first_token, total, output_tokens))
+
+    def _record(self, plan: ResponsePlan) -> ResponsePlan:
+        with self.lock:
+            self.statuses[plan.status] += 1
+            self.sources[plan.source] += 1
+        return plan
+
+    def _fetch_upstream(self, key: str, request: Dict) -> Optional[str]:
+        """Pedir la respuesta a la API real y grabarla en el replay (modo grabación)"""
+        import requests
+        from claude_client import ClaudeAPIError, build_headers, response_text
+
+        try:
+            response = requests.post(self.upstream_url, json={**request, 'stream': False},
+                                     headers=build_headers(os.getenv('CLAUDE_API_KEY')), timeout=UPSTREAM_TIMEOUT)
+            text = response_text(response.status_code, response.json() if response.status_code == 200 else None,
+                                 response.text)
+        except (requests.RequestException, ClaudeAPIError):
+            return None
+        with self.lock:
+            self.replay[key] = text
+            if self.replay_path:
+                with open(self.replay_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'key': key, 'text': text}, ensure_ascii=False) + '\n')
+        return text
+
+    def set_outage(self, mode):
+        if mode is not None and mode not in OUTAGE_MODES:
+            raise ValueError(f"Modo de caída no soportado: {mode}")
+        self.outage = mode
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'active': self.active,
+                'peak_active': self.peak_active,
+                'connections': len(self.connections),
+                'outage': self.outage,
+                'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+                'sources': dict(self.sources),
+                'replay_entries': len(self.replay)
+            }
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    request_queue_size = LISTEN_BACKLOG
+
+
+def make_handler(state: MockClaudeState):
+    class MockClaudeHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, como la API real
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # El cliente cortó la petición (deadline agotado)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send_json(200, state.stats())
+            else:
+                self._send_json(404, {'type': 'error', 'error': {'type': 'not_found_error'}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if self.path == '/outage':
+                try:
+                    state.set_outage(request.get('mode'))
+                except ValueError as e:
+                    self._send_json(400, {'type': 'error', 'error': {'message': str(e)}})
+                    return
+                self._send_json(200, state.stats())
+                return
+            if not self.headers.get('x-api-key'):
+                self._send_json(401, {'type': 'error', 'error': {'type': 'authentication_error'}})
+                return
+
+            with state.lock:
+                state.requests += 1
+                state.active += 1
+                state.peak_active = max(state.peak_active, state.active)
+                state.connections.add(self.client_address)
+            try:
+                if state.outage is not None:
+                    self._outage()
+                    return
+                plan = state.plan(request)
+                if plan.status == 429:
+                    self._send_json(429, {'type': 'error', 'error': {
+                        'type': 'rate_limit_error', 'message': 'Rate limited'
+                    }}, {'retry-after': str(RETRY_AFTER_SECONDS)})
+                    return
+                if plan.status != 200:
+                    self._send_json(plan.status, {'type': 'error', 'error': {
+                        'type': 'overloaded_error', 'message': 'Overloaded'
+                    }})
+                    return
+                if request.get('stream'):
+                    self._stream(request, plan)
+                    return
+                time.sleep(plan.total)
+            finally:
+                with state.lock:
+                    state.active -= 1
+
+            self._send_json(200, {
+                'id': f"msg_mock_{state.requests}",
+                'type': 'message',
+                'role': 'assistant',
+                'model': request.get('model'),
+                'content': [{'type': 'text', 'text': plan.text}],
+                'stop_reason': 'end_turn',
+                'usage': {'input_tokens': len(prompt_text(request)) // CHARS_PER_TOKEN,
+                          'output_tokens': plan.output_tokens}
+            })
+
+        def _outage(self):
+            """Respuesta durante una caída simulada de la API"""
+            if state.outage == 'hang':
+                waited = 0.0
+                while state.outage == 'hang' and waited < OUTAGE_HANG_SECONDS:
+                    time.sleep(0.1)
+                    waited += 0.1
+            self._send_json(529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded'}})
+
+        def _write_chunk(self, data: str):
+            payload = data.encode('utf-8')
+            self.wfile.write(f"{len(payload):X}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        def _stream(self, request, plan: ResponsePlan):
+            """Stream SSE con la secuencia de eventos de la API real, repartida en el tiempo de generación"""
+            words = plan.text.split(' ')
+            chunks = [' '.join(words[i:i + STREAM_CHUNK_WORDS]) + (' ' if i + STREAM_CHUNK_WORDS < len(words) else '')
+                      for i in range(0, len(words), STREAM_CHUNK_WORDS)]
+            interval = (plan.total - plan.first_token) / max(len(chunks), 1)
+
+            def event(name, data):
+                return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+            try:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                time.sleep(plan.first_token)
+                self._write_chunk(event('message_start', {
+                    'type': 'message_start',
+                    'message': {'id': f"msg_mock_{state.requests}", 'model': request.get('model')}
+                }))
+                self._write_chunk(event('content_block_start', {
+                    'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}
+                }))
+                for i, chunk in enumerate(chunks):
+                    if i:
+                        time.sleep(interval)
+                    self._write_chunk(event('content_block_delta', {
+                        'type': 'content_block_delta', 'index': 0,
+                        'delta': {'type': 'text_delta', 'text': chunk}
+                    }))
+                self._write_chunk(event('content_block_stop', {'type': 'content_block_stop', 'index': 0}))
+                self._write_chunk(event('message_delta', {
+                    'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'},
+                    'usage': {'output_tokens': plan.output_tokens}
+                }))
+                self._write_chunk(event('message_stop', {'type': 'message_stop'}))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return MockClaudeHandler
+
+
+def start_mock_server(port: int = 0, latency: float = DEFAULT_LATENCY,
+                      first_token_latency: float = DEFAULT_FIRST_TOKEN_LATENCY, **options):
+    """
+    Arrancar el mock en un hilo en segundo plano.
+
+    Args:
+        options: Resto de parámetros de MockClaudeState (tokens_per_second, error_rate, replay_path...)
+
+    Returns:
+        Tuple: (servidor, estado, URL del endpoint /v1/messages)
+    """
+    state = MockClaudeState(latency, first_token_latency, **options)
+    server = MockHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_port}/v1/messages"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock local de la API de Claude')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help='Segundos por respuesta')
+    parser.add_argument('--first-token', type=float, default=DEFAULT_FIRST_TOKEN_LATENCY,
+                        help='Segundos hasta el primer delta en modo stream')
+    parser.add_argument('--tokens-per-second', type=float,
+                        help='Velocidad de generación; la latencia pasa a ser TTFT + tokens / velocidad')
+    parser.add_argument('--ttft-jitter', type=float, default=0.0,
+                        help='Sigma lognormal del TTFT (0 = TTFT fijo)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de respuestas 529')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fracción de respuestas 429')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de latencias, errores y texto sintético')
+    parser.add_argument('--replay', help='JSONL {key, text} con respuestas grabadas por hash de prompt')
+    parser.add_argument('--record-from', metavar='URL',
+                        help='Pedir a esta API los prompts sin grabar y añadirlos a --replay (usa CLAUDE_API_KEY)')
+    parser.add_argument('--outage', choices=OUTAGE_MODES,
+                        help='Arrancar con una caída simulada (cambiable con POST /outage)')
+    args = parser.parse_args()
+
+    server, state, url = start_mock_server(
+        args.port, args.latency, args.first_token, tokens_per_second=args.tokens_per_second,
+        ttft_jitter=args.ttft_jitter, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed, replay_path=args.replay, upstream_url=args.record_from)
+    state.set_outage(args.outage)
+    timing = (f"TTFT {args.first_token}s + {args.tokens_per_second} tokens/s" if args.tokens_per_second
+              else f"latencia {args.latency}s")
+    print(f"🤖 Mock de Claude escuchando en {url} ({timing}, {len(state.replay)} respuestas grabadas)")
+    print(f"   Usar con: CLAUDE_API_URL={url} CLAUDE_API_KEY=mock python LLM/asgi_server.py")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Mock Claude Test - LLM Premier League
+Verifica que el mock de Claude es determinista, reproduce respuestas grabadas y sigue el modelo de latencia configurado
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from batch_predict import Fixture, parse_claude_predictions  # noqa: E402
+from claude_client import CLAUDE_MAX_TOKENS, CLAUDE_MODEL, ClaudeAPIError, ClaudeClient  # noqa: E402
+from mock_claude_server import MockClaudeState, start_mock_server  # noqa: E402
+from single_flight import canonical_prompt_key  # noqa: E402
+
+TTFT = 0.05
+TOKENS_PER_SECOND = 400
+RATE_SAMPLES = 4000
+ERROR_RATE = 0.05
+RATE_LIMIT_RATE = 0.10
+TIMING_TOLERANCE = 0.05  # Segundos de margen sobre la latencia planificada
+FIXTURES = [Fixture(0, 'Arsenal', 'Chelsea'), Fixture(1, 'Liverpool', 'Everton')]
+PREDICTION_PROMPT = """PARTIDOS:
+0. Arsenal (local) vs Chelsea (visitante)
+1. Liverpool (local) vs Everton (visitante)
+
+Responde ÚNICAMENTE con un array JSON con un objeto por partido, en el mismo orden."""
+
+
+def request_body(prompt: str, stream: bool = False) -> dict:
+    body = {'model': CLAUDE_MODEL, 'max_tokens': CLAUDE_MAX_TOKENS, 'messages': [{'role': 'user', 'content': prompt}]}
+    return {**body, 'stream': True} if stream else body
+
+
+def planned(seed: int, prompts) -> list:
+    """Estado, texto y tiempos que un mock recién creado planifica para una secuencia de prompts"""
+    state = MockClaudeState(first_token_latency=TTFT, tokens_per_second=TOKENS_PER_SECOND, ttft_jitter=0.5,
+                            error_rate=ERROR_RATE, rate_limit_rate=RATE_LIMIT_RATE, seed=seed)
+    return [(p.status, p.text, p.first_token, p.total) for p in (state.plan(request_body(q)) for q in prompts)]
+
+
+def time_to_first_delta(url: str, prompt: str) -> float:
+    start = time.perf_counter()
+    with requests.post(url, json=request_body(prompt, stream=True), headers={'x-api-key': 'mock'},
+                       stream=True, timeout=10) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            if 'content_block_delta' in line:
+                return time.perf_counter() - start
+    return float('inf')
+
+
+def main():
+    print("🤖 LLM PREMIER LEAGUE - MOCK CLAUDE TEST")
+    print("=" * 70)
+    results = {'timestamp': datetime.now().isoformat()}
+
+    # Misma semilla y mismos prompts (con repeticiones): misma secuencia de estados, textos y latencias
+    prompts = [PREDICTION_PROMPT, 'Analiza la Premier League', PREDICTION_PROMPT] * 20
+    first, second, other = planned(7, prompts), planned(7, prompts), planned(8, prompts)
+    print(f"🎲 {len(prompts)} peticiones planificadas dos veces con la semilla 7 y una con la 8")
+
+    # Tasas de 429 y 529 con prompts distintos
+    state = MockClaudeState(error_rate=ERROR_RATE, rate_limit_rate=RATE_LIMIT_RATE, seed=1)
+    statuses = [state.plan(request_body(f"Pregunta {i}")).status for i in range(RATE_SAMPLES)]
+    rates = {'429': statuses.count(429) / RATE_SAMPLES, '529': statuses.count(529) / RATE_SAMPLES}
+    results['rates'] = rates
+    print(f"🚦 {RATE_SAMPLES} peticiones: {rates['429']:.1%} 429 (objetivo {RATE_LIMIT_RATE:.0%}), "
+          f"{rates['529']:.1%} 529 (objetivo {ERROR_RATE:.0%})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        replay_path = os.path.join(tmp, 'replay.jsonl')
+        recorded = 'Respuesta grabada de la API real'
+        with open(replay_path, 'w', encoding='utf-8') as f:
+            key = canonical_prompt_key(CLAUDE_MODEL, CLAUDE_MAX_TOKENS, '¿Quién ganará la liga?')
+            f.write(json.dumps({'key': key, 'text': recorded}) + '\n')
+
+        server, state, url = start_mock_server(first_token_latency=TTFT, tokens_per_second=TOKENS_PER_SECOND,
+                                               replay_path=replay_path)
+        client = ClaudeClient(api_key='mock', base_url=url)
+        replayed = client.complete('¿Quién ganará la liga?')
+
+        start = time.perf_counter()
+        prediction_text = client.complete(PREDICTION_PROMPT)
+        elapsed = time.perf_counter() - start
+        expected = TTFT + max(1, len(prediction_text) // 4) / TOKENS_PER_SECOND
+        predictions = parse_claude_predictions(prediction_text, FIXTURES)
+        ttft = time_to_first_delta(url, PREDICTION_PROMPT)
+        results['timing'] = {'expected': expected, 'non_stream': elapsed, 'stream_first_delta': ttft}
+        print(f"\n⏱️ Predicción de {len(prediction_text)} caracteres: {elapsed * 1000:.0f}ms "
+              f"(modelo {expected * 1000:.0f}ms); primer delta en stream {ttft * 1000:.0f}ms (TTFT {TTFT * 1000:.0f}ms)")
+        stats = state.stats()
+        results['mock_stats'] = stats
+        print(f"🎞️ Fuentes: {stats['sources']}")
+        server.shutdown()
+
+    server, _, url = start_mock_server(rate_limit_rate=1.0)
+    limited = requests.post(url, json=request_body('Hola'), headers={'x-api-key': 'mock'}, timeout=5)
+    try:
+        ClaudeClient(api_key='mock', base_url=url).complete('Hola')
+        client_raises = False
+    except ClaudeAPIError:
+        client_raises = True
+    server.shutdown()
+
+    env = {**os.environ, 'CLAUDE_API_URL': url}
+    configured = subprocess.run(
+        [sys.executable, '-c', 'import claude_client; print(claude_client.CLAUDE_API_URL)'],
+        cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'),
+        env=env, capture_output=True, text=True).stdout.strip()
+
+    checks = {
+        'same_seed_same_run': first == second,
+        'other_seed_differs': first != other,
+        'repeated_prompt_varies': len({p[3] for p in first[::3] if p[0] == 200}) > 1,
+        'rate_limit_rate_matches': abs(rates['429'] - RATE_LIMIT_RATE) < 0.02,
+        'error_rate_matches': abs(rates['529'] - ERROR_RATE) < 0.015,
+        'replay_returns_recorded': replayed == recorded,
+        'latency_follows_model': expected - 0.005 <= elapsed <= expected + TIMING_TOLERANCE,
+        'stream_first_delta_at_ttft': TTFT * 0.9 <= ttft <= TTFT + TIMING_TOLERANCE,
+        'prediction_json_parses': sorted(predictions) == [0, 1],
+        '429_with_retry_after': limited.status_code == 429 and limited.headers.get('retry-after') is not None,
+        'client_raises_on_429': client_raises,
+        'base_url_from_env': configured == url
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"mock_claude_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Open-Loop Load Generator - LLM Premier League
+Generador de carga de lazo abierto: las peticiones salen a la tasa fijada, no cuando responde la anterior
+"""
+
+import asyncio
+import json
+import math
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from latency_histogram import LatencyHistogram
+
+PROFILES = ('constant', 'poisson', 'ramp')
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_TIMEOUT = 30.0
+MAX_ERRORS_KEPT = 20
+
+
+def arrival_schedule(rate: float, duration: float, profile: str = 'constant',
+                     end_rate: Optional[float] = None, seed: Optional[int] = None) -> List[float]:
+    """
+    Instantes de envío (segundos desde el inicio) para una tasa de llegada.
+
+    Args:
+        rate: Peticiones por segundo (al inicio de la rampa en 'ramp')
+        duration: Duración de la carga en segundos
+        profile: 'constant' (intervalos fijos), 'poisson' (intervalos exponenciales) o 'ramp' (lineal)
+        end_rate: Tasa al final de la rampa (solo 'ramp')
+        seed: Semilla de los intervalos de Poisson
+
+    Raises:
+        ValueError: Perfil desconocido o tasas no válidas
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Perfil desconocido: {profile} (usa {', '.join(PROFILES)})")
+    end_rate = rate if end_rate is None or profile != 'ramp' else end_rate
+    if rate < 0 or end_rate < 0 or rate + end_rate <= 0 or duration <= 0:
+        raise ValueError("La tasa y la duración deben ser positivas")
+
+    if profile == 'poisson':
+        rng = random.Random(seed)
+        times, t = [], rng.expovariate(rate)
+        while t < duration:
+            times.append(t)
+            t += rng.expovariate(rate)
+        return times
+
+    # N(t) = r0·t + (r1 - r0)·t² / 2D; el envío k-ésimo es la raíz de N(t) = k (forma estable, vale con r1 = r0).
+    # El primero sale en t = 0: con r0 = 0 la fórmula daría 0/0
+    slope = (end_rate - rate) / (2 * duration)
+    total = int((rate + end_rate) * duration / 2)
+    return [2 * k / (rate + math.sqrt(rate * rate + 4 * slope * k)) if k else 0.0 for k in range(total)]
+
+
+@dataclass
+class OpenLoopResult:
+    """Resultado de una carga de lazo abierto"""
+    target_rate: float
+    duration: float
+    # Desde el instante previsto de envío: incluye la cola si el servidor o el pool se atascan
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    # Desde el envío real: lo que mediría un cliente de lazo cerrado
+    service_time: LatencyHistogram = field(default_factory=LatencyHistogram)
+    # Retraso del generador al despachar (debe ser ~0; si crece, el generador no llega a la tasa)
+    send_lag: LatencyHistogram = field(default_factory=LatencyHistogram)
+    status_codes: Dict[int, int] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+    error_count: int = 0
+    response_bytes: int = 0
+    connections_opened: int = 0
+
+    @property
+    def total_requests(self) -> int:
+        return self.latency.count
+
+    @property
+    def successful_requests(self) -> int:
+        return self.status_codes.get(200, 0)
+
+    def summary(self) -> Dict:
+        """Estadísticas en el formato de los resultados JSON de LoadTester"""
+        total = self.total_requests
+        latency = self.latency.summary()
+        return {
+            'target_rps': self.target_rate,
+            'total_requests': total,
+            'successful_requests': self.successful_requests,
+            'failed_requests': total - self.successful_requests,
+            'success_rate': self.successful_requests / total if total else 0,
+            'total_duration': self.duration,
+            'requests_per_second': total / self.duration if self.duration else 0,
+            'avg_response_time': latency['mean'],
+            'min_response_time': latency['min'],
+            'max_response_time': latency['max'],
+            'median_response_time': latency['p50'],
+            'percentile_95': self.latency.value_at_percentile(95),
+            'percentile_99': latency['p99'],
+            'latency': latency,
+            'service_time': self.service_time.summary(),
+            'send_lag_p99': self.send_lag.value_at_percentile(99),
+            'connections_opened': self.connections_opened,
+            'status_codes': {str(code): count for code, count in sorted(self.status_codes.items())},
+            'errors': self.errors,
+            'histogram': self.latency.to_dict()
+        }
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones HTTP/1.1 keep-alive sobre asyncio streams.
+
+    Cliente mínimo a propósito: con httpx el propio cliente se queda en unos cientos de
+    peticiones por segundo y pasa a ser el cuello de botella de la medida. Admite
+    Content-Length, chunked y respuestas que terminan al cerrar la conexión.
+    """
+
+    def __init__(self, base_url: str, size: int = DEFAULT_MAX_CONNECTIONS):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"URL no soportada: {base_url}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.size = size
+        self.opened = 0
+        # Un hueco por conexión: None es un hueco libre todavía sin conexión abierta
+        self._slots: asyncio.LifoQueue = asyncio.LifoQueue()
+        for _ in range(size):
+            self._slots.put_nowait(None)
+
+    async def request(self, method: str, path: str, payload=None,
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, int]:
+        """Enviar una petición y devolver (status, bytes del cuerpo); espera si no hay conexión libre"""
+        body = json.dumps(payload).encode() if payload is not None else b''
+        head = f"{method} {self.prefix}{path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nAccept: */*\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        if payload is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        message = head.encode() + b"\r\n" + body
+
+        connection = await self._slots.get()
+        reusable = False
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+                self.opened += 1
+            status, size, reusable = await self._exchange(*connection, message)
+            return status, size
+        finally:
+            if reusable:
+                self._slots.put_nowait(connection)
+            else:
+                if connection is not None:
+                    connection[1].close()
+                self._slots.put_nowait(None)
+
+    @staticmethod
+    async def _exchange(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                        message: bytes) -> Tuple[int, int, bool]:
+        writer.write(message)
+        await writer.drain()
+        status_line, *header_lines = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1').split("\r\n")
+        version, status = status_line.split(' ', 2)[:2]
+        headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip().lower()
+        keep_alive = headers.get('connection') != 'close' and (version == 'HTTP/1.1'
+                                                                or headers.get('connection') == 'keep-alive')
+
+        if 'content-length' in headers:
+            size = int(headers['content-length'])
+            await reader.readexactly(size)
+        elif headers.get('transfer-encoding') == 'chunked':
+            size = 0
+            while True:
+                chunk = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(chunk + 2)
+                size += chunk
+                if chunk == 0:
+                    break
+        else:
+            size = len(await reader.read())
+            keep_alive = False
+        return int(status), size, keep_alive
+
+    def close(self):
+        """Cerrar las conexiones inactivas"""
+        while not self._slots.empty():
+            connection = self._slots.get_nowait()
+            if connection is not None:
+                connection[1].close()
+
+
+async def run_open_loop(base_url: str, endpoints: Sequence[Dict], schedule: Sequence[float],
+                        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                        timeout: float = DEFAULT_TIMEOUT) -> OpenLoopResult:
+    """
+    Lanzar una petición en cada instante de schedule sin esperar a las anteriores.
+
+    Args:
+        base_url: URL base de la API (p. ej. http://localhost:8080/api)
+        endpoints: Dicts {'method', 'path', 'payload'} de LoadTester (y 'headers' opcional); se reparten en rueda
+        schedule: Instantes de envío en segundos (ver arrival_schedule)
+        max_connections: Tamaño del pool de conexiones keep-alive
+        timeout: Timeout por petición (incluye la espera de una conexión libre del pool)
+    """
+    loop = asyncio.get_running_loop()
+    span = schedule[-1] - schedule[0] if len(schedule) > 1 else 0.0
+    result = OpenLoopResult(target_rate=(len(schedule) - 1) / span if span else 0.0, duration=span)
+    pool = ConnectionPool(base_url, max_connections)
+
+    async def send(endpoint: Dict, intended: float):
+        sent = loop.time()
+        status, error = 0, None
+        try:
+            status, size = await asyncio.wait_for(
+                pool.request(endpoint['method'], endpoint['path'], endpoint['payload'], endpoint.get('headers')),
+                timeout)
+            result.response_bytes += size
+        except asyncio.TimeoutError:
+            error = 'timeout'
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            error = f"{type(e).__name__}: {e}"
+        done = loop.time()
+        result.latency.record(done - intended)
+        result.service_time.record(done - sent)
+        result.send_lag.record(sent - intended)
+        result.status_codes[status] = result.status_codes.get(status, 0) + 1
+        if error is not None or status != 200:
+            result.error_count += 1
+            if len(result.errors) < MAX_ERRORS_KEPT:
+                result.errors.append(error or f"HTTP {status}")
+
+    tasks = []
+    start = loop.time()
+    try:
+        for i, offset in enumerate(schedule):
+            intended = start + offset
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(endpoints[i % len(endpoints)], intended)))
+        await asyncio.gather(*tasks)
+    finally:
+        pool.close()
+    result.duration = loop.time() - start
+    result.connections_opened = pool.opened
+    return result
+
+
+def open_loop_load(base_url: str, endpoints: Sequence[Dict], rate: float, duration: float,
+                   profile: str = 'constant', end_rate: Optional[float] = None, seed: Optional[int] = None,
+                   max_connections: int = DEFAULT_MAX_CONNECTIONS, timeout: float = DEFAULT_TIMEOUT) -> OpenLoopResult:
+    """Versión síncrona de run_open_loop con la tasa de llegada de arrival_schedule"""
+    schedule = arrival_schedule(rate, duration, profile, end_rate, seed)
+    return asyncio.run(run_open_loop(base_url, endpoints, schedule, max_connections, timeout))
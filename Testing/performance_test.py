@@ -13,6 +13,9 @@ from typing import Dict, List, Tuple
 import os
 import sys
 
+from latency_histogram import LatencyHistogram, format_summary
+from suite_runner import MODE_KEYS, MODE_NAMES, MODES, select_mode, suite_parser, selected_modes
+
 # Configuración
 API_BASE_URL = "http://localhost:8080/api"
 TEST_ITERATIONS = 5  # Número de iteraciones por test
@@ -55,6 +58,7 @@ class PerformanceTester:
                 'base_url': API_BASE_URL
             }
         }
+        self.headers = {}
     
     def check_server_status(self) -> bool:
         """Verificar que el servidor esté funcionando"""
@@ -65,26 +69,14 @@ class PerformanceTester:
             return False
     
     def toggle_ai_mode(self, enable: bool) -> bool:
-        """Cambiar el modo AI del sistema"""
-        try:
-            payload = {"use_claude_ai": enable}
-            response = requests.post(
-                f"{API_BASE_URL}/toggle-ai", 
-                json=payload,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ Modo cambiado a: {'Claude AI' if enable else 'Local'}")
-                return data.get('current_mode') == enable
-            else:
-                print(f"❌ Error cambiando modo: {response.text}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Error en toggle: {e}")
+        """Modo AI de las siguientes peticiones (header X-AI-Mode; toggle global si el servidor no lo admite)"""
+        headers = select_mode(API_BASE_URL, 'claude' if enable else 'local')
+        if headers is None:
+            print(f"❌ Error cambiando modo a: {'Claude AI' if enable else 'Local'}")
             return False
+        self.headers = headers
+        print(f"✅ Modo cambiado a: {'Claude AI' if enable else 'Local'}")
+        return True
     
     def measure_endpoint_performance(self, endpoint: str, method: str, payload: Dict = None) -> Dict:
         """Medir rendimiento de un endpoint específico"""
@@ -97,9 +89,10 @@ class PerformanceTester:
                 start_time = time.time()
                 
                 if method == 'GET':
-                    response = requests.get(f"{API_BASE_URL}/{endpoint}", timeout=TIMEOUT)
+                    response = requests.get(f"{API_BASE_URL}/{endpoint}", headers=self.headers, timeout=TIMEOUT)
                 elif method == 'POST':
-                    response = requests.post(f"{API_BASE_URL}/{endpoint}", json=payload, timeout=TIMEOUT)
+                    response = requests.post(f"{API_BASE_URL}/{endpoint}", json=payload, headers=self.headers,
+                                             timeout=TIMEOUT)
                 
                 end_time = time.time()
                 
@@ -117,30 +110,21 @@ class PerformanceTester:
             except Exception as e:
                 print(f"  ❌ Iteración {i+1}: Error - {e}")
         
-        if times:
-            return {
-                'success_rate': success_count / TEST_ITERATIONS,
-                'avg_time': statistics.mean(times),
-                'min_time': min(times),
-                'max_time': max(times),
-                'median_time': statistics.median(times),
-                'std_dev': statistics.stdev(times) if len(times) > 1 else 0,
-                'total_tests': TEST_ITERATIONS,
-                'successful_tests': success_count,
-                'sample_responses': responses[:2]  # Primeras 2 respuestas como muestra
-            }
-        else:
-            return {
-                'success_rate': 0,
-                'avg_time': 0,
-                'min_time': 0,
-                'max_time': 0,
-                'median_time': 0,
-                'std_dev': 0,
-                'total_tests': TEST_ITERATIONS,
-                'successful_tests': 0,
-                'sample_responses': []
-            }
+        # Sin respuestas correctas los tiempos quedan en None (null en el JSON), no en 0
+        histogram = LatencyHistogram(times)
+        return {
+            'success_rate': success_count / TEST_ITERATIONS,
+            'avg_time': histogram.mean,
+            'min_time': histogram.min,
+            'max_time': histogram.max,
+            'median_time': statistics.median(times) if times else None,
+            'std_dev': statistics.stdev(times) if len(times) > 1 else 0,
+            'total_tests': TEST_ITERATIONS,
+            'successful_tests': success_count,
+            'latency': histogram.summary(),
+            'histogram': histogram.to_dict(),
+            'sample_responses': responses[:2]  # Primeras 2 respuestas como muestra
+        }
     
     def test_predictions(self) -> Dict:
         """Test de predicciones de partidos"""
@@ -224,20 +208,31 @@ class PerformanceTester:
         """Calcular estadísticas resumidas"""
         all_times = []
         all_success_rates = []
+        histograms = {}
         
-        for category in mode_results.values():
+        for category_name, category in mode_results.items():
+            histograms[category_name] = LatencyHistogram.merged(
+                LatencyHistogram.from_dict(test_result['histogram']) for test_result in category.values()
+            )
             for test_result in category.values():
                 if test_result['success_rate'] > 0:
                     all_times.append(test_result['avg_time'])
                 all_success_rates.append(test_result['success_rate'])
         
+        # Percentiles por categoría y del modo completo (histogramas combinados, no medias de medias)
+        mode_histogram = LatencyHistogram.merged(histograms.values())
+        latency = {name: histogram.summary() for name, histogram in histograms.items()}
+        latency['all'] = mode_histogram.summary()
+        
         if all_times:
             return {
                 'overall_avg_time': statistics.mean(all_times),
                 'overall_success_rate': statistics.mean(all_success_rates),
                 'fastest_response': min(all_times),
                 'slowest_response': max(all_times),
-                'total_tests_run': sum(len(cat) * TEST_ITERATIONS for cat in mode_results.values())
+                'total_tests_run': sum(len(cat) * TEST_ITERATIONS for cat in mode_results.values()),
+                'latency': latency,
+                'histogram': mode_histogram.to_dict()
             }
         else:
             return {
@@ -245,11 +240,13 @@ class PerformanceTester:
                 'overall_success_rate': 0,
                 'fastest_response': 0,
                 'slowest_response': 0,
-                'total_tests_run': 0
+                'total_tests_run': 0,
+                'latency': latency,
+                'histogram': mode_histogram.to_dict()
             }
     
-    def run_comparative_tests(self):
-        """Ejecutar tests comparativos completos"""
+    def run_comparative_tests(self, modes=tuple(MODES)):
+        """Ejecutar tests comparativos completos (solo los modos indicados: 'local', 'claude')"""
         print("🏆 LLM PREMIER LEAGUE - PERFORMANCE TESTING SUITE")
         print("=" * 80)
         
@@ -259,35 +256,18 @@ class PerformanceTester:
         
         print("✅ Servidor conectado correctamente")
         
-        # Test 1: Modo Claude AI OFF (Local)
-        print("\n" + "="*80)
-        print("🔄 FASE 1: Testing modo LOCAL (AI OFF)")
-        print("="*80)
-        
-        if self.toggle_ai_mode(False):
-            time.sleep(2)  # Esperar a que el cambio se propague
-            self.results['claude_ai_off'] = self.run_full_test_suite("LOCAL")
-            self.results['claude_ai_off']['summary'] = self.calculate_summary_stats(
-                self.results['claude_ai_off']
-            )
-        else:
-            print("❌ No se pudo cambiar al modo LOCAL")
-            return False
-        
-        # Test 2: Modo Claude AI ON  
-        print("\n" + "="*80)
-        print("🔄 FASE 2: Testing modo CLAUDE AI (AI ON)")
-        print("="*80)
-        
-        if self.toggle_ai_mode(True):
-            time.sleep(2)  # Esperar a que el cambio se propague
-            self.results['claude_ai_on'] = self.run_full_test_suite("CLAUDE AI")
-            self.results['claude_ai_on']['summary'] = self.calculate_summary_stats(
-                self.results['claude_ai_on']
-            )
-        else:
-            print("❌ No se pudo cambiar al modo CLAUDE AI")
-            return False
+        for phase, mode in enumerate((m for m in MODES if m in modes), 1):
+            mode_name = MODE_NAMES[mode]
+            print("\n" + "="*80)
+            print(f"🔄 FASE {phase}: Testing modo {mode_name} (AI {'ON' if MODES[mode] else 'OFF'})")
+            print("="*80)
+            
+            if not self.toggle_ai_mode(MODES[mode]):
+                print(f"❌ No se pudo cambiar al modo {mode_name}")
+                return False
+            key = MODE_KEYS[mode]
+            self.results[key] = self.run_full_test_suite(mode_name)
+            self.results[key]['summary'] = self.calculate_summary_stats(self.results[key])
         
         return True
     
@@ -306,12 +286,23 @@ class PerformanceTester:
 
 def main():
     """Función principal"""
+    global API_BASE_URL
+    args = suite_parser('Tests de rendimiento LOCAL vs CLAUDE AI').parse_args()
+    API_BASE_URL = args.base_url
+    modes = selected_modes(args)
     print("Iniciando tests de rendimiento...")
     
     tester = PerformanceTester()
     
-    if tester.run_comparative_tests():
-        results_file = tester.save_results()
+    if tester.run_comparative_tests(modes):
+        results_file = tester.save_results(os.path.abspath(args.output) if args.output else None)
+        
+        if len(modes) < len(MODES):
+            # Un solo modo (servidor fijado a ese modo): la comparación la hace run_all_tests.py
+            summary = tester.results[MODE_KEYS[modes[0]]]['summary']
+            print(f"\n📊 MODO {MODE_NAMES[modes[0]]}: "
+                  f"éxito {summary['overall_success_rate']:.1%}, {format_summary(summary['latency']['all'])}")
+            return True
         
         print("\n" + "="*80)
         print("🎯 RESUMEN DE RESULTADOS")
@@ -326,12 +317,14 @@ def main():
         print(f"   • Éxito promedio: {local_summary['overall_success_rate']:.1%}")
         print(f"   • Respuesta más rápida: {local_summary['fastest_response']:.3f}s")
         print(f"   • Respuesta más lenta: {local_summary['slowest_response']:.3f}s")
+        print(f"   • Latencias: {format_summary(local_summary['latency']['all'])}")
         
         print(f"\n🤖 MODO CLAUDE AI:")
         print(f"   • Tiempo promedio: {ai_summary['overall_avg_time']:.3f}s")
         print(f"   • Éxito promedio: {ai_summary['overall_success_rate']:.1%}")
         print(f"   • Respuesta más rápida: {ai_summary['fastest_response']:.3f}s")
         print(f"   • Respuesta más lenta: {ai_summary['slowest_response']:.3f}s")
+        print(f"   • Latencias: {format_summary(ai_summary['latency']['all'])}")
         
         # Comparación
         time_diff = ai_summary['overall_avg_time'] - local_summary['overall_avg_time']
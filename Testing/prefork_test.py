@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Prefork Test - LLM Premier League
+Mide el throughput del servidor prefork por número de workers y verifica la recarga sin peticiones perdidas
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+from flask import Flask, jsonify, request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from batch_predict import Fixture, predict_local_batch  # noqa: E402
+from columnar_cache import load_dataset  # noqa: E402
+from live_stats import LiveStatsStore  # noqa: E402
+from prefork_server import PreforkServer  # noqa: E402
+
+USERS = 16
+LOAD_SECONDS = 5.0
+RELOAD_LOAD_SECONDS = 6.0
+FIXTURES = [('Arsenal', 'Chelsea'), ('Liverpool', 'Everton'), ('Man City', 'Man United'),
+            ('Tottenham', 'Newcastle'), ('Aston Villa', 'Brighton'), ('West Ham', 'Fulham')]
+
+_loads = {'count': 0}
+
+
+def create_app() -> Flask:
+    """App con un /api/predict local equivalente; se construye en el proceso maestro"""
+    _loads['count'] += 1
+    dataset = load_dataset()
+    live_stats = LiveStatsStore.from_dataset(dataset)
+    table = live_stats.snapshot()
+    team_ids = {name: i for i, name in enumerate(table.team_names)}
+
+    app = Flask(__name__)
+    app.config['GENERATION'] = _loads['count']
+
+    @app.route('/api/predict', methods=['POST'])
+    def predict():
+        data = request.get_json(silent=True) or {}
+        home_team, away_team = data.get('home_team'), data.get('away_team')
+        if home_team not in team_ids or away_team not in team_ids:
+            return jsonify({'success': False, 'error': 'Equipo no encontrado'}), 400
+        prediction = predict_local_batch(table, [Fixture(0, home_team, away_team)])[0]
+        return jsonify({'success': True, 'prediction': prediction,
+                        'worker': os.getpid(), 'generation': app.config['GENERATION']})
+
+    return app
+
+
+def start_server(workers: int, watch_paths=()):
+    """Arrancar el maestro prefork en un proceso aparte; devuelve (proceso, url)"""
+    server = PreforkServer(create_app, host='127.0.0.1', port=0, workers=workers,
+                           watch_paths=watch_paths, reload_interval=0.5)
+    port = server.bind()
+    master = multiprocessing.get_context('fork').Process(target=server.serve_forever, daemon=True)
+    master.start()
+    server._socket.close()  # El maestro conserva su copia del socket
+    url = f"http://127.0.0.1:{port}/api/predict"
+    for _ in range(100):
+        try:
+            requests.post(url, json={'home_team': 'Arsenal', 'away_team': 'Chelsea'}, timeout=2)
+            break
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    return master, url
+
+
+def stop_server(master):
+    os.kill(master.pid, signal.SIGTERM)
+    master.join(timeout=15)
+
+
+def run_load(url: str, seconds: float, during=None) -> dict:
+    """USERS clientes con keep-alive enviando peticiones sin pausa"""
+    stop = threading.Event()
+    lock = threading.Lock()
+    totals = {'ok': 0, 'failed': 0, 'errors': [], 'workers': set(), 'generations': {}}
+
+    def user(user_id: int):
+        session = requests.Session()
+        i = user_id
+        while not stop.is_set():
+            home_team, away_team = FIXTURES[i % len(FIXTURES)]
+            i += 1
+            try:
+                response = session.post(url, json={'home_team': home_team, 'away_team': away_team}, timeout=10)
+                data = response.json()
+                ok = response.status_code == 200 and data.get('success')
+            except (requests.exceptions.RequestException, ValueError) as e:
+                ok, data = False, {'error': str(e)}
+            with lock:
+                if ok:
+                    totals['ok'] += 1
+                    totals['workers'].add(data['worker'])
+                    generation = data['generation']
+                    totals['generations'][generation] = totals['generations'].get(generation, 0) + 1
+                else:
+                    totals['failed'] += 1
+                    totals['errors'].append(data.get('error'))
+
+    threads = [threading.Thread(target=user, args=(u,), daemon=True) for u in range(USERS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    if during is not None:
+        time.sleep(seconds / 3)
+        during()
+        time.sleep(seconds * 2 / 3)
+    else:
+        time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join(timeout=15)
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': totals['ok'] + totals['failed'],
+        'failed': totals['failed'],
+        'rps': totals['ok'] / elapsed,
+        'workers_seen': len(totals['workers']),
+        'generations': totals['generations'],
+        'errors': totals['errors'][:5]
+    }
+
+
+def main():
+    print("🏭 LLM PREMIER LEAGUE - PREFORK SERVER TEST")
+    print("=" * 70)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    cores = os.cpu_count() or 1
+    results = {'timestamp': datetime.now().isoformat(), 'cores': cores, 'throughput': {}}
+
+    for workers in sorted({1, 2, cores}):
+        master, url = start_server(workers)
+        try:
+            stats = run_load(url, LOAD_SECONDS)
+        finally:
+            stop_server(master)
+        results['throughput'][workers] = stats
+        print(f"   {workers:>2} workers: {stats['rps']:>7.1f} RPS, {stats['failed']} fallidas, "
+              f"{stats['workers_seen']} procesos respondiendo")
+    if cores == 1:
+        print("   ℹ️ Una sola CPU disponible: el escalado por núcleos no se puede medir aquí")
+
+    print("\n🔄 Recarga con el dataset modificado durante la carga")
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+        f.write('version,1\n')
+        watched = f.name
+    master, url = start_server(min(cores, 4), watch_paths=[watched])
+
+    def modify_dataset():
+        with open(watched, 'a') as f:
+            f.write('version,2\n')
+
+    try:
+        reload_stats = run_load(url, RELOAD_LOAD_SECONDS, during=modify_dataset)
+    finally:
+        stop_server(master)
+        os.unlink(watched)
+    results['reload'] = reload_stats
+    print(f"   {reload_stats['requests']} peticiones, {reload_stats['failed']} fallidas, "
+          f"por generación: {reload_stats['generations']}")
+
+    checks = {
+        'no_failed_requests': all(r['failed'] == 0 for r in results['throughput'].values()),
+        'all_workers_serving': all(r['workers_seen'] == w for w, r in results['throughput'].items()),
+        'reload_switched_generation': len(reload_stats['generations']) >= 2,
+        'reload_dropped_nothing': reload_stats['failed'] == 0
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"prefork_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -6,11 +6,12 @@ Evalúa la calidad de las respuestas entre modo Claude AI vs modo Local
 
 import requests
 import json
-import time
 from datetime import datetime
 from typing import Dict, List, Tuple
 import re
 
+from suite_runner import MODE_KEYS, MODE_NAMES, MODES, select_mode, suite_parser, selected_modes
+
 API_BASE_URL = "http://localhost:8080/api"
 
 class QualityTester:
@@ -95,15 +96,15 @@ class QualityTester:
             'claude_ai_off': {},
             'timestamp': datetime.now().isoformat()
         }
+        self.headers = {}
     
     def toggle_ai_mode(self, enable: bool) -> bool:
-        """Cambiar modo AI"""
-        try:
-            response = requests.post(f"{API_BASE_URL}/toggle-ai", 
-                                   json={"use_claude_ai": enable}, timeout=10)
-            return response.status_code == 200 and response.json().get('current_mode') == enable
-        except:
+        """Modo AI de las siguientes peticiones (header X-AI-Mode o toggle global)"""
+        headers = select_mode(API_BASE_URL, 'claude' if enable else 'local')
+        if headers is None:
             return False
+        self.headers = headers
+        return True
     
     def evaluate_prediction_quality(self, response_data: Dict) -> Dict:
         """Evaluar calidad de predicción"""
@@ -238,7 +239,7 @@ class QualityTester:
             
             try:
                 response = requests.post(f"{API_BASE_URL}/{endpoint}", 
-                                       json=payload, timeout=30)
+                                       json=payload, headers=self.headers, timeout=30)
                 
                 if response.status_code == 200:
                     response_data = response.json()
@@ -276,55 +277,34 @@ class QualityTester:
                     'total_score': 0
                 }
                 print(f"    ❌ Exception: {e}")
-            
-            time.sleep(1)  # Pausa entre tests
         
         return results
     
-    def run_quality_tests(self):
-        """Ejecutar todos los tests de calidad"""
+    def run_quality_tests(self, modes=tuple(MODES)):
+        """Ejecutar todos los tests de calidad (solo los modos indicados: 'local', 'claude')"""
         print("🏆 LLM PREMIER LEAGUE - QUALITY TESTING SUITE")
         print("=" * 70)
         
-        # Test modo Local (AI OFF)
-        print("\n📊 TESTING LOCAL MODE (AI OFF)")
-        print("-" * 50)
-        
-        if self.toggle_ai_mode(False):
-            time.sleep(2)
-            
-            mode_results = {}
-            mode_results['predictions'] = self.test_endpoint_quality(
-                'predict', self.quality_tests['predictions'], 'LOCAL'
-            )
-            mode_results['analysis'] = self.test_endpoint_quality(
-                'analyze', self.quality_tests['analysis'], 'LOCAL'  
-            )
-            mode_results['chat'] = self.test_endpoint_quality(
-                'chat', self.quality_tests['chat'], 'LOCAL'
-            )
-            
-            self.results['claude_ai_off'] = mode_results
+        for mode in (m for m in MODES if m in modes):
+            mode_name = MODE_NAMES[mode]
+            print(f"\n{'🤖' if MODES[mode] else '📊'} TESTING {mode_name} MODE (AI {'ON' if MODES[mode] else 'OFF'})")
+            print("-" * 50)
             
-        # Test modo Claude AI (AI ON)
-        print("\n🤖 TESTING CLAUDE AI MODE (AI ON)")
-        print("-" * 50)
-        
-        if self.toggle_ai_mode(True):
-            time.sleep(2)
+            if not self.toggle_ai_mode(MODES[mode]):
+                continue
             
             mode_results = {}
             mode_results['predictions'] = self.test_endpoint_quality(
-                'predict', self.quality_tests['predictions'], 'CLAUDE AI'
+                'predict', self.quality_tests['predictions'], mode_name
             )
             mode_results['analysis'] = self.test_endpoint_quality(
-                'analyze', self.quality_tests['analysis'], 'CLAUDE AI'
+                'analyze', self.quality_tests['analysis'], mode_name
             )
             mode_results['chat'] = self.test_endpoint_quality(
-                'chat', self.quality_tests['chat'], 'CLAUDE AI'
+                'chat', self.quality_tests['chat'], mode_name
             )
             
-            self.results['claude_ai_on'] = mode_results
+            self.results[MODE_KEYS[mode]] = mode_results
     
     def calculate_mode_averages(self, mode_data: Dict) -> Dict:
         """Calcular promedios por modo"""
@@ -344,18 +324,16 @@ class QualityTester:
             'total_tests': len(all_scores)
         }
     
-    def save_results(self) -> str:
+    def save_results(self, filepath: str = None) -> str:
         """Guardar resultados"""
-        filename = f"quality_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        filepath = f"/Users/rios/Desktop/LLM-PREMIER/testing/{filename}"
+        if not filepath:
+            filename = f"quality_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            filepath = f"/Users/rios/Desktop/LLM-PREMIER/testing/{filename}"
         
-        # Calcular promedios
-        self.results['claude_ai_off']['summary'] = self.calculate_mode_averages(
-            self.results['claude_ai_off']
-        )
-        self.results['claude_ai_on']['summary'] = self.calculate_mode_averages(
-            self.results['claude_ai_on']
-        )
+        # Calcular promedios de los modos probados
+        for key in MODE_KEYS.values():
+            if self.results[key]:
+                self.results[key]['summary'] = self.calculate_mode_averages(self.results[key])
         
         with open(filepath, 'w') as f:
             json.dump(self.results, f, indent=2, ensure_ascii=False)
@@ -369,20 +347,20 @@ class QualityTester:
         print("📊 RESUMEN DE CALIDAD")
         print("=" * 70)
         
-        local_summary = self.results['claude_ai_off']['summary']
-        ai_summary = self.results['claude_ai_on']['summary']
-        
-        print(f"📊 MODO LOCAL:")
-        print(f"   • Score promedio: {local_summary['overall_quality_score']:.2f} ({local_summary['overall_quality_score']*100:.0f}%)")
-        print(f"   • Predicciones: {local_summary['category_scores']['predictions']:.2f}")
-        print(f"   • Análisis: {local_summary['category_scores']['analysis']:.2f}")
-        print(f"   • Chat: {local_summary['category_scores']['chat']:.2f}")
+        for mode, key in MODE_KEYS.items():
+            summary = self.results[key].get('summary')
+            if not summary:
+                continue
+            print(f"\n{'🤖' if MODES[mode] else '📊'} MODO {MODE_NAMES[mode]}:")
+            print(f"   • Score promedio: {summary['overall_quality_score']:.2f} ({summary['overall_quality_score']*100:.0f}%)")
+            print(f"   • Predicciones: {summary['category_scores']['predictions']:.2f}")
+            print(f"   • Análisis: {summary['category_scores']['analysis']:.2f}")
+            print(f"   • Chat: {summary['category_scores']['chat']:.2f}")
         
-        print(f"\n🤖 MODO CLAUDE AI:")
-        print(f"   • Score promedio: {ai_summary['overall_quality_score']:.2f} ({ai_summary['overall_quality_score']*100:.0f}%)")
-        print(f"   • Predicciones: {ai_summary['category_scores']['predictions']:.2f}")
-        print(f"   • Análisis: {ai_summary['category_scores']['analysis']:.2f}")
-        print(f"   • Chat: {ai_summary['category_scores']['chat']:.2f}")
+        local_summary = self.results['claude_ai_off'].get('summary')
+        ai_summary = self.results['claude_ai_on'].get('summary')
+        if not (local_summary and ai_summary):
+            return
         
         # Comparación
         quality_diff = ai_summary['overall_quality_score'] - local_summary['overall_quality_score']
@@ -391,10 +369,13 @@ class QualityTester:
         print(f"   • Mejora: {quality_diff/local_summary['overall_quality_score']*100:+.1f}%" if local_summary['overall_quality_score'] > 0 else "   • No se puede calcular mejora")
 
 def main():
+    global API_BASE_URL
+    args = suite_parser('Tests de calidad LOCAL vs CLAUDE AI').parse_args()
+    API_BASE_URL = args.base_url
     tester = QualityTester()
-    tester.run_quality_tests()
+    tester.run_quality_tests(selected_modes(args))
+    results_file = tester.save_results(args.output)
     tester.print_summary()
-    results_file = tester.save_results()
     return results_file
 
 if __name__ == "__main__":
@@ -8,7 +8,9 @@ import requests
 import json
 import time
 from datetime import datetime
-import statistics
+
+from latency_histogram import LatencyHistogram, format_latency, format_summary
+from suite_runner import select_mode, suite_parser
 
 API_BASE_URL = "http://localhost:8080/api"
 
@@ -19,15 +21,15 @@ class QuickTester:
             'local_mode': {},
             'claude_mode': {}
         }
+        self.headers = {}
     
     def toggle_ai_mode(self, enable: bool) -> bool:
-        """Cambiar modo AI"""
-        try:
-            response = requests.post(f"{API_BASE_URL}/toggle-ai", 
-                                   json={"use_claude_ai": enable}, timeout=5)
-            return response.status_code == 200
-        except:
+        """Modo AI de las siguientes peticiones (header X-AI-Mode o toggle global)"""
+        headers = select_mode(API_BASE_URL, 'claude' if enable else 'local')
+        if headers is None:
             return False
+        self.headers = headers
+        return True
     
     def test_endpoint(self, endpoint, payload=None, count=3):
         """Test detallado de un endpoint con métricas precisas"""
@@ -43,9 +45,9 @@ class QuickTester:
             try:
                 if payload:
                     response = requests.post(f"{API_BASE_URL}/{endpoint}", 
-                                           json=payload, timeout=15)
+                                           json=payload, headers=self.headers, timeout=15)
                 else:
-                    response = requests.get(f"{API_BASE_URL}/{endpoint}", timeout=15)
+                    response = requests.get(f"{API_BASE_URL}/{endpoint}", headers=self.headers, timeout=15)
                 
                 response_time = time.time() - start
                 
@@ -62,27 +64,28 @@ class QuickTester:
                 error_msg = str(e)[:50]
                 errors.append(error_msg)
                 print(f"      {i+1}/{count}: ❌ {error_msg}")
-            
-            time.sleep(0.3)  # Pausa más corta
         
         batch_time = time.time() - start_batch
         
-        # Calcular estadísticas detalladas
+        # Calcular estadísticas detalladas (sin respuestas correctas los tiempos quedan en None)
+        histogram = LatencyHistogram(times)
         result = {
-            'avg_time': statistics.mean(times) if times else 999,
-            'min_time': min(times) if times else 0,
-            'max_time': max(times) if times else 0,
+            'avg_time': histogram.mean,
+            'min_time': histogram.min,
+            'max_time': histogram.max,
             'success_rate': success / count,
             'total_tests': count,
             'successful_tests': success,
             'failed_tests': count - success,
             'batch_duration': batch_time,
             'throughput': count / batch_time,
-            'errors': errors
+            'errors': errors,
+            'latency': histogram.summary(),
+            'histogram': histogram.to_dict()
         }
         
         # Mostrar resumen del endpoint
-        print(f"    📊 Resumen: {success}/{count} exitosos, promedio {result['avg_time']:.3f}s")
+        print(f"    📊 Resumen: {success}/{count} exitosos, promedio {format_latency(result['avg_time'])}")
         
         return result
     
@@ -107,7 +110,6 @@ class QuickTester:
         
         if self.toggle_ai_mode(False):
             print("✅ Modo LOCAL activado")
-            time.sleep(1)
             self.results['local_mode'] = {}
             
             for endpoint, name, payload in tests:
@@ -119,8 +121,6 @@ class QuickTester:
         local_duration = time.time() - start_local
         print(f"\n⏱️  Tiempo total LOCAL: {local_duration:.2f}s")
         
-        time.sleep(2)  # Pausa entre modos
-        
         # Test CLAUDE AI mode (AI ON)
         print(f"\n🤖 TESTING CLAUDE AI MODE (AI ON)")
         print("=" * 45)
@@ -128,7 +128,6 @@ class QuickTester:
         
         if self.toggle_ai_mode(True):
             print("✅ Modo CLAUDE AI activado")
-            time.sleep(1)
             self.results['claude_mode'] = {}
             
             for endpoint, name, payload in tests:
@@ -145,6 +144,13 @@ class QuickTester:
             'local_total': local_duration,
             'claude_total': claude_duration
         }
+        
+        # Percentiles por modo con los histogramas de todos sus endpoints
+        self.results['latency'] = {}
+        for mode in ('local_mode', 'claude_mode'):
+            histogram = LatencyHistogram.merged(LatencyHistogram.from_dict(r['histogram'])
+                                                for r in self.results[mode].values())
+            self.results['latency'][mode] = {**histogram.summary(), 'histogram': histogram.to_dict()}
     
     def print_summary(self):
         """Resumen detallado con comparaciones precisas"""
@@ -164,8 +170,9 @@ class QuickTester:
         
         for endpoint in local.keys():
             if endpoint in claude:
-                local_time = local[endpoint]['avg_time']
-                claude_time = claude[endpoint]['avg_time']
+                # Un endpoint sin respuestas correctas no tiene tiempo: nunca gana en velocidad
+                local_time = local[endpoint]['avg_time'] if local[endpoint]['avg_time'] is not None else float('inf')
+                claude_time = claude[endpoint]['avg_time'] if claude[endpoint]['avg_time'] is not None else float('inf')
                 local_success = local[endpoint]['success_rate']
                 claude_success = claude[endpoint]['success_rate']
                 
@@ -178,22 +185,27 @@ class QuickTester:
                     'reliability': reliability_winner
                 }
                 
-                print(f"{endpoint:<12} {local_time:.3f}s ({local_success*100:3.0f}%) {claude_time:>8.3f}s ({claude_success*100:3.0f}%) {speed_winner:>10}")
+                print(f"{endpoint:<12} {format_latency(local[endpoint]['avg_time']):>8} ({local_success*100:3.0f}%) "
+                      f"{format_latency(claude[endpoint]['avg_time']):>8} ({claude_success*100:3.0f}%) {speed_winner:>10}")
         
         # Estadísticas generales
         print(f"\n📈 ESTADÍSTICAS GENERALES:")
         print("-" * 40)
         
-        # Tiempos promedio
-        local_avg = sum(r['avg_time'] for r in local.values()) / len(local)
-        claude_avg = sum(r['avg_time'] for r in claude.values()) / len(claude)
+        # Tiempos promedio de todas las respuestas correctas del modo
+        latency = self.results.get('latency', {})
+        local_avg = latency.get('local_mode', {}).get('mean') or 0
+        claude_avg = latency.get('claude_mode', {}).get('mean') or 0
         speed_diff = abs(local_avg - claude_avg)
-        speed_improvement = ((max(local_avg, claude_avg) - min(local_avg, claude_avg)) / max(local_avg, claude_avg)) * 100
+        speed_improvement = ((max(local_avg, claude_avg) - min(local_avg, claude_avg)) / max(local_avg, claude_avg)) * 100 if max(local_avg, claude_avg) else 0
         
         print(f"⚡ Velocidad promedio:")
         print(f"   • LOCAL: {local_avg:.3f}s")
         print(f"   • CLAUDE AI: {claude_avg:.3f}s")
         print(f"   • Diferencia: {speed_diff:.3f}s ({speed_improvement:.1f}% {'LOCAL' if local_avg < claude_avg else 'CLAUDE AI'} más rápido)")
+        if latency:
+            print(f"   • Percentiles LOCAL: {format_summary(latency['local_mode'])}")
+            print(f"   • Percentiles CLAUDE AI: {format_summary(latency['claude_mode'])}")
         
         # Tasas de éxito
         local_success_avg = sum(r['success_rate'] for r in local.values()) / len(local)
@@ -236,17 +248,20 @@ class QuickTester:
         else:
             print("   💡 HÍBRIDO: Usar LOCAL para velocidad, CLAUDE AI para calidad")
     
-    def save_results(self):
+    def save_results(self, filepath=None):
         """Guardar resultados básicos"""
         filename = f"quick_test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        filepath = f"/Users/rios/Desktop/LLM-PREMIER/testing/{filename}"
+        filepath = filepath or f"/Users/rios/Desktop/LLM-PREMIER/testing/{filename}"
         
         with open(filepath, 'w') as f:
             json.dump(self.results, f, indent=2)
         
-        print(f"\n💾 Resultados guardados en: {filename}")
+        print(f"\n💾 Resultados guardados en: {filepath}")
 
 def main():
+    global API_BASE_URL
+    args = suite_parser('Test rápido LOCAL vs CLAUDE AI', modes=False).parse_args()
+    API_BASE_URL = args.base_url
     print("⚡ DETAILED TESTING - Análisis preciso con consumo moderado")
     print("⏱️  Duración: ~6-8 minutos")
     print("💰 Costo: ~12 requests (6 LOCAL + 6 CLAUDE AI)")
@@ -256,7 +271,7 @@ def main():
     tester = QuickTester()
     tester.run_quick_test()
     tester.print_summary()
-    tester.save_results()
+    tester.save_results(args.output)
     
     print(f"\n🎉 Análisis detallado completado!")
     print(f"📊 Datos precisos para tomar decisiones informadas")
@@ -1,22 +1,31 @@
 #!/usr/bin/env python3
 """
 Master Test Suite Runner - LLM Premier League
-Ejecuta toda la suite de tests de rendimiento de forma automatizada
+Ejecuta toda la suite de tests de rendimiento de forma automatizada: cada suite y modo contra su propio
+servidor, todas en paralelo
 """
 
+import argparse
 import os
 import sys
-import subprocess
+import threading
 import time
 import json
 from datetime import datetime
-from pathlib import Path
+from functools import partial
+
+from latency_histogram import LatencyHistogram, format_latency, format_summary
+from suite_runner import (MODE_NAMES, MODES, TESTING_DIR, Job, ProgressPrinter, run_jobs, run_script,
+                          start_api_server, start_mock_claude)
+
+# Mock de Claude con latencias de producción (TTFT ~0.6 s, 60 tokens/s) para ejecuciones sin coste
+MOCK_CLAUDE_OPTIONS = ('--tokens-per-second', '60', '--first-token', '0.6', '--ttft-jitter', '0.3', '--seed', '1')
 
 class MasterTestRunner:
     def __init__(self):
-        self.base_dir = "/Users/rios/Desktop/LLM-PREMIER"
-        self.testing_dir = f"{self.base_dir}/testing"
-        self.results_dir = f"{self.testing_dir}/results"
+        self.testing_dir = TESTING_DIR
+        self.base_dir = os.path.dirname(self.testing_dir)
+        self.results_dir = os.path.join(self.testing_dir, 'results')
         
         # Crear directorio de resultados
         os.makedirs(self.results_dir, exist_ok=True)
@@ -45,78 +54,79 @@ class MasterTestRunner:
             'summary': {},
             'recommendations': []
         }
+        self.progress = ProgressPrinter()
+        self._processes = []
+        self._processes_lock = threading.Lock()
     
-    def check_api_server(self) -> bool:
-        """Verificar que el servidor API está corriendo"""
-        import requests
-        try:
-            response = requests.get("http://localhost:8080/api/health", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
+    def start_server(self, test_name: str, mode: str, run_dir: str, inputs: dict):
+        """Instancia del servidor solo para una suite y un modo (su carga no se mezcla con la de otras suites)"""
+        env = {}
+        if 'mock_claude' in inputs:
+            env = {'CLAUDE_API_URL': inputs['mock_claude'].url, 'CLAUDE_API_KEY': 'mock'}
+        server = start_api_server(f"servidor {test_name}/{mode}", MODES[mode], env,
+                                  log_path=os.path.join(run_dir, f"server_{test_name}_{mode}.log"))
+        with self._processes_lock:
+            self._processes.append(server)
+        self.progress(f"{test_name}/{mode}", f"🖥️  Servidor {MODE_NAMES[mode]} en {server.url}")
+        return server
+    
+    def start_mock(self, run_dir: str, inputs: dict):
+        mock = start_mock_claude(MOCK_CLAUDE_OPTIONS, log_path=os.path.join(run_dir, 'mock_claude.log'))
+        with self._processes_lock:
+            self._processes.append(mock)
+        self.progress('mock', f"🤖 Mock de Claude en {mock.url}")
+        return mock
     
-    def run_test_script(self, test_name: str, script_path: str) -> dict:
-        """Ejecutar un script de test"""
-        print(f"\n🚀 EJECUTANDO: {self.test_suite[test_name]['description']}")
-        print(f"⏱️  Tiempo estimado: {self.test_suite[test_name]['duration_estimate']}")
-        print("-" * 60)
+    def run_test_script(self, test_name: str, mode: str, run_dir: str, inputs: dict) -> dict:
+        """Ejecutar un script de test en un modo contra su servidor y leer el JSON que escribe"""
+        server = inputs[f"server:{test_name}:{mode}"]
+        label = f"{test_name}/{mode}"
+        output = os.path.join(run_dir, f"{test_name}_{mode}.json")
+        self.progress(label, f"🚀 EJECUTANDO: {self.test_suite[test_name]['description']} "
+                             f"({self.test_suite[test_name]['duration_estimate']})")
         
-        start_time = time.time()
+        result = run_script(label, self.test_suite[test_name]['script'],
+                            ['--base-url', server.url, '--mode', mode, '--output', output],
+                            progress=self.progress, log_path=os.path.join(run_dir, f"{test_name}_{mode}.log"))
         
-        try:
-            # Ejecutar el script
-            result = subprocess.run([
-                sys.executable, script_path
-            ], capture_output=True, text=True, cwd=self.testing_dir, timeout=1800)  # 30 min timeout
-            
-            end_time = time.time()
-            execution_time = end_time - start_time
-            
-            if result.returncode == 0:
-                print(f"✅ {test_name.upper()} completado exitosamente")
-                print(f"⏱️  Tiempo real: {execution_time/60:.1f} minutos")
-                
-                # Buscar archivo de resultados más reciente
-                result_files = list(Path(self.testing_dir).glob(f"{test_name.split('_')[0]}*results*.json"))
-                latest_file = max(result_files, key=os.path.getctime) if result_files else None
-                
-                test_results = {}
-                if latest_file:
-                    with open(latest_file, 'r') as f:
-                        test_results = json.load(f)
-                
-                return {
-                    'success': True,
-                    'execution_time': execution_time,
-                    'stdout': result.stdout,
-                    'stderr': result.stderr,
-                    'results_file': str(latest_file) if latest_file else None,
-                    'results_data': test_results
-                }
-            else:
-                print(f"❌ {test_name.upper()} falló")
-                print(f"Error: {result.stderr}")
-                return {
-                    'success': False,
-                    'execution_time': execution_time,
-                    'error': result.stderr,
-                    'stdout': result.stdout
-                }
-                
-        except subprocess.TimeoutExpired:
-            print(f"⏰ {test_name.upper()} excedió el tiempo límite")
-            return {
-                'success': False,
-                'execution_time': 1800,
-                'error': 'Timeout exceeded'
-            }
-        except Exception as e:
-            print(f"❌ Error ejecutando {test_name}: {e}")
-            return {
-                'success': False,
-                'execution_time': time.time() - start_time,
-                'error': str(e)
-            }
+        result['results_file'] = output if os.path.exists(output) else None
+        result['results_data'] = {}
+        if result['results_file']:
+            with open(output, 'r') as f:
+                result['results_data'] = json.load(f)
+        if result['timed_out']:
+            self.progress(label, f"⏰ {test_name.upper()} excedió el tiempo límite")
+        elif result['success']:
+            self.progress(label, f"✅ {test_name.upper()} completado en {result['execution_time']/60:.1f} minutos")
+        else:
+            self.progress(label, f"❌ {test_name.upper()} falló (código {result['returncode']}, log: {result['log_file']})")
+        return result
+    
+    def collect_results(self, test_name: str, modes, outcomes: dict) -> dict:
+        """Resultado de una suite con los de cada modo; results_data combina los JSON por modo"""
+        runs = {}
+        results_data = {}
+        for mode in modes:
+            outcome = outcomes[f"{test_name}:{mode}"]
+            if not outcome['success']:
+                # No llegó a ejecutarse: normalmente porque su servidor (o el mock) no arrancó
+                server = outcomes[f"server:{test_name}:{mode}"]
+                runs[mode] = {'success': False, 'execution_time': 0,
+                              'error': outcome['error'] if server['success'] else server['error']}
+                continue
+            run = outcome['value']
+            runs[mode] = {key: value for key, value in run.items() if key != 'results_data'}
+            for key, value in run['results_data'].items():
+                if value or key not in results_data:
+                    results_data[key] = value
+        
+        return {
+            'success': all(run['success'] for run in runs.values()),
+            'execution_time': sum(run['execution_time'] for run in runs.values()),
+            'modes': runs,
+            'results_data': results_data,
+            'error': '; '.join(f"{mode}: {run['error']}" for mode, run in runs.items() if run.get('error')) or None
+        }
     
     def analyze_results(self):
         """Analizar todos los resultados y generar recomendaciones"""
@@ -127,11 +137,28 @@ class MasterTestRunner:
             'total_tests_run': len([t for t in self.master_results['test_results'].values() if t['success']]),
             'failed_tests': len([t for t in self.master_results['test_results'].values() if not t['success']]),
             'total_execution_time': sum(t['execution_time'] for t in self.master_results['test_results'].values()),
+            'wall_clock_time': self.master_results.get('wall_clock_time', 0),
             'performance_insights': {},
             'quality_insights': {},
-            'load_insights': {}
+            'load_insights': {},
+            'latency': {}
         }
         
+        # Latencias por modo: histogramas de todas las suites combinados
+        histogram_paths = {'performance': ('summary', 'histogram'), 'load_stress': ('histogram',)}
+        for mode in ['claude_ai_off', 'claude_ai_on']:
+            histograms = {}
+            for test_name, path in histogram_paths.items():
+                data = self.master_results['test_results'].get(test_name, {}).get('results_data', {}).get(mode, {})
+                for key in path:
+                    data = data.get(key, {})
+                if data:
+                    histograms[test_name] = LatencyHistogram.from_dict(data)
+            if histograms:
+                combined = LatencyHistogram.merged(histograms.values())
+                summary['latency'][mode] = {name: h.summary() for name, h in histograms.items()}
+                summary['latency'][mode]['all'] = combined.summary()
+        
         # Analizar rendimiento
         if 'performance' in self.master_results['test_results']:
             perf_data = self.master_results['test_results']['performance'].get('results_data', {})
@@ -141,14 +168,18 @@ class MasterTestRunner:
                 ai_perf = perf_data.get('claude_ai_on', {}).get('summary', {})
                 
                 if local_perf and ai_perf:
-                    speed_diff = local_perf.get('avg_response_time', 0) - ai_perf.get('avg_response_time', 0)
-                    success_diff = ai_perf.get('success_rate', 0) - local_perf.get('success_rate', 0)
+                    local_latency = local_perf.get('latency', {}).get('all', {})
+                    ai_latency = ai_perf.get('latency', {}).get('all', {})
+                    speed_diff = (ai_latency.get('mean') or 0) - (local_latency.get('mean') or 0)
+                    success_diff = ai_perf.get('overall_success_rate', 0) - local_perf.get('overall_success_rate', 0)
                     
                     summary['performance_insights'] = {
                         'local_faster_by': speed_diff,
                         'ai_more_reliable_by': success_diff,
-                        'local_avg_time': local_perf.get('avg_response_time', 0),
-                        'ai_avg_time': ai_perf.get('avg_response_time', 0)
+                        'local_avg_time': local_latency.get('mean') or 0,
+                        'ai_avg_time': ai_latency.get('mean') or 0,
+                        'local_p99': local_latency.get('p99'),
+                        'ai_p99': ai_latency.get('p99')
                     }
                     
                     if speed_diff > 0:
@@ -185,17 +216,18 @@ class MasterTestRunner:
                 for mode in ['claude_ai_off', 'claude_ai_on']:
                     mode_data = load_data.get(mode, {})
                     if 'stress_escalation' in mode_data:
-                        max_users = max(mode_data['stress_escalation'].keys()) if mode_data['stress_escalation'] else 0
+                        # Las claves son la tasa de llegada (RPS); en el JSON llegan como texto
+                        max_rps = max(map(int, mode_data['stress_escalation'].keys())) if mode_data['stress_escalation'] else 0
                         mode_name = "LOCAL" if 'off' in mode else "CLAUDE AI"
-                        summary['load_insights'][mode] = {'max_concurrent_users': max_users}
+                        summary['load_insights'][mode] = {'max_arrival_rate': max_rps}
                         
-                        if max_users >= 40:
-                            recommendations.append(f"💪 Modo {mode_name} maneja alta concurrencia ({max_users}+ usuarios)")
-                        elif max_users < 20:
-                            recommendations.append(f"⚠️  Modo {mode_name} limitado en concurrencia (máx {max_users} usuarios)")
+                        if max_rps >= 200:
+                            recommendations.append(f"💪 Modo {mode_name} maneja alta carga ({max_rps}+ RPS)")
+                        elif max_rps < 50:
+                            recommendations.append(f"⚠️  Modo {mode_name} limitado en carga (máx {max_rps} RPS)")
         
         # Recomendaciones generales
-        total_time = summary['total_execution_time']
+        total_time = summary['wall_clock_time']
         if total_time > 1800:  # 30 minutos
             recommendations.append("⏰ Tests extensos - considera ejecutar individualmente en producción")
         
@@ -216,18 +248,27 @@ class MasterTestRunner:
         summary = self.master_results['summary']
         
         print(f"\n📊 RESUMEN EJECUTIVO:")
-        print(f"   • Tests ejecutados: {summary['total_tests_run']}/{len(self.test_suite)}")
+        print(f"   • Tests ejecutados: {summary['total_tests_run']}/{len(self.master_results['test_results'])}")
         print(f"   • Tests fallidos: {summary['failed_tests']}")
-        print(f"   • Tiempo total: {summary['total_execution_time']/60:.1f} minutos")
+        print(f"   • Tiempo total: {summary['wall_clock_time']/60:.1f} minutos "
+              f"(las suites en serie: {summary['total_execution_time']/60:.1f} minutos)")
         
         # Insights de rendimiento
         if summary.get('performance_insights'):
             perf = summary['performance_insights']
             print(f"\n⚡ RENDIMIENTO:")
-            print(f"   • LOCAL: {perf['local_avg_time']:.2f}s promedio")
-            print(f"   • CLAUDE AI: {perf['ai_avg_time']:.2f}s promedio")
+            print(f"   • LOCAL: {perf['local_avg_time']:.2f}s promedio, p99 {format_latency(perf['local_p99'])}")
+            print(f"   • CLAUDE AI: {perf['ai_avg_time']:.2f}s promedio, p99 {format_latency(perf['ai_p99'])}")
             print(f"   • Diferencia: {abs(perf['local_faster_by']):.2f}s ({'LOCAL' if perf['local_faster_by'] > 0 else 'CLAUDE AI'} más rápido)")
         
+        # Percentiles de latencia por modo y suite
+        if summary.get('latency'):
+            print(f"\n⏱️  LATENCIAS (p50 / p90 / p99 / p99.9 / max):")
+            for mode, suites in summary['latency'].items():
+                mode_name = "LOCAL" if 'off' in mode else "CLAUDE AI"
+                for suite, data in suites.items():
+                    print(f"   • {mode_name:<9} {suite:<12} {format_summary(data)}")
+        
         # Insights de calidad
         if summary.get('quality_insights'):
             qual = summary['quality_insights']
@@ -241,7 +282,7 @@ class MasterTestRunner:
             print(f"\n💪 CAPACIDAD DE CARGA:")
             for mode, data in summary['load_insights'].items():
                 mode_name = "LOCAL" if 'off' in mode else "CLAUDE AI"
-                print(f"   • {mode_name}: {data['max_concurrent_users']} usuarios concurrentes máximo")
+                print(f"   • {mode_name}: {data['max_arrival_rate']} RPS máximo")
         
         # Recomendaciones
         print(f"\n🔍 RECOMENDACIONES:")
@@ -268,26 +309,34 @@ class MasterTestRunner:
         print(f"\n📁 Resultados maestros guardados en: {filepath}")
         return filepath
     
-    def run_full_suite(self):
-        """Ejecutar suite completa de tests"""
+    def run_full_suite(self, suites=None, modes=None, mock_claude: bool = False):
+        """
+        Ejecutar la suite completa: un servidor por suite y modo, todos los scripts a la vez.
+
+        Args:
+            suites: Suites a ejecutar (por defecto todas)
+            modes: Modos a probar ('local', 'claude'; por defecto ambos)
+            mock_claude: Apuntar los servidores en modo Claude al mock local (sin coste de API)
+        """
+        suites = [name for name in self.test_suite if name in (suites or self.test_suite)]
+        modes = [mode for mode in MODES if mode in (modes or MODES)]
+        run_dir = os.path.join(self.results_dir, f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        os.makedirs(run_dir, exist_ok=True)
+        
         print("🏆 LLM PREMIER LEAGUE - MASTER TESTING SUITE")
         print("=" * 80)
         print("🚀 Ejecutando suite completa de tests de rendimiento")
         print(f"📁 Directorio base: {self.base_dir}")
-        print(f"⏱️  Duración estimada: 30-45 minutos")
+        print(f"🧩 {len(suites)} suites x {len(modes)} modos en paralelo, cada una con su servidor")
+        print(f"🤖 Claude: {'mock local' if mock_claude else 'API real (CLAUDE_API_KEY)'}")
+        print(f"📄 Logs y resultados por suite en: {run_dir}")
         
-        # Verificar servidor
-        print("\n🔍 Verificando servidor API...")
-        if not self.check_api_server():
-            print("❌ Servidor API no disponible en http://localhost:8080")
-            print("   Por favor, ejecuta: python LLM/api_server_optimized.py")
-            return False
-        print("✅ Servidor API disponible")
-        
-        # Ejecutar cada test
-        for test_name, test_info in self.test_suite.items():
-            script_path = f"{self.testing_dir}/{test_info['script']}"
-            
+        # Grafo de trabajos: mock -> servidores en modo Claude; cada servidor -> su suite
+        jobs = []
+        if mock_claude and 'claude' in modes:
+            jobs.append(Job('mock_claude', partial(self.start_mock, run_dir)))
+        for test_name in list(suites):
+            script_path = os.path.join(self.testing_dir, self.test_suite[test_name]['script'])
             if not os.path.exists(script_path):
                 print(f"❌ Script no encontrado: {script_path}")
                 self.master_results['test_results'][test_name] = {
@@ -295,36 +344,56 @@ class MasterTestRunner:
                     'error': 'Script not found',
                     'execution_time': 0
                 }
+                suites.remove(test_name)
                 continue
-            
-            # Ejecutar test
-            result = self.run_test_script(test_name, script_path)
-            self.master_results['test_results'][test_name] = result
-            
-            # Pausa entre tests
-            if test_name != list(self.test_suite.keys())[-1]:  # No pause after last test
-                print(f"\n⏳ Pausa de 30 segundos antes del siguiente test...")
-                time.sleep(30)
+            for mode in modes:
+                server_job = f"server:{test_name}:{mode}"
+                needs_mock = mock_claude and mode == 'claude'
+                jobs.append(Job(server_job, partial(self.start_server, test_name, mode, run_dir),
+                                ['mock_claude'] if needs_mock else []))
+                jobs.append(Job(f"{test_name}:{mode}", partial(self.run_test_script, test_name, mode, run_dir),
+                                [server_job]))
+        
+        start = time.time()
+        try:
+            outcomes = run_jobs(jobs)
+        finally:
+            for process in self._processes:
+                process.stop()
+        self.master_results['wall_clock_time'] = time.time() - start
+        self.master_results['run_dir'] = run_dir
+        
+        for test_name in suites:
+            self.master_results['test_results'][test_name] = self.collect_results(test_name, modes, outcomes)
         
         # Analizar y reportar
         self.analyze_results()
         self.print_final_report()
         self.save_master_results()
         
-        return True
+        return all(result['success'] for result in self.master_results['test_results'].values())
 
 def main():
     runner = MasterTestRunner()
-    success = runner.run_full_suite()
+    parser = argparse.ArgumentParser(description='Suite completa de tests de rendimiento, calidad y carga')
+    parser.add_argument('--suite', choices=list(runner.test_suite), action='append',
+                        help='Suite a ejecutar (repetible); por defecto todas')
+    parser.add_argument('--mode', choices=list(MODES), action='append',
+                        help='Modo a probar (repetible); por defecto local y claude')
+    parser.add_argument('--mock-claude', action='store_true',
+                        help='Modo Claude contra mock_claude_server.py en lugar de la API real')
+    args = parser.parse_args()
+    
+    success = runner.run_full_suite(args.suite, args.mode, args.mock_claude)
     
     if success:
         print(f"\n🎉 TESTING SUITE COMPLETADA")
         print(f"📊 Revisa los archivos de resultados en: {runner.results_dir}")
     else:
         print(f"\n❌ TESTING SUITE FALLÓ")
-        print(f"🔧 Revisa la configuración del servidor y vuelve a intentar")
+        print(f"🔧 Revisa los logs de cada suite y servidor en: {runner.master_results['run_dir']}")
     
     return success
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Season Simulator Benchmark - LLM Premier League
+Mide la simulación Monte Carlo de temporadas y la valida contra una simulación partido a partido en Python
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from batch_predict import local_probabilities  # noqa: E402
+from columnar_cache import load_dataset  # noqa: E402
+from goals_model import fit_goals_model  # noqa: E402
+from live_stats import LiveStatsStore  # noqa: E402
+from season_simulator import SeasonSimulator, latest_season_teams, round_robin, simulate_seasons  # noqa: E402
+
+TARGET_SEASONS = 100_000
+MAX_SECONDS = 5.0
+REFERENCE_SEASONS = 4_000
+# Error estándar de una probabilidad con 4000 temporadas: <= 0.008; 4 sigmas
+MAX_PROBABILITY_GAP = 0.035
+MAX_POINTS_GAP = 0.5
+
+
+def reference_simulation(team_names, home, away, probabilities, seasons: int, seed: int):
+    """Simulación ingenua partido a partido, como referencia de la versión vectorizada"""
+    rng = np.random.default_rng(seed)
+    n = len(team_names)
+    titles, relegations, points_total = np.zeros(n), np.zeros(n), np.zeros(n)
+    for _ in range(seasons):
+        points = [0.0] * n
+        for h, a, (p_home, p_draw, _) in zip(home.tolist(), away.tolist(), probabilities.tolist()):
+            u = rng.random()
+            if u < p_home:
+                points[h] += 3
+            elif u < p_home + p_draw:
+                points[h] += 1
+                points[a] += 1
+            else:
+                points[a] += 3
+        jitter = rng.random(n)
+        order = sorted(range(n), key=lambda i: (-points[i], -jitter[i]))
+        titles[order[0]] += 1
+        relegations[order[-3:]] += 1
+        points_total += points
+    return titles / seasons, relegations / seasons, points_total / seasons
+
+
+def main():
+    print("🎲 LLM PREMIER LEAGUE - SEASON SIMULATOR BENCHMARK")
+    print("=" * 70)
+    dataset = load_dataset()
+    live_stats = LiveStatsStore.from_dataset(dataset)
+    goals_model = fit_goals_model(dataset)
+    teams = latest_season_teams(dataset)
+    simulator = SeasonSimulator(live_stats, goals_model, teams)
+    results = {'timestamp': datetime.now().isoformat(), 'teams': len(teams), 'timing': {}}
+
+    fixtures = round_robin(teams)
+    probabilities = local_probabilities(live_stats.snapshot(), fixtures, goals_model)
+    index = {name: i for i, name in enumerate(teams)}
+    home = np.array([index[f.home_team] for f in fixtures])
+    away = np.array([index[f.away_team] for f in fixtures])
+    probabilities = probabilities / probabilities.sum(axis=1, keepdims=True)
+    print(f"📋 {len(teams)} equipos, {len(fixtures)} partidos por temporada, {os.cpu_count()} CPU")
+
+    print(f"\n⏱️ {TARGET_SEASONS:,} temporadas")
+    for workers in (1, 2):
+        start = time.perf_counter()
+        simulate_seasons(teams, home, away, probabilities, seasons=TARGET_SEASONS, seed=7, workers=workers)
+        seconds = time.perf_counter() - start
+        results['timing'][workers] = {'seconds': seconds, 'seasons_per_second': TARGET_SEASONS / seconds}
+        print(f"   {workers} worker(s): {seconds:6.2f}s ({TARGET_SEASONS / seconds:,.0f} temporadas/s)")
+
+    response = simulator.simulate({'seasons': TARGET_SEASONS, 'seed': 2024})
+    repeated = simulator.simulate({'seasons': TARGET_SEASONS, 'seed': 2024})
+    parallel = simulator.simulate({'seasons': TARGET_SEASONS, 'seed': 2024, 'workers': 2})
+    rows = response['teams']
+    print(f"\n🏆 Simulación de /api/simulate ({response['elapsed_seconds']:.2f}s)")
+    print(f"   {'Equipo':<18} {'Título':>7} {'Top 4':>7} {'Descenso':>9} {'Puntos':>7}")
+    for row in rows:
+        print(f"   {row['team']:<18} {row['title']:>7.1%} {row['top4']:>7.1%} {row['relegation']:>9.1%} "
+              f"{row['expected_points']:>7.1f}")
+    results['simulation'] = rows
+
+    print(f"\n🔍 Referencia partido a partido ({REFERENCE_SEASONS:,} temporadas)")
+    start = time.perf_counter()
+    titles, relegations, points = reference_simulation(teams, home, away, probabilities, REFERENCE_SEASONS, 99)
+    reference_seconds = time.perf_counter() - start
+    by_team = {row['team']: row for row in rows}
+    title_gap = max(abs(by_team[t]['title'] - titles[i]) for i, t in enumerate(teams))
+    relegation_gap = max(abs(by_team[t]['relegation'] - relegations[i]) for i, t in enumerate(teams))
+    points_gap = max(abs(by_team[t]['expected_points'] - points[i]) for i, t in enumerate(teams))
+    results['reference'] = {'seasons': REFERENCE_SEASONS, 'seconds': reference_seconds, 'max_title_gap': title_gap,
+                            'max_relegation_gap': relegation_gap, 'max_points_gap': points_gap}
+    print(f"   {reference_seconds:.1f}s; diferencia máxima: título {title_gap:.3f}, descenso {relegation_gap:.3f}, "
+          f"puntos {points_gap:.2f}")
+
+    checks = {
+        'under_5s_one_core': results['timing'][1]['seconds'] < MAX_SECONDS,
+        'title_sums_to_one': abs(sum(r['title'] for r in rows) - 1) < 1e-3,
+        'top4_sums_to_four': abs(sum(r['top4'] for r in rows) - 4) < 1e-3,
+        'relegation_sums_to_three': abs(sum(r['relegation'] for r in rows) - 3) < 1e-3,
+        'seed_reproducible': response['teams'] == repeated['teams'],
+        'workers_match_single_process': response['teams'] == parallel['teams'],
+        'matches_reference': title_gap < MAX_PROBABILITY_GAP and relegation_gap < MAX_PROBABILITY_GAP
+        and points_gap < MAX_POINTS_GAP
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"season_simulator_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
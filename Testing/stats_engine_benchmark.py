@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Statistics Engine Benchmark - LLM Premier League
+Mide el motor vectorizado de estadísticas y verifica escalado lineal con datos multi-liga
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from columnar_cache import ColumnarDataset, load_dataset  # noqa: E402
+from stats_engine import FORM_WINDOW, compute_team_stats  # noqa: E402
+
+SCALE_FACTORS = [1, 10, 100]
+REPEATS = 7
+# Tiempo por fila a 100x vs 10x. Las ligas simuladas multiplican también los
+# equipos, así que con el filtrado por equipo que sustituye el motor el tiempo
+# por fila crece con el número de equipos (10x por escalón) y con un sort
+# n·log n ~1.2x. El motor es lineal (radix sorts + bincount), pero a 100x los
+# arrays ya no caben en L2 y el scatter del radix sort cuesta 1.6-2x por fila;
+# el límite deja margen para eso y sigue detectando el crecimiento cuadrático.
+MAX_SCALING_RATIO = 3.0
+FORM_LETTER = {('home', 'H'): 'W', ('home', 'A'): 'L', ('away', 'A'): 'W', ('away', 'H'): 'L'}
+
+
+def replicate_as_leagues(dataset: ColumnarDataset, factor: int) -> ColumnarDataset:
+    """Simular `factor` ligas: copias del dataset con códigos de equipo desplazados"""
+    n_teams = len(dataset.team_names)
+    offsets = np.repeat(np.arange(factor) * n_teams, len(dataset))
+
+    columns = {
+        'Date': np.tile(dataset['Date'], factor),
+        'HomeTeam': np.tile(dataset['HomeTeam'].astype(np.uint32), factor) + offsets,
+        'AwayTeam': np.tile(dataset['AwayTeam'].astype(np.uint32), factor) + offsets,
+        'FTHG': np.tile(dataset['FTHG'], factor),
+        'FTAG': np.tile(dataset['FTAG'], factor),
+        'FTR': np.tile(dataset['FTR'], factor)
+    }
+    code_dtype = np.uint8 if n_teams * factor <= 0xFF else np.uint16
+    columns['HomeTeam'] = columns['HomeTeam'].astype(code_dtype)
+    columns['AwayTeam'] = columns['AwayTeam'].astype(code_dtype)
+
+    teams = [f"{name} L{league}" for league in range(factor) for name in dataset.team_names]
+    dictionaries = {'teams': teams, 'FTR': dataset.dictionaries['FTR']}
+    kinds = {'Date': 'date', 'HomeTeam': 'team', 'AwayTeam': 'team',
+             'FTHG': 'numeric', 'FTAG': 'numeric', 'FTR': 'category'}
+    return ColumnarDataset(columns, kinds, dictionaries, len(dataset) * factor, dataset.source_sha256)
+
+
+def legacy_team_stats(dataset: ColumnarDataset) -> dict:
+    """Referencia: filtrado por equipo como en _calculate_advanced_statistics"""
+    home = dataset.decode('HomeTeam')
+    away = dataset.decode('AwayTeam')
+    ftr = dataset.decode('FTR')
+    hg, ag = dataset['FTHG'], dataset['FTAG']
+    # Orden cronológico estable, como el sort por fecha del DataFrame
+    order = sorted(range(len(dataset)), key=lambda i: dataset['Date'][i])
+    rows = [(home[i], away[i], hg[i], ag[i], ftr[i]) for i in order]
+
+    stats = {}
+    for team in dataset.team_names:
+        home_games = [r for r in rows if r[0] == team]
+        away_games = [r for r in rows if r[1] == team]
+        games = [r for r in rows if r[0] == team or r[1] == team]
+        if not games:
+            continue
+        home_wins = sum(1 for r in home_games if r[4] == 'H')
+        away_wins = sum(1 for r in away_games if r[4] == 'A')
+        form = [FORM_LETTER.get(('home' if r[0] == team else 'away', r[4]), 'D') for r in games[-FORM_WINDOW:]]
+        stats[team] = {
+            'matches_played': len(games),
+            'goals_per_game': (sum(int(r[2]) for r in home_games) + sum(int(r[3]) for r in away_games)) / len(games),
+            'win_rate': (home_wins + away_wins) / len(games),
+            'home_win_rate': home_wins / len(home_games) if home_games else 0.0,
+            'away_win_rate': away_wins / len(away_games) if away_games else 0.0,
+            'recent_form': ''.join(form)
+        }
+    return stats
+
+
+def differences(vectorized: dict, reference: dict) -> list:
+    """Campos en los que el motor vectorizado no coincide con la referencia"""
+    diffs = []
+    for team, ref in reference.items():
+        for key, value in ref.items():
+            got = vectorized.get(team, {}).get(key)
+            same = got == value if isinstance(value, str) else got is not None and abs(got - value) < 1e-9
+            if not same:
+                diffs.append(f"{team}.{key}: {got!r} != {value!r}")
+    return diffs
+
+
+def time_call(fn, *args) -> float:
+    """Mejor tiempo de REPEATS ejecuciones tras una de calentamiento"""
+    fn(*args)
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print("📊 LLM PREMIER LEAGUE - STATISTICS ENGINE BENCHMARK")
+    print("=" * 70)
+
+    dataset = load_dataset()
+    print(f"✅ Dataset cargado: {len(dataset)} partidos, {len(dataset.team_names)} equipos")
+
+    # Validar contra la implementación por equipo
+    vectorized = compute_team_stats(dataset).to_dict()
+    reference = legacy_team_stats(dataset)
+    diffs = differences(vectorized, reference)
+    if diffs:
+        print(f"❌ {len(diffs)} diferencias con la referencia por equipo, p.ej. {diffs[0]}")
+    else:
+        print(f"✅ Resultados idénticos a la referencia por equipo ({len(reference)} equipos, "
+              f"incluidas forma reciente y tasas local/visitante)")
+
+    legacy_time = time_call(legacy_team_stats, dataset)
+    print(f"\n🐢 Referencia por equipo (1x): {legacy_time * 1000:.1f} ms")
+
+    results = {'timestamp': datetime.now().isoformat(), 'legacy_1x_seconds': legacy_time,
+               'reference_differences': diffs, 'scales': {}}
+    print(f"\n{'Escala':<8} {'Partidos':>10} {'Equipos':>8} {'Tiempo':>12} {'ns/fila':>10}")
+    print("-" * 52)
+
+    for factor in SCALE_FACTORS:
+        scaled = replicate_as_leagues(dataset, factor)
+        elapsed = time_call(compute_team_stats, scaled)
+        ns_per_row = elapsed / len(scaled) * 1e9
+        results['scales'][factor] = {
+            'rows': len(scaled),
+            'teams': len(scaled.team_names),
+            'seconds': elapsed,
+            'ns_per_row': ns_per_row
+        }
+        print(f"{factor:>5}x   {len(scaled):>10} {len(scaled.team_names):>8} "
+              f"{elapsed * 1000:>9.2f} ms {ns_per_row:>10.1f}")
+
+    ratio = results['scales'][100]['ns_per_row'] / results['scales'][10]['ns_per_row']
+    results['scaling_ratio_100x_vs_10x'] = ratio
+    results['linear'] = ratio <= MAX_SCALING_RATIO
+
+    print(f"\n⚖️  Tiempo por fila 100x / 10x: {ratio:.2f} (límite {MAX_SCALING_RATIO})")
+    print(f"🚀 Speedup vs referencia (1x): {legacy_time / results['scales'][1]['seconds']:.0f}x")
+    print("✅ Escalado lineal" if results['linear'] else "❌ Escalado peor que lineal")
+
+    filename = f"stats_engine_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return results['linear'] and not diffs
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
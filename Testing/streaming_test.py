@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Streaming Test - LLM Premier League
+Mide time-to-first-byte de /api/chat con y sin Server-Sent Events (Flask y ASGI) contra un mock local de Claude
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import requests
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LLM'))
+
+from api_extensions import claude_sse_response, get_service, init_api_extensions, stream_requested  # noqa: E402
+from async_claude_client import AsyncClaudeClient, BlockingClaudeClient  # noqa: E402
+from circuit_breaker import AsyncCircuitBreakerClient, CircuitBreaker  # noqa: E402
+from mock_claude_server import start_mock_server  # noqa: E402
+
+MOCK_LATENCY = 3.0          # Respuesta completa de Claude (2-5 s en producción)
+MOCK_FIRST_TOKEN = 0.25
+REPEATS = 3
+MAX_FIRST_DELTA_SECONDS = 0.5
+
+
+def create_app(claude) -> Flask:
+    """App mínima con un /api/chat equivalente al de api_server_optimized.py"""
+    app = Flask(__name__)
+    init_api_extensions(app, claude=claude)
+
+    @app.route('/api/chat', methods=['POST'])
+    def chat():
+        question = (request.get_json(silent=True) or {}).get('message', '')
+        prompt = f"Responde como analista de la Premier League: {question}"
+        if stream_requested():
+            return claude_sse_response(prompt, finalize=lambda text: {'success': True, 'response': text})
+        return jsonify({'success': True, 'response': get_service('claude').complete(prompt)})
+
+    return app
+
+
+def start_asgi(mock_url: str):
+    """App ASGI completa bajo uvicorn en un hilo, con el cliente asíncrono y su circuit breaker"""
+    import uvicorn
+    from asgi_server import create_asgi_app
+
+    claude = AsyncCircuitBreakerClient(AsyncClaudeClient(api_key='mock', base_url=mock_url), CircuitBreaker())
+    config = uvicorn.Config(create_asgi_app(use_claude_ai=True, claude=claude), host='127.0.0.1', port=0,
+                            log_level='warning')
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def measure_prediction(url: str) -> dict:
+    """Eventos del stream de /api/predict y tiempo hasta la primera predicción parcial"""
+    start = time.perf_counter()
+    first_partial = None
+    events = []
+    with requests.post(url, json={'home_team': 'Arsenal', 'away_team': 'Chelsea'},
+                       headers={'Accept': 'text/event-stream'}, stream=True, timeout=30) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith('event: '):
+                events.append(line[7:])
+                if line == 'event: partial' and first_partial is None:
+                    first_partial = time.perf_counter() - start
+    return {'first_partial': first_partial, 'total': time.perf_counter() - start, 'events': events}
+
+
+def measure(url: str, stream: bool) -> dict:
+    """Tiempo hasta el primer byte, hasta el primer delta y total"""
+    headers = {'Accept': 'text/event-stream'} if stream else {}
+    start = time.perf_counter()
+    first_byte = first_delta = None
+    events = []
+    with requests.post(url, json={'message': '¿Quién ganará el Arsenal vs Chelsea?'},
+                       headers=headers, stream=True, timeout=30) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            now = time.perf_counter() - start
+            if first_byte is None:
+                first_byte = now
+            if line.startswith('event: '):
+                events.append(line[7:])
+                if line == 'event: delta' and first_delta is None:
+                    first_delta = now
+    total = time.perf_counter() - start
+    return {
+        'first_byte': first_byte,
+        'first_delta': first_delta if stream else total,
+        'total': total,
+        'events': {name: events.count(name) for name in set(events)}
+    }
+
+
+def main():
+    print("📡 LLM PREMIER LEAGUE - STREAMING (SSE) TEST")
+    print("=" * 70)
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    mock, _, mock_url = start_mock_server(latency=MOCK_LATENCY, first_token_latency=MOCK_FIRST_TOKEN)
+    claude = BlockingClaudeClient(AsyncClaudeClient(api_key='mock', base_url=mock_url))
+    server = make_server('127.0.0.1', 0, create_app(claude), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/chat"
+    print(f"🤖 Mock de Claude: {MOCK_LATENCY}s por respuesta, primer token a {MOCK_FIRST_TOKEN}s\n")
+
+    results = {'timestamp': datetime.now().isoformat(), 'buffered': [], 'streaming': [], 'asgi_streaming': []}
+    asgi_server = None
+    try:
+        for _ in range(REPEATS):
+            results['buffered'].append(measure(url, stream=False))
+            results['streaming'].append(measure(url, stream=True))
+        asgi_server, asgi_url = start_asgi(mock_url)
+        for _ in range(REPEATS):
+            results['asgi_streaming'].append(measure(f"{asgi_url}/api/chat", stream=True))
+        results['asgi_predict'] = measure_prediction(f"{asgi_url}/api/predict")
+    finally:
+        if asgi_server is not None:
+            asgi_server.should_exit = True
+        server.shutdown()
+        claude.close()
+        mock.shutdown()
+
+    def avg(mode, key):
+        return sum(r[key] for r in results[mode]) / len(results[mode])
+
+    print(f"{'Modo':<15} {'Primer byte':>12} {'Primer texto':>13} {'Total':>8}")
+    print("-" * 51)
+    for mode in ('buffered', 'streaming', 'asgi_streaming'):
+        print(f"{mode:<15} {avg(mode, 'first_byte'):>11.3f}s {avg(mode, 'first_delta'):>12.3f}s "
+              f"{avg(mode, 'total'):>7.2f}s")
+
+    last = results['streaming'][-1]['events']
+    asgi_last = results['asgi_streaming'][-1]['events']
+    print(f"\n📨 Eventos del stream: Flask {last}, ASGI {asgi_last}")
+    predict = results['asgi_predict']
+    print(f"🎯 /api/predict ASGI: {predict['events'].count('partial')} parciales, primera a "
+          f"{predict['first_partial'] or 0:.3f}s, total {predict['total']:.2f}s")
+
+    checks = {
+        'first_delta_fast': avg('streaming', 'first_delta') <= MAX_FIRST_DELTA_SECONDS,
+        'buffered_waits_full_response': avg('buffered', 'first_byte') >= MOCK_LATENCY * 0.9,
+        'stream_ends_with_done': last.get('done') == 1 and last.get('start') == 1,
+        'asgi_first_delta_fast': avg('asgi_streaming', 'first_delta') <= MAX_FIRST_DELTA_SECONDS,
+        'asgi_stream_ends_with_done': asgi_last.get('done') == 1 and asgi_last.get('delta', 0) > 1,
+        'asgi_predict_partials_before_done': (predict['events'].count('partial') > 1
+                                              and predict['events'][-1] == 'done')
+    }
+    results['checks'] = checks
+    print()
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    filename = f"streaming_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {filename}")
+
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
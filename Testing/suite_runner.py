@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Suite Runner - LLM Premier League
+Servidores aislados por modo y puerto, ejecución de scripts de test en paralelo según dependencias y progreso en vivo
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import requests
+
+TESTING_DIR = os.path.dirname(os.path.abspath(__file__))
+LLM_DIR = os.path.join(TESTING_DIR, '..', 'LLM')
+DEFAULT_API_BASE_URL = "http://localhost:8080/api"
+MODES = {'local': False, 'claude': True}
+MODE_KEYS = {'local': 'claude_ai_off', 'claude': 'claude_ai_on'}
+MODE_NAMES = {'local': 'LOCAL', 'claude': 'CLAUDE AI'}
+AI_MODE_HEADER = 'X-AI-Mode'
+SERVER_START_TIMEOUT = 120.0
+SUITE_TIMEOUT = 1800  # 30 min por script
+
+
+def suite_parser(description: str, modes: bool = True) -> argparse.ArgumentParser:
+    """Argumentos comunes de los scripts de test: servidor, modos (si el script los separa) y fichero de resultados"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--base-url', default=DEFAULT_API_BASE_URL, help='URL base de la API (acabada en /api)')
+    if modes:
+        parser.add_argument('--mode', choices=list(MODES), action='append',
+                            help='Modo a probar (repetible); por defecto local y claude')
+    parser.add_argument('--output', help='Ruta del JSON de resultados')
+    return parser
+
+
+def selected_modes(args: argparse.Namespace) -> List[str]:
+    return [mode for mode in MODES if mode in (args.mode or MODES)]
+
+
+def select_mode(base_url: str, mode: str) -> Optional[Dict[str, str]]:
+    """
+    Headers con los que las siguientes peticiones usan el modo indicado.
+
+    Si el servidor elige el motor por petición (anuncia ai_modes en /health)
+    basta con el header X-AI-Mode: el modo global no cambia y no hay que
+    esperar a que se propague. Con servidores anteriores se cambia el modo
+    global con /toggle-ai.
+
+    Returns:
+        Dict de headers, o None si el servidor no acepta el cambio de modo
+    """
+    headers = {AI_MODE_HEADER: mode}
+    try:
+        health = requests.get(f"{base_url}/health", timeout=10).json()
+        if mode in health.get('ai_modes', ()):
+            return headers
+        response = requests.post(f"{base_url}/toggle-ai", json={'use_claude_ai': MODES[mode]}, timeout=10)
+        data = response.json()
+    except (requests.RequestException, ValueError):
+        return None
+    # use_claude_ai en LLM/api_engine.py; current_mode en versiones anteriores del servidor
+    if response.status_code == 200 and data.get('use_claude_ai', data.get('current_mode')) == MODES[mode]:
+        return headers
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ProgressPrinter:
+    """Líneas de varios procesos en la misma consola, sin mezclarse y con la etiqueta de su trabajo"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.width = 0
+
+    def __call__(self, label: str, text: str):
+        with self.lock:
+            self.width = max(self.width, len(label))
+            print(f"[{label:<{self.width}}] {text}", flush=True)
+
+
+@dataclass
+class ManagedProcess:
+    """Proceso auxiliar (servidor de la API o mock de Claude) con la URL en la que escucha"""
+    name: str
+    url: str
+    process: subprocess.Popen
+    log_path: Optional[str] = None
+
+    def wait_ready(self, health_url: str, timeout: float = SERVER_START_TIMEOUT):
+        """
+        Esperar a que el proceso responda.
+
+        Raises:
+            RuntimeError: Si el proceso termina o no responde a tiempo
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} terminó al arrancar (código {self.process.returncode}, "
+                                   f"log: {self.log_path})")
+            try:
+                requests.get(health_url, timeout=2)
+                return
+            except requests.exceptions.RequestException:
+                time.sleep(0.1)
+        raise RuntimeError(f"{self.name} no respondió en {timeout:.0f}s (log: {self.log_path})")
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+def _spawn(name: str, command: Sequence[str], cwd: str, env: Dict[str, str], url: str,
+           log_path: Optional[str]) -> ManagedProcess:
+    log = open(log_path, 'w') if log_path else subprocess.DEVNULL
+    try:
+        process = subprocess.Popen(list(command), cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+    finally:
+        if log_path:
+            log.close()  # El hijo conserva su copia del descriptor
+    return ManagedProcess(name, url, process, log_path)
+
+
+def start_api_server(name: str, use_claude_ai: Optional[bool] = None, env: Optional[Dict[str, str]] = None,
+                     log_path: Optional[str] = None) -> ManagedProcess:
+    """
+    Arrancar una instancia propia del servidor ASGI (LLM/asgi_server.py) en un puerto libre.
+
+    Las suites miden este servidor, no el Flask: sirve los mismos contratos
+    (PremierLeagueEngine), pero las cifras no son comparables con resultados
+    anteriores tomados contra Flask. Para medir Flask, arrancarlo aparte y
+    ejecutar cada suite con --base-url.
+
+    Args:
+        name: Nombre para los mensajes de error
+        use_claude_ai: Modo fijo de la instancia (USE_CLAUDE_AI); None deja el del entorno
+        env: Variables de entorno adicionales (p. ej. CLAUDE_API_URL del mock)
+        log_path: Fichero para la salida del servidor
+
+    Returns:
+        ManagedProcess con la URL base de la API (acabada en /api), ya respondiendo
+
+    Raises:
+        RuntimeError: Si el servidor no arranca
+    """
+    port = free_port()
+    server_env = {**os.environ, **(env or {})}
+    if use_claude_ai is not None:
+        server_env['USE_CLAUDE_AI'] = 'true' if use_claude_ai else 'false'
+    server = _spawn(name, [sys.executable, 'asgi_server.py', '--host', '127.0.0.1', '--port', str(port)],
+                    LLM_DIR, server_env, f"http://127.0.0.1:{port}/api", log_path)
+    try:
+        server.wait_ready(f"{server.url}/health")
+    except RuntimeError:
+        server.stop()
+        raise
+    return server
+
+
+def start_mock_claude(options: Sequence[str] = (), log_path: Optional[str] = None) -> ManagedProcess:
+    """
+    Arrancar mock_claude_server.py en un puerto libre.
+
+    Returns:
+        ManagedProcess con la URL del endpoint /v1/messages
+
+    Raises:
+        RuntimeError: Si el mock no arranca
+    """
+    port = free_port()
+    mock = _spawn('mock de Claude', [sys.executable, 'mock_claude_server.py', '--port', str(port), *options],
+                  TESTING_DIR, dict(os.environ), f"http://127.0.0.1:{port}/v1/messages", log_path)
+    try:
+        mock.wait_ready(f"http://127.0.0.1:{port}/stats")
+    except RuntimeError:
+        mock.stop()
+        raise
+    return mock
+
+
+def run_script(label: str, script: str, args: Sequence[str] = (), progress: Optional[ProgressPrinter] = None,
+               log_path: Optional[str] = None, timeout: float = SUITE_TIMEOUT) -> Dict:
+    """
+    Ejecutar un script de Testing/ y reenviar su salida línea a línea según se produce.
+
+    Returns:
+        Dict: success, returncode, execution_time, timed_out y log_file
+    """
+    start = time.time()
+    process = subprocess.Popen([sys.executable, '-u', script, *args], cwd=TESTING_DIR, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True, bufsize=1)
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    log = open(log_path, 'w') if log_path else None
+    try:
+        for line in process.stdout:
+            if log:
+                log.write(line)
+            if progress:
+                progress(label, line.rstrip())
+        returncode = process.wait()
+    finally:
+        timer.cancel()
+        if log:
+            log.close()
+    return {'success': returncode == 0, 'returncode': returncode, 'execution_time': time.time() - start,
+            'timed_out': timed_out.is_set(), 'log_file': log_path}
+
+
+@dataclass
+class Job:
+    """Trabajo del grafo: run recibe los valores devueltos por sus dependencias"""
+    name: str
+    run: Callable[[Dict[str, Any]], Any]
+    depends_on: Sequence[str] = field(default_factory=tuple)
+
+
+def run_jobs(jobs: Sequence[Job], max_workers: Optional[int] = None) -> Dict[str, Dict]:
+    """
+    Ejecutar trabajos en paralelo en cuanto terminan sus dependencias.
+
+    Un trabajo falla si lanza una excepción; los que dependen de él no se ejecutan.
+
+    Returns:
+        Dict: nombre -> {success, value | error, skipped, seconds}, en el orden de jobs
+
+    Raises:
+        ValueError: Si un trabajo depende de otro que no está definido antes que él
+    """
+    defined = set()
+    for job in jobs:
+        missing = [dep for dep in job.depends_on if dep not in defined]
+        if missing:
+            raise ValueError(f"{job.name} depende de trabajos no definidos antes: {', '.join(missing)}")
+        defined.add(job.name)
+
+    results: Dict[str, Dict] = {}
+    pending = list(jobs)
+    running = {}
+
+    def timed(job: Job, inputs: Dict[str, Any]):
+        start = time.time()
+        return job.run(inputs), time.time() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(jobs), 1)) as executor:
+        while pending or running:
+            for job in list(pending):
+                failed = next((dep for dep in job.depends_on if dep in results and not results[dep]['success']), None)
+                if failed:
+                    results[job.name] = {'success': False, 'skipped': True, 'error': f"Dependencia fallida: {failed}"}
+                    pending.remove(job)
+                elif all(dep in results for dep in job.depends_on):
+                    inputs = {dep: results[dep]['value'] for dep in job.depends_on}
+                    running[executor.submit(timed, job, inputs)] = job
+                    pending.remove(job)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    value, seconds = future.result()
+                    results[job.name] = {'success': True, 'skipped': False, 'value': value, 'seconds': seconds}
+                except Exception as e:
+                    results[job.name] = {'success': False, 'skipped': False, 'error': str(e)}
+    return {job.name: results[job.name] for job in jobs}